@@ -1,5 +1,6 @@
 import os
 import subprocess
+from profiler import PROFILER, PROFILE_SUMMARY_FILE, PROFILE_TRACE_FILE
 from sympy import sympify, expand, simplify
 import re
 
@@ -14,7 +15,8 @@ def generate_answers(data_dir):
         if f.endswith('.in'):
             with open(f"{data_dir}/{f}") as file:
                 expr = process_expr(file.read().strip())
-                answers[f] = str(expand(simplify(sympify(expr))))
+                with PROFILER.phase("sympy_answer", f):
+                    answers[f] = str(expand(simplify(sympify(expr))))
     return answers
 
 
@@ -35,16 +37,21 @@ def test_jar(jar_path, answers):
             with open(f"data/{case}") as f:
                 input_data = f.read()
 
-            p = subprocess.run(
-                ['java', '-jar', jar_path],
-                input=input_data,
-                capture_output=True,
-                text=True,
-                timeout=3
-            )
+            case_key = f"{jar_base}/{case_base}"
+            with PROFILER.phase("jar_run", case_key):
+                p = subprocess.run(
+                    ['java', '-jar', jar_path],
+                    input=input_data,
+                    capture_output=True,
+                    text=True,
+                    timeout=3
+                )
+            PROFILER.count("output_chars", len(p.stdout))
             output = process_expr(p.stdout.strip())
 
-            if sympify(answers[case]).equals(sympify(output)):
+            with PROFILER.phase("sympy_compare", case_key):
+                is_equal = sympify(answers[case]).equals(sympify(output))
+            if is_equal:
                 results["correct"] += 1
             else:
                 # 生成错误报告
@@ -86,6 +93,7 @@ def main():
 
     with open("summary.txt", "w") as f:
         f.write("Test Summary:\n" + "\n".join(report))
+    PROFILER.report(PROFILE_SUMMARY_FILE, PROFILE_TRACE_FILE)
     print("\nTest completed. See summary.txt")
 
 
@@ -2,6 +2,7 @@ import os
 import subprocess
 import time
 from multiprocessing import Process, Queue
+from profiler import PROFILER, PROFILE_SUMMARY_FILE, PROFILE_TRACE_FILE
 from sympy import simplify, sympify, expand_trig
 
 # 配置参数
@@ -78,6 +79,7 @@ def compare_expressions(std_expr, test_expr):
 
 def generate_report(jar_name, case_name, input_data, std_out, test_out, reason):
     """生成错误报告"""
+    PROFILER.count("bug_reports")
     os.makedirs("bug", exist_ok=True)
     filename = f"bug/{jar_name}_{case_name}.txt"
 
@@ -113,18 +115,24 @@ def main():
             print(f"  Processing: {case_name}", end='\r')
 
             # 获取并保存标准答案
-            std_out = run_jar(std_jar, case_file)
+            with PROFILER.phase("std_run", case_name):
+                std_out = run_jar(std_jar, case_file)
             ans_path = os.path.join("out", f"{case_name}.ans")
-            save_output(std_out, ans_path)
+            with PROFILER.phase("output_write", case_name):
+                save_output(std_out, ans_path)
 
             if std_out.startswith("ERROR"):
                 print(f"  [ERROR] 标准程序执行失败: {case_name}")
                 continue
 
             # 测试并保存目标输出
-            test_out = run_jar(jar, case_file)
+            case_key = f"{jar_base}/{case_name}"
+            with PROFILER.phase("jar_run", case_key):
+                test_out = run_jar(jar, case_file)
+            PROFILER.count("output_chars", len(test_out))
             out_path = os.path.join("out", f"{case_name}_{jar_base}.out")
-            save_output(test_out, out_path)
+            with PROFILER.phase("output_write", case_key):
+                save_output(test_out, out_path)
 
             # 错误处理
             if test_out.startswith("ERROR"):
@@ -137,7 +145,8 @@ def main():
 
             # 符号比较
             start_time = time.time()
-            cmp_status, cmp_result = compare_expressions(std_out, test_out)
+            with PROFILER.phase("sympy_compare", case_key):
+                cmp_status, cmp_result = compare_expressions(std_out, test_out)
             elapsed = time.time() - start_time
 
             # 结果判断
@@ -162,6 +171,8 @@ def main():
 
         print(f"  发现 {bug_count} 个错误用例".ljust(40))
 
+    PROFILER.report(os.path.join("out", PROFILE_SUMMARY_FILE), os.path.join("out", PROFILE_TRACE_FILE))
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
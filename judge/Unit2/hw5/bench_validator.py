@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Validator benchmark and fault-detection regression. Times Validator on synthesized valid traces (lines/s, optional
+# peak memory) and, with --faults, checks that every injected fault from trace_synth.FAULTS is reported.
+# Usage: python bench_validator.py [input_files...] [--repeat N] [--passengers N] [--seed S] [--memory] [--faults]
+#   Without input files a random case of --passengers requests is used. Needs check.py's imports (numpy).
+import sys
+import time
+import tracemalloc
+from check import Validator
+from trace_synth import load_inputs, random_inputs, scale_inputs, synthesize, inject_fault, pop_option, FAULTS
+
+# --- Configuration ---
+DEFAULT_PASSENGERS = 10000
+# --- End Configuration ---
+
+
+def validate_all(inputs, lines):
+    validator = Validator(inputs)
+    for line in lines:
+        if not validator.validate_line(line): break
+    validator.final_checks()
+    return validator
+
+
+def bench_case(name, inputs, lines, measure_memory=False, check_faults=False, seed=0):
+    """Times one trace; returns True if the clean trace had errors or an injected fault went unnoticed."""
+    print(f"== {name}: {len(inputs)} requests, {len(lines)} lines")
+    start = time.perf_counter()
+    validator = validate_all(inputs, lines)
+    elapsed = time.perf_counter() - start
+    print(f"  validate: {elapsed:.3f}s ({len(lines) / max(elapsed, 1e-9):,.0f} lines/s)")
+    if measure_memory:  # separate pass: tracemalloc slows validation down several times
+        tracemalloc.start()
+        validate_all(inputs, lines)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  peak traced memory: {peak / 1024 / 1024:.1f} MiB")
+    errors = validator.get_errors()
+    print(f"  errors: {len(errors)}" + (f" (first: {errors[0]})" if errors else ""))
+    failed = bool(errors)
+    if check_faults:
+        for fault in FAULTS:
+            injected = inject_fault(lines, fault, seed)
+            if injected is None: print(f"  fault {fault:<16} n/a"); continue
+            corrupted, expected = injected
+            caught = any(expected.lower() in e.lower() for e in validate_all(inputs, corrupted).get_errors())
+            print(f"  fault {fault:<16} {'caught' if caught else 'MISSED (expected: ' + expected + ')'}")
+            failed = failed or not caught
+    return failed
+
+
+def main():
+    args = sys.argv[1:]
+    measure_memory = "--memory" in args; check_faults = "--faults" in args
+    args = [a for a in args if a not in ("--memory", "--faults")]
+    repeat = int(pop_option(args, "--repeat", 1)); seed = int(pop_option(args, "--seed", 0))
+    passengers = int(pop_option(args, "--passengers", DEFAULT_PASSENGERS))
+    cases = []
+    for path in args:
+        inputs = scale_inputs(load_inputs(path), repeat)
+        cases.append((path, inputs, synthesize(inputs)))
+    if not cases:
+        inputs = scale_inputs(random_inputs(passengers, seed), repeat)
+        cases.append(("random", inputs, synthesize(inputs)))
+    failed = [name for name, inputs, lines in cases if bench_case(name, inputs, lines, measure_memory, check_faults, seed)]
+    if failed: print(f"\nFAILED: {', '.join(failed)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
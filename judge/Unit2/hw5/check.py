@@ -12,6 +12,7 @@ from threading import Lock, Thread, Event # For stream readers
 import math
 from collections import defaultdict, deque
 import traceback
+from profiler import PROFILER, PROFILE_SUMMARY_FILE, PROFILE_TRACE_FILE
 
 # --- Plotting Import ---
 try:
@@ -100,8 +101,9 @@ def stream_reader_thread(stream_pipe, output_buffer, buffer_lock):
         try: stream_pipe.close()
         except Exception: pass
 
-def run_java_program_with_threads(jar_file, input_data_str):
+def run_java_program_with_threads(jar_file, input_data_str, case=None):
     start_time = time.monotonic()
+    phase_start = time.perf_counter()
     stdout_buffer, stderr_buffer = [], []
     stdout_lock, stderr_lock = Lock(), Lock()
     full_stderr_str, exit_code, status_code = "", None, None
@@ -117,11 +119,13 @@ def run_java_program_with_threads(jar_file, input_data_str):
         stdout_thread = Thread(target=stream_reader_thread, args=(process.stdout, stdout_buffer, stdout_lock), daemon=True)
         stderr_thread = Thread(target=stream_reader_thread, args=(process.stderr, stderr_buffer, stderr_lock), daemon=True)
         stdout_thread.start(); stderr_thread.start()
+        PROFILER.record("jvm_spawn", phase_start, time.perf_counter() - phase_start, case); phase_start = time.perf_counter()
 
         try: # Send input
             if input_data_str: process.stdin.write(input_data_str)
             process.stdin.close()
         except (BrokenPipeError, OSError) as e: status_code, full_stderr_str = "ExecutionError", full_stderr_str + f"\nError sending input/closing stdin: {e}"
+        PROFILER.record("input_feed", phase_start, time.perf_counter() - phase_start, case); phase_start = time.perf_counter()
 
         process_terminated_normally = False
         if status_code != "ExecutionError": # Only monitor if input phase ok
@@ -164,6 +168,8 @@ def run_java_program_with_threads(jar_file, input_data_str):
                       pass # Ignore errors during forced kill
              except Exception as wait_e: full_stderr_str += f"\nChecker: Error during process.wait(): {wait_e}"; status_code = "ExecutionError" if status_code not in ["Killed", "TLE", "ExecutionError"] else status_code
 
+        PROFILER.record("process_wait", phase_start, time.perf_counter() - phase_start, case); phase_start = time.perf_counter()
+
         # Wait for reader threads
         thread_join_timeout = 5.0
         stdout_thread.join(timeout=thread_join_timeout)
@@ -173,6 +179,8 @@ def run_java_program_with_threads(jar_file, input_data_str):
         # Construct final output
         with stdout_lock: full_stdout = "".join(stdout_buffer)
         with stderr_lock: full_stderr_str += "".join(stderr_buffer)
+        PROFILER.record("output_read", phase_start, time.perf_counter() - phase_start, case)
+        PROFILER.count("stdout_chars", len(full_stdout))
 
         # Final Status Determination
         final_exit_code = process.poll()
@@ -456,6 +464,7 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir):
     data_file_base = os.path.splitext(data_file)[0]
     output_file_name = f"{jar_name_base}_{data_file_base}.txt"
     output_file_path = os.path.join(out_dir, output_file_name)
+    case_key = f"{jar_name_base}/{data_file_base}"
 
     errors = []
     stdout_data, stderr_data = "", ""
@@ -468,16 +477,16 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir):
 
     try:
         try: # Read Input
-            with open(data_file_path, 'r', encoding='utf-8', errors='replace') as f: input_str = f.read()
+            with PROFILER.phase("input_read", case_key), open(data_file_path, 'r', encoding='utf-8', errors='replace') as f: input_str = f.read()
         except FileNotFoundError: raise FileNotFoundError(f"Input file not found: {data_file_path}") # Raise specific error
         except Exception as e: raise Exception(f"Error reading input {data_file_path}: {e}") # Raise other read errors
 
         # Run Java Program
-        stdout_data, stderr_data, execution_time, run_status_code = run_java_program_with_threads(jar_file, input_str)
+        stdout_data, stderr_data, execution_time, run_status_code = run_java_program_with_threads(jar_file, input_str, case_key)
 
         # Save Output File
         try:
-            with open(output_file_path, 'w', encoding='utf-8', errors='replace') as f:
+            with PROFILER.phase("output_write", case_key), open(output_file_path, 'w', encoding='utf-8', errors='replace') as f:
                 f.write(stdout_data);
                 if stderr_data: f.write("\n\n--- STDERR ---\n" + stderr_data)
         except IOError as e: errors.append(f"Warning: Failed to write output file {output_file_path}: {e}")
@@ -513,12 +522,15 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir):
                      if initial_run_status == "OK": errors.append("Validation Error: No output produced."); result_status = "WRONG_ANSWER"
                      else: result_status = initial_run_status; errors.append("INFO: No output.") if initial_run_status in ["TIMEOUT_SOFT", "RUNTIME_ERROR"] else None
                 else:
+                     validation_start = time.perf_counter()
                      validator = Validator(parsed_requests)
                      validation_stopped = False
                      output_lines = stdout_data.strip().split('\n')
                      for line_no, output_line in enumerate(output_lines):
                          if not validator.validate_line(output_line): validation_stopped = True; break
                      if not validation_stopped: validator.final_checks()
+                     PROFILER.record("validation", validation_start, time.perf_counter() - validation_start, case_key)
+                     PROFILER.count("lines_validated", line_no + 1)
                      validation_errors = validator.get_errors()
                      # --- Get metrics from validator ---
                      final_sim_time = validator.get_final_sim_time()
@@ -600,7 +612,7 @@ def test_single_jar(jar_file, all_data_files, data_dir, out_dir, report_dir):
     # Write the report
     report_file_path = os.path.join(report_dir, f"{jar_name_base}.report")
     try:
-        with open(report_file_path, 'w', encoding='utf-8', errors='replace') as f:
+        with PROFILER.phase("report_write"), open(report_file_path, 'w', encoding='utf-8', errors='replace') as f:
             f.write(f"Report for: {jar_file}\nOverall: {passed_tests}/{total_tests} passed ({failed_tests} failed).\n{'=' * 20}\n")
             for line in report_lines: f.write(line + "\n")
         print(f"Finished tests for {jar_file}. Report saved to '{report_file_path}'")
@@ -705,7 +717,7 @@ def main():
             if current_jar_plot_avgtime: plot_data_avgtime[jar_file] = current_jar_plot_avgtime
             report_file_path = os.path.join(REPORT_DIR, f"{jar_name_base}.report")
             try: # Write report
-                with open(report_file_path, 'w', encoding='utf-8', errors='replace') as f:
+                with PROFILER.phase("report_write"), open(report_file_path, 'w', encoding='utf-8', errors='replace') as f:
                     f.write(f"Report for: {jar_file}\nOverall: {passed_tests}/{total_tests} passed ({failed_tests} failed).\n{'=' * 20}\n"); [f.write(line + "\n") for line in report_lines]
                 print(f"Report saved to '{report_file_path}'")
             except IOError as e: print(f"Error writing report file '{report_file_path}': {e}", file=sys.stderr)
@@ -756,7 +768,7 @@ def main():
                 # Write Report (Ordered)
                 report_file_path = os.path.join(REPORT_DIR, f"{jar_name_base}.report")
                 try:
-                    with open(report_file_path, 'w', encoding='utf-8', errors='replace') as f:
+                    with PROFILER.phase("report_write"), open(report_file_path, 'w', encoding='utf-8', errors='replace') as f:
                         f.write(f"Report for: {jar_file}\nOverall: {passed_tests}/{total_tests} passed ({failed_tests} failed).\n{'=' * 20}\n")
                         for df in data_files:
                              result = report_map.get(df)
@@ -792,9 +804,11 @@ def main():
     else: print("No JAR files were tested (or mode was invalid).")
     print("\n" + "=" * 30)
     # Generate all plots using the collected data
-    plot_runtime_results(plot_data_runtime, data_files)
-    plot_power_consumption(plot_data_power, data_files)
-    plot_weighted_avg_time(plot_data_avgtime, data_files)
+    with PROFILER.phase("plotting"):
+        plot_runtime_results(plot_data_runtime, data_files)
+        plot_power_consumption(plot_data_power, data_files)
+        plot_weighted_avg_time(plot_data_avgtime, data_files)
+    PROFILER.report(os.path.join(REPORT_DIR, PROFILE_SUMMARY_FILE), os.path.join(REPORT_DIR, PROFILE_TRACE_FILE))
     print("All tests complete."); print("=" * 30)
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Validator benchmark and fault-detection regression. Times Validator on synthesized valid traces (lines/s, optional
+# peak memory) and, with --faults, checks that every injected fault from trace_synth.FAULTS is reported.
+# Usage: python bench_validator.py [input_files...] [--repeat N] [--passengers N] [--sche-every K] [--seed S] [--memory] [--faults]
+#   Without input files: a built-in RECEIVE/SCHE-heavy stress case plus a random case. Needs check.py's imports (numpy).
+import sys
+import time
+import tracemalloc
+from check import Validator, ELEVATOR_CAPACITY, NUM_ELEVATORS, DOOR_OPEN_CLOSE_TIME, SCHE_STOP_TIME, floor_to_int
+from trace_synth import load_inputs, random_inputs, scale_inputs, synthesize, inject_fault, pop_option, FAULTS
+
+# --- Configuration ---
+DEFAULT_PASSENGERS = 6000
+DEFAULT_SCHE_EVERY = 5   # one SCHE (cancelling every outstanding RECEIVE of that elevator) per N loaded batches
+SCHE_SPEED = 0.2
+STEP = DOOR_OPEN_CLOSE_TIME
+# --- End Configuration ---
+
+
+def build_case(num_passengers, sche_every):
+    """Every elevator pre-RECEIVEs its whole share of F1->F2 passengers, shuttles them in full batches,
+    and periodically runs an in-place SCHE at F1 after which the outstanding passengers are re-RECEIVEd."""
+    f1, f2 = floor_to_int('F1'), floor_to_int('F2')
+    inputs = [{'type': 'passenger', 'time': 1.0, 'id': pid, 'pri': 1, 'from': f1, 'to': f2} for pid in range(1, num_passengers + 1)]
+    lines = []
+    t = 1.0
+    for eid in range(1, NUM_ELEVATORS + 1):
+        share = list(range(eid, num_passengers + 1, NUM_ELEVATORS))
+        lines.extend(f"[{t:.4f}]RECEIVE-{pid}-{eid}" for pid in share)
+        batches = [share[i:i + ELEVATOR_CAPACITY] for i in range(0, len(share), ELEVATOR_CAPACITY)]
+        for b_idx, batch in enumerate(batches):
+            if b_idx and b_idx % sche_every == 0:
+                inputs.append({'type': 'sche', 'time': t, 'eid': eid, 'speed': SCHE_SPEED, 'to': f1, 'claimed': False})
+                lines.append(f"[{t:.4f}]SCHE-ACCEPT-{eid}-{SCHE_SPEED}-F1")
+                lines.append(f"[{t:.4f}]SCHE-BEGIN-{eid}")
+                lines.append(f"[{t:.4f}]OPEN-F1-{eid}")
+                t += SCHE_STOP_TIME
+                lines.append(f"[{t:.4f}]CLOSE-F1-{eid}")
+                lines.append(f"[{t:.4f}]SCHE-END-{eid}")
+                lines.extend(f"[{t:.4f}]RECEIVE-{pid}-{eid}" for later in batches[b_idx:] for pid in later)
+            lines.append(f"[{t:.4f}]OPEN-F1-{eid}")
+            lines.extend(f"[{t:.4f}]IN-{pid}-F1-{eid}" for pid in batch)
+            t += STEP; lines.append(f"[{t:.4f}]CLOSE-F1-{eid}")
+            t += STEP; lines.append(f"[{t:.4f}]ARRIVE-F2-{eid}")
+            lines.append(f"[{t:.4f}]OPEN-F2-{eid}")
+            lines.extend(f"[{t:.4f}]OUT-S-{pid}-F2-{eid}" for pid in batch)
+            t += STEP; lines.append(f"[{t:.4f}]CLOSE-F2-{eid}")
+            if b_idx + 1 < len(batches):
+                t += STEP; lines.append(f"[{t:.4f}]ARRIVE-F1-{eid}")
+    return inputs, lines
+
+
+def validate_all(inputs, lines):
+    validator = Validator([dict(req) for req in inputs])  # Validator marks SCHE inputs as claimed
+    for line in lines:
+        if not validator.validate_line(line): break
+    validator.final_checks()
+    return validator
+
+
+def bench_case(name, inputs, lines, measure_memory=False, check_faults=False, seed=0):
+    """Times one trace; returns True if the clean trace had errors or an injected fault went unnoticed."""
+    print(f"== {name}: {len(inputs)} requests, {len(lines)} lines")
+    start = time.perf_counter()
+    validator = validate_all(inputs, lines)
+    elapsed = time.perf_counter() - start
+    print(f"  validate: {elapsed:.3f}s ({len(lines) / max(elapsed, 1e-9):,.0f} lines/s)")
+    if measure_memory:  # separate pass: tracemalloc slows validation down several times
+        tracemalloc.start()
+        validate_all(inputs, lines)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  peak traced memory: {peak / 1024 / 1024:.1f} MiB")
+    errors = validator.get_errors()
+    print(f"  errors: {len(errors)}" + (f" (first: {errors[0]})" if errors else ""))
+    failed = bool(errors)
+    if check_faults:
+        for fault in FAULTS:
+            injected = inject_fault(lines, fault, seed)
+            if injected is None: print(f"  fault {fault:<16} n/a"); continue
+            corrupted, expected = injected
+            caught = any(expected.lower() in e.lower() for e in validate_all(inputs, corrupted).get_errors())
+            print(f"  fault {fault:<16} {'caught' if caught else 'MISSED (expected: ' + expected + ')'}")
+            failed = failed or not caught
+    return failed
+
+
+def main():
+    args = sys.argv[1:]
+    measure_memory = "--memory" in args; check_faults = "--faults" in args
+    args = [a for a in args if a not in ("--memory", "--faults")]
+    repeat = int(pop_option(args, "--repeat", 1)); seed = int(pop_option(args, "--seed", 0))
+    passengers = int(pop_option(args, "--passengers", DEFAULT_PASSENGERS))
+    sche_every = max(1, int(pop_option(args, "--sche-every", DEFAULT_SCHE_EVERY)))
+    cases = []
+    for path in args:
+        inputs = scale_inputs(load_inputs(path), repeat)
+        cases.append((path, inputs, synthesize(inputs)))
+    if not cases:
+        cases.append(("stress", *build_case(passengers, sche_every)))
+        inputs = scale_inputs(random_inputs(passengers, seed), repeat)
+        cases.append(("random", inputs, synthesize(inputs)))
+    failed = [name for name, inputs, lines in cases if bench_case(name, inputs, lines, measure_memory, check_faults, seed)]
+    if failed: print(f"\nFAILED: {', '.join(failed)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
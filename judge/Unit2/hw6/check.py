@@ -13,6 +13,7 @@ from threading import Lock, Thread, Event # For stream readers
 import math
 from collections import defaultdict, deque
 import traceback
+from profiler import PROFILER, PROFILE_SUMMARY_FILE, PROFILE_TRACE_FILE
 
 # --- Plotting Import ---
 try:
@@ -79,8 +80,9 @@ def stream_reader_thread(stream_pipe, output_buffer, buffer_lock):
         try: stream_pipe.close()
         except Exception: pass
 
-def run_java_program_with_threads(jar_file, input_data_str):
+def run_java_program_with_threads(jar_file, input_data_str, case=None):
     start_time = time.monotonic()
+    phase_start = time.perf_counter()
     stdout_buffer, stderr_buffer = [], []
     stdout_lock, stderr_lock = Lock(), Lock()
     full_stderr_str, exit_code, status_code = "", None, None
@@ -96,12 +98,14 @@ def run_java_program_with_threads(jar_file, input_data_str):
         stdout_thread = Thread(target=stream_reader_thread, args=(process.stdout, stdout_buffer, stdout_lock), daemon=True)
         stderr_thread = Thread(target=stream_reader_thread, args=(process.stderr, stderr_buffer, stderr_lock), daemon=True)
         stdout_thread.start(); stderr_thread.start()
+        PROFILER.record("jvm_spawn", phase_start, time.perf_counter() - phase_start, case); phase_start = time.perf_counter()
 
         try:
             if input_data_str: process.stdin.write(input_data_str)
             process.stdin.close()
         except (BrokenPipeError, OSError) as e:
             status_code = "ExecutionError"; full_stderr_str += f"\nChecker: Error sending input: {e}."
+        PROFILER.record("input_feed", phase_start, time.perf_counter() - phase_start, case); phase_start = time.perf_counter()
 
         process_terminated_normally = False
         if status_code != "ExecutionError":
@@ -134,6 +138,7 @@ def run_java_program_with_threads(jar_file, input_data_str):
                  full_stderr_str += f"\nChecker: Error during wait(): {wait_e}"
                  if status_code not in ["Killed", "TLE", "ExecutionError"]: status_code = "ExecutionError"
 
+        PROFILER.record("process_wait", phase_start, time.perf_counter() - phase_start, case); phase_start = time.perf_counter()
         thread_join_timeout = 5.0
         stdout_thread.join(timeout=thread_join_timeout)
         stderr_thread.join(timeout=thread_join_timeout)
@@ -141,6 +146,8 @@ def run_java_program_with_threads(jar_file, input_data_str):
 
         with stdout_lock: full_stdout = "".join(stdout_buffer)
         with stderr_lock: full_stderr_str += "".join(stderr_buffer)
+        PROFILER.record("output_read", phase_start, time.perf_counter() - phase_start, case)
+        PROFILER.count("stdout_chars", len(full_stdout))
 
         final_exit_code = process.poll()
         if status_code not in ["Killed", "TLE", "ExecutionError", "JavaNotFound"]:
@@ -170,6 +177,35 @@ def run_java_program_with_threads(jar_file, input_data_str):
 F1_INT = floor_to_int('F1'); B1_INT = floor_to_int('B1')
 VALID_SCHE_FLOORS_INT = {floor_to_int(f) for f in ["B2", "B1", "F1", "F2", "F3", "F4", "F5"]}
 VALID_SCHE_SPEEDS = {0.2, 0.3, 0.4, 0.5}
+# --- Legal move table: floor -> floors reachable in one ARRIVE (B1<->F1 counts as one step) ---
+LEGAL_MOVES = {f: frozenset(g for g in FLOOR_MAP_INT_TO_STR if abs(g - f) == 1 or {f, g} == {B1_INT, F1_INT}) for f in FLOOR_MAP_INT_TO_STR}
+
+class AssignmentIndex:
+    """RECEIVE bookkeeping: passenger -> elevator plus the reverse elevator -> passengers lookup.
+    Cancelling every receive of one elevator (SCHE/UPDATE) is O(1): the elevator's epoch is bumped and
+    stale passenger entries are dropped lazily the next time they are looked up."""
+    def __init__(self, elevator_ids):
+        self.by_passenger = {}  # pid -> (eid, epoch at RECEIVE time)
+        self.by_elevator = {eid: set() for eid in elevator_ids}
+        self.epoch = {eid: 0 for eid in elevator_ids}
+    def elevator_of(self, pid):
+        entry = self.by_passenger.get(pid)
+        if entry is None: return None
+        eid, epoch = entry
+        if self.epoch[eid] != epoch: del self.by_passenger[pid]; return None
+        return eid
+    def assign(self, pid, eid):
+        old = self.elevator_of(pid)
+        if old is not None: self.by_elevator[old].discard(pid)
+        self.by_passenger[pid] = (eid, self.epoch[eid]); self.by_elevator[eid].add(pid)
+    def release(self, pid):
+        old = self.elevator_of(pid)
+        if old is not None: self.by_elevator[old].discard(pid); del self.by_passenger[pid]
+    def cancel_elevator(self, eid):
+        self.epoch[eid] += 1; self.by_elevator[eid] = set()
+    def has_receives(self, eid): return bool(self.by_elevator[eid])
+    def active(self): return {pid: eid for eid, pids in self.by_elevator.items() for pid in sorted(pids)}
+
 # --- Validation Logic ---
 class Validator:
     # --- __init__ and helper methods remain unchanged ---
@@ -180,19 +216,22 @@ class Validator:
         self.sim_time = 0.0
         self.elevators = {}
         self.passengers = {}
-        self.active_passenger_assignments = {}
+        self.assignments = AssignmentIndex(range(1, NUM_ELEVATORS + 1))
+        self.pending_sche = defaultdict(deque) # eid -> unclaimed SCHE inputs in input order
+        for req in all_input_requests:
+            if req['type'] == 'sche' and not req.get('claimed', False): self.pending_sche[req['eid']].append(req)
         self.open_count = 0; self.close_count = 0; self.move_count = 0
 
         for i in range(1, NUM_ELEVATORS + 1):
             self.elevators[i] = {'id': i, 'floor': F1_INT, 'state': 'CLOSED', 'passengers': set(),
                                  'last_action_time': 0.0, 'last_arrive_time': 0.0, 'open_time': -1.0,
                                  'sche_state': 'IDLE', 'sche_target_floor': None, 'sche_speed': None,
-                                 'sche_begin_time': -1.0, 'active_receives': set()}
+                                 'sche_begin_time': -1.0}
         for req in self.passenger_requests_dict.values():
             pid = req['id']
             self.passengers[pid] = {'id': pid, 'state': 'OUTSIDE', 'location': req['from'], 'destination': req['to'],
                                     'request_time': req['time'], 'priority': req['pri'], 'arrival_time': -1.0,
-                                    'current_assignment': None, 'needs_pickup': False}
+                                    'needs_pickup': False}
     def add_error(self, message):
         error_time_str = f"{max(0.0, self.sim_time):.4f}" if isinstance(self.sim_time, (int, float)) else "?.????"
         self.errors.append(f"[Time ~{error_time_str}] {message}")
@@ -218,27 +257,23 @@ class Validator:
         if current_line_time < self.sim_time - EPSILON * 10: self.add_error(f"Timestamp decreasing: {current_line_time:.4f} < {self.sim_time:.4f}")
         self.sim_time = max(self.sim_time, current_line_time)
 
-        match_arrive = RE_ARRIVE.match(line); match_open = RE_OPEN.match(line); match_close = RE_CLOSE.match(line)
-        match_in = RE_IN.match(line); match_out = RE_OUT.match(line); match_receive = RE_RECEIVE.match(line)
-        match_sche_begin = RE_SCHE_BEGIN.match(line); match_sche_end = RE_SCHE_END.match(line)
-        match_sche_accept = RE_SCHE_ACCEPT.match(line)
-
+        # Patterns are tried lazily in branch order: each line only pays for the regexes up to its own kind
         try:
             # --- ARRIVE --- (Keep original logic)
-            if match_arrive:
+            if (match_arrive := RE_ARRIVE.match(line)):
                 _, floor_str, eid_str = match_arrive.groups(); eid = int(eid_str); floor_int = floor_to_int(floor_str)
                 e_state = self._get_elevator_state(eid)
                 if floor_int is None or e_state is None: self.add_error(f"ARRIVE Invalid: {line}"); return True
                 if e_state['state'] != 'CLOSED': self.add_error(f"ARRIVE-{floor_str}-{eid}: Door not CLOSED.")
-                prev_floor = e_state['floor']; is_valid = (prev_floor == B1_INT and floor_int == F1_INT) or (prev_floor == F1_INT and floor_int == B1_INT) or (floor_int is not None and abs(floor_int - prev_floor) == 1)
+                prev_floor = e_state['floor']; is_valid = floor_int in LEGAL_MOVES.get(prev_floor, ())
                 if not is_valid: self.add_error(f"ARRIVE-{floor_str}-{eid}: Invalid move from {int_to_floor(prev_floor)}.")
                 if e_state['sche_state'] != 'ACTIVE':
                     exp_t = e_state['last_action_time'] + MOVE_TIME_PER_FLOOR
                     if current_line_time < exp_t - EPSILON: self.add_error(f"ARRIVE-{floor_str}-{eid}: Normal move too fast.")
-                if e_state['sche_state'] == 'IDLE' and not e_state['passengers'] and not e_state['active_receives']: self.add_error(f"ARRIVE-{floor_str}-{eid}: Idle move.")
+                if e_state['sche_state'] == 'IDLE' and not e_state['passengers'] and not self.assignments.has_receives(eid): self.add_error(f"ARRIVE-{floor_str}-{eid}: Idle move.")
                 e_state['floor'] = floor_int; e_state['last_action_time'] = current_line_time; e_state['last_arrive_time'] = current_line_time; self.move_count += 1
             # --- OPEN --- (Keep original logic)
-            elif match_open:
+            elif (match_open := RE_OPEN.match(line)):
                 _, floor_str, eid_str = match_open.groups(); eid = int(eid_str); floor_int = floor_to_int(floor_str)
                 e_state = self._get_elevator_state(eid)
                 if floor_int is None or e_state is None: self.add_error(f"OPEN Invalid: {line}"); return True
@@ -251,7 +286,7 @@ class Validator:
                 elif e_state['sche_state'] != 'IDLE': self.add_error(f"OPEN-{floor_str}-{eid}: Invalid OPEN during SCHE state {e_state['sche_state']}.")
                 e_state['state'] = 'OPEN'; e_state['open_time'] = current_line_time; e_state['last_action_time'] = current_line_time; self.open_count += 1
             # --- CLOSE --- (Keep original logic)
-            elif match_close:
+            elif (match_close := RE_CLOSE.match(line)):
                 _, floor_str, eid_str = match_close.groups(); eid = int(eid_str); floor_int = floor_to_int(floor_str)
                 e_state = self._get_elevator_state(eid)
                 if floor_int is None or e_state is None: self.add_error(f"CLOSE Invalid: {line}"); return True
@@ -267,7 +302,7 @@ class Validator:
                     if current_line_time < exp_t - EPSILON: self.add_error(f"CLOSE-{floor_str}-{eid}: Normal door closed too fast.")
                 e_state['state'] = 'CLOSED'; e_state['open_time'] = -1.0; e_state['last_action_time'] = current_line_time; self.close_count += 1
             # --- IN --- (Keep original logic)
-            elif match_in:
+            elif (match_in := RE_IN.match(line)):
                 _, pid_s, floor_s, eid_s = match_in.groups(); pid=int(pid_s); eid=int(eid_s); floor_i=floor_to_int(floor_s)
                 p_state = self._get_passenger_state(pid); e_state = self._get_elevator_state(eid)
                 if floor_i is None or p_state is None or e_state is None: self.add_error(f"IN Invalid: {line}"); return True
@@ -277,15 +312,14 @@ class Validator:
                 if p_state['location']!=floor_i: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Passenger wrong floor.")
                 if len(e_state['passengers'])>=ELEVATOR_CAPACITY: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Elevator full.")
                 if pid in e_state['passengers']: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Passenger already IN.")
-                if p_state['current_assignment']!=eid: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Wrong assignment {p_state['current_assignment']}.")
-                if pid not in e_state['active_receives']: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Not in active_receives.")
+                assigned = self.assignments.elevator_of(pid)
+                if assigned!=eid: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Wrong assignment {assigned}.")
                 if e_state['sche_state']!='IDLE': self.add_error(f"IN-{pid}-{floor_s}-{eid}: Cannot enter during SCHE.")
                 e_state['passengers'].add(pid);
-                if pid in e_state['active_receives']: e_state['active_receives'].remove(pid)
-                if self.active_passenger_assignments.get(pid)==eid: del self.active_passenger_assignments[pid]
-                p_state['state']='INSIDE';p_state['location']=eid;p_state['current_assignment']=None;p_state['needs_pickup']=False
+                if assigned==eid: self.assignments.release(pid)
+                p_state['state']='INSIDE';p_state['location']=eid;p_state['needs_pickup']=False
             # --- OUT --- (Keep original logic)
-            elif match_out:
+            elif (match_out := RE_OUT.match(line)):
                 _, flag, pid_s, floor_s, eid_s = match_out.groups(); pid=int(pid_s); eid=int(eid_s); floor_i=floor_to_int(floor_s)
                 p_state = self._get_passenger_state(pid); e_state = self._get_elevator_state(eid)
                 if floor_i is None or p_state is None or e_state is None: self.add_error(f"OUT Invalid: {line}"); return True
@@ -305,21 +339,18 @@ class Validator:
                 if pid in e_state['passengers']: e_state['passengers'].remove(pid)
                 p_state['location']=floor_i
             # --- RECEIVE --- (Keep original logic)
-            elif match_receive:
+            elif (match_receive := RE_RECEIVE.match(line)):
                 _, pid_s, eid_s = match_receive.groups(); pid=int(pid_s); eid=int(eid_s)
                 p_state=self._get_passenger_state(pid); e_state=self._get_elevator_state(eid)
                 if p_state is None or e_state is None: self.add_error(f"RECEIVE Invalid: {line}"); return True
                 if p_state['state'] not in ['OUTSIDE','NEEDS_PICKUP']: self.add_error(f"RECEIVE-{pid}-{eid}: Passenger not OUTSIDE.")
-                existing=self.active_passenger_assignments.get(pid)
+                existing=self.assignments.elevator_of(pid)
                 if existing is not None and existing!=eid: self.add_error(f"RECEIVE-{pid}-{eid}: Double assignment (prev: {existing}).")
                 if e_state['sche_state']!='IDLE': self.add_error(f"RECEIVE-{pid}-{eid}: Cannot assign during SCHE.")
-                if existing!=eid:
-                    if existing is not None and existing in self.elevators:
-                        if pid in self.elevators[existing]['active_receives']: self.elevators[existing]['active_receives'].remove(pid)
-                    e_state['active_receives'].add(pid); p_state['current_assignment']=eid; self.active_passenger_assignments[pid]=eid
+                if existing!=eid: self.assignments.assign(pid, eid)
 
             # <--- MODIFICATION START: Updated SCHE-BEGIN logic ---
-            elif match_sche_begin:
+            elif (match_sche_begin := RE_SCHE_BEGIN.match(line)):
                 _, eid_str = match_sche_begin.groups(); eid = int(eid_str)
                 e_state = self._get_elevator_state(eid)
                 if e_state is None: self.add_error(f"SCHE-BEGIN Invalid: {line}"); return True
@@ -328,13 +359,11 @@ class Validator:
 
                 # Find the FIRST UNCLAIMED SCHE input request for this elevator
                 found_sche_input = None
-                input_req_index = -1 # Keep track of index if needed, or just the object
-                for idx, req in enumerate(self.all_inputs):
-                    if req.get('type') == 'sche' and req.get('eid') == eid and not req.get('claimed', False):
-                        found_sche_input = req
-                        # Mark the request as claimed IN THE VALIDATOR'S COPY of inputs
-                        req['claimed'] = True # Modify the dict in self.all_inputs
-                        break # Found the first unclaimed one
+                pending = self.pending_sche.get(eid)
+                if pending:
+                    found_sche_input = pending.popleft()
+                    # Mark the request as claimed IN THE VALIDATOR'S COPY of inputs
+                    found_sche_input['claimed'] = True
 
                 if found_sche_input:
                      e_state['sche_target_floor'] = found_sche_input['to']
@@ -351,18 +380,12 @@ class Validator:
                 e_state['sche_state'] = 'ACTIVE'
                 e_state['sche_begin_time'] = current_line_time
 
-                # Cancel active RECEIVEs for this elevator for passengers *outside* (Keep original logic)
-                receives_to_cancel = list(e_state['active_receives'])
-                for received_pid in receives_to_cancel:
-                    rcv_p_state = self._get_passenger_state(received_pid)
-                    if rcv_p_state and rcv_p_state['state'] in ['OUTSIDE', 'NEEDS_PICKUP']:
-                        e_state['active_receives'].remove(received_pid)
-                        if self.active_passenger_assignments.get(received_pid) == eid: del self.active_passenger_assignments[received_pid]
-                        if rcv_p_state['current_assignment'] == eid: rcv_p_state['current_assignment'] = None
+                # Cancel active RECEIVEs for this elevator (passengers leave the receive set on IN, so all are *outside*)
+                self.assignments.cancel_elevator(eid)
             # <--- MODIFICATION END ---
 
             # --- SCHE-END --- (Keep original logic)
-            elif match_sche_end:
+            elif (match_sche_end := RE_SCHE_END.match(line)):
                 _, eid_s = match_sche_end.groups(); eid=int(eid_s)
                 e_state=self._get_elevator_state(eid)
                 if e_state is None: self.add_error(f"SCHE-END Invalid: {line}"); return True
@@ -372,7 +395,7 @@ class Validator:
                 e_state['sche_state']='IDLE'; e_state['sche_target_floor']=None; e_state['sche_speed']=None; e_state['sche_begin_time']=-1.0
 
             # --- SCHE-ACCEPT --- (Keep original logic from previous fix)
-            elif match_sche_accept:
+            elif (match_sche_accept := RE_SCHE_ACCEPT.match(line)):
                 _ts, eid_s, speed_s, floor_s = match_sche_accept.groups();
                 try:
                     eid=int(eid_s); speed=float(speed_s); floor_i=floor_to_int(floor_s)
@@ -407,7 +430,8 @@ class Validator:
             if e_state.get('state') != 'CLOSED': self.add_error(f"E{eid} !CLOSED.")
             if e_state.get('passengers'): self.add_error(f"E{eid} finished w/ passengers: {sorted(list(e_state['passengers']))}.")
             if e_state.get('sche_state') != 'IDLE': self.add_error(f"E{eid} finished !IDLE SCHE state: {e_state.get('sche_state')}.")
-        if self.active_passenger_assignments: self.add_error(f"Finished w/ active assignments: {self.active_passenger_assignments}")
+        active_assignments = self.assignments.active()
+        if active_assignments: self.add_error(f"Finished w/ active assignments: {active_assignments}")
     def get_errors(self): return self.errors
     def get_final_sim_time(self): return self.sim_time if self.sim_time > 0 else 0.0
     def get_power_consumption(self):
@@ -482,6 +506,7 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir, log_dir):
     log_file_path = os.path.join(log_dir, log_file_name)
     output_file_name = f"{jar_name_base}_{data_file_base}.out"
     output_file_path_filtered = os.path.join(out_dir, output_file_name)
+    case_key = f"{jar_name_base}/{data_file_base}"
 
     errors = []; stdout_data, stderr_data = "", ""; execution_time, run_status_code = 0, None
     result_status = "CHECKER_ERROR"; final_sim_time = 0.0; power_consumption = 0.0; weighted_avg_time = 0.0
@@ -491,7 +516,7 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir, log_dir):
         # <--- MODIFICATION START: Add 'claimed' flag during input parsing ---
         input_str = ""; parsed_inputs = []; parse_error = False
         try:
-            with open(data_file_path, 'r', encoding='utf-8', errors='replace') as f: input_lines = f.readlines(); input_str = "".join(input_lines)
+            with PROFILER.phase("input_read", case_key), open(data_file_path, 'r', encoding='utf-8', errors='replace') as f: input_lines = f.readlines(); input_str = "".join(input_lines)
             for line_num, line in enumerate(input_lines):
                 line = line.strip();
                 if not line: continue
@@ -520,11 +545,11 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir, log_dir):
         if parse_error: result_status = "INPUT_ERROR"
         else:
             # --- Run Java Program ---
-            stdout_data, stderr_data, execution_time, run_status_code = run_java_program_with_threads(jar_file, input_str)
+            stdout_data, stderr_data, execution_time, run_status_code = run_java_program_with_threads(jar_file, input_str, case_key)
 
             # --- Save Full Log File ---
             try:
-                with open(log_file_path, 'w', encoding='utf-8', errors='replace') as f:
+                with PROFILER.phase("log_write", case_key), open(log_file_path, 'w', encoding='utf-8', errors='replace') as f:
                     f.write(f"--- STDOUT ---\n{stdout_data}")
                     if stderr_data: f.write("\n\n--- STDERR ---\n" + stderr_data)
             except IOError as e: errors.append(f"Warning: Failed to write log file {log_file_path}: {e}")
@@ -534,7 +559,7 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir, log_dir):
             filtered_output_lines = [line for line in all_stdout_lines if not RE_LOG_LINE.search(line)]
             clean_stdout_data_for_saving = "\n".join(filtered_output_lines)
             try:
-                with open(output_file_path_filtered, 'w', encoding='utf-8', errors='replace') as f:
+                with PROFILER.phase("output_write", case_key), open(output_file_path_filtered, 'w', encoding='utf-8', errors='replace') as f:
                     f.write(clean_stdout_data_for_saving)
             except IOError as e: errors.append(f"Warning: Failed to write filtered output file {output_file_path_filtered}: {e}")
 
@@ -553,12 +578,15 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir, log_dir):
                     else: result_status = initial_run_status; errors.append("INFO: No non-log output before timeout/error.")
                 else:
                     # Pass the modified parsed_inputs (with 'claimed' flag)
+                    validation_start = time.perf_counter()
                     validator = Validator(parsed_inputs)
                     validation_stopped = False
                     for output_line in filtered_output_lines:
                         if not validator.validate_line(output_line):
                             validation_stopped = True; break
                     if not validation_stopped: validator.final_checks()
+                    PROFILER.record("validation", validation_start, time.perf_counter() - validation_start, case_key)
+                    PROFILER.count("lines_validated", len(filtered_output_lines))
 
                     validation_errors = validator.get_errors()
                     final_sim_time = validator.get_final_sim_time()
@@ -622,7 +650,7 @@ def test_single_jar(jar_file, all_data_files, data_dir, out_dir, log_dir, report
              break
     report_path = os.path.join(report_dir, f"{jar_name_base}.report")
     try:
-        with open(report_path, 'w', encoding='utf-8', errors='replace') as f:
+        with PROFILER.phase("report_write"), open(report_path, 'w', encoding='utf-8', errors='replace') as f:
             f.write(f"Report: {jar_file}\nOverall: {passed_tests}/{total_tests} passed ({failed_tests} failed).\n{'='*20}\n")
             f.write("\n".join(report_lines) + "\n")
         print(f"Finished {jar_file}. Report saved to '{report_path}'")
@@ -800,7 +828,7 @@ def main():
                 # Write Report (Original logic)
                 report_path = os.path.join(REPORT_DIR, f"{jar_name_base}.report")
                 try:
-                    with open(report_path, 'w', encoding='utf-8', errors='replace') as f:
+                    with PROFILER.phase("report_write"), open(report_path, 'w', encoding='utf-8', errors='replace') as f:
                         f.write(f"Report: {jar_file}\nOverall: {passed}/{total} passed ({failed} failed).\n{'='*20}\n")
                         report_lines=[]
                         for df_rep in data_files:
@@ -839,9 +867,10 @@ def main():
     print("\n" + "=" * 30); print("Post-processing results..."); print("=" * 30)
     # Prepare raw results structure for process_scores
     all_raw_results = {'power': raw_results_power, 'sim_time': raw_results_runtime, 'avg_time': raw_results_avgtime}
-    scores_power, scores_runtime, scores_avgtime, total_scores = process_scores(
-        all_raw_results, data_files, list(overall_summary.keys())
-    )
+    with PROFILER.phase("scoring"):
+        scores_power, scores_runtime, scores_avgtime, total_scores = process_scores(
+            all_raw_results, data_files, list(overall_summary.keys())
+        )
     # Prepare plot data (use raw for originals, calculated for total score)
     plot_data_runtime = defaultdict(dict, raw_results_runtime)
     plot_data_power = defaultdict(dict, raw_results_power)
@@ -876,6 +905,7 @@ def main():
         else: print("Plotting enabled, but matplotlib unavailable.")
     else: print("Plotting disabled.")
 
+    PROFILER.report(os.path.join(REPORT_DIR, PROFILE_SUMMARY_FILE), os.path.join(REPORT_DIR, PROFILE_TRACE_FILE))
     print("\nAll tests complete.")
     print(f"Check '{REPORT_DIR}' for reports.")
     print(f"Check '{LOG_DIR}' for full logs (.log).")
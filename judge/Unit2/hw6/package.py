@@ -1,114 +1,230 @@
 import os
-import datetime
-import subprocess
-import shutil
 import sys
+import json
+import zlib
+import hashlib
+import datetime
 
 # --- 配置 ---
 FOLDERS_TO_ARCHIVE = ["data", "log", "out", "report"]
 ARCHIVE_BASENAME = "snapshot"
+SNAPSHOT_STORE_DIR = ".snapshots"  # 快照仓库: objects/ 存放去重后的压缩块, manifests/ 存放每次快照的清单
+CHUNK_SIZE = 1024 * 1024  # 按 1MB 定长分块, 追加写的大日志只需存新增的块
+COMPRESS_LEVEL = 6
 # --- End 配置 ---
 
-def find_rar_executable():
-    """查找系统中的 rar 可执行文件路径"""
-    rar_exec = shutil.which('rar') # 跨平台查找 PATH 中的 rar
-    if rar_exec:
-        print(f"找到 RAR 可执行文件: {rar_exec}")
-        return rar_exec
-    else:
-        # 在 Windows 上尝试常见路径 (如果未在 PATH 中)
-        if sys.platform == "win32":
-            common_paths = [
-                os.path.join(os.environ.get("ProgramFiles", "C:\\Program Files"), "WinRAR", "rar.exe"),
-                os.path.join(os.environ.get("ProgramFiles(x86)", "C:\\Program Files (x86)"), "WinRAR", "rar.exe")
-            ]
-            for path in common_paths:
-                if os.path.isfile(path):
-                    print(f"在常见路径找到 RAR 可执行文件: {path}")
-                    return path
-        return None
+OBJECTS_DIR = os.path.join(SNAPSHOT_STORE_DIR, "objects")
+MANIFESTS_DIR = os.path.join(SNAPSHOT_STORE_DIR, "manifests")
+
+
+def object_path(digest):
+    """返回某个块在仓库中的存放路径 (按哈希前两位分目录)"""
+    return os.path.join(OBJECTS_DIR, digest[:2], digest[2:])
+
+
+def store_chunk(chunk):
+    """存储一个数据块, 已存在则跳过; 返回 (哈希, 新写入的字节数)"""
+    digest = hashlib.sha256(chunk).hexdigest()
+    path = object_path(digest)
+    if os.path.exists(path):
+        return digest, 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compressed = zlib.compress(chunk, COMPRESS_LEVEL)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(compressed)
+    os.replace(tmp_path, path)  # 原子替换, 中途中断不会留下损坏的块
+    return digest, len(compressed)
+
+
+def load_chunk(digest):
+    """读取并校验一个数据块"""
+    with open(object_path(digest), 'rb') as f:
+        chunk = zlib.decompress(f.read())
+    if hashlib.sha256(chunk).hexdigest() != digest:
+        raise ValueError(f"数据块校验失败: {digest}")
+    return chunk
+
+
+def list_snapshot_names():
+    """按时间顺序列出所有快照名"""
+    if not os.path.isdir(MANIFESTS_DIR):
+        return []
+    return sorted(f[:-len(".json")] for f in os.listdir(MANIFESTS_DIR) if f.endswith(".json"))
+
+
+def load_manifest(name):
+    """读取快照清单, 支持用 latest 指代最新快照"""
+    if name == "latest":
+        names = list_snapshot_names()
+        if not names:
+            raise FileNotFoundError("仓库中还没有任何快照")
+        name = names[-1]
+    path = os.path.join(MANIFESTS_DIR, f"{name}.json")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"找不到快照: {name}")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_files(folders):
+    """遍历要打包的文件夹, 产出使用 / 分隔的相对路径"""
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            for filename in sorted(files):
+                yield os.path.join(root, filename).replace(os.sep, "/")
+
+
+def create_snapshot(folders):
+    """对给定文件夹创建一次快照, 返回 (快照名, 统计信息)"""
+    previous_files = {}
+    names = list_snapshot_names()
+    if names:
+        previous_files = load_manifest(names[-1])["files"]
+
+    files = {}
+    stats = {"files": 0, "reused": 0, "bytes": 0, "new_bytes": 0}
+    for rel_path in iter_files(folders):
+        st = os.stat(rel_path)
+        stats["files"] += 1
+        stats["bytes"] += st.st_size
+        old = previous_files.get(rel_path)
+        # 大小与修改时间均未变化时直接沿用上次的块列表, 不再重新读取和哈希
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns and \
+                all(os.path.exists(object_path(d)) for d in old["chunks"]):
+            files[rel_path] = old
+            stats["reused"] += 1
+            continue
+        chunks = []
+        with open(rel_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest, written = store_chunk(chunk)
+                chunks.append(digest)
+                stats["new_bytes"] += written
+        files[rel_path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "chunks": chunks}
 
-def main():
-    print("--- 开始创建快照压缩包 ---")
-
-    # 1. 查找 RAR 可执行文件
-    rar_executable = find_rar_executable()
-    if not rar_executable:
-        print("\n错误：找不到 'rar' 可执行文件。")
-        print("请确保已安装 WinRAR (Windows) 或 RAR (Linux/macOS)，")
-        print("并且 'rar' 命令已添加到系统的 PATH 环境变量中。")
-        sys.exit(1) # 错误退出
-
-    # 2. 检查需要打包的文件夹是否存在
-    current_directory = os.getcwd()
-    existing_folders = []
-    print("\n检查要打包的文件夹:")
-    for folder in FOLDERS_TO_ARCHIVE:
-        folder_path = os.path.join(current_directory, folder)
-        if os.path.isdir(folder_path):
-            print(f"  - 找到: {folder}")
-            existing_folders.append(folder) # 只添加存在的文件夹名
-        else:
-            print(f"  - 未找到 (跳过): {folder}")
-
-    if not existing_folders:
-        print("\n警告：所有指定要打包的文件夹都不存在，无需创建压缩包。")
-        sys.exit(0) # 正常退出，因为无事可做
-
-    # 3. 生成时间戳和压缩文件名
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    archive_filename = f"{ARCHIVE_BASENAME}_{timestamp}.rar"
-    print(f"\n准备创建压缩文件: {archive_filename}")
-
-    # 4. 构建 RAR 命令
-    # 命令格式: rar a <archive_name>.rar <folder1> <folder2> ...
-    command = [
-        rar_executable,
-        'a', # 添加到压缩文件
-        archive_filename
-    ]
-    command.extend(existing_folders) # 将所有存在的文件夹添加到命令末尾
-
-    print(f"执行命令: {' '.join(command)}") # 打印将要执行的命令
-
-    # 5. 执行打包命令
-    try:
-        # 使用 subprocess.run 执行命令
-        # check=True: 如果 rar 命令返回非零（错误）状态码，则抛出 CalledProcessError
-        # capture_output=True: 捕获 rar 的标准输出和标准错误
-        # text=True: 以文本模式处理输出/错误
-        result = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8', errors='ignore')
-        print("\n--- RAR 输出 ---")
-        print(result.stdout)
-        print("---------------")
-        print(f"\n成功创建压缩文件: {archive_filename}")
-        sys.exit(0) # 成功退出
-
-    except FileNotFoundError:
-        # 这个错误理论上不应该发生，因为我们已经检查过 rar_executable
-        print(f"\n错误：无法执行找到的 RAR 命令 '{rar_executable}'。")
-        sys.exit(1)
-    except subprocess.CalledProcessError as e:
-        # rar 命令执行失败（返回非零状态码）
-        print("\n错误：RAR 命令执行失败！")
-        print(f"返回码: {e.returncode}")
-        print("\n--- RAR 标准输出 ---")
-        print(e.stdout)
-        print("\n--- RAR 标准错误 ---")
-        print(e.stderr)
-        print("--------------------")
-        # 尝试删除可能已部分创建的错误文件
-        if os.path.exists(archive_filename):
-            try:
-                os.remove(archive_filename)
-                print(f"(已尝试删除部分创建的压缩文件: {archive_filename})")
-            except OSError as del_e:
-                 print(f"(尝试删除部分创建的压缩文件失败: {del_e})")
-        sys.exit(1)
-    except Exception as e:
-        # 其他 Python 异常
-        print(f"\n发生意外错误: {e}")
+    name = f"{ARCHIVE_BASENAME}_{timestamp}"
+    suffix = 1
+    while os.path.exists(os.path.join(MANIFESTS_DIR, f"{name}.json")):
+        suffix += 1
+        name = f"{ARCHIVE_BASENAME}_{timestamp}_{suffix}"
+    manifest = {"name": name, "created": timestamp, "folders": folders, "files": files}
+    os.makedirs(MANIFESTS_DIR, exist_ok=True)
+    tmp_path = os.path.join(MANIFESTS_DIR, f"{name}.json.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, os.path.join(MANIFESTS_DIR, f"{name}.json"))
+    return name, stats
+
+
+def restore_snapshot(name, target_dir):
+    """将快照完整还原到 target_dir (默认不覆盖当前工作目录)"""
+    manifest = load_manifest(name)
+    for rel_path, entry in manifest["files"].items():
+        dest = os.path.join(target_dir, *rel_path.split("/"))
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, 'wb') as f:
+            for digest in entry["chunks"]:
+                f.write(load_chunk(digest))
+    return manifest["name"], len(manifest["files"])
+
+
+def diff_snapshots(name_a, name_b):
+    """比较两个快照, 返回 (新增, 删除, 修改, 快照A文件表, 快照B文件表)"""
+    files_a = load_manifest(name_a)["files"]
+    files_b = load_manifest(name_b)["files"]
+    added = sorted(p for p in files_b if p not in files_a)
+    removed = sorted(p for p in files_a if p not in files_b)
+    modified = sorted(p for p in files_a if p in files_b and files_a[p]["chunks"] != files_b[p]["chunks"])
+    return added, removed, modified, files_a, files_b
+
+
+def format_size(num_bytes):
+    """把字节数格式化为易读的大小"""
+    if num_bytes < 1024:
+        return f"{num_bytes}B"
+    for unit in ["KB", "MB", "GB"]:
+        num_bytes /= 1024
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.1f}{unit}"
+
+
+def print_usage():
+    print("用法:")
+    print("  python package.py                   创建快照 (默认)")
+    print("  python package.py list              列出所有快照")
+    print("  python package.py restore <快照> [目录]  还原快照到目录 (默认 restore_<快照>)")
+    print("  python package.py diff <快照A> <快照B>    比较两个快照 (可用 latest 表示最新)")
+
+
+def main():
+    args = sys.argv[1:]
+    command = args[0] if args else "create"
+
+    if command == "create":
+        print("--- 开始创建快照 ---")
+        print("\n检查要打包的文件夹:")
+        existing_folders = []
+        for folder in FOLDERS_TO_ARCHIVE:
+            if os.path.isdir(folder):
+                print(f"  - 找到: {folder}")
+                existing_folders.append(folder)
+            else:
+                print(f"  - 未找到 (跳过): {folder}")
+        if not existing_folders:
+            print("\n警告：所有指定要打包的文件夹都不存在，无需创建快照。")
+            sys.exit(0)
+        try:
+            name, stats = create_snapshot(existing_folders)
+        except OSError as e:
+            print(f"\n错误：创建快照失败: {e}")
+            sys.exit(1)
+        print(f"\n成功创建快照: {name}")
+        print(f"  文件数: {stats['files']} (其中 {stats['reused']} 个未变化, 直接复用)")
+        print(f"  原始大小: {format_size(stats['bytes'])}, 本次新增存储: {format_size(stats['new_bytes'])}")
+        print(f"  仓库位置: {SNAPSHOT_STORE_DIR}")
+
+    elif command == "list":
+        names = list_snapshot_names()
+        if not names:
+            print("仓库中还没有任何快照。")
+        for name in names:
+            files = load_manifest(name)["files"]
+            total = sum(entry["size"] for entry in files.values())
+            print(f"{name}: {len(files)} 个文件, {format_size(total)}")
+
+    elif command == "restore" and len(args) >= 2:
+        target_dir = args[2] if len(args) >= 3 else f"restore_{args[1]}"
+        if os.path.exists(target_dir) and os.listdir(target_dir):
+            print(f"错误：目标目录 {target_dir} 非空，为防止覆盖请指定其他目录。")
+            sys.exit(1)
+        try:
+            name, count = restore_snapshot(args[1], target_dir)
+        except (OSError, ValueError, zlib.error) as e:
+            print(f"错误：还原失败: {e}")
+            sys.exit(1)
+        print(f"已将快照 {name} 的 {count} 个文件还原到 {target_dir}")
+
+    elif command == "diff" and len(args) >= 3:
+        try:
+            added, removed, modified, files_a, files_b = diff_snapshots(args[1], args[2])
+        except FileNotFoundError as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+        for path in added:
+            print(f"+ {path} ({format_size(files_b[path]['size'])})")
+        for path in removed:
+            print(f"- {path} ({format_size(files_a[path]['size'])})")
+        for path in modified:
+            print(f"M {path} ({format_size(files_a[path]['size'])} -> {format_size(files_b[path]['size'])})")
+        print(f"\n新增 {len(added)}, 删除 {len(removed)}, 修改 {len(modified)}")
+
+    else:
+        print_usage()
         sys.exit(1)
 
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
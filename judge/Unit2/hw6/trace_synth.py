@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# Synthesizes a valid output trace for an input file with a simple serial scheduling policy, optionally scaled up
+# (--repeat) and/or corrupted with one injected fault (--fault). Used by bench_validator.py; needs check.py's imports.
+# Usage: python trace_synth.py <input_file> [--repeat N] [--fault NAME] [--seed S] [-o output_file] [--input-out scaled_input_file]
+import sys
+import math
+import random
+from check import (RE_INPUT_PASSENGER, RE_INPUT_SCHE, FLOOR_MAP_INT_TO_STR, NUM_ELEVATORS, F1_INT,
+                   MOVE_TIME_PER_FLOOR, DOOR_OPEN_CLOSE_TIME, SCHE_STOP_TIME, floor_to_int, int_to_floor)
+
+FLOORS = sorted(FLOOR_MAP_INT_TO_STR)  # walking order; B1 and F1 are neighbours
+FLOOR_INDEX = {f: i for i, f in enumerate(FLOORS)}
+
+
+def ms(seconds):
+    """All synthesized times are integer milliseconds so printed timestamps never round below a required gap."""
+    return int(round(seconds * 1000))
+
+
+# --- Inputs ---
+def load_inputs(path):
+    """Parses an input file into the same request dicts check.py builds."""
+    inputs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line: continue
+            if (m := RE_INPUT_PASSENGER.match(line)):
+                t, p, pri, f_s, to_s = m.groups()
+                inputs.append({'type': 'passenger', 'time': float(t), 'id': int(p), 'pri': int(pri), 'from': floor_to_int(f_s), 'to': floor_to_int(to_s)})
+            elif (m := RE_INPUT_SCHE.match(line)):
+                t, e, spd_s, fl_s = m.groups()
+                inputs.append({'type': 'sche', 'time': float(t), 'eid': int(e), 'speed': float(spd_s), 'to': floor_to_int(fl_s), 'claimed': False})
+            else: raise ValueError(f"Malformed input line: {line}")
+    return inputs
+
+
+def random_inputs(num_passengers, seed=0, duration=50.0):
+    """Random passenger-only requests (no SCHE) for when no input file is given."""
+    rng = random.Random(seed)
+    inputs = []
+    for pid in range(1, num_passengers + 1):
+        src, dst = rng.sample(FLOORS, 2)
+        inputs.append({'type': 'passenger', 'time': round(1.0 + rng.random() * duration, 1), 'id': pid, 'pri': rng.randint(1, 100), 'from': src, 'to': dst})
+    inputs.sort(key=lambda req: req['time'])
+    return inputs
+
+
+def scale_inputs(inputs, repeat):
+    """Tiles the request list `repeat` times, shifting time and passenger ids."""
+    if repeat <= 1: return [dict(req) for req in inputs]
+    span = math.ceil(max((req['time'] for req in inputs), default=0.0)) + 1
+    pid_base = max((req['id'] for req in inputs if req['type'] == 'passenger'), default=0)
+    scaled = []
+    for k in range(repeat):
+        for req in inputs:
+            copy = dict(req); copy['time'] = req['time'] + k * span
+            if req['type'] == 'passenger': copy['id'] = req['id'] + k * pid_base
+            scaled.append(copy)
+    return scaled
+
+
+def format_inputs(inputs):
+    lines = []
+    for req in inputs:
+        if req['type'] == 'passenger': lines.append(f"[{req['time']:.1f}]{req['id']}-PRI-{req['pri']}-FROM-{int_to_floor(req['from'])}-TO-{int_to_floor(req['to'])}")
+        elif req['type'] == 'sche': lines.append(f"[{req['time']:.1f}]SCHE-{req['eid']}-{req['speed']}-{int_to_floor(req['to'])}")
+    return lines
+
+
+# --- Synthesis ---
+class TraceSynthesizer:
+    """Serial policy: one job (a passenger ride or a SCHE) at a time, in input order. Passengers are handed to
+    elevators round-robin, each RECEIVEd, picked up and delivered before the next job starts."""
+
+    def __init__(self):
+        self.lines = []
+        self.now = 0  # ms
+        self.next_car = 0
+        self.floors = {eid: F1_INT for eid in range(1, NUM_ELEVATORS + 1)}
+
+    def emit(self, text):
+        self.lines.append(f"[{self.now / 1000:.4f}]{text}")
+
+    def move(self, eid, target, step=ms(MOVE_TIME_PER_FLOOR)):
+        idx, goal = FLOOR_INDEX[self.floors[eid]], FLOOR_INDEX[target]
+        while idx != goal:
+            idx += 1 if goal > idx else -1
+            self.now += step; self.floors[eid] = FLOORS[idx]
+            self.emit(f"ARRIVE-{int_to_floor(FLOORS[idx])}-{eid}")
+
+    def door(self, eid, actions, hold=DOOR_OPEN_CLOSE_TIME):
+        floor_s = int_to_floor(self.floors[eid])
+        self.emit(f"OPEN-{floor_s}-{eid}")
+        for action in actions: self.emit(action)
+        self.now += ms(hold)
+        self.emit(f"CLOSE-{floor_s}-{eid}")
+
+    def serve_passenger(self, req):
+        pid, src, dst = req['id'], req['from'], req['to']
+        eid = self.next_car + 1; self.next_car = (self.next_car + 1) % NUM_ELEVATORS
+        self.emit(f"RECEIVE-{pid}-{eid}")
+        self.move(eid, src)
+        self.door(eid, [f"IN-{pid}-{int_to_floor(src)}-{eid}"])
+        self.move(eid, dst)
+        self.door(eid, [f"OUT-S-{pid}-{int_to_floor(dst)}-{eid}"])
+
+    def serve_sche(self, req):
+        eid = req['eid']
+        self.emit(f"SCHE-ACCEPT-{eid}-{req['speed']}-{int_to_floor(req['to'])}")
+        self.emit(f"SCHE-BEGIN-{eid}")
+        self.move(eid, req['to'], ms(req['speed']))
+        self.door(eid, [], hold=SCHE_STOP_TIME)
+        self.emit(f"SCHE-END-{eid}")
+
+    def run(self, inputs):
+        handlers = {'passenger': self.serve_passenger, 'sche': self.serve_sche}
+        for req in sorted(inputs, key=lambda r: r['time']):
+            self.now = max(self.now, ms(req['time']))
+            handlers[req['type']](req)
+        return self.lines
+
+
+def synthesize(inputs):
+    """Returns the output lines for the given parsed inputs."""
+    return TraceSynthesizer().run(inputs)
+
+
+# --- Fault injection ---
+def _time_of(line): return float(line[1:line.index(']')])
+def _body(line): return line[line.index(']') + 1:]
+def _at(seconds, line): return f"[{seconds:.4f}]{_body(line)}"
+
+
+def _pick(rng, lines, predicate):
+    candidates = [i for i, line in enumerate(lines) if predicate(i, line)]
+    return rng.choice(candidates) if candidates else None
+
+
+def fault_teleport(lines, rng):
+    i = _pick(rng, lines, lambda i, l: _body(l).startswith("ARRIVE-"))
+    if i is None: return None
+    _, floor_s, eid_s = _body(lines[i]).split('-')
+    far = 'B4' if floor_to_int(floor_s) > F1_INT else 'F7'  # never adjacent to the floor before this step
+    lines[i] = f"[{_time_of(lines[i]):.4f}]ARRIVE-{far}-{eid_s}"
+    return lines
+
+
+def fault_fast_close(lines, rng):
+    i = _pick(rng, lines, lambda i, l: _body(l).startswith("CLOSE-"))
+    if i is None: return None
+    open_body = "OPEN-" + _body(lines[i])[len("CLOSE-"):]
+    j = next(j for j in range(i - 1, -1, -1) if _body(lines[j]) == open_body)
+    lines[i] = _at(_time_of(lines[j]), lines[i])
+    return lines
+
+
+def fault_drop_line(prefix, last_per_key=False):
+    def mutate(lines, rng):
+        if last_per_key:  # only the last such line of each elevator, so a later one cannot repair the state
+            last = {}
+            for i, line in enumerate(lines):
+                if _body(line).startswith(prefix): last[_body(line)] = i
+            keep = set(last.values())
+            i = _pick(rng, lines, lambda i, l: i in keep)
+        else: i = _pick(rng, lines, lambda i, l: _body(l).startswith(prefix))
+        if i is None: return None
+        del lines[i]
+        return lines
+    return mutate
+
+
+def fault_drop_receive(lines, rng):
+    """Drops the RECEIVE an IN actually relies on (earlier ones may have been cancelled by a SCHE anyway)."""
+    last_receive, used = {}, set()
+    for i, line in enumerate(lines):
+        body = _body(line)
+        if body.startswith("RECEIVE-"): last_receive[body.split('-')[1]] = i
+        elif body.startswith("IN-") and body.split('-')[1] in last_receive: used.add(last_receive.pop(body.split('-')[1]))
+    i = _pick(rng, lines, lambda i, l: i in used)
+    if i is None: return None
+    del lines[i]
+    return lines
+
+
+def fault_time_reverse(lines, rng):
+    i = _pick(rng, lines, lambda i, l: i > 0 and _time_of(lines[i - 1]) >= 1.0)
+    if i is None: return None
+    lines[i] = _at(_time_of(lines[i - 1]) - 1.0, lines[i])
+    return lines
+
+
+# name -> (mutator, substring the Validator's error list must contain)
+FAULTS = {
+    'teleport': (fault_teleport, "Invalid move"),
+    'fast_close': (fault_fast_close, "closed too fast"),
+    'drop_out': (fault_drop_line("OUT-S-"), "!Reach dest"),
+    'drop_receive': (fault_drop_receive, "Wrong assignment"),
+    'time_reverse': (fault_time_reverse, "Timestamp decreasing"),
+    'drop_sche_end': (fault_drop_line("SCHE-END-", last_per_key=True), "finished !IDLE SCHE state"),
+}
+
+
+def inject_fault(lines, name, seed=0):
+    """Returns (corrupted_lines, expected_error_substring), or None if the trace has nothing to corrupt."""
+    mutator, expected = FAULTS[name]
+    corrupted = mutator(list(lines), random.Random(seed))
+    return (corrupted, expected) if corrupted is not None else None
+
+
+# --- Command line ---
+def pop_option(args, name, default=None):
+    if name not in args: return default
+    idx = args.index(name); value = args[idx + 1]; del args[idx:idx + 2]
+    return value
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = int(pop_option(args, "--repeat", 1)); fault = pop_option(args, "--fault"); seed = int(pop_option(args, "--seed", 0))
+    output_path = pop_option(args, "-o"); input_out_path = pop_option(args, "--input-out")
+    if len(args) != 1 or (fault is not None and fault not in FAULTS):
+        print("Usage: python trace_synth.py <input_file> [--repeat N] [--fault NAME] [--seed S] [-o output_file] [--input-out scaled_input_file]")
+        print(f"Faults: {', '.join(FAULTS)}"); sys.exit(1)
+    inputs = scale_inputs(load_inputs(args[0]), repeat)
+    lines = synthesize(inputs)
+    if fault is not None:
+        injected = inject_fault(lines, fault, seed)
+        if injected is None: print(f"Fault '{fault}' not applicable to this trace.", file=sys.stderr); sys.exit(1)
+        lines, expected = injected
+        print(f"Injected '{fault}' (validator should report: {expected})", file=sys.stderr)
+    if input_out_path:
+        with open(input_out_path, 'w', encoding='utf-8') as f: f.write("\n".join(format_inputs(inputs)) + "\n")
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f: f.write("\n".join(lines) + "\n")
+    else: print("\n".join(lines))
+    print(f"{len(inputs)} requests -> {len(lines)} output lines", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
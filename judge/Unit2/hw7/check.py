@@ -13,6 +13,7 @@ from threading import Lock, Thread, Event # For stream readers
 import math
 from collections import defaultdict, deque
 import traceback
+from profiler import PROFILER, PROFILE_SUMMARY_FILE, PROFILE_TRACE_FILE
 
 # --- Plotting Import ---
 try:
@@ -92,8 +93,9 @@ def stream_reader_thread(stream_pipe, output_buffer, buffer_lock):
         try: stream_pipe.close()
         except Exception: pass
 
-def run_java_program_with_threads(jar_file, input_data_str):
+def run_java_program_with_threads(jar_file, input_data_str, case=None):
     start_time = time.monotonic()
+    phase_start = time.perf_counter()
     stdout_buffer, stderr_buffer = [], []
     stdout_lock, stderr_lock = Lock(), Lock()
     full_stderr_str, exit_code, status_code = "", None, None
@@ -109,12 +111,14 @@ def run_java_program_with_threads(jar_file, input_data_str):
         stdout_thread = Thread(target=stream_reader_thread, args=(process.stdout, stdout_buffer, stdout_lock), daemon=True)
         stderr_thread = Thread(target=stream_reader_thread, args=(process.stderr, stderr_buffer, stderr_lock), daemon=True)
         stdout_thread.start(); stderr_thread.start()
+        PROFILER.record("jvm_spawn", phase_start, time.perf_counter() - phase_start, case); phase_start = time.perf_counter()
 
         try:
             if input_data_str: process.stdin.write(input_data_str)
             process.stdin.close()
         except (BrokenPipeError, OSError) as e:
             status_code = "ExecutionError"; full_stderr_str += f"\nChecker: Error sending input (process likely terminated): {e}."
+        PROFILER.record("input_feed", phase_start, time.perf_counter() - phase_start, case); phase_start = time.perf_counter()
 
         process_terminated_normally = False
         if status_code != "ExecutionError":
@@ -147,6 +151,7 @@ def run_java_program_with_threads(jar_file, input_data_str):
                  full_stderr_str += f"\nChecker: Error during wait(): {wait_e}"
                  if status_code not in ["Killed", "TLE", "ExecutionError"]: status_code = "ExecutionError"
 
+        PROFILER.record("process_wait", phase_start, time.perf_counter() - phase_start, case); phase_start = time.perf_counter()
         thread_join_timeout = 5.0
         stdout_thread.join(timeout=thread_join_timeout)
         stderr_thread.join(timeout=thread_join_timeout)
@@ -154,6 +159,8 @@ def run_java_program_with_threads(jar_file, input_data_str):
 
         with stdout_lock: full_stdout = "".join(stdout_buffer)
         with stderr_lock: full_stderr_str += "".join(stderr_buffer)
+        PROFILER.record("output_read", phase_start, time.perf_counter() - phase_start, case)
+        PROFILER.count("stdout_chars", len(full_stdout))
 
         final_exit_code = process.poll()
         if status_code not in ["Killed", "TLE", "ExecutionError", "JavaNotFound"]:
@@ -184,6 +191,35 @@ F1_INT = floor_to_int('F1'); B1_INT = floor_to_int('B1')
 VALID_SCHE_UPDATE_FLOORS_INT = {floor_to_int(f) for f in ["B2", "B1", "F1", "F2", "F3", "F4", "F5"]}
 VALID_SCHE_SPEEDS = {0.2, 0.3, 0.4, 0.5}
 
+# --- Legal move table: floor -> floors reachable in one ARRIVE (B1<->F1 counts as one step) ---
+LEGAL_MOVES = {f: frozenset(g for g in FLOOR_MAP_INT_TO_STR if abs(g - f) == 1 or {f, g} == {B1_INT, F1_INT}) for f in FLOOR_MAP_INT_TO_STR}
+
+class AssignmentIndex:
+    """RECEIVE bookkeeping: passenger -> elevator plus the reverse elevator -> passengers lookup.
+    Cancelling every receive of one elevator (SCHE/UPDATE) is O(1): the elevator's epoch is bumped and
+    stale passenger entries are dropped lazily the next time they are looked up."""
+    def __init__(self, elevator_ids):
+        self.by_passenger = {}  # pid -> (eid, epoch at RECEIVE time)
+        self.by_elevator = {eid: set() for eid in elevator_ids}
+        self.epoch = {eid: 0 for eid in elevator_ids}
+    def elevator_of(self, pid):
+        entry = self.by_passenger.get(pid)
+        if entry is None: return None
+        eid, epoch = entry
+        if self.epoch[eid] != epoch: del self.by_passenger[pid]; return None
+        return eid
+    def assign(self, pid, eid):
+        old = self.elevator_of(pid)
+        if old is not None: self.by_elevator[old].discard(pid)
+        self.by_passenger[pid] = (eid, self.epoch[eid]); self.by_elevator[eid].add(pid)
+    def release(self, pid):
+        old = self.elevator_of(pid)
+        if old is not None: self.by_elevator[old].discard(pid); del self.by_passenger[pid]
+    def cancel_elevator(self, eid):
+        self.epoch[eid] += 1; self.by_elevator[eid] = set()
+    def has_receives(self, eid): return bool(self.by_elevator[eid])
+    def active(self): return {pid: eid for eid, pids in self.by_elevator.items() for pid in sorted(pids)}
+
 # --- Validation Logic ---
 class Validator:
     # --- __init__ (No change needed) ---
@@ -194,7 +230,13 @@ class Validator:
         self.sim_time = 0.0
         self.elevators = {}
         self.passengers = {}
-        self.active_passenger_assignments = {}
+        self.assignments = AssignmentIndex(range(1, NUM_ELEVATORS + 1))
+        self.pending_sche = defaultdict(deque) # eid -> unclaimed SCHE inputs in input order
+        self.pending_updates = defaultdict(deque) # frozenset({aid, bid}) -> unclaimed UPDATE inputs in input order
+        for req in all_input_requests:
+            if req.get('claimed', False): continue
+            if req['type'] == 'sche': self.pending_sche[req['eid']].append(req)
+            elif req['type'] == 'update': self.pending_updates[frozenset((req['aid'], req['bid']))].append(req)
         self.open_count = 0; self.close_count = 0; self.move_count = 0
         for i in range(1, NUM_ELEVATORS + 1):
             self.elevators[i] = {
@@ -202,7 +244,6 @@ class Validator:
                 'last_action_time': 0.0, 'last_arrive_time': 0.0, 'open_time': -1.0,
                 'current_speed': DEFAULT_MOVE_TIME_PER_FLOOR,
                 'min_floor': MIN_FLOOR_INT, 'max_floor': MAX_FLOOR_INT,
-                'active_receives': set(),
                 'sche_state': 'IDLE', 'sche_target_floor': None, 'sche_speed_override': None,
                 'sche_begin_time': -1.0, 'sche_accept_time': -1.0,
                 'update_state': 'IDLE', 'update_partner_id': None, 'update_transfer_floor': None,
@@ -214,7 +255,7 @@ class Validator:
             self.passengers[pid] = {
                 'id': pid,'state': 'OUTSIDE', 'location': req['from'], 'destination': req['to'],
                 'request_time': req['time'], 'priority': req['pri'],'arrival_time': -1.0,
-                'current_assignment': None,'needs_pickup': False
+                'needs_pickup': False
             }
 
     def add_error(self, message):
@@ -227,15 +268,8 @@ class Validator:
         if pid not in self.passengers: self.add_error(f"CRITICAL: Invalid Passenger ID {pid}"); return None
         return self.passengers[pid]
     def _cancel_external_receives_for_elevator(self, eid):
-        e_state = self._get_elevator_state(eid)
-        if not e_state: return
-        receives_to_cancel = list(e_state['active_receives'])
-        for received_pid in receives_to_cancel:
-            rcv_p_state = self._get_passenger_state(received_pid)
-            if rcv_p_state and rcv_p_state['state'] in ['OUTSIDE', 'NEEDS_PICKUP'] and self.active_passenger_assignments.get(received_pid) == eid:
-                if received_pid in e_state['active_receives']: e_state['active_receives'].remove(received_pid)
-                if self.active_passenger_assignments.get(received_pid) == eid: del self.active_passenger_assignments[received_pid]
-                if rcv_p_state['current_assignment'] == eid: rcv_p_state['current_assignment'] = None
+        # Receives are released on IN, so every remaining one belongs to a passenger outside: drop them all at once
+        if self._get_elevator_state(eid): self.assignments.cancel_elevator(eid)
 
     # --- validate_line --- MODIFIED IN CHECK ---
     def validate_line(self, line):
@@ -249,14 +283,10 @@ class Validator:
         if current_line_time < self.sim_time - EPSILON * 100: self.add_error(f"Timestamp decreasing: {current_line_time:.4f} < {self.sim_time:.4f}")
         self.sim_time = max(self.sim_time, current_line_time)
 
-        match_arrive=RE_ARRIVE.match(line); match_open=RE_OPEN.match(line); match_close=RE_CLOSE.match(line)
-        match_in=RE_IN.match(line); match_out=RE_OUT.match(line); match_receive=RE_RECEIVE.match(line)
-        match_sche_begin=RE_SCHE_BEGIN.match(line); match_sche_end=RE_SCHE_END.match(line); match_sche_accept=RE_SCHE_ACCEPT.match(line)
-        match_update_accept=RE_UPDATE_ACCEPT.match(line); match_update_begin=RE_UPDATE_BEGIN.match(line); match_update_end=RE_UPDATE_END.match(line)
-
+        # Patterns are tried lazily in branch order: each line only pays for the regexes up to its own kind
         try:
             # ARRIVE
-            if match_arrive:
+            if (match_arrive := RE_ARRIVE.match(line)):
                 _, floor_str, eid_str = match_arrive.groups(); eid = int(eid_str); floor_int = floor_to_int(floor_str)
                 e_state = self._get_elevator_state(eid)
                 if floor_int is None or e_state is None: self.add_error(f"ARRIVE Invalid (eid {eid_str} /floor {floor_str}): {line}"); return True
@@ -264,14 +294,12 @@ class Validator:
                 if e_state['state'] != 'CLOSED': self.add_error(f"ARRIVE-{floor_str}-{eid}: Door not CLOSED.")
                 prev_floor = e_state['floor']
                 if not (e_state['min_floor'] <= floor_int <= e_state['max_floor']): self.add_error(f"ARRIVE-{floor_str}-{eid}: Arrived outside valid range [{int_to_floor(e_state['min_floor'])}-{int_to_floor(e_state['max_floor'])}].")
-                is_f1_b1_move = (prev_floor == F1_INT and floor_int == B1_INT) or (prev_floor == B1_INT and floor_int == F1_INT)
-                is_normal_step = (not is_f1_b1_move) and (floor_diff(floor_int, prev_floor) == 1)
-                is_valid_step = is_f1_b1_move or is_normal_step
+                is_valid_step = floor_int in LEGAL_MOVES.get(prev_floor, ())
                 if not is_valid_step: self.add_error(f"ARRIVE-{floor_str}-{eid}: Invalid move step from {int_to_floor(prev_floor)} to {floor_str}.")
                 current_move_time = e_state['sche_speed_override'] if e_state['sche_state'] == 'ACTIVE' else e_state['current_speed']
                 exp_t = e_state['last_action_time'] + current_move_time
                 if current_line_time < exp_t - EPSILON: self.add_error(f"ARRIVE-{floor_str}-{eid}: Move too fast (arrived {current_line_time:.4f}, expected >= {exp_t:.4f}, speed {current_move_time:.1f}s/f).")
-                has_passengers = bool(e_state['passengers']); has_receives = bool(e_state['active_receives']); is_sche_active = (e_state['sche_state'] == 'ACTIVE')
+                has_passengers = bool(e_state['passengers']); has_receives = self.assignments.has_receives(eid); is_sche_active = (e_state['sche_state'] == 'ACTIVE')
                 is_first_post_update_move = e_state['initial_post_update_move_allowed']
                 is_double_car_leaving_transfer = (e_state['update_state'] in ['DOUBLE_CAR_A', 'DOUBLE_CAR_B'] and prev_floor == e_state['update_transfer_floor'] and e_state['update_transfer_floor'] is not None)
                 can_move_idle = (has_passengers or has_receives or is_sche_active or is_first_post_update_move or is_double_car_leaving_transfer)
@@ -292,7 +320,7 @@ class Validator:
                 self.move_count += 1
 
             # OPEN
-            elif match_open:
+            elif (match_open := RE_OPEN.match(line)):
                 _, floor_str, eid_str = match_open.groups(); eid = int(eid_str); floor_int = floor_to_int(floor_str)
                 e_state = self._get_elevator_state(eid)
                 if floor_int is None or e_state is None: self.add_error(f"OPEN Invalid (eid/floor): {line}"); return True
@@ -307,7 +335,7 @@ class Validator:
                 e_state['state'] = 'OPEN'; e_state['open_time'] = current_line_time; e_state['last_action_time'] = current_line_time; self.open_count += 1
 
             # CLOSE
-            elif match_close:
+            elif (match_close := RE_CLOSE.match(line)):
                 _, floor_str, eid_str = match_close.groups(); eid = int(eid_str); floor_int = floor_to_int(floor_str)
                 e_state = self._get_elevator_state(eid)
                 if floor_int is None or e_state is None: self.add_error(f"CLOSE Invalid (eid/floor): {line}"); return True
@@ -327,7 +355,7 @@ class Validator:
                 if is_sche_close: e_state['sche_state'] = 'CLOSED_SCHE_TARGET'
 
             # --- IN --- (Corrected state check)
-            elif match_in:
+            elif (match_in := RE_IN.match(line)):
                 _, pid_s, floor_s, eid_s = match_in.groups(); pid=int(pid_s); eid=int(eid_s); floor_i=floor_to_int(floor_s)
                 p_state = self._get_passenger_state(pid); e_state = self._get_elevator_state(eid)
                 if floor_i is None or p_state is None or e_state is None: self.add_error(f"IN Invalid (pid/eid/floor): {line}"); return True
@@ -349,15 +377,14 @@ class Validator:
                 if p_state['location']!=floor_i: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Passenger not at this floor ({int_to_floor(p_state['location'])}).")
                 if len(e_state['passengers'])>=ELEVATOR_CAPACITY: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Elevator full ({len(e_state['passengers'])}).")
                 if pid in e_state['passengers']: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Passenger already inside this elevator.")
-                if p_state['current_assignment']!=eid: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Passenger not assigned to this elevator via RECEIVE (assigned to {p_state['current_assignment']}).")
-                if pid not in e_state['active_receives']: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Elevator does not have an active (unfulfilled) RECEIVE for passenger.")
+                assigned = self.assignments.elevator_of(pid)
+                if assigned!=eid: self.add_error(f"IN-{pid}-{floor_s}-{eid}: Passenger not assigned to this elevator via RECEIVE (assigned to {assigned}).")
                 e_state['passengers'].add(pid);
-                if pid in e_state['active_receives']: e_state['active_receives'].remove(pid)
-                if self.active_passenger_assignments.get(pid)==eid: del self.active_passenger_assignments[pid]
-                p_state['state']='INSIDE';p_state['location']=eid;p_state['current_assignment']=None;p_state['needs_pickup']=False
+                if assigned==eid: self.assignments.release(pid)
+                p_state['state']='INSIDE';p_state['location']=eid;p_state['needs_pickup']=False
 
             # OUT
-            elif match_out:
+            elif (match_out := RE_OUT.match(line)):
                 _, flag, pid_s, floor_s, eid_s = match_out.groups(); pid=int(pid_s); eid=int(eid_s); floor_i=floor_to_int(floor_s)
                 p_state = self._get_passenger_state(pid); e_state = self._get_elevator_state(eid)
                 if floor_i is None or p_state is None or e_state is None: self.add_error(f"OUT Invalid (pid/eid/floor): {line}"); return True
@@ -382,7 +409,7 @@ class Validator:
                 p_state['state'] = outcome_state; p_state['location'] = floor_i
 
             # RECEIVE (Corrected state check)
-            elif match_receive:
+            elif (match_receive := RE_RECEIVE.match(line)):
                 _, pid_s, eid_s = match_receive.groups(); pid=int(pid_s); eid=int(eid_s)
                 p_state=self._get_passenger_state(pid); e_state=self._get_elevator_state(eid)
                 if p_state is None or e_state is None: self.add_error(f"RECEIVE Invalid (pid/eid): {line}"); return True
@@ -391,16 +418,12 @@ class Validator:
                 if is_sche_blocking: self.add_error(f"RECEIVE-{pid}-{eid}: Cannot assign during SCHE state {e_state['sche_state']}."); return True
                 if is_update_blocking: self.add_error(f"RECEIVE-{pid}-{eid}: Cannot assign during UPDATE state {e_state['update_state']}."); return True
                 if p_state['state'] not in ['OUTSIDE','NEEDS_PICKUP']: self.add_error(f"RECEIVE-{pid}-{eid}: Passenger not OUTSIDE/NEEDS_PICKUP (state: {p_state['state']})."); return True
-                existing_assignment = self.active_passenger_assignments.get(pid)
+                existing_assignment = self.assignments.elevator_of(pid)
                 if existing_assignment is not None and existing_assignment != eid: self.add_error(f"RECEIVE-{pid}-{eid}: Double assignment violation (P{pid} already assigned to E{existing_assignment})."); return True
-                if existing_assignment != eid:
-                    if existing_assignment is not None and existing_assignment in self.elevators:
-                        old_e_state = self.elevators[existing_assignment]
-                        if pid in old_e_state['active_receives']: old_e_state['active_receives'].remove(pid)
-                    e_state['active_receives'].add(pid); p_state['current_assignment']=eid; self.active_passenger_assignments[pid]=eid
+                if existing_assignment != eid: self.assignments.assign(pid, eid)
 
             # SCHE-ACCEPT
-            elif match_sche_accept:
+            elif (match_sche_accept := RE_SCHE_ACCEPT.match(line)):
                 _ts, eid_s, speed_s, floor_s = match_sche_accept.groups();
                 try:
                     eid=int(eid_s); speed=float(speed_s); floor_i=floor_to_int(floor_s)
@@ -413,22 +436,21 @@ class Validator:
                 except Exception as e_acc: self.add_error(f"SCHE-ACCEPT Internal check error: {e_acc}")
 
             # SCHE-BEGIN
-            elif match_sche_begin:
+            elif (match_sche_begin := RE_SCHE_BEGIN.match(line)):
                 _, eid_str = match_sche_begin.groups(); eid = int(eid_str)
                 e_state = self._get_elevator_state(eid)
                 if e_state is None: self.add_error(f"SCHE-BEGIN Invalid eid: {line}"); return True
                 if e_state['update_state'] != 'IDLE': self.add_error(f"SCHE-BEGIN-{eid}: Cannot start SCHE during UPDATE state ({e_state['update_state']})."); return True
                 if e_state['state'] != 'CLOSED': self.add_error(f"SCHE-BEGIN-{eid}: Door not CLOSED."); return True
                 if e_state['sche_state'] != 'IDLE': self.add_error(f"SCHE-BEGIN-{eid}: Not in IDLE SCHE state (state: {e_state['sche_state']})."); return True
-                found_sche_input = None
-                for req in self.all_inputs:
-                    if req.get('type') == 'sche' and req.get('eid') == eid and not req.get('claimed', False): found_sche_input = req; req['claimed'] = True; break
+                found_sche_input = None; pending = self.pending_sche.get(eid)
+                if pending: found_sche_input = pending.popleft(); found_sche_input['claimed'] = True
                 if found_sche_input: e_state['sche_target_floor'] = found_sche_input['to']; e_state['sche_speed_override'] = found_sche_input['speed']
                 else: self.add_error(f"SCHE-BEGIN-{eid}: WARNING - Could not find unclaimed matching SCHE input."); e_state['sche_target_floor'] = None; e_state['sche_speed_override'] = None
                 e_state['sche_state'] = 'ACTIVE'; e_state['sche_begin_time'] = current_line_time; self._cancel_external_receives_for_elevator(eid)
 
             # SCHE-END
-            elif match_sche_end:
+            elif (match_sche_end := RE_SCHE_END.match(line)):
                 _, eid_s = match_sche_end.groups(); eid=int(eid_s)
                 e_state=self._get_elevator_state(eid)
                 if e_state is None: self.add_error(f"SCHE-END Invalid eid: {line}"); return True
@@ -442,7 +464,7 @@ class Validator:
                 e_state['sche_state']='IDLE'; e_state['sche_target_floor']=None; e_state['sche_speed_override']=None; e_state['sche_begin_time']=-1.0; e_state['sche_accept_time'] = -1.0
 
             # UPDATE-ACCEPT
-            elif match_update_accept:
+            elif (match_update_accept := RE_UPDATE_ACCEPT.match(line)):
                 _ts, aid_s, bid_s, floor_s = match_update_accept.groups();
                 try:
                     aid=int(aid_s); bid=int(bid_s); floor_i=floor_to_int(floor_s)
@@ -459,7 +481,7 @@ class Validator:
                 except Exception as e_uacc: self.add_error(f"UPDATE-ACCEPT Internal check error: {e_uacc}")
 
             # UPDATE-BEGIN
-            elif match_update_begin:
+            elif (match_update_begin := RE_UPDATE_BEGIN.match(line)):
                 _ts, aid_s, bid_s = match_update_begin.groups();
                 try:
                     aid = int(aid_s); bid = int(bid_s); a_state = self._get_elevator_state(aid); b_state = self._get_elevator_state(bid)
@@ -468,10 +490,10 @@ class Validator:
                     if a_state['update_state'] != 'PENDING_UPDATE' or b_state['update_state'] != 'PENDING_UPDATE': self.add_error(f"UPDATE-BEGIN-{aid}-{bid}: Elevators not in PENDING_UPDATE state."); valid_pre_begin_state = False
                     if a_state['state'] != 'CLOSED' or b_state['state'] != 'CLOSED': self.add_error(f"UPDATE-BEGIN-{aid}-{bid}: Doors not closed."); valid_pre_begin_state = False
                     if a_state['passengers'] or b_state['passengers']: self.add_error(f"UPDATE-BEGIN-{aid}-{bid}: Elevators not empty."); valid_pre_begin_state = False
-                    found_update_input = None
-                    for req in self.all_inputs:
-                        if req.get('type') == 'update' and req.get('aid') == aid and req.get('bid') == bid and not req.get('claimed', False): found_update_input = req; req['claimed'] = True; break
-                        elif req.get('type') == 'update' and req.get('aid') == bid and req.get('bid') == aid and not req.get('claimed', False): self.add_error(f"UPDATE-BEGIN-{aid}-{bid}: Output order mismatches input order ({bid}-{aid})."); valid_pre_begin_state = False; break
+                    found_update_input = None; pending = self.pending_updates.get(frozenset((aid, bid)))
+                    if pending:
+                        if pending[0]['aid'] == aid: found_update_input = pending.popleft(); found_update_input['claimed'] = True
+                        else: self.add_error(f"UPDATE-BEGIN-{aid}-{bid}: Output order mismatches input order ({bid}-{aid})."); valid_pre_begin_state = False
                     if not found_update_input and valid_pre_begin_state: self.add_error(f"UPDATE-BEGIN-{aid}-{bid}: WARNING - Could not find matching unclaimed UPDATE input.")
                     if valid_pre_begin_state:
                         a_state['pending_update_request'] = found_update_input; b_state['pending_update_request'] = found_update_input
@@ -482,7 +504,7 @@ class Validator:
                 except Exception as e_ubgn: self.add_error(f"UPDATE-BEGIN Internal check error: {e_ubgn}"); return True
 
             # UPDATE-END
-            elif match_update_end:
+            elif (match_update_end := RE_UPDATE_END.match(line)):
                  _ts, aid_s, bid_s = match_update_end.groups();
                  try:
                     aid = int(aid_s); bid = int(bid_s); a_state = self._get_elevator_state(aid); b_state = self._get_elevator_state(bid)
@@ -552,7 +574,8 @@ class Validator:
                           if e_state.get('floor') <= partner_state.get('floor'): self.add_error(f"E{eid}(A) finished at/below E{partner_id}(B).")
                       elif final_update_state == 'DOUBLE_CAR_B' and partner_state.get('update_state') == 'DOUBLE_CAR_A':
                            if e_state.get('floor') >= partner_state.get('floor'): self.add_error(f"E{eid}(B) finished at/above E{partner_id}(A).")
-        if self.active_passenger_assignments: self.add_error(f"Finished w/ active external assignments remaining: {self.active_passenger_assignments}")
+        active_assignments = self.assignments.active()
+        if active_assignments: self.add_error(f"Finished w/ active external assignments remaining: {active_assignments}")
 
     # --- get_errors, get_final_sim_time, metrics (No change needed) ---
     def get_errors(self): return self.errors
@@ -616,12 +639,13 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir, log_dir):
     data_file_base = os.path.splitext(data_file)[0]; log_file_name = f"{jar_name_base}_{data_file_base}.log"
     log_file_path = os.path.join(log_dir, log_file_name); output_file_name = f"{jar_name_base}_{data_file_base}.out"
     output_file_path_filtered = os.path.join(out_dir, output_file_name)
+    case_key = f"{jar_name_base}/{data_file_base}"
     errors = []; stdout_data, stderr_data = "", ""; execution_time, run_status_code = 0, None
     result_status = "CHECKER_ERROR"; final_sim_time = 0.0; power_consumption = 0.0; weighted_avg_time = 0.0
     try:
         input_str = ""; parsed_inputs = []; parse_error = False
         try:
-            with open(data_file_path, 'r', encoding='utf-8', errors='replace') as f: input_lines = f.readlines(); input_str = "".join(input_lines)
+            with PROFILER.phase("input_read", case_key), open(data_file_path, 'r', encoding='utf-8', errors='replace') as f: input_lines = f.readlines(); input_str = "".join(input_lines)
             for line_num, line in enumerate(input_lines):
                 line = line.strip();
                 if not line: continue
@@ -655,9 +679,9 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir, log_dir):
         except Exception as e: raise Exception(f"Error reading/parsing input {data_file_path}: {e}")
         if parse_error: result_status = "INPUT_ERROR"
         else:
-            stdout_data, stderr_data, execution_time, run_status_code = run_java_program_with_threads(jar_file, input_str)
+            stdout_data, stderr_data, execution_time, run_status_code = run_java_program_with_threads(jar_file, input_str, case_key)
             try:
-                with open(log_file_path, 'w', encoding='utf-8', errors='replace') as f:
+                with PROFILER.phase("log_write", case_key), open(log_file_path, 'w', encoding='utf-8', errors='replace') as f:
                     f.write(f"--- INPUT ---\n{input_str}\n\n"); f.write(f"--- STDOUT ---\n{stdout_data}")
                     if stderr_data: f.write("\n\n--- STDERR ---\n" + stderr_data)
                     f.write(f"\n\n--- EXECUTION TIME: {execution_time:.4f}s ---"); f.write(f"\n--- RUN STATUS CODE: {run_status_code} ---")
@@ -665,7 +689,7 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir, log_dir):
             all_stdout_lines = stdout_data.splitlines(); filtered_output_lines = [line for line in all_stdout_lines if not RE_LOG_LINE.search(line)]
             clean_stdout_data_for_saving = "\n".join(filtered_output_lines)
             try:
-                with open(output_file_path_filtered, 'w', encoding='utf-8', errors='replace') as f: f.write(clean_stdout_data_for_saving)
+                with PROFILER.phase("output_write", case_key), open(output_file_path_filtered, 'w', encoding='utf-8', errors='replace') as f: f.write(clean_stdout_data_for_saving)
             except IOError as e: errors.append(f"Warning: Failed to write filtered output file {output_file_path_filtered}: {e}")
             initial_run_status = "OK"
             if run_status_code == "Killed": initial_run_status = "TIMEOUT_HARD"
@@ -678,6 +702,7 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir, log_dir):
                      if initial_run_status == "OK": result_status = "WRONG_ANSWER"; errors.append("Validation Error: No non-log output for non-empty input.")
                      else: result_status = initial_run_status; errors.append("INFO: No non-log output before timeout/error.")
                 else:
+                    validation_start = time.perf_counter()
                     validator = Validator(parsed_inputs); validation_stopped = False
                     for line_num_val, output_line_val in enumerate(filtered_output_lines):
                         if not validator.validate_line(output_line_val):
@@ -685,6 +710,8 @@ def run_single_test_case(jar_file, data_file, data_dir, out_dir, log_dir):
                             val_errors = validator.get_errors();
                             if val_errors: errors.extend([f"  -> {ve}" for ve in val_errors[-3:]]); break
                     if not validation_stopped: validator.final_checks()
+                    PROFILER.record("validation", validation_start, time.perf_counter() - validation_start, case_key)
+                    PROFILER.count("lines_validated", len(filtered_output_lines))
                     validation_errors = validator.get_errors(); final_sim_time = validator.get_final_sim_time()
                     if not validation_stopped and initial_run_status == "OK":
                         power_consumption = validator.get_power_consumption(); weighted_avg_time = validator.get_weighted_average_completion_time()
@@ -736,7 +763,7 @@ def test_single_jar(jar_file, all_data_files, data_dir, out_dir, log_dir, report
     summary = f"Report: {jar_file}\nOverall: {passed_tests}/{total_tests} passed ({failed_tests} failed).\n{'='*40}"
     print(f"\nFinished {jar_file}. Results: {passed_tests}/{total_tests} passed.")
     try:
-        with open(report_path, 'w', encoding='utf-8', errors='replace') as f: f.write(summary + "\n"); f.write("\n".join(report_lines) + "\n")
+        with PROFILER.phase("report_write"), open(report_path, 'w', encoding='utf-8', errors='replace') as f: f.write(summary + "\n"); f.write("\n".join(report_lines) + "\n")
         print(f"Report saved to '{report_path}'")
     except IOError as e: print(f"Error writing report '{report_path}': {e}", file=sys.stderr)
     return (jar_file, passed_tests, total_tests, jar_plot_data_runtime, jar_plot_data_power, jar_plot_data_avgtime)
@@ -870,7 +897,7 @@ def main():
                 if jar_raw_avgtime: raw_results_avgtime[jar_file] = jar_raw_avgtime
                 report_path = os.path.join(REPORT_DIR, f"{jar_name_base}.report");
                 try:
-                    with open(report_path, 'w', encoding='utf-8', errors='replace') as f:
+                    with PROFILER.phase("report_write"), open(report_path, 'w', encoding='utf-8', errors='replace') as f:
                         f.write(f"Report: {jar_file}\nOverall: {passed}/{total} passed ({failed} failed).\n{'='*40}\n"); report_lines_for_file=[]
                         for df_rep in data_files:
                             res=report_map.get(df_rep)
@@ -897,7 +924,7 @@ def main():
     else: print(f"Error: Unknown PARALLEL_MODE '{PARALLEL_MODE}'.", file=sys.stderr); sys.exit(1)
     print("\n"+"="*40); print("Post-processing results..."); print("="*40)
     all_raw_results = {'power': raw_results_power, 'sim_time': raw_results_runtime, 'avg_time': raw_results_avgtime}
-    scores_power, scores_runtime, scores_avgtime, total_scores = process_scores(all_raw_results, data_files, list(overall_summary.keys()))
+    with PROFILER.phase("scoring"): scores_power, scores_runtime, scores_avgtime, total_scores = process_scores(all_raw_results, data_files, list(overall_summary.keys()))
     plot_data_runtime = defaultdict(dict, {k: v.copy() for k, v in raw_results_runtime.items()})
     plot_data_power = defaultdict(dict, {k: v.copy() for k, v in raw_results_power.items()})
     plot_data_avgtime = defaultdict(dict, {k: v.copy() for k, v in raw_results_avgtime.items()})
@@ -922,6 +949,7 @@ def main():
              plot_total_score(plot_data_total_score, data_files_for_plotting); print("Plot generation attempt finished.")
         else: print("\nPlotting enabled, but matplotlib unavailable.")
     else: print("\nPlotting disabled.")
+    PROFILER.report(os.path.join(REPORT_DIR, PROFILE_SUMMARY_FILE), os.path.join(REPORT_DIR, PROFILE_TRACE_FILE))
     print("\n"+"="*40); print("Checker run finished.")
     print(f"- Detailed reports in: '{REPORT_DIR}'"); print(f"- Full logs in: '{LOG_DIR}'"); print(f"- Validated outputs in: '{OUT_DIR}'")
     if enable_plotting and MATPLOTLIB_AVAILABLE: print(f"- Plots saved in current directory.")
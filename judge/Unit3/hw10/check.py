@@ -7,7 +7,14 @@ import shutil
 import filecmp
 import signal
 import platform
-from itertools import zip_longest # <--- 新增导入
+import concurrent.futures
+from profiler import PROFILER
+from std_cache import STD_CACHE
+from time_limits import LIMITS, SLOW_STATUS, measured_time # 按标程 CPU 时间校准每个输入的时限
+from result_stream import RESULTS # 每个用例的结果写入 JSON-lines 结果流, 可断点续跑并生成 HTML 汇总
+from resource_usage import USAGE, AccountedPopen, reap, describe, gc_log_args, gc_log_path_for # 每次运行的 CPU / 峰值内存 / GC
+import oracle
+from output_compare import compare_output_files, copy_text_excerpt, output_digest, CompareResult # 流式逐行对比
 
 # --- 配置 (Configuration) ---
 STD_DIR = "std"
@@ -16,12 +23,18 @@ DATA_DIR = "data"
 OUT_DIR = "out"
 STDOUT_DIR = "stdout"
 LOG_DIR = "log"
-TIMEOUT_SECONDS = 10
+TIMEOUT_SECONDS = 10 # 测试 jar 时限; 有该输入的标程用时时由 time_limits.py 在此之下校准
 DATA_GENERATOR_SCRIPT = "data_generator.py"
 MAX_DIFF_LINES_TO_LOG = 10 # 最多记录 10 行不同的细节
+MAX_WORKERS = os.cpu_count() or 1 # 同时运行的 JVM 数; 超过核数会互相抢占 CPU, 容易误判 TLE
+STD_BACKEND = os.environ.get("JUDGE_STD", "jar") # 'oracle': 用 oracle.py (Python 参考实现) 代替 std/*.jar 生成标准输出
+                                                 # 'vote': 没有标程, 以测试 JAR 的多数输出为准
+VOTE_QUORUM = float(os.environ.get("JUDGE_VOTE_QUORUM", "0.5")) # 多数投票: 胜出的输出至少要占全部测试 JAR 的比例
+VOTE_REPORT = "vote_report.txt" # 多数投票: 各输入的分组与少数 JAR
 
 # --- 全局变量 (Global Variable) ---
 std_run_statuses = {} # 存储 std.jar 的运行状态 {input_basename: status}
+vote_summaries = {} # 多数投票: {input_basename: 报告中的行}
 
 # --- 辅助函数 (Helper Functions) ---
 
@@ -45,15 +58,19 @@ def clear_dir(dir_path):
 def run_jar(jar_path, input_path, output_path, timeout):
     """运行 JAR 文件，处理输入输出和超时。"""
     status = 'AC'; stderr_content = b''; start_time = time.time(); process = None
+    case_key = f"{os.path.basename(jar_path)}/{os.path.basename(input_path)}"; wait_start = None
+    gc_log_path = gc_log_path_for(output_path) # 仅 JUDGE_GC_LOG=1 时非 None
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         with open(input_path, 'r', encoding='utf-8') as infile, \
              open(output_path, 'wb') as outfile:
-            java_command = ['java', '-Xms128m', '-Xmx512m', '-jar', jar_path]
+            java_command = ['java', '-Xms128m', '-Xmx512m'] + gc_log_args(gc_log_path) + ['-jar', jar_path]
             preexec_fn_toset = None
             if platform.system() != "Windows": preexec_fn_toset = os.setsid
-            process = subprocess.Popen(java_command, stdin=infile, stdout=outfile, stderr=subprocess.PIPE, preexec_fn=preexec_fn_toset)
+            spawn_start = time.perf_counter()
+            process = AccountedPopen(java_command, stdin=infile, stdout=outfile, stderr=subprocess.PIPE, preexec_fn=preexec_fn_toset)
             try:
+                PROFILER.record("jvm_spawn", spawn_start, time.perf_counter() - spawn_start, case_key); wait_start = time.perf_counter()
                 _, stderr_content = process.communicate(timeout=timeout)
                 if stderr_content:
                     status = 'RE'
@@ -71,68 +88,60 @@ def run_jar(jar_path, input_path, output_path, timeout):
                         print(f"    终止 PID {process.pid} 失败: {kill_err}. 尝试 process.kill() 回退。")
                         try: process.kill()
                         except Exception: pass
+                    reap(process) # 回收被杀的 JVM, 以取得其资源用量
                 status = 'TLE'; stderr_content = b"--- PROCESS KILLED DUE TO TIMEOUT ---"
     except FileNotFoundError: print(f"错误: 未找到 'java' 命令。"); status = 'RE'; stderr_content = b"Java command not found."
     except Exception as e: print(f"运行 {jar_path} 时发生意外错误: {e}"); status = 'RE'; stderr_content = str(e).encode()
     if process and process.poll() is None and status == 'RE': # 确保在发生 RE 时也尝试清理进程
         try: process.kill(); process.wait(timeout=0.5)
         except Exception as kill_e: print(f"    意外错误后尝试终止进程时出错: {kill_e}")
-    end_time = time.time()
-    print(f"    完成: {os.path.basename(jar_path)} 在 {os.path.basename(input_path)} 上耗时 {end_time - start_time:.2f}s - 运行状态: {status}")
+    if wait_start is not None: PROFILER.record("process_wait", wait_start, time.perf_counter() - wait_start, case_key)
+    if os.path.exists(output_path): PROFILER.count("output_bytes", os.path.getsize(output_path))
+    end_time = time.time(); usage = USAGE.record(jar_path, input_path, status, end_time - start_time, process, gc_log_path)
+    print(f"    完成: {os.path.basename(jar_path)} 在 {os.path.basename(input_path)} 上耗时 {end_time - start_time:.2f}s - 运行状态: {status}{describe(usage)}")
     return status, b'', stderr_content
 
-def compare_outputs(std_ans_path, test_out_path):
-    """对比两个输出文件，忽略行首尾空白。"""
+def compare_outputs(std_ans_path, test_out_path, input_path=None):
+    """流式对比两个输出文件 (忽略行首尾空白), 返回 CompareResult: match 为是否一致, mismatches 为前 MAX_DIFF_LINES_TO_LOG 处差异及其对应的输入指令。"""
     try:
-        if not os.path.exists(std_ans_path): print(f"    对比错误: 未找到标准答案文件 ({std_ans_path})"); return False
-        if not os.path.exists(test_out_path): print(f"    对比错误: 未找到测试输出文件 ({test_out_path})"); return False
-        with open(std_ans_path, 'r', encoding='utf-8', errors='ignore') as f1, \
-             open(test_out_path, 'r', encoding='utf-8', errors='ignore') as f2:
-            lines1 = [line.strip() for line in f1]; lines2 = [line.strip() for line in f2]
-            while lines1 and not lines1[-1]: lines1.pop()
-            while lines2 and not lines2[-1]: lines2.pop()
-            return lines1 == lines2
-    except Exception as e: print(f"    对比文件 {std_ans_path} 和 {test_out_path} 时出错: {e}"); return False
+        if not os.path.exists(std_ans_path): print(f"    对比错误: 未找到标准答案文件 ({std_ans_path})"); return CompareResult(False, [], False)
+        if not os.path.exists(test_out_path): print(f"    对比错误: 未找到测试输出文件 ({test_out_path})"); return CompareResult(False, [], False)
+        return compare_output_files(std_ans_path, test_out_path, input_path, MAX_DIFF_LINES_TO_LOG) # 达到差异上限即停止, 大文件走 mmap
+    except Exception as e: print(f"    对比文件 {std_ans_path} 和 {test_out_path} 时出错: {e}"); return CompareResult(False, [], False)
+
+def write_file_section(logfile, title, path, missing_message, centers=()):
+    """把文件内容按块写入日志的 '--- 标题 ---' 与 '--- 标题结束 ---' 之间; 超大文件只摘录开头、结尾与 centers (差异所在行) 附近的行。"""
+    logfile.write(f"--- {title} ({os.path.basename(path)}) ---\n")
+    if os.path.exists(path):
+        try: copy_text_excerpt(path, logfile, centers)
+        except Exception as e: logfile.write(f"\n!!! 读取文件错误: {e} !!!\n")
+    else: logfile.write(missing_message)
+    logfile.write(f"\n--- {title}结束 ---\n")
 
 # ==============================================================
 #  核心修改：create_log_file 函数增加详细差异对比
 # ==============================================================
 def create_log_file(log_path, input_path, std_ans_path, test_out_path,
-                    std_status, test_status, test_stderr_content, final_status):
-    """为失败的测试用例创建日志文件，并在 WA 时追加详细差异。"""
+                    std_status, test_status, test_stderr_content, final_status, comparison=None):
+    """为失败的测试用例创建日志文件，并在 WA 时追加详细差异 (直接使用评测时的对比结果, 不再重新对比)。"""
     if final_status == 'AC (Skipped - Std TLE)':
          print(f"    跳过日志创建: {os.path.basename(input_path)} (因 Std TLE 被跳过).")
          return
 
     print(f"    检测到差异 ({final_status})! 创建日志: {log_path}")
     try:
+        if final_status == 'WA' and comparison is None: comparison = compare_outputs(std_ans_path, test_out_path, input_path)
+        mismatches = comparison.mismatches if comparison else [] # 超大文件按这些差异所在行摘录
+        input_centers, output_centers = [m.input_line for m in mismatches], [m.output_line for m in mismatches]
         with open(log_path, 'w', encoding='utf-8') as logfile:
             logfile.write(f"--- 测试用例失败: {final_status} ---\n")
             logfile.write(f"标准程序状态: {std_status}\n")
             if test_status: logfile.write(f"测试程序状态: {test_status}\n\n")
             else: logfile.write("测试程序状态: 未运行 (因 Std TLE 跳过)\n\n")
 
-            # --- 写入输入数据 ---
-            logfile.write(f"--- 输入数据 ({os.path.basename(input_path)}) ---\n")
-            input_lines_content = []
-            try:
-                with open(input_path, 'r', encoding='utf-8', errors='ignore') as f_in:
-                    input_lines_content = [line.rstrip('\r\n') for line in f_in]
-                    logfile.write('\n'.join(input_lines_content))
-            except Exception as e: logfile.write(f"\n!!! 读取输入文件错误: {e} !!!\n")
-            logfile.write("\n--- 输入数据结束 ---\n\n")
-
-            # --- 写入标准输出 ---
-            logfile.write(f"--- 标准输出 ({os.path.basename(std_ans_path)}) ---\n")
-            std_lines_content = []
-            if os.path.exists(std_ans_path):
-                try:
-                    with open(std_ans_path, 'r', encoding='utf-8', errors='ignore') as f_std:
-                        std_lines_content = [line.rstrip('\r\n') for line in f_std]
-                        logfile.write('\n'.join(std_lines_content))
-                except Exception as e: logfile.write(f"\n!!! 读取标准输出错误: {e} !!!\n")
-            else: logfile.write("!!! 未找到或为空的标准输出文件 !!!\n")
-            logfile.write("\n--- 标准输出结束 ---\n\n")
+            # --- 写入输入数据与标准输出 (按块拷贝, 不整体读入内存) ---
+            write_file_section(logfile, "输入数据", input_path, "!!! 未找到输入文件 !!!\n", input_centers); logfile.write("\n")
+            write_file_section(logfile, "标准输出", std_ans_path, "!!! 未找到或为空的标准输出文件 !!!\n", output_centers); logfile.write("\n")
 
             # --- 写入测试程序的 stderr (如果 RE/TLE) ---
             if test_status == 'RE' or test_status == 'TLE':
@@ -141,50 +150,185 @@ def create_log_file(log_path, input_path, std_ans_path, test_out_path,
                  logfile.write("\n--- 测试程序标准错误结束 ---\n\n")
 
             # --- 写入测试程序的 stdout ---
-            logfile.write(f"--- 测试程序输出 ({os.path.basename(test_out_path)}) ---\n")
-            test_lines_content = []
-            if os.path.exists(test_out_path):
-                 try:
-                      with open(test_out_path, 'r', encoding='utf-8', errors='ignore') as f_test:
-                           test_lines_content = [line.rstrip('\r\n') for line in f_test]
-                           logfile.write('\n'.join(test_lines_content))
-                 except Exception as e: logfile.write(f"\n!!! 读取测试输出错误: {e} !!!\n")
-            else: logfile.write("!!! 未找到或为空的测试输出文件 !!!\n")
-            logfile.write("\n--- 测试程序输出结束 ---\n")
-
-            # --- 新增：详细差异对比 (仅在 WA 时进行) ---
+            write_file_section(logfile, "测试程序输出", test_out_path, "!!! 未找到或为空的测试输出文件 !!!\n", output_centers)
+
+            # --- 详细差异对比 (仅在 WA 时进行) ---
             if final_status == 'WA':
                 logfile.write(f"\n\n--- 详细差异对比 (前 {MAX_DIFF_LINES_TO_LOG} 处不同) ---\n")
-                diff_count = 0
-                # 使用 zip_longest 处理不等长文件
-                for line_num, (input_line, std_line, test_line) in enumerate(
-                    zip_longest(input_lines_content, std_lines_content, test_lines_content, fillvalue="<文件结束>"), start=1):
-
-                    # 比较去除首尾空白后的内容
-                    std_line_stripped = std_line.strip() if std_line != "<文件结束>" else "<文件结束>"
-                    test_line_stripped = test_line.strip() if test_line != "<文件结束>" else "<文件结束>"
-
-                    if std_line_stripped != test_line_stripped:
-                        diff_count += 1
-                        logfile.write(f"\n[差异 #{diff_count} 在 第 {line_num} 行]\n")
-                        if input_line != "<文件结束>":
-                            logfile.write(f"  对应输入: {input_line}\n")
-                        else:
-                            logfile.write(f"  对应输入: <输入在此行前已结束>\n")
-                        logfile.write(f"  标准输出: {std_line}\n") # 显示原始行以便观察空白差异
-                        logfile.write(f"  测试输出: {test_line}\n")
-
-                        if diff_count >= MAX_DIFF_LINES_TO_LOG:
-                            logfile.write("\n--- (已达到最大差异记录数) ---\n")
-                            break
-                if diff_count == 0:
-                     logfile.write("\n--- 未检测到逐行差异 (可能由文件末尾空行或其他 compare_outputs 未捕获问题导致) ---\n")
+                for diff_count, mismatch in enumerate(comparison.mismatches, start=1):
+                    logfile.write(f"\n[差异 #{diff_count} 在 第 {mismatch.output_line} 行输出]\n")
+                    if mismatch.input_line is not None: logfile.write(f"  对应输入 (第 {mismatch.input_line} 行): {mismatch.input_command}\n")
+                    else: logfile.write(f"  对应输入: <输出行数已超过输入指令数>\n")
+                    logfile.write(f"  标准输出: {mismatch.std_line}\n") # 显示原始行以便观察空白差异
+                    logfile.write(f"  测试输出: {mismatch.test_line}\n")
+                if comparison.stopped_early: logfile.write("\n--- (已达到最大差异记录数) ---\n")
+                elif not comparison.mismatches:
+                     logfile.write("\n--- 未检测到逐行差异 (可能由文件缺失或读取错误导致) ---\n")
             # --- 详细差异对比结束 ---
 
     except Exception as e:
         print(f"    创建日志文件 {log_path} 时出错: {e}")
 
 
+def run_std_case(std_jar_path, input_path):
+    """运行标准 JAR 生成某个输入的标准输出, 记录并返回其状态。"""
+    input_basename = os.path.basename(input_path)
+    std_ans_path = os.path.join(STDOUT_DIR, os.path.splitext(input_basename)[0] + ".ans")
+    std_timeout = TIMEOUT_SECONDS * 3 # 给标程更长时间
+    cached = STD_CACHE.lookup(std_jar_path, input_path, std_ans_path, std_timeout) if std_jar_path else None
+    if std_jar_path is None: # JUDGE_STD=oracle
+        print(f"  运行参考实现 oracle.py 处理 {input_basename}...")
+        with PROFILER.phase("oracle_run", input_basename): std_status = oracle.run_file(input_path, std_ans_path)
+    elif cached:
+        std_status = cached[0]; print(f"  复用 {input_basename} 的缓存标准输出 - 运行状态: {std_status}")
+        if std_status == 'AC': LIMITS.record_std(input_basename, *((cached[2], 'cpu') if cached[2] is not None else (cached[1], 'wall'))) # 旧条目没有 CPU 时间
+    else:
+        print(f"  运行标准 JAR 处理 {input_basename}...")
+        run_start = time.perf_counter()
+        std_status, _, std_stderr = run_jar(std_jar_path, input_path, std_ans_path, timeout=std_timeout)
+        std_elapsed = time.perf_counter() - run_start
+        std_time, std_clock = measured_time(os.path.basename(std_jar_path), input_basename, std_elapsed)
+        STD_CACHE.store(std_jar_path, input_path, std_ans_path, std_status, std_elapsed, std_timeout, std_time if std_clock == 'cpu' else None)
+        if std_status == 'AC': LIMITS.record_std(input_basename, std_time, std_clock)
+    std_run_statuses[input_basename] = std_status
+    if std_status != 'AC' and not os.path.exists(std_ans_path):
+         try: open(std_ans_path, 'w').close(); print(f"    因状态为 {std_status} 创建了空的标准输出文件")
+         except Exception as e_create: print(f"    警告: 创建空输出文件 {std_ans_path} 失败: {e_create}")
+    if std_status == 'RE': print(f"    警告: 标准 JAR 在 {input_basename} 上报告了 RE。")
+    elif std_status == 'TLE': print(f"    警告: 标准 JAR 在 {input_basename} 上报告了 TLE。")
+    return std_status
+
+def case_paths(test_jar_path, input_path):
+    """某个测试 JAR 在某个输入上的 (输出路径, 日志路径)。"""
+    jar_name_no_ext = os.path.splitext(os.path.basename(test_jar_path))[0]; input_name_no_ext = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(OUT_DIR, f"{jar_name_no_ext}_{input_name_no_ext}.txt"), os.path.join(LOG_DIR, f"{jar_name_no_ext}_{input_name_no_ext}.log")
+
+def submit_when_done(executor, future, fn, *args):
+    """future 完成后再把 fn(*args) 提交到线程池, 返回其结果的 Future; 线程池中不会有线程阻塞等待 future (已完成则立即提交)。"""
+    result = concurrent.futures.Future()
+    def relay(inner):
+        if inner.cancelled(): result.cancel()
+        elif inner.exception() is not None: result.set_exception(inner.exception())
+        else: result.set_result(inner.result())
+    def launch(_):
+        try: executor.submit(fn, *args).add_done_callback(relay)
+        except RuntimeError as e: result.set_exception(e) # 线程池正在关闭
+    future.add_done_callback(launch)
+    return result
+
+def judge_case(test_jar_path, input_path, std_future):
+    """运行测试 JAR (与标程并行), 等该输入的标准输出就绪后立即对比, 返回最终状态。校准时限时标程结束后才提交 (submit_when_done)。"""
+    test_jar_name = os.path.basename(test_jar_path)
+    input_basename = os.path.basename(input_path); input_name_no_ext = os.path.splitext(input_basename)[0]
+    case_name = f"{test_jar_name}/{input_basename}"
+    test_out_path, log_path = case_paths(test_jar_path, input_path)
+    std_ans_basename = input_name_no_ext + ".ans"; std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
+
+    calibrated = LIMITS.enabled and STD_BACKEND == "jar" # 校准时限需要标程在该输入上的用时: 此时用例在标程结束后才提交, 下面的 std_future.result() 立即返回
+    test_status = test_wall = None; test_timeout = TIMEOUT_SECONDS
+    if not calibrated:
+        print(f"  测试 {case_name}"); test_run_start = time.perf_counter()
+        test_status, _, test_stderr_content = run_jar(test_jar_path, input_path, test_out_path, TIMEOUT_SECONDS)
+        test_wall = time.perf_counter() - test_run_start
+    try: std_future.result()
+    except Exception as e: print(f"    警告: 标准 JAR 处理 {input_basename} 时发生意外错误: {e}")
+    std_status = std_run_statuses.get(input_basename, 'Skipped (No Std Status)')
+
+    if std_status == 'TLE':
+        print(f"    {case_name}: 跳过, 因为 std.jar 超时。")
+        RESULTS.record(test_jar_path, input_path, std_status, test_status, 'AC (Skipped - Std TLE)', test_wall, test_timeout); return 'AC (Skipped - Std TLE)'
+    elif std_status == 'Skipped (No Std Status)':
+         print(f"    {case_name}: 跳过对比, 未找到标准状态。")
+         RESULTS.record(test_jar_path, input_path, None, test_status, std_status, test_wall, test_timeout); return std_status
+    if calibrated:
+        print(f"  测试 {case_name} ({LIMITS.describe_limit(input_basename, TIMEOUT_SECONDS)})"); test_run_start = time.perf_counter()
+        test_timeout = LIMITS.timeout_for(input_basename, TIMEOUT_SECONDS)
+        test_status, _, test_stderr_content = run_jar(test_jar_path, input_path, test_out_path, test_timeout)
+        test_wall = time.perf_counter() - test_run_start
+
+    final_status = 'Unknown'; comparison_needed = False; comparison = None
+    if std_status == test_status:
+        if std_status == 'AC': comparison_needed = True
+        else: final_status = 'AC'; print(f"    {case_name}: 行为一致 ({std_status})。接受。")
+    else:
+        if test_status == 'AC': final_status = 'WA'; print(f"    {case_name}: 状态不匹配, 测试 JAR 为 AC, 但标准 JAR 为 {std_status}。")
+        else: final_status = test_status; print(f"    {case_name}: 状态不匹配, 测试 JAR 为 {test_status}, 标准 JAR 为 {std_status}。")
+
+    if comparison_needed:
+         with PROFILER.phase("compare", case_name): comparison = compare_outputs(std_ans_path, test_out_path, input_path)
+         if comparison.match:
+             final_status = 'AC'
+             ratio = LIMITS.check_slow(test_jar_name, input_basename, *measured_time(test_jar_name, input_basename, test_wall))
+             if ratio is not None: final_status = SLOW_STATUS; print(f"    {case_name}: 输出正确但用时为标程的 {ratio:.1f} 倍, 标记为 {SLOW_STATUS}。")
+         else: final_status = 'WA'; print(f"    {case_name}: 输出与标准答案不同。")
+
+    if final_status not in ('AC', SLOW_STATUS, 'AC (Skipped - Std TLE)'):
+         with PROFILER.phase("log_write", case_name):
+             create_log_file(log_path, input_path, std_ans_path, test_out_path, std_status, test_status, test_stderr_content, final_status, comparison)
+    RESULTS.record(test_jar_path, input_path, std_status, test_status, final_status, test_wall, test_timeout, comparison)
+    return final_status
+
+def run_test_case(test_jar_path, input_path):
+    """多数投票模式: 只运行测试 JAR, 返回 (状态, stderr 内容)。"""
+    print(f"  测试 {os.path.basename(test_jar_path)}/{os.path.basename(input_path)}")
+    status, _, stderr_content = run_jar(test_jar_path, input_path, case_paths(test_jar_path, input_path)[0], TIMEOUT_SECONDS)
+    return status, stderr_content
+
+def describe_divergence(comparison):
+    """第一处不同的输出行及触发它的输入命令, 用于投票报告。"""
+    if comparison is None or not comparison.mismatches: return ""
+    mismatch = comparison.mismatches[0]
+    if mismatch.input_line is None: return f", 首个差异在输出第 {mismatch.output_line} 行 (已超出最后一条命令)"
+    return f", 首个差异在输出第 {mismatch.output_line} 行 (输入第 {mismatch.input_line} 行: {mismatch.input_command})"
+
+def vote_case(input_path, run_futures):
+    """
+    多数投票模式 (N 版本差分测试): 等某输入上所有测试 JAR 运行结束, 按输出内容分组 (RE 归为一组, TLE 不参与投票)。
+    最大的组若至少占全部 JAR 的 VOTE_QUORUM 且没有同样大的组, 就作为标准输出: 组内 JAR 为 AC, 其余按状态判 WA/RE/TLE
+    并以多数输出写日志; 否则全部跳过。返回 {test_jar_path: final_status}。
+    """
+    input_basename = os.path.basename(input_path); runs = {}
+    for test_jar_path, future in run_futures.items():
+        try: runs[test_jar_path] = future.result()
+        except Exception as e: print(f"    警告: {os.path.basename(test_jar_path)}/{input_basename} 运行时发生意外错误: {e}"); runs[test_jar_path] = ('RE', str(e).encode(errors='ignore'))
+    with PROFILER.phase("vote", input_basename):
+        groups = {} # {输出摘要 或 'RE': [test_jar_path]}
+        for test_jar_path, (status, _) in runs.items():
+            if status == 'AC': groups.setdefault(output_digest(case_paths(test_jar_path, input_path)[0]), []).append(test_jar_path)
+            elif status == 'RE': groups.setdefault('RE', []).append(test_jar_path)
+        ranked = sorted(groups.items(), key=lambda item: len(item[1]), reverse=True)
+        group_text = " | ".join(", ".join(os.path.basename(p) for p in jars) + (" (RE)" if key == 'RE' else "") for key, jars in ranked)
+        if not ranked or len(ranked[0][1]) < VOTE_QUORUM * len(runs) or (len(ranked) > 1 and len(ranked[1][1]) == len(ranked[0][1])):
+            print(f"    {input_basename}: 没有达到法定人数的多数输出, 跳过。")
+            vote_summaries[input_basename] = f"{input_basename}: 无多数 ({len(runs)} 个 JAR) - 分组: {group_text or '无'}"
+            for test_jar_path, (status, _) in runs.items(): RESULTS.record(test_jar_path, input_path, "vote", status, 'Skipped (No Quorum)', limit_s=TIMEOUT_SECONDS)
+            return {test_jar_path: 'Skipped (No Quorum)' for test_jar_path in runs}
+        winner, majority = ranked[0]; reference_out = case_paths(majority[0], input_path)[0]
+        majority_label = f"测试 JAR 多数输出 ({len(majority)}/{len(runs)}, 如 {os.path.basename(majority[0])})" + (" - RE" if winner == 'RE' else "")
+        results, minority_lines = {}, []
+        for test_jar_path, (status, stderr_content) in sorted(runs.items()):
+            if test_jar_path in majority:
+                results[test_jar_path] = 'AC'; RESULTS.record(test_jar_path, input_path, "vote", status, 'AC', limit_s=TIMEOUT_SECONDS); continue
+            test_out_path, log_path = case_paths(test_jar_path, input_path)
+            final_status = 'WA' if status == 'AC' else status
+            comparison = compare_outputs(reference_out, test_out_path, input_path)
+            print(f"    {os.path.basename(test_jar_path)}/{input_basename}: 与多数输出不一致。标记为 {final_status}。")
+            create_log_file(log_path, input_path, reference_out, test_out_path, majority_label, status, stderr_content, final_status, comparison)
+            minority_lines.append(f"    {os.path.basename(test_jar_path)}: {final_status}{describe_divergence(comparison)}")
+            results[test_jar_path] = final_status
+            RESULTS.record(test_jar_path, input_path, "vote", status, final_status, limit_s=TIMEOUT_SECONDS, comparison=comparison)
+    vote_summaries[input_basename] = "\n".join([f"{input_basename}: 多数 {len(majority)}/{len(runs)} - 分组: {group_text}"] + minority_lines)
+    return results
+
+def write_vote_report(report_path, overall_results):
+    """多数投票报告: 各输入的分组与少数 JAR, 以及每个 JAR 处于少数的次数。"""
+    minority_count = {name: sum(s in ('WA', 'RE', 'TLE') for s in results.values()) for name, results in overall_results.items()}
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(f"--- 多数投票报告 (quorum {VOTE_QUORUM:.0%}) ---\n\n")
+        for input_basename in sorted(vote_summaries): f.write(vote_summaries[input_basename] + "\n")
+        f.write("\n各 JAR 处于少数的次数:\n")
+        for name in sorted(minority_count, key=lambda n: -minority_count[n]): f.write(f"  - {name}: {minority_count[name]}/{len(overall_results[name])}\n")
+
 # --- 主脚本逻辑 (Main Script Logic) ---
 
 if __name__ == "__main__":
@@ -212,13 +356,17 @@ if __name__ == "__main__":
 
     # 查找标准 JAR
     std_jars = glob.glob(os.path.join(STD_DIR, "*.jar"))
-    if not std_jars: print(f"错误: 在 '{STD_DIR}' 中未找到标准 JAR 文件。"); sys.exit(1)
-    if len(std_jars) > 1: print(f"错误: 在 '{STD_DIR}' 中找到多个 JAR 文件。请确保只有一个标准 JAR。"); sys.exit(1)
-    std_jar_path = std_jars[0]; print(f"找到标准 JAR: {std_jar_path}")
+    if STD_BACKEND == "oracle": std_jar_path = None; print("使用参考实现 oracle.py 代替标准 JAR。")
+    elif STD_BACKEND == "vote": std_jar_path = None; print(f"多数投票模式: 不使用标准 JAR, 以测试 JAR 的多数输出为准 (quorum {VOTE_QUORUM:.0%})。")
+    else:
+        if not std_jars: print(f"错误: 在 '{STD_DIR}' 中未找到标准 JAR 文件。(没有可信的标准 JAR 时可设置 JUDGE_STD=vote 使用多数投票)"); sys.exit(1)
+        if len(std_jars) > 1: print(f"错误: 在 '{STD_DIR}' 中找到多个 JAR 文件。请确保只有一个标准 JAR。"); sys.exit(1)
+        std_jar_path = std_jars[0]; print(f"找到标准 JAR: {std_jar_path}")
 
     # 查找测试 JAR
     test_jar_paths = glob.glob(os.path.join(TESTJAR_DIR, "*.jar"))
     if not test_jar_paths: print(f"警告: 在 '{TESTJAR_DIR}' 中未找到测试 JAR 文件。")
+    if STD_BACKEND == "vote" and len(test_jar_paths) < 3: print("警告: 多数投票模式下测试 JAR 少于 3 个, 多数结果可能没有意义。")
 
     # 查找输入数据文件
     input_files = sorted(glob.glob(os.path.join(DATA_DIR, "*.txt")))
@@ -226,63 +374,48 @@ if __name__ == "__main__":
     print(f"找到 {len(input_files)} 个输入数据文件。"); print(f"找到 {len(test_jar_paths)} 个测试 JAR 文件。")
     print("--- 设置阶段结束 ---")
 
-    # 2. 生成标准输出并记录状态 (Generate Standard Outputs & Record Statuses)
-    print("\n--- 生成标准输出并记录状态 ---")
+    # 2. 标准 JAR 与测试 JAR 流水线并行运行 (Pipelined Std & Test Runs)
+    print(f"\n--- 生成标准输出并对比测试 (最多 {MAX_WORKERS} 个并行任务) ---")
     std_run_statuses.clear() # 确保字典是空的
-    for input_path in input_files:
-        input_basename = os.path.basename(input_path)
-        std_ans_basename = os.path.splitext(input_basename)[0] + ".ans"
-        std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
-        print(f"  运行标准 JAR 处理 {input_basename}...")
-        std_status, _, std_stderr = run_jar(std_jar_path, input_path, std_ans_path, timeout=TIMEOUT_SECONDS * 3) # 给标程更长时间
-        std_run_statuses[input_basename] = std_status
-        if std_status != 'AC' and not os.path.exists(std_ans_path):
-             try: open(std_ans_path, 'w').close(); print(f"    因状态为 {std_status} 创建了空的标准输出文件")
-             except Exception as e_create: print(f"    警告: 创建空输出文件 {std_ans_path} 失败: {e_create}")
-        if std_status == 'RE': print(f"    警告: 标准 JAR 在 {input_basename} 上报告了 RE。")
-        elif std_status == 'TLE': print(f"    警告: 标准 JAR 在 {input_basename} 上报告了 TLE。")
-    print("--- 标准输出生成与状态记录完成 ---")
-
-    # 3. 运行对比测试 (Run Comparison Testing)
-    print("\n--- 对比测试阶段 ---")
-    overall_results = {}
+    test_jar_paths.sort()
+    case_futures = {}; vote_futures = {}; vote_summaries.clear()
+    resumed_results = {} # JUDGE_RESUME=1: {(test_jar_path, input_path): 上次运行写入结果流的结论}
+    RESULTS.start(std_jar_path, STD_BACKEND, TIMEOUT_SECONDS)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # 按输入交错提交: 线程池按 FIFO 取任务, 某输入的标程任务总先于它的测试任务开始, 测试任务等待标程时不会占满线程池而死锁
+        # 校准时限时测试需要标程用时: 用例由标程完成的回调提交, 期间后续输入的标程任务继续占满线程池
+        calibrated = LIMITS.enabled and STD_BACKEND == "jar"
+        for input_path in input_files:
+            if STD_BACKEND == "vote": # 同理: 某输入的所有运行任务都先于等待它们的投票任务出队
+                run_futures = {test_jar_path: executor.submit(run_test_case, test_jar_path, input_path) for test_jar_path in test_jar_paths}
+                vote_futures[input_path] = executor.submit(vote_case, input_path, run_futures); continue
+            for test_jar_path in test_jar_paths:
+                record = RESULTS.reusable(test_jar_path, input_path)
+                if record: resumed_results[(test_jar_path, input_path)] = record["verdict"]
+            pending = [p for p in test_jar_paths if (p, input_path) not in resumed_results]
+            if test_jar_paths and not pending: continue # 所有 jar 在该输入上的结果都可复用, 标程也不必运行
+            std_future = executor.submit(run_std_case, std_jar_path, input_path)
+            for test_jar_path in pending:
+                if calibrated: case_futures[(test_jar_path, input_path)] = submit_when_done(executor, std_future, judge_case, test_jar_path, input_path, std_future)
+                else: case_futures[(test_jar_path, input_path)] = executor.submit(judge_case, test_jar_path, input_path, std_future)
+        concurrent.futures.wait(case_futures.values()) # 回调提交必须在线程池关闭 (with 块结束) 之前完成
+    RESULTS.close()
+    print("--- 标准输出生成与对比测试完成 ---")
+    if resumed_results: print(f"复用了 {RESULTS.path} 中上次运行的 {len(resumed_results)} 个用例结果 (JUDGE_RESUME=1)。")
     if not test_jar_paths: print("未找到测试 JAR，退出对比测试。"); sys.exit(0)
 
+    # 3. 按固定顺序汇总结果 (Collect Results in Deterministic Order)
+    overall_results = {}
     for test_jar_path in test_jar_paths:
-        test_jar_name = os.path.basename(test_jar_path)
-        print(f"\n--- 测试 JAR: {test_jar_name} ---")
-        jar_results = {}; overall_results[test_jar_name] = jar_results
+        jar_results = {}; overall_results[os.path.basename(test_jar_path)] = jar_results
         for input_path in input_files:
-            input_basename = os.path.basename(input_path); input_name_no_ext = os.path.splitext(input_basename)[0]
-            print(f"  测试输入: {input_basename}")
-            test_out_filename = f"{os.path.splitext(test_jar_name)[0]}_{input_name_no_ext}.txt"; test_out_path = os.path.join(OUT_DIR, test_out_filename)
-            log_filename = f"{os.path.splitext(test_jar_name)[0]}_{input_name_no_ext}.log"; log_path = os.path.join(LOG_DIR, log_filename)
-            std_ans_basename = input_name_no_ext + ".ans"; std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
-            std_status = std_run_statuses.get(input_basename, 'Skipped (No Std Status)')
-
-            if std_status == 'TLE':
-                print(f"    跳过输入 {input_basename} 因为 std.jar 超时。")
-                final_status = 'AC (Skipped - Std TLE)'; jar_results[input_basename] = final_status; continue
-            elif std_status == 'Skipped (No Std Status)':
-                 print(f"    跳过对比: 未找到 '{input_basename}' 的标准状态。"); jar_results[input_basename] = std_status; continue
-
-            test_status, _, test_stderr_content = run_jar(test_jar_path, input_path, test_out_path, TIMEOUT_SECONDS)
-
-            final_status = 'Unknown'; comparison_needed = False
-            if std_status == test_status:
-                if std_status == 'AC': comparison_needed = True
-                else: final_status = 'AC'; print(f"    行为一致 ({std_status})。接受。")
-            else:
-                if test_status == 'AC': final_status = 'WA'; print(f"    状态不匹配: 测试 JAR 为 AC, 但标准 JAR 为 {std_status}。")
-                else: final_status = test_status; print(f"    状态不匹配: 测试 JAR 为 {test_status}, 标准 JAR 为 {std_status}。")
-
-            if comparison_needed:
-                 if compare_outputs(std_ans_path, test_out_path): final_status = 'AC'
-                 else: final_status = 'WA'; print(f"    输出与标准答案不同。")
-
-            jar_results[input_basename] = final_status
-            if final_status != 'AC' and final_status != 'AC (Skipped - Std TLE)':
-                 create_log_file(log_path, input_path, std_ans_path, test_out_path, std_status, test_status, test_stderr_content, final_status)
+            input_basename = os.path.basename(input_path)
+            try:
+                if (test_jar_path, input_path) in resumed_results: jar_results[input_basename] = resumed_results[(test_jar_path, input_path)]
+                else: jar_results[input_basename] = vote_futures[input_path].result()[test_jar_path] if STD_BACKEND == "vote" else case_futures[(test_jar_path, input_path)].result()
+            except Exception as e:
+                print(f"  错误: {os.path.basename(test_jar_path)}/{input_basename} 评测时发生意外错误: {e}")
+                jar_results[input_basename] = f"Skipped (Internal Error: {e})"
 
     # 4. 生成报告 (Generate Reports)
     print("\n--- 生成报告 ---")
@@ -290,18 +423,20 @@ if __name__ == "__main__":
         report_filename = f"{os.path.splitext(test_jar_name)[0]}_report.txt"
         report_path = os.path.join(os.path.dirname(sys.argv[0]) or '.', report_filename)
         print(f"  生成报告: {report_path}")
-        total_cases = len(results); counts = {'AC': 0, 'WA': 0, 'TLE': 0, 'RE': 0, 'AC (Skipped - Std TLE)': 0}; other_skipped_count = 0
+        total_cases = len(results); counts = {'AC': 0, SLOW_STATUS: 0, 'WA': 0, 'TLE': 0, 'RE': 0, 'AC (Skipped - Std TLE)': 0}; other_skipped_count = 0
         failed_or_skipped_cases = []
         for input_name, status in results.items():
             if status in counts: counts[status] = counts.get(status, 0) + 1
             else: other_skipped_count += 1; status = status # 保留原始状态字符串
-            if status != 'AC': failed_or_skipped_cases.append((input_name, status))
+            if status == 'TLE': failed_or_skipped_cases.append((input_name, f"TLE, {LIMITS.describe_limit(input_name, TIMEOUT_SECONDS)}"))
+            elif status not in ('AC', SLOW_STATUS): failed_or_skipped_cases.append((input_name, status)) # 偏慢的用例单独列出
         failed_or_skipped_cases.sort()
         try:
-            with open(report_path, 'w', encoding='utf-8') as f:
+            with PROFILER.phase("report_write"), open(report_path, 'w', encoding='utf-8') as f:
                 f.write(f"--- {test_jar_name} 测试报告 ---\n\n"); f.write(f"总测试用例数: {total_cases}\n"); f.write("结果汇总:\n")
                 plain_ac_count=counts.get('AC', 0); skipped_tle_count=counts.get('AC (Skipped - Std TLE)', 0); wa_count=counts.get('WA', 0); tle_count=counts.get('TLE', 0); re_count=counts.get('RE', 0)
                 if plain_ac_count > 0: f.write(f"  - AC (通过): {plain_ac_count}\n")
+                if counts[SLOW_STATUS] > 0: f.write(f"  - AC (通过但偏慢): {counts[SLOW_STATUS]}\n")
                 if wa_count > 0: f.write(f"  - WA (答案错误): {wa_count}\n")
                 if tle_count > 0: f.write(f"  - TLE (超时): {tle_count}\n")
                 if re_count > 0: f.write(f"  - RE (运行时错误): {re_count}\n")
@@ -312,5 +447,19 @@ if __name__ == "__main__":
                     for name, status in failed_or_skipped_cases: f.write(f"  - {name}: {status}\n")
                 elif skipped_tle_count == 0 and other_skipped_count == 0: f.write("\n所有测试用例通过!\n")
                 else: f.write("\n所有运行的测试用例通过 (部分用例因标程TLE跳过)。\n")
+                slow_lines = LIMITS.slow_lines(test_jar_name)
+                if slow_lines: f.write("\n" + "\n".join(slow_lines) + "\n")
+                usage_lines = USAGE.jar_lines(test_jar_name) # 该 jar 的 CPU / 内存, 通过但资源消耗过大的提交也能看出来
+                if usage_lines: f.write("\n" + "\n".join(usage_lines) + "\n")
         except Exception as e: print(f"  写入报告 {report_path} 时出错: {e}")
+    if STD_BACKEND == "vote":
+        vote_report_path = os.path.join(os.path.dirname(sys.argv[0]) or '.', VOTE_REPORT); print(f"  生成多数投票报告: {vote_report_path}")
+        try: write_vote_report(vote_report_path, overall_results)
+        except Exception as e: print(f"  写入报告 {vote_report_path} 时出错: {e}")
+    print(STD_CACHE.summary())
+    print(LIMITS.summary(TIMEOUT_SECONDS))
+    summary_path = RESULTS.write_summary()
+    if summary_path: print(f"结果流: {RESULTS.path}, 汇总: {summary_path} (python result_stream.py 可合并多个结果流重新生成)")
+    USAGE.report()
+    PROFILER.report()
     print("\n--- 对比测试完成 ---")
\ No newline at end of file
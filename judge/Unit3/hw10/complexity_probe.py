@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+# Complexity-scaling probe for student jars. For every query family it generates inputs of geometrically increasing
+# size that stress that query, times the jar on each, fits (time - JVM baseline) ~ a * N^b on a log-log scale and
+# reports the empirical exponent b plus the projected time at the public / mutual instruction limits.
+# Usage: python complexity_probe.py [jar_files...] [--families qts,qba,...] [--points K] [--max N] [--repeat R] [--seed S]
+#   Without jar files: every jar in testjar/. Families whose commands this homework does not have are skipped.
+import os
+import sys
+import glob
+import math
+import time
+import random
+from check import run_jar, TIMEOUT_SECONDS, TESTJAR_DIR
+from data_generator import COMMANDS, MAX_INSTRUCTIONS, MODE_PUBLIC, MODE_MUTUAL
+
+# --- 配置 ---
+PROBE_DIR = "probe"            # 生成的探测数据与输出
+DEFAULT_POINTS = 5             # 规模个数, 相邻规模相差一倍
+DEFAULT_REPEAT = 2             # 每个规模运行次数, 取最快的一次
+NOISE_FLOOR = 0.05             # 扣除 JVM 启动时间后低于该秒数的点视为噪声, 不参与拟合
+EXPONENT_WARN = 1.5            # 指数超过该值即标记为风险
+PROJECTION_WARN = 0.5          # 公测规模下的预计用时超过 TIMEOUT_SECONDS 的该比例即标记为风险
+TAG_MEMBER_LIMIT = 999         # 标签最多 999 人 (JML)
+# --- End 配置 ---
+
+
+def pop_option(args, name, default):
+    if name in args:
+        i = args.index(name); value = args[i + 1]; del args[i:i + 2]; return value
+    return default
+
+
+def add_persons(lines, count):
+    lines.extend(f"ap {pid} p{pid} {(pid * 37) % 100 + 1}" for pid in range(1, count + 1))
+
+
+def new_edge(rng, persons, edges):
+    """A random pair that is not linked yet (None if the graph is almost complete)."""
+    for _ in range(32):
+        a, b = rng.randint(1, persons), rng.randint(1, persons)
+        if a != b and (min(a, b), max(a, b)) not in edges:
+            edges.add((min(a, b), max(a, b))); return a, b
+    return None
+
+
+def build_qts(n, rng):
+    """Near-complete graph on sqrt(2n) persons; the second half alternates a new edge with qts,
+    so a triangle count recomputed after every change costs O(P^3) per query."""
+    persons = max(4, math.isqrt(2 * n))
+    pairs = [(a, b) for a in range(1, persons + 1) for b in range(1, a)]
+    rng.shuffle(pairs)
+    lines = []; add_persons(lines, persons)
+    while len(lines) < n // 2 and pairs:
+        a, b = pairs.pop(); lines.append(f"ar {a} {b} {rng.randint(1, 100)}")
+    while len(lines) < n:
+        if pairs: a, b = pairs.pop(); lines.append(f"ar {a} {b} {rng.randint(1, 100)}")
+        lines.append("qts")
+    return lines[:n]
+
+
+def build_chain(n, rng, query):
+    """A path over n/4 persons, then query between random pairs with a new chord every 8 queries (qci, qsp)."""
+    persons = max(4, n // 4)
+    lines = []; add_persons(lines, persons)
+    edges = set()
+    for pid in range(1, persons):
+        edges.add((pid, pid + 1)); lines.append(f"ar {pid} {pid + 1} {rng.randint(1, 100)}")
+    count = 0
+    while len(lines) < n:
+        count += 1
+        if count % 8 == 0:
+            edge = new_edge(rng, persons, edges)
+            if edge: lines.append(f"ar {edge[0]} {edge[1]} {rng.randint(1, 100)}")
+        lines.append(f"{query} {rng.randint(1, persons)} {rng.randint(1, persons)}")
+    return lines[:n]
+
+
+def build_qba(n, rng):
+    """A star around person 1; the query phase raises one spoke and asks qba 1, so a scan is O(degree)."""
+    persons = max(4, n // 4)
+    lines = []; add_persons(lines, persons)
+    lines.extend(f"ar 1 {pid} {rng.randint(1, 100)}" for pid in range(2, persons + 1))
+    while len(lines) < n:
+        lines.append(f"mr 1 {rng.randint(2, persons)} {rng.randint(1, 50)}"); lines.append("qba 1")
+    return lines[:n]
+
+
+def build_qtvs(n, rng):
+    """One tag of person 1 holding up to 999 linked members (a path among them); the query phase changes
+    one member-member value and asks qtvs, so summing over member pairs is O(members^2) per query."""
+    members = max(4, min(n // 5, TAG_MEMBER_LIMIT))
+    lines = []; add_persons(lines, members + 1)
+    lines.extend(f"ar 1 {pid} {rng.randint(1, 100)}" for pid in range(2, members + 2))
+    lines.extend(f"ar {pid} {pid + 1} {rng.randint(1, 100)}" for pid in range(2, members + 1))
+    lines.append("at 1 1")
+    lines.extend(f"att {pid} 1 1" for pid in range(2, members + 2))
+    while len(lines) < n:
+        pid = rng.randint(2, members); lines.append(f"mr {pid} {pid + 1} 1"); lines.append("qtvs 1 1")
+    return lines[:n]
+
+
+def build_qbc(n, rng):
+    """Account 1 with n/4 followers; the query phase alternates a contribution and qbc 1."""
+    persons = max(4, n // 4)
+    lines = []; add_persons(lines, persons)
+    lines.append("coa 1 1 acc1")
+    lines.extend(f"foa {pid} 1" for pid in range(2, persons + 1))
+    article = 0
+    while len(lines) < n:
+        article += 1
+        lines.append(f"ca {rng.randint(1, persons)} 1 {article} art{article}"); lines.append("qbc 1")
+    return lines[:n]
+
+
+def build_messages(n, rng, query):
+    """A path over n/8 persons; each round adds and sends a red envelope between neighbours and queries
+    the receiver (qsv, qm), so anything recomputed from the message history grows with the input."""
+    persons = max(4, n // 8)
+    lines = []; add_persons(lines, persons)
+    lines.extend(f"ar {pid} {pid + 1} {rng.randint(1, 100)}" for pid in range(1, persons))
+    message = 0
+    while len(lines) < n:
+        message += 1
+        a = rng.randint(1, persons - 1)
+        lines.append(f"arem {message} {rng.randint(1, 200)} 0 {a} {a + 1}"); lines.append(f"sm {message}")
+        lines.append(f"{query} {a + 1}")
+    return lines[:n]
+
+
+# family -> (builder, commands the input uses)
+FAMILIES = {
+    "qts": (build_qts, ["ap", "ar", "qts"]),
+    "qci": (lambda n, rng: build_chain(n, rng, "qci"), ["ap", "ar", "qci"]),
+    "qba": (build_qba, ["ap", "ar", "mr", "qba"]),
+    "qsp": (lambda n, rng: build_chain(n, rng, "qsp"), ["ap", "ar", "qsp"]),
+    "qtvs": (build_qtvs, ["ap", "ar", "mr", "at", "att", "qtvs"]),
+    "qbc": (build_qbc, ["ap", "coa", "foa", "ca", "qbc"]),
+    "qsv": (lambda n, rng: build_messages(n, rng, "qsv"), ["ap", "ar", "arem", "sm", "qsv"]),
+    "qm": (lambda n, rng: build_messages(n, rng, "qm"), ["ap", "ar", "arem", "sm", "qm"]),
+}
+
+
+def write_input(name, lines):
+    path = os.path.join(PROBE_DIR, f"{name}.txt")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def time_jar(jar_path, input_path, repeat):
+    """Returns (status, best wall time in seconds); stops repeating once a run is not AC."""
+    out_path = os.path.join(PROBE_DIR, "out", f"{os.path.splitext(os.path.basename(jar_path))[0]}_{os.path.basename(input_path)}")
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        status, _, _ = run_jar(jar_path, input_path, out_path, timeout=TIMEOUT_SECONDS)
+        elapsed = time.perf_counter() - start
+        if status != 'AC': return status, elapsed
+        best = elapsed if best is None else min(best, elapsed)
+    return 'AC', best
+
+
+def fit_power_law(points):
+    """Least squares of log(t) = log(a) + b * log(N); returns (a, b) or None with fewer than two points."""
+    if len(points) < 2: return None
+    xs = [math.log(n) for n, _ in points]; ys = [math.log(t) for _, t in points]
+    mean_x = sum(xs) / len(xs); mean_y = sum(ys) / len(ys)
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0: return None
+    b = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+    return math.exp(mean_y - b * mean_x), b
+
+
+def probe_family(jar_path, family, sizes, baseline, repeat, seed):
+    builder = FAMILIES[family][0]
+    print(f"  -- {family}")
+    measured, fit_points, timed_out = [], [], False
+    for n in sizes:
+        input_path = write_input(f"{family}_{n}", builder(n, random.Random(seed + n)))
+        status, elapsed = time_jar(jar_path, input_path, repeat)
+        measured.append((n, status, elapsed))
+        print(f"     N={n:<6} {status:<3} {elapsed:7.3f}s (net {max(elapsed - baseline, 0):.3f}s)")
+        if status == 'TLE': timed_out = True; break  # larger sizes would only time out as well
+        if status == 'AC' and elapsed - baseline >= NOISE_FLOOR: fit_points.append((n, elapsed - baseline))
+    fit = fit_power_law(fit_points)
+    projections = {}
+    for mode in (MODE_PUBLIC, MODE_MUTUAL):
+        limit = MAX_INSTRUCTIONS[mode]
+        if timed_out and limit >= measured[-1][0]: projections[mode] = None  # >= timeout
+        elif fit: projections[mode] = baseline + fit[0] * limit ** fit[1]
+        else: projections[mode] = max((t for n, s, t in measured if s == 'AC' and n <= limit), default=baseline)
+    exponent = fit[1] if fit else None
+    public = projections[MODE_PUBLIC]
+    risk = timed_out or public is None or public > TIMEOUT_SECONDS * PROJECTION_WARN or \
+        (exponent is not None and exponent > EXPONENT_WARN)
+    return {"family": family, "exponent": exponent, "projections": projections, "risk": risk,
+            "errors": [f"N={n}: {s}" for n, s, _ in measured if s not in ('AC', 'TLE')]}
+
+
+def format_projection(value):
+    return f">={TIMEOUT_SECONDS}s (TLE)" if value is None else f"{value:.2f}s"
+
+
+def main():
+    args = sys.argv[1:]
+    points = max(2, int(pop_option(args, "--points", DEFAULT_POINTS)))
+    max_n = int(pop_option(args, "--max", MAX_INSTRUCTIONS[MODE_PUBLIC]))
+    repeat = max(1, int(pop_option(args, "--repeat", DEFAULT_REPEAT)))
+    seed = int(pop_option(args, "--seed", 0))
+    wanted = pop_option(args, "--families", ",".join(FAMILIES)).split(",")
+    unknown = [f for f in wanted if f not in FAMILIES]
+    if unknown: print(f"Unknown families: {', '.join(unknown)} (known: {', '.join(FAMILIES)})"); sys.exit(1)
+    families = [f for f in wanted if all(cmd in COMMANDS for cmd in FAMILIES[f][1])]
+    skipped = [f for f in wanted if f not in families]
+    if skipped: print(f"Skipping families not in this homework: {', '.join(skipped)}")
+    jar_paths = args or sorted(glob.glob(os.path.join(TESTJAR_DIR, "*.jar")))
+    if not jar_paths: print(f"No jar files given and none found in '{TESTJAR_DIR}'."); sys.exit(1)
+    os.makedirs(os.path.join(PROBE_DIR, "out"), exist_ok=True)
+    sizes = sorted({max(16, max_n >> k) for k in range(points)})
+    baseline_input = write_input("baseline", ["ap 1 p1 1"])
+
+    risky, constant = [], False
+    for jar_path in jar_paths:
+        jar_name = os.path.basename(jar_path)
+        print(f"\n== {jar_name}: sizes {sizes}")
+        status, baseline = time_jar(jar_path, baseline_input, repeat)
+        if status != 'AC': print(f"  baseline run failed ({status}), skipping jar"); risky.append(jar_name); continue
+        print(f"  JVM baseline: {baseline:.3f}s")
+        results = [probe_family(jar_path, family, sizes, baseline, repeat, seed) for family in families]
+        print(f"\n  {'family':<6} {'exponent':>8}  {'public N=' + str(MAX_INSTRUCTIONS[MODE_PUBLIC]):>16}  {'mutual N=' + str(MAX_INSTRUCTIONS[MODE_MUTUAL]):>16}")
+        for r in results:
+            exponent = f"{r['exponent']:.2f}" if r['exponent'] is not None else "n/a"
+            constant = constant or r['exponent'] is None
+            line = f"  {r['family']:<6} {exponent:>8}  {format_projection(r['projections'][MODE_PUBLIC]):>16}  {format_projection(r['projections'][MODE_MUTUAL]):>16}"
+            if r['risk']: line += "  RISK"
+            if r['errors']: line += f"  ({'; '.join(r['errors'])})"
+            print(line)
+            if r['risk']: risky.append(f"{jar_name}:{r['family']}")
+    if constant: print("\nexponent n/a: the jar stayed within NOISE_FLOOR of the JVM baseline at every size (effectively constant).")
+    if risky: print(f"\nRISK: {', '.join(risky)}")
+    sys.exit(1 if risky else 0)
+
+
+if __name__ == "__main__":
+    main()
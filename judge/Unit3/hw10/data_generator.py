@@ -3,6 +3,14 @@ import os
 import string
 import sys
 import time # 引入 time 模块
+import json
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import topology
+import outcome_coverage
+from output_compare import build_line_index
+from outcome_coverage import COVERAGE
 
 # --- 配置常量 (Configuration Constants) ---
 MODE_PUBLIC = 's'
@@ -39,12 +47,26 @@ EXCEPTION_TARGET_COMMANDS = [
     "coa", "doa", "ca", "da", "foa"
 ]
 STATE_BUILDING_COMMANDS = ["ap", "coa", "ar", "ln"] # ln 也是状态建立
+# 缺少的前置状态 (见 blocking_reason) -> 能补上该状态的指令
+REASON_BUILDERS = {
+    "no persons": "ap", "fewer than 2 persons": "ap", "few persons": "ap", "graph complete": "ap", "no relations": "ar", "sparse graph": "ar",
+    "no tags": "at", "no tag members": "att", "no accounts": "coa", "no articles": "ca",
+}
+
+# --- 批量生成 (Batch Generation) ---
+DEFAULT_WORKERS = os.cpu_count() or 1 # 并行生成数据的进程数, 每个进程有自己的一份状态变量
+MANIFEST_PATH = os.path.join("data", "manifest.json") # 记录每个文件的种子, 用于逐字节复现
+MAX_FAILURES_SHOWN = 5 # 每个文件报告的最常见生成失败原因个数
 
 # --- 状态变量 (State Variables) ---
 persons = set(); person_details = {}; relations = set(); relation_values = {}
 person_tags = {}; tag_members = {}; official_accounts = set(); account_details = {}
 followers = {}; articles = set(); article_details = {}; account_articles = {}
 contributions = {}
+worst_case_topology = None # 当前最坏情况文件的 topology.Topology, 输出 ln 之前为 None
+command_histogram = Counter() # 当前文件各指令条数 (ln 块只计一次)
+failure_reasons = Counter() # 当前文件 (指令, 原因) -> 生成失败次数
+recent_failures = Counter() # 本轮 (一次策略调用) 内的失败原因, 供 strategy_build_state 选择补什么状态
 
 # --- 运行时变量 (Runtime variables) ---
 instructions_generated_total = 0
@@ -80,8 +102,7 @@ def get_random_existing_person():
     return random.choice(tuple(persons))
 def get_two_random_existing_persons():
     if len(persons)<2: return None, None
-    try: return random.sample(persons,2)
-    except: return None, None
+    return random.sample(tuple(persons),2) # 3.11 起 random.sample 不再接受 set, 之前这里总是返回 (None, None)
 def get_random_tag_for_person(person_id):
     tags_set=person_tags.get(person_id)
     if not tags_set: return None
@@ -208,17 +229,14 @@ def _try_generate_command_params(command):
                 del_tag_state(p_id, t_id)
     # --- Add Person To Tag ---
     elif command == "att":
-        # Need p1, p2, t_id, link(p1,p2), p2 has t_id, p1 not in tag
-        p2 = get_random_existing_person()
-        if p2 is not None:
+        # Need p1, p2, t_id, link(p1,p2), p2 has t_id, p1 not in tag; 从已有关系出发, 随机两人几乎不可能相连
+        if relations:
+            p1, p2 = random.choice(tuple(relations))
+            if random.random() < 0.5: p1, p2 = p2, p1
             t_id = get_random_tag_for_person(p2)
-            if t_id is not None:
-                p1 = get_random_existing_person()
-                if p1 is not None and p1 != p2:
-                    key = (min(p1, p2), max(p1, p2))
-                    if key in relations and p1 not in tag_members.get((p2, t_id), set()):
-                        generated.append(f"att {p1} {p2} {t_id}")
-                        add_to_tag_state(p1, p2, t_id)
+            if t_id is not None and p1 not in tag_members.get((p2, t_id), set()):
+                generated.append(f"att {p1} {p2} {t_id}")
+                add_to_tag_state(p1, p2, t_id)
     # --- Delete Person From Tag ---
     elif command == "dft":
         # Need p2 has t_id, p1 in tag
@@ -336,6 +354,23 @@ def _try_generate_command_params(command):
 
     return generated
 
+def blocking_reason(command):
+    """按 _try_generate_command_params 的前置条件返回指令在当前状态下缺少什么, 不缺则返回 None。
+    图查询 / foa 在人数不到上限一半、图查询在关系数不到人数两倍时虽然能生成, 但测不出性能, 也算缺少状态"""
+    if command == "ap": return "person limit" if len(persons) >= max_p else None
+    if command == "ln": return "ln not first"
+    if not persons: return "no persons"
+    if command in ("ar", "qci", "qsp") and len(persons) < 2: return "fewer than 2 persons"
+    if command == "ar": return "graph complete" if len(relations) >= len(persons) * (len(persons) - 1) // 2 else None
+    if command in ("mr", "att") and not relations: return "no relations"
+    if command in ("qts", "qcs", "qci", "qsp", "foa") and len(persons) < max_p // 2: return "few persons"
+    if command in ("qts", "qcs", "qci", "qsp") and len(relations) < 2 * len(persons): return "sparse graph"
+    if command in ("dt", "att", "dft", "qtav", "qtvs") and not tag_members: return "no tags"
+    if command == "dft" and not any(tag_members.values()): return "no tag members"
+    if command in ("doa", "ca", "foa", "qbc") and not official_accounts: return "no accounts"
+    if command == "da" and not articles: return "no articles"
+    return None
+
 # --- 健壮的随机策略 (Robust Random Strategy) ---
 def strategy_random(commands_list):
     """策略：持续随机选择并尝试生成指令，直到成功一个或达到尝试上限。"""
@@ -348,6 +383,8 @@ def strategy_random(commands_list):
         generated_lines = _try_generate_command_params(command)
         if generated_lines:
             return generated_lines # 成功则返回
+        reason = blocking_reason(command) or "unlucky pick" # 状态满足, 只是本次随机选中的对象不合适
+        failure_reasons[(command, reason)] += 1; recent_failures[reason] += 1
         tries += 1
 
     # 尝试次数耗尽仍失败
@@ -355,23 +392,28 @@ def strategy_random(commands_list):
     return []
 
 # --- 其他策略 (Other Strategies) ---
-def strategy_query_heavy(commands_list):
-    """策略：优先尝试生成查询指令。"""
-    preferred_cmds = [cmd for cmd in PERF_QUERY_COMMANDS if cmd in commands_list]
+def _focus(preferred_cmds, commands_list):
+    """优先生成 preferred_cmds 中的指令; 其中缺少前置状态的越多, 越倾向于先生成补状态的指令。"""
     if preferred_cmds:
+        missing = Counter(reason for reason in map(blocking_reason, preferred_cmds) if reason in REASON_BUILDERS)
+        if missing and random.random() < sum(missing.values()) / len(preferred_cmds):
+            result = strategy_build_state(commands_list, missing)
+            if result: return result
         # 尝试生成优先指令，如果失败则 strategy_random 返回空
         result = strategy_random(preferred_cmds) # 调用健壮版 random
         if result: return result
+        result = strategy_build_state(commands_list) # 优先指令全部无法生成时先补状态
+        if result: return result
     # 如果优先指令失败或没有优先指令，进行全局随机尝试
     return strategy_random(commands_list) # 调用健壮版 random
 
+def strategy_query_heavy(commands_list):
+    """策略：优先尝试生成查询指令。"""
+    return _focus([cmd for cmd in PERF_QUERY_COMMANDS if cmd in commands_list], commands_list)
+
 def strategy_account_focus(commands_list):
     """策略：优先尝试生成账号和文章相关指令。"""
-    preferred_cmds = [cmd for cmd in ACCOUNT_ARTICLE_COMMANDS if cmd in commands_list]
-    if preferred_cmds:
-        result = strategy_random(preferred_cmds) # 调用健壮版 random
-        if result: return result
-    return strategy_random(commands_list) # 调用健壮版 random
+    return _focus([cmd for cmd in ACCOUNT_ARTICLE_COMMANDS if cmd in commands_list], commands_list)
 
 def strategy_exception_focus(commands_list):
     """策略：尝试生成一个可能导致异常的指令，如果失败则回退到随机。"""
@@ -441,28 +483,70 @@ def strategy_exception_focus(commands_list):
         return strategy_random(commands_list) # 回退到健壮的随机
     return generated # 返回成功生成的异常指令
 
+def strategy_coverage_guided(commands_list):
+    """策略：根据 oracle 的输出反馈 (outcome_coverage.py), 优先生成以往结果 (异常类型与计数、零 / 负 / 大的查询结果) 出现最少的合法指令或违反 JML 的指令。"""
+    return COVERAGE.next_lines(commands_list, _try_generate_command_params, random) or strategy_random(commands_list)
+
 def strategy_tag_focus(commands_list):
     """策略：优先尝试生成标签相关指令。"""
-    preferred_cmds = [cmd for cmd in TAG_COMMANDS if cmd in commands_list]
-    if preferred_cmds:
-        result = strategy_random(preferred_cmds) # 调用健壮版 random
-        if result: return result
-    return strategy_random(commands_list) # 调用健壮版 random
+    return _focus([cmd for cmd in TAG_COMMANDS if cmd in commands_list], commands_list)
 
 def strategy_load_network(commands_list):
-     """策略：尝试生成 ln 指令（仅在开头）。"""
+     """策略：开头生成 ln 指令，之后与 random 相同。"""
      global current_file_instruction_count
      if current_file_instruction_count == 0 and 'ln' in commands_list:
          return _try_generate_command_params('ln')
      else:
-         return [] # 非开头则此策略无效
+         return strategy_random([c for c in commands_list if c != 'ln']) # 之前此处返回 []，整个文件在 ln 之后就停止了
+
+def strategy_build_state(commands_list, reasons=None):
+    """策略：生成能补上所缺状态的指令 (没有人则 ap, 没有关系则 ar, 没有标签则 at ...)，reasons 默认取本轮的失败原因。"""
+    for reason, _ in (reasons or recent_failures).most_common():
+        builder = REASON_BUILDERS.get(reason)
+        if builder in commands_list:
+            result = _try_generate_command_params(builder)
+            if result: return result
+    return strategy_random([c for c in STATE_BUILDING_COMMANDS if c in commands_list and c != 'ln'])
+
+# --- 最坏情况拓扑 (Worst-Case Topologies) ---
+def apply_topology_line(line):
+    """把拓扑产生的 ar / mr / at / att / dft 同步到生成器状态"""
+    parts = line.split(); command, args = parts[0], list(map(int, parts[1:]))
+    if command == "ar": add_relation_state(*args)
+    elif command == "mr": modify_relation_state(*args)
+    elif command == "at": add_tag_state(*args)
+    elif command == "att": add_to_tag_state(*args)
+    elif command == "dft": del_from_tag_state(*args)
+
+def worst_case_lines(family, commands_list):
+    """首次调用: 人数上限下该拓扑的 ln 块及后续设置指令; 之后每次: 一轮扰动 + 最昂贵的查询"""
+    global worst_case_topology
+    if worst_case_topology is None:
+        if current_file_instruction_count > 0 or 'ln' not in commands_list: return [] # ln 只能是第一条指令
+        worst_case_topology = topology.build(family, max_p, random, COMMANDS)
+        for pid, name, age in zip(worst_case_topology.ids, worst_case_topology.names, worst_case_topology.ages): add_person_state(pid, name, age)
+        for (p1, p2), value in worst_case_topology.edges.items(): add_relation_state(p1, p2, value)
+        for line in worst_case_topology.setup: apply_topology_line(line)
+        return worst_case_topology.ln_lines() + worst_case_topology.setup
+    lines = worst_case_topology.next_lines()
+    for line in lines: apply_topology_line(line)
+    return lines
+
+def make_worst_case_strategy(family):
+    def strategy(commands_list): return worst_case_lines(family, commands_list)
+    strategy.__name__ = f"strategy_worst_{family}"
+    strategy.__doc__ = f"策略：最坏情况拓扑 {family}，剩余指令全部用于该拓扑下最昂贵的查询"
+    return strategy
+
+# {策略名: 策略}, 每个本次作业指令能表达的拓扑族一个
+WORST_CASE_STRATEGIES = {f"worst_{family}": make_worst_case_strategy(family) for family in topology.available_families(COMMANDS)}
 
 # --- 主生成逻辑 (Main Generation Logic) ---
-def generate_test_case(filename_prefix, mode_choice, strategy_func):
-    """生成单个测试用例文件，文件名包含策略名"""
+def generate_test_case(filename_prefix, mode_choice, strategy_func, seed=None):
+    """生成单个测试用例文件，文件名包含策略名; 给定 seed 时输出只由 (seed, 模式, 策略) 决定"""
     global persons, person_details, relations, relation_values, person_tags, tag_members
     global official_accounts, account_details, followers, articles, article_details, account_articles, contributions
-    global max_instr, max_p, mode
+    global max_instr, max_p, mode, worst_case_topology, command_histogram, failure_reasons, recent_failures
     global current_file_instruction_count # 使用文件级计数器
 
     # 重置状态 (Reset state)
@@ -470,7 +554,11 @@ def generate_test_case(filename_prefix, mode_choice, strategy_func):
     person_tags.clear(); tag_members.clear()
     official_accounts.clear(); account_details.clear(); followers.clear(); articles.clear()
     article_details.clear(); account_articles.clear(); contributions.clear()
+    worst_case_topology = None
+    command_histogram = Counter(); failure_reasons = Counter(); recent_failures = Counter()
     current_file_instruction_count = 0 # 重置文件级计数器
+    random.seed(seed)
+    COVERAGE.reset()
 
     mode = mode_choice
     max_instr = MAX_INSTRUCTIONS[mode]
@@ -484,6 +572,7 @@ def generate_test_case(filename_prefix, mode_choice, strategy_func):
 
     print(f"Generating {filename} using primary strategy {strategy_name}...")
 
+    ln_rows_left = 0
     # 打开文件准备写入
     try:
         with open(filepath, 'w', encoding='utf-8') as f:
@@ -495,18 +584,26 @@ def generate_test_case(filename_prefix, mode_choice, strategy_func):
                     break
 
                 # --- 调用指定策略 ---
+                recent_failures.clear()
                 generated_lines = strategy_func(current_allowed)
+                if not generated_lines: # 策略无法继续: 先补状态, 再全局随机, 都失败才停止
+                    generated_lines = strategy_build_state(current_allowed) or strategy_random(current_allowed)
 
                 # --- 处理生成结果 ---
                 if generated_lines:
+                    written = []
                     for line in generated_lines:
                         if current_file_instruction_count < max_instr:
-                            f.write(line + '\n')
+                            f.write(line + '\n'); written.append(line)
                             current_file_instruction_count += 1
+                            if ln_rows_left: ln_rows_left -= 1 # ln 块的数据行不计入直方图
+                            else:
+                                command = line.split()[0]; command_histogram[command] += 1
+                                if command == "ln": ln_rows_left = int(line.split()[1]) + 2
                         else: break
-                else: # 如果指定的策略（包括其内部回退）最终返回了 []
-                      # 这通常意味着健壮的 strategy_random 也找不到可执行指令
-                      print(f"Warning: Strategy {strategy_name} (incl. potential fallback) produced 0 lines. Stopping generation for {filename} at {current_file_instruction_count} instructions.", file=sys.stderr)
+                    COVERAGE.observe(written) # 所有策略都让 oracle 跟上文件内容, 用于统计覆盖
+                else: # 指定策略、状态建立与全局随机都返回了 []
+                      print(f"Warning: Strategy {strategy_name} (incl. state building and random fallback) produced 0 lines. Stopping generation for {filename} at {current_file_instruction_count} instructions.", file=sys.stderr)
                       break # 无法继续生成
 
                 # 检查是否达到上限
@@ -516,11 +613,80 @@ def generate_test_case(filename_prefix, mode_choice, strategy_func):
         print(f"Error opening or writing to file {filepath}: {e}", file=sys.stderr)
         return None # 返回 None 表示生成失败
 
+    build_line_index(filepath) # data/<文件名>.idx: 输出行 -> 输入行, 供评测机写日志和对比时直接定位
     print(f"Generated {filepath} with {current_file_instruction_count} instructions.")
     return filename # 返回生成的文件名
 
+def generate_seeded_case(task):
+    """进程池任务: task = (filename_prefix, mode, strategy_name, seed), 返回 (生成的文件名或 None, 用时, 指令直方图, 失败原因, 各结果出现次数)"""
+    filename_prefix, mode_choice, strategy_name, seed = task
+    start_time_file = time.time()
+    strategy_func = WORST_CASE_STRATEGIES.get(strategy_name) or globals()[f"strategy_{strategy_name}"]
+    generated_filename = generate_test_case(filename_prefix, mode_choice, strategy_func, seed)
+    return generated_filename, time.time() - start_time_file, command_histogram, failure_reasons, COVERAGE.hits
+
+def generate_batch(tasks, workers):
+    """生成全部 tasks (workers > 1 时使用进程池), 按 tasks 顺序返回 [(task, 文件名或 None, 各结果出现次数)]"""
+    outcomes = []
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            futures = [executor.submit(generate_seeded_case, task) for task in tasks]
+            for future in futures:
+                try: outcomes.append(future.result())
+                except Exception as e: outcomes.append(e)
+    else:
+        for task in tasks:
+            try: outcomes.append(generate_seeded_case(task))
+            except Exception as e: outcomes.append(e)
+
+    results = []
+    for task, outcome in zip(tasks, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Critical Error generating test case starting with {task[0]} using strategy {task[2]} (seed {task[3]}): {outcome!r}", file=sys.stderr)
+            results.append((task, None, None))
+        else:
+            generated_filename, elapsed, histogram, failures, hits = outcome
+            if generated_filename:
+                print(f"    Time taken for {generated_filename}: {elapsed:.2f}s")
+                print("    Commands: " + ", ".join(f"{command} {count}" for command, count in histogram.most_common()))
+                if failures:
+                    print("    Failed attempts: " + ", ".join(f"{command} ({reason}) {count}" for (command, reason), count in failures.most_common(MAX_FAILURES_SHOWN)))
+                print(f"    Coverage: {outcome_coverage.summary(hits)}")
+            else: print(f"Error: Failed to generate file starting with {task[0]}.")
+            results.append((task, generated_filename, hits))
+    return results
+
+def write_manifest(mode_choice, master_seed, results):
+    cases = [{"file": filename, "prefix": task[0], "strategy": task[2], "seed": task[3]}
+             for task, filename, _ in results if filename]
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump({"mode": mode_choice, "master_seed": master_seed, "cases": cases}, f, indent=2)
+
+def replay_manifest(filenames, workers):
+    """按 manifest 中记录的种子重新生成指定文件 (为空则全部), 得到与原文件逐字节相同的数据"""
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f: manifest = json.load(f)
+    wanted = {os.path.basename(name) for name in filenames}
+    tasks = [(case["prefix"], manifest["mode"], case["strategy"], case["seed"])
+             for case in manifest["cases"] if not wanted or case["file"] in wanted]
+    missing = wanted - {case["file"] for case in manifest["cases"]}
+    if missing: print(f"Warning: not in {MANIFEST_PATH}: {', '.join(sorted(missing))}", file=sys.stderr)
+    results = generate_batch(tasks, workers)
+    print(f"\nReplayed {sum(1 for _, filename, _ in results if filename)} of {len(tasks)} files.")
+
 # --- 主执行块 (Main Execution Block) ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HW10 data generator")
+    parser.add_argument("--seed", type=int, default=None, help="master seed of the batch (default: random)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="number of generator processes")
+    parser.add_argument("--replay", nargs='*', metavar="FILE", default=None,
+                        help=f"regenerate FILEs (default: all) from the seeds in {MANIFEST_PATH}")
+    parser.add_argument("--stress", action="store_true",
+                        help="only worst-case topologies (topology.py), each filled up with its most expensive queries")
+    args = parser.parse_args()
+
+    if args.replay is not None:
+        replay_manifest(args.replay, args.workers); sys.exit(0)
+
     while True:
         mode_input = input(f"Choose mode: Public Test ({MODE_PUBLIC}) or Mutual Test ({MODE_MUTUAL}): ").lower()
         if mode_input in [MODE_PUBLIC, MODE_MUTUAL]: break
@@ -538,45 +704,28 @@ if __name__ == "__main__":
 
     strategies_to_use = [
         strategy_load_network, strategy_random, strategy_account_focus,
-        strategy_query_heavy, strategy_exception_focus, strategy_tag_focus,
+        strategy_query_heavy, strategy_exception_focus, strategy_coverage_guided, strategy_tag_focus,
         strategy_random, strategy_account_focus, strategy_query_heavy,
         strategy_random,
     ]
+    if args.stress: strategies_to_use = list(WORST_CASE_STRATEGIES.values())
     num_strategies = len(strategies_to_use)
 
-    generated_files_count = 0
-    file_base_index = 1
-    start_time_total = time.time() # 记录总开始时间
+    # 每个文件的种子由主种子派生, 主种子相同则整批数据相同
+    master_seed = args.seed if args.seed is not None else random.randrange(2**32)
+    seeder = random.Random(master_seed)
+    tasks = [(f"testcase_{i + 1}", mode_input,
+              strategies_to_use[i % num_strategies].__name__.replace("strategy_", ""), seeder.randrange(2**32))
+             for i in range(num_files_total)]
+    print(f"Master seed: {master_seed}, workers: {args.workers}")
 
-    while generated_files_count < num_files_total:
-        start_time_file = time.time() # 记录单个文件开始时间
-        current_strategy_func = strategies_to_use[generated_files_count % num_strategies]
-        filename_prefix = f"testcase_{file_base_index}"
-        try:
-             generated_filename = generate_test_case(filename_prefix, mode_input, current_strategy_func)
-             if generated_filename: # 检查是否成功生成文件
-                 generated_files_count += 1
-                 file_base_index += 1
-                 end_time_file = time.time()
-                 print(f"    Time taken for {generated_filename}: {end_time_file - start_time_file:.2f}s")
-             else:
-                 # 生成失败，可能需要处理
-                 print(f"Error: Failed to generate file starting with {filename_prefix}.")
-                 # 决定是否继续或停止
-                 cont = input("File generation failed. Continue? (y/n): ").lower()
-                 if cont != 'y': break
-                 file_base_index += 1 # 增加索引避免下次冲突
-
-        except Exception as e:
-             import traceback
-             print(f"\n!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!", file=sys.stderr)
-             print(f"Critical Error generating test case starting with {filename_prefix} using strategy {current_strategy_func.__name__}:", file=sys.stderr)
-             traceback.print_exc(file=sys.stderr)
-             print(f"!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n", file=sys.stderr)
-             cont = input("A critical error occurred. Continue generating? (y/n): ").lower()
-             if cont != 'y': break
-             file_base_index += 1
+    start_time_total = time.time() # 记录总开始时间
+    results = generate_batch(tasks, args.workers)
+    write_manifest(mode_input, master_seed, results)
+    generated_files_count = sum(1 for _, filename, _ in results if filename)
+    coverage_path = outcome_coverage.COVERAGE_REPORT_FILE
+    headline = outcome_coverage.write_report(coverage_path, COMMANDS, [(filename, task[2], hits) for task, filename, hits in results if filename])
+    print("\n" + "\n".join(headline) + f"\n(详见 {coverage_path})")
 
     end_time_total = time.time()
     print(f"\nData generation finished. Generated {generated_files_count} files.")
-    print(f"Total time taken: {end_time_total - start_time_total:.2f}s")
\ No newline at end of file
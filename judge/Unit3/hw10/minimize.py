@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+# Dependency-aware test-case minimizer for Unit3 failures. Given an input on which a test jar diverges from the
+# reference (std jar or oracle.py), it removes commands by delta debugging until no chunk can be removed any more.
+# A command is removed together with everything that depends on it (dropping `ap 5` also drops every command that
+# names person 5, dropping `at 5 1` drops that tag's att / qtvs / tag messages, dropping `am 7 ...` drops `sm 7`),
+# so candidates stay meaningful instead of turning the rest of the input into exceptions. Persons of an `ln` block
+# are units of their own and the block is rewritten without them; its relations are units as well.
+# Candidates of one wave run in parallel (reference and test jar each); the first one in candidate order that still
+# fails the same way wins, so the result does not depend on which run finishes first.
+# Usage: python minimize.py <input_file> <test_jar> [--std std_jar|oracle] [-o output_file] [--workers N] [--any]
+#   --any: accept any divergence; by default a WA must still first differ on the same kind of command, and an RE
+#          must still be an RE, so the reduction does not slip to a different bug.
+import os
+import sys
+import glob
+import threading
+import concurrent.futures
+import oracle
+from check import run_jar, TIMEOUT_SECONDS, STD_DIR, STD_BACKEND
+from output_compare import compare_output_files, index_path_for
+
+# --- 配置 ---
+MINIMIZE_DIR = "minimize"      # 候选数据与输出
+STD_TIMEOUT = TIMEOUT_SECONDS * 3
+DEFAULT_WORKERS = os.cpu_count() or 1
+# --- End 配置 ---
+
+
+def pop_option(args, name, default):
+    if name in args:
+        i = args.index(name); value = args[i + 1]; del args[i:i + 2]; return value
+    return default
+
+
+def command_entities(args):
+    """(entities the command creates, entities it needs) for one command line split into tokens.
+    Entities: ('P', id) person, ('R', a, b) relation, ('T', owner, tag), ('A', account), ('ART', article),
+    ('M', message), ('E', emoji). Unknown commands depend on nothing."""
+    name, ints = args[0], []
+    for token in args[1:]:
+        try: ints.append(int(token))
+        except ValueError: ints.append(None)
+
+    def person(i): return ('P', ints[i])
+    def relation(i, j): return ('R', min(ints[i], ints[j]), max(ints[i], ints[j]))
+
+    try:
+        if name == "ap": return [person(0)], []
+        if name == "ar": return [relation(0, 1)], [person(0), person(1)]
+        if name in ("mr", "qv"): return [], [person(0), person(1), relation(0, 1)]
+        if name in ("qci", "qsp"): return [], [person(0), person(1)]
+        if name == "at": return [('T', ints[0], ints[1])], [person(0)]
+        if name in ("dt", "qtvs", "qtav"): return [], [person(0), ('T', ints[0], ints[1])]
+        if name in ("att", "dft"): return [], [person(0), person(1), ('T', ints[1], ints[2])]
+        if name in ("qba", "qra", "qsv", "qrm", "qm"): return [], [person(0)]
+        if name == "coa": return [('A', ints[1])], [person(0)]
+        if name in ("doa", "foa"): return [], [person(0), ('A', ints[1])]
+        if name == "qbc": return [], [('A', ints[0])]
+        if name == "ca": return [('ART', ints[2])], [person(0), ('A', ints[1])]
+        if name == "da": return [], [person(0), ('A', ints[1]), ('ART', ints[2])]
+        if name in ("am", "arem", "afm", "aem"):  # id extra type id1 id2
+            needs = [person(3), person(4) if ints[2] == 0 else ('T', ints[3], ints[4])]
+            if name == "afm": needs.append(('ART', ints[1]))
+            if name == "aem": needs.append(('E', ints[1]))
+            return [('M', ints[0])], needs
+        if name == "sm": return [], [('M', ints[0])]
+        if name == "sei": return [('E', ints[0])], []
+        if name == "qp": return [], [('E', ints[0])]
+    except (IndexError, TypeError):
+        pass
+    return [], []
+
+
+class Unit:
+    """One removable piece: a command, a person of an ln block, or a relation of an ln block."""
+
+    def __init__(self, kind, item, key, defines, refs):
+        self.kind, self.item, self.key = kind, item, key
+        self.defines, self.refs = defines, refs
+
+
+class LnBlock:
+    def __init__(self, tokens):
+        n = int(tokens[0])
+        self.ids = [int(t) for t in tokens[1:n + 1]]
+        self.names = tokens[n + 1:2 * n + 1]
+        self.ages = tokens[2 * n + 1:3 * n + 1]
+        values = iter(tokens[3 * n + 1:])
+        self.edges = {}  # (i, j) with i > j -> value
+        for i in range(1, n):
+            for j in range(i):
+                value = next(values)
+                if value != "0": self.edges[(i, j)] = value
+
+    def lines(self, persons, edges):
+        """The block restricted to the person indices and (i, j) edges given; [] without persons."""
+        if not persons: return []
+        persons = sorted(persons)
+        lines = [f"ln {len(persons)}", " ".join(str(self.ids[p]) for p in persons),
+                 " ".join(self.names[p] for p in persons), " ".join(self.ages[p] for p in persons)]
+        for a in range(1, len(persons)):
+            lines.append(" ".join(self.edges[(persons[a], persons[b])] if (persons[a], persons[b]) in edges else "0"
+                                  for b in range(a)))
+        return lines
+
+
+def parse_input(lines):
+    """Splits an input into items (a command line or an LnBlock) and the units that can be removed."""
+    items, units = [], []
+    lines = iter(lines)
+    for line in lines:
+        args = line.split()
+        if not args: continue
+        index = len(items)
+        if args[0] in ("ln", "load_network"):
+            n = int(args[1]); needed = 3 * n + n * (n - 1) // 2
+            tokens = [args[1]]
+            while len(tokens) < needed + 1: tokens.extend(next(lines).split())
+            block = LnBlock(tokens); items.append(block)
+            for p, pid in enumerate(block.ids):
+                units.append(Unit("person", index, p, [('P', pid)], []))
+            for (i, j) in block.edges:
+                a, b = block.ids[i], block.ids[j]
+                units.append(Unit("edge", index, (i, j), [('R', min(a, b), max(a, b))], [('P', a), ('P', b)]))
+        else:
+            items.append(line.strip())
+            units.append(Unit("command", index, None, *command_entities(args)))
+    return items, units
+
+
+class Minimizer:
+    """Delta debugging over a set of kept units, with dependency closure and parallel candidate runs."""
+
+    def __init__(self, items, units, test_jar, std_jar, workers, same_failure):
+        self.items, self.units = items, units
+        self.test_jar, self.std_jar, self.workers = test_jar, std_jar, workers
+        self.same_failure = same_failure  # None: any divergence; else ('WA', command name) or (run status, None)
+        self.definers, self.dependents = {}, {}
+        for u, unit in enumerate(units):
+            for entity in unit.defines: self.definers.setdefault(entity, []).append(u)
+            for entity in unit.refs: self.dependents.setdefault(entity, []).append(u)
+        self.lock = threading.Lock()
+        self.next_candidate = 0
+        self.runs = 0
+        self.verdicts = {}  # frozenset(kept) -> verdict
+
+    def closure(self, kept, removed):
+        """kept minus `removed` and minus every unit that needs an entity no remaining unit creates."""
+        kept = set(kept) - set(removed)
+        pending = [entity for u in removed for entity in self.units[u].defines]
+        while pending:
+            entity = pending.pop()
+            if any(u in kept for u in self.definers.get(entity, ())): continue
+            for u in self.dependents.get(entity, ()):
+                if u in kept:
+                    kept.discard(u); pending.extend(self.units[u].defines)
+        return frozenset(kept)
+
+    def render(self, kept):
+        commands, persons, edges = set(), {}, {}
+        for u in kept:
+            unit = self.units[u]
+            if unit.kind == "command": commands.add(unit.item)
+            elif unit.kind == "person": persons.setdefault(unit.item, set()).add(unit.key)
+            else: edges.setdefault(unit.item, set()).add(unit.key)
+        lines = []
+        for index, item in enumerate(self.items):
+            if isinstance(item, LnBlock): lines.extend(item.lines(persons.get(index, ()), edges.get(index, ())))
+            elif index in commands: lines.append(item)
+        return lines
+
+    def evaluate(self, lines):
+        """Runs reference and test jar on `lines`; returns (reference status, test status, first mismatch or None)."""
+        with self.lock:
+            number = self.next_candidate; self.next_candidate += 1; self.runs += 1
+        input_path = os.path.join(MINIMIZE_DIR, f"cand_{number}.txt")
+        std_path = os.path.join(MINIMIZE_DIR, "out", f"cand_{number}.ans")
+        test_path = os.path.join(MINIMIZE_DIR, "out", f"cand_{number}.txt")
+        with open(input_path, 'w', encoding='utf-8') as f: f.write("\n".join(lines) + "\n")
+        try:
+            if self.std_jar is None: std_status = oracle.run_file(input_path, std_path)
+            else: std_status = run_jar(self.std_jar, input_path, std_path, STD_TIMEOUT)[0]
+            if std_status != 'AC': return std_status, None, None  # the reference itself fails on this candidate
+            test_status = run_jar(self.test_jar, input_path, test_path, TIMEOUT_SECONDS)[0]
+            comparison = compare_output_files(std_path, test_path, input_path, max_mismatches=1)
+            return std_status, test_status, comparison.mismatches[0] if comparison.mismatches else None
+        finally:
+            for path in (input_path, index_path_for(input_path), std_path, test_path):
+                try: os.remove(path)
+                except OSError: pass
+
+    def fails(self, kept):
+        """Whether the candidate keeping `kept` still fails (the same way unless same_failure is None)."""
+        if kept not in self.verdicts:
+            std_status, test_status, mismatch = self.evaluate(self.render(kept))
+            kind = failure_kind(test_status, mismatch) if std_status == 'AC' else None
+            self.verdicts[kept] = kind is not None and (self.same_failure is None or kind == self.same_failure)
+        return self.verdicts[kept]
+
+    def reduce(self, kept, candidates, executor):
+        """One ddmin pass over the units in `candidates`: removes chunks (with their dependents) while the
+        failure persists, refining the chunks down to single units. Returns the new kept set."""
+        chunks = 2
+        while True:
+            pool = [u for u in candidates if u in kept]
+            if not pool: return kept
+            chunks = min(chunks, len(pool))
+            size = -(-len(pool) // chunks)
+            removals = [pool[i:i + size] for i in range(0, len(pool), size)]
+            print(f"  {len(self.render(kept))} lines, {len(pool)} units, trying {len(removals)} chunks of ~{size}")
+            reduced = None
+            for wave in range(0, len(removals), self.workers):
+                trials = [self.closure(kept, removal) for removal in removals[wave:wave + self.workers]]
+                trials = list(dict.fromkeys(trial for trial in trials if trial != kept))
+                for trial, failed in zip(trials, executor.map(self.fails, trials)):
+                    if failed: reduced = trial; break
+                if reduced is not None: break
+            if reduced is not None:
+                kept, chunks = reduced, max(chunks - 1, 2)
+            elif chunks >= len(pool):
+                return kept
+            else:
+                chunks = min(len(pool), chunks * 2)
+
+    def run(self):
+        kept = frozenset(range(len(self.units)))
+        structural = [u for u, unit in enumerate(self.units) if unit.kind != "edge"]
+        relations = [u for u, unit in enumerate(self.units) if unit.kind == "edge"]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:  # removing relations can make more commands removable and vice versa
+                before = kept
+                print("-- commands and ln persons")
+                kept = self.reduce(kept, structural, executor)
+                if any(u in kept for u in relations):
+                    print("-- ln relations")
+                    kept = self.reduce(kept, relations, executor)
+                if kept == before: return kept
+
+
+def failure_kind(test_status, mismatch):
+    """(run status, None) for RE / TLE, ('WA', command of the first mismatch) for wrong output, None if it passes."""
+    if test_status != 'AC': return test_status, None
+    if mismatch is None: return None
+    return 'WA', mismatch.input_command.split()[0] if mismatch.input_command else None
+
+
+def main():
+    args = sys.argv[1:]
+    output_path = pop_option(args, "-o", None)
+    workers = max(1, int(pop_option(args, "--workers", DEFAULT_WORKERS)))
+    std = pop_option(args, "--std", "oracle" if STD_BACKEND == "oracle" else None)
+    any_divergence = "--any" in args
+    if any_divergence: args.remove("--any")
+    if len(args) != 2:
+        print("Usage: python minimize.py <input_file> <test_jar> [--std std_jar|oracle] [-o output_file] [--workers N] [--any]")
+        sys.exit(1)
+    input_path, test_jar = args
+    if std is None:
+        std_jars = glob.glob(os.path.join(STD_DIR, "*.jar"))
+        if len(std_jars) != 1: print(f"Expected exactly one jar in '{STD_DIR}' (or pass --std std_jar|oracle)."); sys.exit(1)
+        std = std_jars[0]
+    std_jar = None if std == "oracle" else std
+    output_path = output_path or os.path.join(MINIMIZE_DIR, f"{os.path.splitext(os.path.basename(input_path))[0]}_min.txt")
+    os.makedirs(os.path.join(MINIMIZE_DIR, "out"), exist_ok=True)
+
+    with open(input_path, 'r', encoding='utf-8', errors='ignore') as f:
+        original = f.read().splitlines()
+    items, units = parse_input(original)
+    minimizer = Minimizer(items, units, test_jar, std_jar, workers, None)
+    print(f"== {os.path.basename(test_jar)} on {input_path} against {std_jar or 'oracle.py'}: {len(units)} units")
+    std_status, test_status, mismatch = minimizer.evaluate(minimizer.render(frozenset(range(len(units)))))
+    if std_status != 'AC': print(f"The reference itself ends with {std_status} on this input; nothing to compare against."); sys.exit(1)
+    kind = failure_kind(test_status, mismatch)
+    if kind is None: print("The test jar does not fail on this input; nothing to minimize."); sys.exit(1)
+    if not any_divergence:
+        minimizer.same_failure = kind
+        print(f"Failure: {kind[0]}" + (f" first differing on '{kind[1]}'" if kind[1] else ""))
+
+    kept = minimizer.run()
+    lines = minimizer.render(kept)
+    with open(output_path, 'w', encoding='utf-8') as f: f.write("\n".join(lines) + "\n")
+    _, _, mismatch = minimizer.evaluate(lines)
+    print(f"\n{len(original)} -> {len(lines)} lines after {minimizer.runs} candidate runs; written to {output_path}")
+    if mismatch is not None:
+        print(f"First difference at output line {mismatch.output_line}"
+              + (f" (input line {mismatch.input_line}: {mismatch.input_command})" if mismatch.input_line else ""))
+        print(f"  expected: {mismatch.std_line}\n  got     : {mismatch.test_line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Per-input time limits calibrated on std.jar. The standard JAR's CPU time on an input (measured, or kept in the
+# std answer cache) times TIMEOUT_FACTOR, plus TIMEOUT_ALLOWANCE for JVM start-up and load from the parallel runs,
+# clamped to [TIMEOUT_FLOOR, TIMEOUT_SECONDS], is the test JARs' timeout on that input: a hung jar is killed after
+# a few seconds on small inputs instead of the full TIMEOUT_SECONDS. The limit is wall-clock time while std's time
+# is CPU time, hence the allowance and the floor.
+# A test JAR that is correct but needs SLOW_FACTOR times std's CPU time gets the verdict "AC (Slow)", with the ratio
+# in its report, so performance outliers show up on cheap inputs that never come near a timeout.
+# Without a std time for an input (JUDGE_STD=oracle / vote, std failed, no CPU figures) the fixed limit applies.
+import os
+import threading
+from resource_usage import USAGE
+
+# --- 配置 ---
+CALIBRATION_ENABLED = os.environ.get("JUDGE_TIMEOUT_CALIBRATE", "1") != "0"
+TIMEOUT_FACTOR = float(os.environ.get("JUDGE_TIMEOUT_FACTOR", "5"))  # 测试 jar 时限 = 标程 CPU 时间 x 该倍数
+TIMEOUT_ALLOWANCE = float(os.environ.get("JUDGE_TIMEOUT_ALLOWANCE", "1"))  # 在倍数之外固定加上的秒数: JVM 启动与并行运行的负载
+TIMEOUT_FLOOR = float(os.environ.get("JUDGE_TIMEOUT_FLOOR", "3"))  # 校准时限的下限 (秒), 容纳小数据上的抖动; 上限为 check.py 的 TIMEOUT_SECONDS
+SLOW_FACTOR = 3.0        # 通过但用时达到标程该倍数即判为 "AC (Slow)"
+SLOW_MIN_SECONDS = 0.5   # 且比标程多出至少该秒数, 避免 JVM 启动主导的小数据被误判
+SLOW_STATUS = "AC (Slow)"
+# --- End 配置 ---
+
+
+def measured_time(jar_name, input_name, wall_s):
+    """(seconds, 'cpu' or 'wall') of a finished run: the JVM's CPU time when resource_usage has it."""
+    usage = USAGE.measured(jar_name).get(input_name)
+    if usage is not None:
+        return usage.user_s + usage.sys_s, 'cpu'
+    return wall_s, 'wall'
+
+
+class TimeLimitCalibrator:
+    """std times per input, the limits derived from them and the slow-but-correct runs."""
+
+    def __init__(self, enabled=CALIBRATION_ENABLED):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.std_times = {}  # input name -> (seconds, clock)
+        self.slow = {}       # jar name -> {input name: (ratio, test seconds, std seconds, clock)}
+
+    def record_std(self, input_name, seconds, clock):
+        if self.enabled and seconds is not None:
+            with self.lock:
+                self.std_times[input_name] = (seconds, clock)
+
+    def std_seconds(self, input_name):
+        """std's time on the input that its limit is calibrated on, or None."""
+        with self.lock:
+            std = self.std_times.get(input_name)
+        return None if std is None else std[0]
+
+    def limit_for(self, std_seconds, ceiling):
+        """The limit that a std time gives under the current settings; the fixed limit without one."""
+        if not self.enabled or std_seconds is None:
+            return ceiling
+        return min(ceiling, max(TIMEOUT_FLOOR, std_seconds * TIMEOUT_FACTOR + TIMEOUT_ALLOWANCE))
+
+    def timeout_for(self, input_name, ceiling):
+        return self.limit_for(self.std_seconds(input_name), ceiling)
+
+    def describe_limit(self, input_name, ceiling):
+        """'limit 4.0s (std CPU 0.60s x5 + 1s)' for messages and reports, or the fixed limit."""
+        with self.lock:
+            std = self.std_times.get(input_name)
+        if std is None:
+            return f"limit {ceiling:.1f}s (fixed)"
+        return f"limit {self.timeout_for(input_name, ceiling):.1f}s (std {std[1].upper()} {std[0]:.2f}s x{TIMEOUT_FACTOR:g} + {TIMEOUT_ALLOWANCE:g}s)"
+
+    def check_slow(self, jar_name, input_name, seconds, clock):
+        """Records and returns the ratio to std if an AC run was slow, otherwise None. Only compares like clocks."""
+        with self.lock:
+            std = self.std_times.get(input_name)
+        if std is None or std[1] != clock:
+            return None
+        ratio = seconds / max(std[0], 1e-3)
+        if ratio < SLOW_FACTOR or seconds - std[0] < SLOW_MIN_SECONDS:
+            return None
+        with self.lock:
+            self.slow.setdefault(jar_name, {})[input_name] = (ratio, seconds, std[0], clock)
+        return ratio
+
+    def slow_run(self, jar_name, input_name):
+        """(ratio, test seconds, std seconds, clock) of a slow-but-correct run, or None."""
+        with self.lock:
+            return self.slow.get(jar_name, {}).get(input_name)
+
+    def restore_slow(self, jar_name, input_name, entry):
+        """Re-enters a slow run judged by an earlier run that is being resumed (result_stream.py)."""
+        with self.lock:
+            self.slow.setdefault(jar_name, {})[input_name] = entry
+
+    def slow_lines(self, jar_name):
+        """Section of one jar's report: its slow-but-correct inputs, slowest first."""
+        with self.lock:
+            slow = dict(self.slow.get(jar_name, {}))
+        if not slow:
+            return []
+        lines = [f"Slow but correct (>= {SLOW_FACTOR:g}x std):"]
+        for name, (ratio, seconds, std_seconds, clock) in sorted(slow.items(), key=lambda kv: kv[1][0], reverse=True):
+            lines.append(f"  - {name}: {ratio:.1f}x ({clock.upper()} {seconds:.2f}s vs std {std_seconds:.2f}s)")
+        return lines
+
+    def summary(self, ceiling):
+        if not self.enabled:
+            return f"Time limits: fixed {ceiling}s (calibration disabled)."
+        with self.lock:
+            names = list(self.std_times)
+            slow = sum(len(runs) for runs in self.slow.values())
+        limits = [self.timeout_for(name, ceiling) for name in names]
+        if not limits:
+            return f"Time limits: fixed {ceiling}s (no std times to calibrate on)."
+        return (f"Time limits: std time x{TIMEOUT_FACTOR:g} + {TIMEOUT_ALLOWANCE:g}s within [{TIMEOUT_FLOOR:g}s, {ceiling}s] on {len(limits)} "
+                f"input(s), {min(limits):.1f}-{max(limits):.1f}s; {slow} slow but correct run(s).")
+
+
+LIMITS = TimeLimitCalibrator()
@@ -7,7 +7,14 @@ import shutil
 import filecmp
 import signal
 import platform
-from itertools import zip_longest # Used for comparing files line by line
+import concurrent.futures
+from profiler import PROFILER
+from std_cache import STD_CACHE
+from time_limits import LIMITS, SLOW_STATUS, measured_time # Per-input time limits calibrated on std's CPU time
+from result_stream import RESULTS # Every case result as a JSON-lines record, resumable runs and the HTML summary
+from resource_usage import USAGE, AccountedPopen, reap, describe, gc_log_args, gc_log_path_for # Per-run CPU / peak RSS / GC
+import oracle
+from output_compare import compare_output_files, copy_text_excerpt, output_digest, CompareResult # Streaming line comparison
 
 # --- 配置 (Configuration) ---
 STD_DIR = "std"
@@ -16,13 +23,19 @@ DATA_DIR = "data"
 OUT_DIR = "out"
 STDOUT_DIR = "stdout"
 LOG_DIR = "log"
-TIMEOUT_SECONDS = 10  # Timeout for the test JAR
+TIMEOUT_SECONDS = 10  # Timeout for the test JAR; with a std time for the input, time_limits.py calibrates it below this
 DATA_GENERATOR_SCRIPT = "data_generator.py"
 MAX_DIFF_LINES_TO_LOG = 10 # Max number of differing lines to detail in the log
 STD_TIMEOUT_FACTOR = 3 # Allow standard JAR more time (TIMEOUT_SECONDS * factor)
+MAX_WORKERS = os.cpu_count() or 1 # Max JVMs running at once; more than the core count makes them compete for CPU and risks false TLEs
+STD_BACKEND = os.environ.get("JUDGE_STD", "jar") # 'oracle': expected outputs come from oracle.py (Python reference) instead of std/*.jar
+                                                 # 'vote': no std at all, the majority output of the test jars is expected
+VOTE_QUORUM = float(os.environ.get("JUDGE_VOTE_QUORUM", "0.5")) # Vote mode: share of all test jars the winning group needs
+VOTE_REPORT = "vote_report.txt" # Vote mode: per-input groups and minority jars
 
 # --- 全局变量 (Global Variable) ---
 std_run_statuses = {} # Stores the run status of std.jar {input_basename: status}
+vote_summaries = {} # Vote mode: {input_basename: summary line(s) for VOTE_REPORT}
 
 # --- 辅助函数 (Helper Functions) ---
 
@@ -67,6 +80,9 @@ def run_jar(jar_path, input_path, output_path, timeout):
     stderr_content = b''
     start_time = time.time()
     process = None
+    case_key = f"{os.path.basename(jar_path)}/{os.path.basename(input_path)}"
+    wait_start = None
+    gc_log_path = gc_log_path_for(output_path) # None unless JUDGE_GC_LOG=1
     try:
         # Ensure output directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -74,13 +90,14 @@ def run_jar(jar_path, input_path, output_path, timeout):
         with open(input_path, 'r', encoding='utf-8') as infile, \
              open(output_path, 'wb') as outfile: # Open output in binary write mode
 
-            java_command = ['java', '-Xms128m', '-Xmx512m', '-jar', jar_path]
+            java_command = ['java', '-Xms128m', '-Xmx512m'] + gc_log_args(gc_log_path) + ['-jar', jar_path]
             # Use os.setsid for process group killing on non-Windows for better cleanup
             preexec_fn_toset = None
             if platform.system() != "Windows":
                 preexec_fn_toset = os.setsid
 
-            process = subprocess.Popen(
+            spawn_start = time.perf_counter()
+            process = AccountedPopen( # Reaps with os.wait4 to keep the JVM's CPU time and peak RSS
                 java_command,
                 stdin=infile,
                 stdout=outfile, # Redirect stdout directly to the file
@@ -91,6 +108,7 @@ def run_jar(jar_path, input_path, output_path, timeout):
             try:
                 # Wait for process completion or timeout, capture stderr
                 # stdout is being written directly to outfile, so stdout_content will be None
+                PROFILER.record("jvm_spawn", spawn_start, time.perf_counter() - spawn_start, case_key); wait_start = time.perf_counter()
                 _, stderr_content = process.communicate(timeout=timeout)
 
                 # Check return code and stderr after communication
@@ -126,6 +144,7 @@ def run_jar(jar_path, input_path, output_path, timeout):
                             process.kill() # Fallback kill
                         except Exception:
                             pass # Ignore errors during fallback kill
+                    reap(process) # Collect the killed JVM's resource usage
 
             # Ensure process is cleaned up if communicate didn't handle it (e.g., early error)
             finally:
@@ -147,114 +166,60 @@ def run_jar(jar_path, input_path, output_path, timeout):
         status = 'RE'
         stderr_content = str(e).encode(errors='ignore') # Encode exception message
 
+    if wait_start is not None: PROFILER.record("process_wait", wait_start, time.perf_counter() - wait_start, case_key)
+    if os.path.exists(output_path): PROFILER.count("output_bytes", os.path.getsize(output_path))
     end_time = time.time()
-    print(f"    Finished: {os.path.basename(jar_path)} on {os.path.basename(input_path)} in {end_time - start_time:.2f}s - Status: {status}")
+    usage = USAGE.record(jar_path, input_path, status, end_time - start_time, process, gc_log_path)
+    print(f"    Finished: {os.path.basename(jar_path)} on {os.path.basename(input_path)} in {end_time - start_time:.2f}s - Status: {status}{describe(usage)}")
     # Return empty stdout as it's redirected
     return status, b'', stderr_content
 
-def compare_outputs(std_ans_path, test_out_path):
-    """Compares two output files, ignoring leading/trailing whitespace on each line."""
+def compare_outputs(std_ans_path, test_out_path, input_path=None):
+    """
+    Compares two output files in one streaming pass, ignoring leading/trailing whitespace on each line.
+    Returns a CompareResult; .match is True if identical, .mismatches holds the first
+    MAX_DIFF_LINES_TO_LOG differing lines together with the input command that produced each.
+    """
     try:
         if not os.path.exists(std_ans_path):
             print(f"    Comparison Error: Standard answer file not found ({std_ans_path})")
-            return False
+            return CompareResult(False, [], False)
         if not os.path.exists(test_out_path):
             print(f"    Comparison Error: Test output file not found ({test_out_path})")
-            return False
-
-        # Read lines, strip whitespace, handle potential encoding errors
-        with open(std_ans_path, 'r', encoding='utf-8', errors='ignore') as f1, \
-             open(test_out_path, 'r', encoding='utf-8', errors='ignore') as f2:
-            lines1 = [line.strip() for line in f1]
-            lines2 = [line.strip() for line in f2]
-
-            # Remove trailing empty lines which might cause false negatives
-            while lines1 and not lines1[-1]: lines1.pop()
-            while lines2 and not lines2[-1]: lines2.pop()
+            return CompareResult(False, [], False)
 
-            return lines1 == lines2
+        # Stops at the first MAX_DIFF_LINES_TO_LOG mismatches; large files are read via mmap
+        return compare_output_files(std_ans_path, test_out_path, input_path, MAX_DIFF_LINES_TO_LOG)
 
     except Exception as e:
         print(f"    Error comparing files {os.path.basename(std_ans_path)} and {os.path.basename(test_out_path)}: {e}")
-        return False
+        return CompareResult(False, [], False)
+
 
 # ==============================================================
-#  NEW HELPER FUNCTION TO MAP OUTPUT LINES TO INPUT COMMANDS
+#  日志文件创建函数 (Log File Creation Function)
 # ==============================================================
-def map_output_to_input_command(input_lines):
-    """
-    Parses input lines to map expected output line indices to the
-    starting line index of the corresponding input command. Handles 'ln'.
-
-    Args:
-        input_lines (list): A list of strings, each representing a line from the input file.
-
-    Returns:
-        list: A list where list[i] is the 0-based starting line index in
-              input_lines for the command that produces the i-th output line.
-    """
-    output_to_input_command_start_line = []
-    input_line_index = 0
-    while input_line_index < len(input_lines):
-        if not input_lines[input_line_index].strip(): # Skip empty lines if any
-             input_line_index += 1
-             continue
-
-        command_line = input_lines[input_line_index].strip()
-        command_start_index = input_line_index # Record the start line of this command
-
-        # --- Handle 'ln' command ---
-        if command_line.startswith("ln "):
-            n = 0
-            try:
-                parts = command_line.split()
-                if len(parts) == 2:
-                    n = int(parts[1])
-                    if n < 0: # Handle invalid n
-                         print(f"Warning: Invalid N={n} in 'ln' command at input line {command_start_index + 1}. Treating as single command.", file=sys.stderr)
-                         n = 0 # Treat as single line command
-                else: # Malformed ln command
-                    print(f"Warning: Malformed 'ln' command '{command_line}' at input line {command_start_index + 1}. Treating as single command.", file=sys.stderr)
-                    n = 0 # Treat as single line command
-            except (ValueError, IndexError): # Handle potential errors parsing 'ln N'
-                print(f"Warning: Error parsing 'ln' command '{command_line}' at input line {command_start_index + 1}. Treating as single command.", file=sys.stderr)
-                n = 0 # Treat as single line command
-
-            if n > 0:
-                 # Expected lines for ln N: 1 (ln N) + 3 (ids, names, ages) + (N-1) (matrix rows) = N + 3
-                 block_size = n + 3
-                 # Check if the full block exists in the input
-                 if input_line_index + block_size <= len(input_lines):
-                      # This ln block generates 1 output line ('Ok')
-                      output_to_input_command_start_line.append(command_start_index)
-                      input_line_index += block_size # Move index past the entire block
-                 else:
-                      # Incomplete ln block in input
-                      print(f"Warning: Incomplete 'ln' block detected starting at input line {command_start_index + 1}. Expected {block_size} lines, found {len(input_lines) - input_line_index}.", file=sys.stderr)
-                      # Still associate one output with the start of the command
-                      output_to_input_command_start_line.append(command_start_index)
-                      input_line_index += 1 # Move to next line to avoid infinite loop
-            else: # n=0 or parsing error, treat 'ln' as a single line command
-                 output_to_input_command_start_line.append(command_start_index)
-                 input_line_index += 1
-
-        # --- Handle other commands (assume 1 input -> 1 output) ---
-        else:
-            output_to_input_command_start_line.append(command_start_index)
-            input_line_index += 1
-
-    return output_to_input_command_start_line
+def write_file_section(logfile, title, path, missing_message, centers=()):
+    """Streams one file into the log between '--- title ---' and '--- End of title ---' markers.
+    Huge files are excerpted: first / last lines and the lines around `centers` (the mismatches)."""
+    logfile.write(f"--- {title} ---\n")
+    if path and os.path.exists(path):
+        try:
+            copy_text_excerpt(path, logfile, centers)
+        except Exception as e:
+            print(f"    Error reading {path} for log: {e}")
+            logfile.write(f"!!! Error reading file: {e} !!!")
+    else:
+        logfile.write(missing_message)
+    logfile.write(f"\n--- End of {title} ---\n")
 
 
-# ==============================================================
-#  日志文件创建函数 (Log File Creation Function) - MODIFIED
-# ==============================================================
 def create_log_file(log_path, input_path, std_ans_path, test_out_path,
-                    std_status, test_status, test_stderr_content, final_status):
+                    std_status, test_status, test_stderr_content, final_status, comparison=None):
     """
     Creates a log file for a failed test case.
-    If the status is WA, it includes a detailed line-by-line comparison
-    showing the first few differences and the corresponding input command start line.
+    If the status is WA, it includes the first few differences from the comparison result
+    (computed here if not passed in) and the input command that produced each of them.
     Handles multi-line commands like 'ln'.
     """
     if final_status == 'AC (Skipped - Std TLE)':
@@ -263,42 +228,19 @@ def create_log_file(log_path, input_path, std_ans_path, test_out_path,
 
     print(f"    Difference detected ({final_status})! Creating log: {log_path}")
     try:
-        # --- Read all file contents first ---
-        input_lines_content = []
-        std_lines_content = []
-        test_lines_content = []
-        try:
-            with open(input_path, 'r', encoding='utf-8', errors='ignore') as f_in:
-                input_lines_content = [line.rstrip('\r\n') for line in f_in]
-        except Exception as e:
-            print(f"    Error reading input file {input_path} for log: {e}")
-            input_lines_content = [f"!!! Error reading input file: {e} !!!"]
-
-        if os.path.exists(std_ans_path):
-            try:
-                with open(std_ans_path, 'r', encoding='utf-8', errors='ignore') as f_std:
-                    std_lines_content = [line.rstrip('\r\n') for line in f_std]
-            except Exception as e:
-                print(f"    Error reading std output file {std_ans_path} for log: {e}")
-                std_lines_content = [f"!!! Error reading standard output file: {e} !!!"]
+        if test_status is not None and test_status != 'AC':
+             test_missing_message = f"!!! Test output file not found or empty (Test Status: {test_status}) !!!"
         else:
-             std_lines_content = ["!!! Standard output file not found or empty !!!"]
-
-        if os.path.exists(test_out_path):
-             try:
-                  with open(test_out_path, 'r', encoding='utf-8', errors='ignore') as f_test:
-                       test_lines_content = [line.rstrip('\r\n') for line in f_test]
-             except Exception as e:
-                  print(f"    Error reading test output file {test_out_path} for log: {e}")
-                  test_lines_content = [f"!!! Error reading test output file: {e} !!!"]
-        # Handle case where test wasn't run (e.g., skipped) or output file wasn't created
-        elif test_status is not None and test_status != 'AC':
-             test_lines_content = [f"!!! Test output file not found or empty (Test Status: {test_status}) !!!"]
-        else:
-             test_lines_content = ["!!! Test output file not found or empty !!!"]
+             test_missing_message = "!!! Test output file not found or empty !!!"
 
+        # Reuse the judge's comparison instead of diffing the files again
+        if final_status == 'WA' and comparison is None:
+            comparison = compare_outputs(std_ans_path, test_out_path, input_path)
+        mismatches = comparison.mismatches if comparison else []
+        input_centers = [m.input_line for m in mismatches]
+        output_centers = [m.output_line for m in mismatches]
 
-        # --- Write log file ---
+        # --- Write log file (file contents are streamed, never held in memory) ---
         with open(log_path, 'w', encoding='utf-8') as logfile:
             logfile.write(f"--- Test Case Failed: {final_status} ---\n")
             logfile.write(f"Input File: {os.path.basename(input_path)}\n")
@@ -306,15 +248,11 @@ def create_log_file(log_path, input_path, std_ans_path, test_out_path,
             if test_status: logfile.write(f"Test Program Status: {test_status}\n\n")
             else: logfile.write("Test Program Status: Not Run (Skipped due to Std TLE)\n\n")
 
-            # Write Input Data
-            logfile.write(f"--- Input Data ---\n")
-            logfile.write('\n'.join(input_lines_content))
-            logfile.write("\n--- End of Input Data ---\n\n")
-
-            # Write Standard Output
-            logfile.write(f"--- Standard Output ---\n")
-            logfile.write('\n'.join(std_lines_content))
-            logfile.write("\n--- End of Standard Output ---\n\n")
+            write_file_section(logfile, "Input Data", input_path, "!!! Input file not found !!!", input_centers)
+            logfile.write("\n")
+            write_file_section(logfile, "Standard Output", std_ans_path, "!!! Standard output file not found or empty !!!",
+                               output_centers)
+            logfile.write("\n")
 
             # Write Test Program's Standard Error (if RE/TLE)
             if test_status == 'RE' or test_status == 'TLE':
@@ -322,60 +260,31 @@ def create_log_file(log_path, input_path, std_ans_path, test_out_path,
                  logfile.write(test_stderr_content.decode(encoding='utf-8', errors='replace'))
                  logfile.write("\n--- End of Test Program Standard Error ---\n\n")
 
-            # Write Test Program's Standard Output
-            logfile.write(f"--- Test Program Output ---\n")
-            logfile.write('\n'.join(test_lines_content))
-            logfile.write("\n--- End of Test Program Output ---\n")
+            write_file_section(logfile, "Test Program Output", test_out_path, test_missing_message, output_centers)
 
             # --- Detailed Difference Comparison (Only for WA) ---
             if final_status == 'WA':
                 logfile.write(f"\n\n--- Detailed Differences (First {MAX_DIFF_LINES_TO_LOG} Mismatches) ---\n")
 
-                # Generate the mapping from output line index to input command start line index
-                # Do this *after* reading input_lines_content
-                output_to_input_map = map_output_to_input_command(input_lines_content)
-
-                diff_count = 0
-                # Iterate over OUTPUT lines using zip_longest
-                for line_num, (std_line, test_line) in enumerate(
-                    zip_longest(std_lines_content, test_lines_content, fillvalue="<EOF>"), start=1):
-
-                    std_line_stripped = std_line.strip() if std_line != "<EOF>" else "<EOF>"
-                    test_line_stripped = test_line.strip() if test_line != "<EOF>" else "<EOF>"
-
-                    if std_line_stripped != test_line_stripped:
-                        diff_count += 1
-                        logfile.write(f"\n[Mismatch #{diff_count} at Output Line {line_num}]\n")
-
-                        # Find the corresponding input command using the map
-                        output_index = line_num - 1 # 0-based index for the map
-                        if output_index < len(output_to_input_map):
-                            input_command_start_index = output_to_input_map[output_index]
-                            # Ensure the index is valid before accessing input_lines_content
-                            if 0 <= input_command_start_index < len(input_lines_content):
-                                command_line_text = input_lines_content[input_command_start_index]
-                                logfile.write(f"  Triggering Input Command (Starts at Line {input_command_start_index + 1}): {command_line_text}\n")
-                                # Add a note for 'ln' commands
-                                if command_line_text.strip().startswith("ln "):
-                                    logfile.write(f"    (Note: This is a multi-line 'ln' command block)\n")
-                            else:
-                                logfile.write(f"  Triggering Input Command: <Error: Calculated input index {input_command_start_index} out of bounds>\n")
-                        else:
-                            # This case means the test output has more lines than expected based on input parsing
-                            logfile.write(f"  Triggering Input Command: <Output line {line_num} exceeds expected output count based on input parsing>\n")
-
-                        # Log the differing output lines (show original for whitespace context)
-                        logfile.write(f"  Standard Output Line {line_num}: {std_line}\n")
-                        logfile.write(f"  Test Output Line {line_num}    : {test_line}\n")
+                for diff_count, mismatch in enumerate(comparison.mismatches, start=1):
+                    logfile.write(f"\n[Mismatch #{diff_count} at Output Line {mismatch.output_line}]\n")
+                    if mismatch.input_line is not None:
+                        logfile.write(f"  Triggering Input Command (Starts at Line {mismatch.input_line}): {mismatch.input_command}\n")
+                        # Add a note for 'ln' commands
+                        if mismatch.input_command.startswith("ln "):
+                            logfile.write(f"    (Note: This is a multi-line 'ln' command block)\n")
+                    else:
+                        # The test output has more lines than expected based on input parsing
+                        logfile.write(f"  Triggering Input Command: <Output line {mismatch.output_line} exceeds expected output count based on input parsing>\n")
 
-                        if diff_count >= MAX_DIFF_LINES_TO_LOG:
-                            logfile.write("\n--- (Reached max difference lines to log) ---\n")
-                            break # Stop after logging max differences
+                    # Log the differing output lines (show original for whitespace context)
+                    logfile.write(f"  Standard Output Line {mismatch.output_line}: {mismatch.std_line}\n")
+                    logfile.write(f"  Test Output Line {mismatch.output_line}    : {mismatch.test_line}\n")
 
-                if diff_count == 0 and not compare_outputs(std_ans_path, test_out_path):
-                     logfile.write("\n--- No line-by-line diff found by zip_longest, but compare_outputs reported WA (check trailing lines/whitespace?) ---\n")
-                elif diff_count == 0 and final_status == 'WA': # Ensure this only prints if WA was the status
-                     logfile.write("\n--- No line-by-line differences found (unexpected for WA status) ---\n")
+                if comparison.stopped_early:
+                    logfile.write("\n--- (Reached max difference lines to log) ---\n")
+                elif not comparison.mismatches:
+                    logfile.write("\n--- No line-by-line differences found (unexpected for WA status) ---\n")
 
             # --- End of Detailed Difference Comparison ---
 
@@ -386,6 +295,286 @@ def create_log_file(log_path, input_path, std_ans_path, test_out_path,
         traceback.print_exc()
 
 
+def run_std_case(std_jar_path, input_path):
+    """
+    Runs the standard JAR on one input file, writing stdout/<name>.ans.
+    Records the status in std_run_statuses and returns it.
+    """
+    input_basename = os.path.basename(input_path)
+    # Construct standard output filename (e.g., testcase_1.ans)
+    std_ans_basename = os.path.splitext(input_basename)[0] + ".ans"
+    std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
+
+    # Give standard JAR more time
+    std_timeout = TIMEOUT_SECONDS * STD_TIMEOUT_FACTOR
+
+    # Reuse the persisted answer if this exact jar already ran on this exact input
+    cached = STD_CACHE.lookup(std_jar_path, input_path, std_ans_path, std_timeout) if std_jar_path else None
+    if std_jar_path is None:
+        # JUDGE_STD=oracle: the in-process reference is fast enough that caching is pointless
+        print(f"  处理 {input_basename} 使用参考实现 oracle.py...")
+        with PROFILER.phase("oracle_run", input_basename):
+            std_status = oracle.run_file(input_path, std_ans_path)
+    elif cached:
+        std_status = cached[0]
+        print(f"  复用 {input_basename} 的缓存标准输出 - 运行状态: {std_status}")
+        if std_status == 'AC': # Old cache entries have no CPU time, their wall time is the best estimate
+            LIMITS.record_std(input_basename, *((cached[2], 'cpu') if cached[2] is not None else (cached[1], 'wall')))
+    else:
+        print(f"  处理 {input_basename} 使用标准 JAR...")
+        run_start = time.perf_counter()
+        std_status, _, std_stderr = run_jar(std_jar_path, input_path, std_ans_path, timeout=std_timeout)
+        std_elapsed = time.perf_counter() - run_start
+        std_time, std_clock = measured_time(os.path.basename(std_jar_path), input_basename, std_elapsed)
+        STD_CACHE.store(std_jar_path, input_path, std_ans_path, std_status, std_elapsed, std_timeout,
+                        std_time if std_clock == 'cpu' else None)
+        if std_status == 'AC':
+            LIMITS.record_std(input_basename, std_time, std_clock)
+    std_run_statuses[input_basename] = std_status # Store the status
+
+    # Create empty output file if run failed, for consistency
+    if std_status != 'AC' and not os.path.exists(std_ans_path):
+         try:
+             with open(std_ans_path, 'w'): pass # Create empty file
+             print(f"    为 {input_basename} 创建了空的标准输出文件，因为状态为 {std_status}。")
+         except Exception as e_create:
+             print(f"    警告: 创建空输出文件 {std_ans_path} 失败: {e_create}")
+
+    if std_status == 'RE':
+        print(f"    警告: 标准 JAR 在 {input_basename} 上报告了 RE。")
+    elif std_status == 'TLE':
+        print(f"    警告: 标准 JAR 在 {input_basename} 上报告了 TLE。")
+    return std_status
+
+
+def case_paths(test_jar_path, input_path):
+    """Returns (output path, log path) of one test JAR on one input file."""
+    jar_name_no_ext = os.path.splitext(os.path.basename(test_jar_path))[0]
+    input_name_no_ext = os.path.splitext(os.path.basename(input_path))[0]
+    return (os.path.join(OUT_DIR, f"{jar_name_no_ext}_{input_name_no_ext}.txt"),
+            os.path.join(LOG_DIR, f"{jar_name_no_ext}_{input_name_no_ext}.log"))
+
+
+def submit_when_done(executor, future, fn, *args):
+    """
+    Submits fn(*args) to the pool once `future` has finished and returns a Future of its result,
+    so no pool thread sits blocked waiting for `future`. If it has already finished, fn is submitted at once.
+    """
+    result = concurrent.futures.Future()
+    def relay(inner):
+        if inner.cancelled():
+            result.cancel()
+        elif inner.exception() is not None:
+            result.set_exception(inner.exception())
+        else:
+            result.set_result(inner.result())
+    def launch(_):
+        try:
+            executor.submit(fn, *args).add_done_callback(relay)
+        except RuntimeError as e: # The pool is shutting down
+            result.set_exception(e)
+    future.add_done_callback(launch)
+    return result
+
+def judge_case(test_jar_path, input_path, std_future):
+    """
+    Runs one test JAR on one input file and returns its final status.
+    The test JAR runs concurrently with the standard JAR; the comparison starts
+    as soon as std_future (the standard run for the same input) has finished.
+    With calibrated time limits the case is only submitted once std_future has finished (submit_when_done).
+    """
+    test_jar_name = os.path.basename(test_jar_path)
+    input_basename = os.path.basename(input_path)
+    input_name_no_ext = os.path.splitext(input_basename)[0]
+    case_name = f"{test_jar_name}/{input_basename}" # Prefix for messages, since cases run interleaved
+
+    # Define output and log paths for this test run
+    test_out_path, log_path = case_paths(test_jar_path, input_path)
+
+    # Standard output path
+    std_ans_basename = input_name_no_ext + ".ans"
+    std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
+
+    # Run the test JAR (the standard JAR may still be running on the same input). A calibrated time limit needs
+    # std's time on this input, so then the case was submitted after the standard run finished instead.
+    calibrated = LIMITS.enabled and STD_BACKEND == "jar"
+    test_status = test_wall = None
+    test_timeout = TIMEOUT_SECONDS
+    if not calibrated:
+        print(f"  测试 {case_name}")
+        test_run_start = time.perf_counter()
+        test_status, _, test_stderr_content = run_jar(test_jar_path, input_path, test_out_path, TIMEOUT_SECONDS)
+        test_wall = time.perf_counter() - test_run_start
+
+    # Wait for the standard run, then get its status for this input
+    try:
+        std_future.result()
+    except Exception as e:
+        print(f"    警告: 标准 JAR 处理 {input_basename} 时发生意外错误: {e}")
+    std_status = std_run_statuses.get(input_basename, 'Skipped (Internal Error - No Std Status Found)')
+
+    final_status = 'Unknown' # Default status
+
+    # Discard the test run if standard JAR timed out
+    if std_status == 'TLE':
+        print(f"    {case_name}: 跳过，因为标准 JAR 超时。")
+        final_status = 'AC (Skipped - Std TLE)'
+        # Create a minimal log indicating skip reason
+        create_log_file(log_path, input_path, std_ans_path, "", std_status, None, b"", final_status)
+        RESULTS.record(test_jar_path, input_path, std_status, test_status, final_status, test_wall, test_timeout)
+        return final_status
+    elif std_status == 'Skipped (Internal Error - No Std Status Found)':
+         print(f"    {case_name}: 跳过对比，未找到标准运行状态。")
+         RESULTS.record(test_jar_path, input_path, None, test_status, std_status, test_wall, test_timeout)
+         return std_status
+
+    if calibrated:
+        test_timeout = LIMITS.timeout_for(input_basename, TIMEOUT_SECONDS)
+        print(f"  测试 {case_name} ({LIMITS.describe_limit(input_basename, TIMEOUT_SECONDS)})")
+        test_run_start = time.perf_counter()
+        test_status, _, test_stderr_content = run_jar(test_jar_path, input_path, test_out_path, test_timeout)
+        test_wall = time.perf_counter() - test_run_start
+
+    # Determine final status based on comparison
+    comparison_needed = False
+    comparison = None
+    if std_status == test_status:
+        if std_status == 'AC':
+            comparison_needed = True # Both AC, need to compare output
+        else:
+            # Both failed in the same way (RE) - Treat as AC for comparison purposes
+            # TLE case is handled above by skipping
+            final_status = 'AC'
+            print(f"    {case_name}: 状态匹配 ({std_status})。接受。")
+    else:
+        # Statuses differ
+        if test_status == 'AC':
+            # Test JAR passed but standard failed (RE) - this is effectively WA
+            final_status = 'WA'
+            print(f"    {case_name}: 状态不匹配: 测试 JAR 为 AC, 标准 JAR 为 {std_status}。标记为 WA。")
+            comparison_needed = True # Compare output to see the difference
+        else:
+            # Test JAR failed differently than standard JAR, or standard passed and test failed
+            final_status = test_status # Report the test JAR's failure status (TLE or RE)
+            print(f"    {case_name}: 状态不匹配: 测试 JAR 为 {test_status}, 标准 JAR 为 {std_status}。标记为 {final_status}。")
+
+    # Compare outputs if needed
+    if comparison_needed:
+         with PROFILER.phase("compare", case_name):
+             comparison = compare_outputs(std_ans_path, test_out_path, input_path)
+         if comparison.match:
+             # If outputs match, and we reached here, it means std_status was AC
+             final_status = 'AC'
+             print(f"    {case_name}: 输出匹配。接受。")
+             ratio = LIMITS.check_slow(test_jar_name, input_basename, *measured_time(test_jar_name, input_basename, test_wall))
+             if ratio is not None:
+                 final_status = SLOW_STATUS
+                 print(f"    {case_name}: 输出正确但用时为标程的 {ratio:.1f} 倍。标记为 {SLOW_STATUS}。")
+         else:
+             # Outputs differ
+             final_status = 'WA'
+             print(f"    {case_name}: 输出与标准答案不同。标记为 WA。")
+
+    # Create log for any non-AC status, including RE, TLE, WA
+    if final_status not in ('AC', SLOW_STATUS, 'AC (Skipped - Std TLE)'):
+         with PROFILER.phase("log_write", case_name):
+             create_log_file(log_path, input_path, std_ans_path, test_out_path,
+                             std_status, test_status, test_stderr_content, final_status, comparison)
+    RESULTS.record(test_jar_path, input_path, std_status, test_status, final_status, test_wall, test_timeout, comparison)
+    return final_status
+
+
+def run_test_case(test_jar_path, input_path):
+    """Vote mode: runs one test JAR on one input file; returns (status, stderr_content)."""
+    print(f"  测试 {os.path.basename(test_jar_path)}/{os.path.basename(input_path)}")
+    status, _, stderr_content = run_jar(test_jar_path, input_path, case_paths(test_jar_path, input_path)[0], TIMEOUT_SECONDS)
+    return status, stderr_content
+
+
+def describe_divergence(comparison):
+    """The first differing output line and the input command behind it, for the vote report."""
+    if comparison is None or not comparison.mismatches:
+        return ""
+    mismatch = comparison.mismatches[0]
+    if mismatch.input_line is None:
+        return f", 首个差异在输出第 {mismatch.output_line} 行 (已超出最后一条命令)"
+    return f", 首个差异在输出第 {mismatch.output_line} 行 (输入第 {mismatch.input_line} 行: {mismatch.input_command})"
+
+
+def vote_case(input_path, run_futures):
+    """
+    Vote mode (N-version differential testing): waits for every test JAR's run on one input and groups
+    them by output content (RE runs form one group, TLE runs never vote). The largest group is taken as
+    the expected output if it holds at least VOTE_QUORUM of all jars and no other group is as large;
+    its jars are AC, the others WA / RE / TLE with a log against the majority output.
+    Returns {test_jar_path: final_status}.
+    """
+    input_basename = os.path.basename(input_path)
+    runs = {}
+    for test_jar_path, future in run_futures.items():
+        try:
+            runs[test_jar_path] = future.result()
+        except Exception as e:
+            print(f"    警告: {os.path.basename(test_jar_path)}/{input_basename} 运行时发生意外错误: {e}")
+            runs[test_jar_path] = ('RE', str(e).encode(errors='ignore'))
+
+    with PROFILER.phase("vote", input_basename):
+        groups = {} # {output digest or 'RE': [test_jar_path]}
+        for test_jar_path, (status, _) in runs.items():
+            if status == 'AC':
+                groups.setdefault(output_digest(case_paths(test_jar_path, input_path)[0]), []).append(test_jar_path)
+            elif status == 'RE':
+                groups.setdefault('RE', []).append(test_jar_path)
+        ranked = sorted(groups.items(), key=lambda item: len(item[1]), reverse=True)
+        group_text = " | ".join(", ".join(os.path.basename(p) for p in jars) + (" (RE)" if key == 'RE' else "")
+                                for key, jars in ranked)
+
+        if not ranked or len(ranked[0][1]) < VOTE_QUORUM * len(runs) or \
+                (len(ranked) > 1 and len(ranked[1][1]) == len(ranked[0][1])):
+            print(f"    {input_basename}: 没有达到法定人数的多数输出，跳过。")
+            vote_summaries[input_basename] = f"{input_basename}: 无多数 ({len(runs)} 个 JAR) - 分组: {group_text or '无'}"
+            for test_jar_path, (status, _) in runs.items():
+                RESULTS.record(test_jar_path, input_path, "vote", status, 'Skipped (No Quorum)', limit_s=TIMEOUT_SECONDS)
+            return {test_jar_path: 'Skipped (No Quorum)' for test_jar_path in runs}
+
+        winner, majority = ranked[0]
+        reference_out = case_paths(majority[0], input_path)[0]
+        majority_label = f"测试 JAR 多数输出 ({len(majority)}/{len(runs)}, 如 {os.path.basename(majority[0])})" + \
+                         (" - RE" if winner == 'RE' else "")
+        results, minority_lines = {}, []
+        for test_jar_path, (status, stderr_content) in sorted(runs.items()):
+            if test_jar_path in majority:
+                results[test_jar_path] = 'AC'
+                RESULTS.record(test_jar_path, input_path, "vote", status, 'AC', limit_s=TIMEOUT_SECONDS)
+                continue
+            test_out_path, log_path = case_paths(test_jar_path, input_path)
+            final_status = 'WA' if status == 'AC' else status
+            comparison = compare_outputs(reference_out, test_out_path, input_path)
+            print(f"    {os.path.basename(test_jar_path)}/{input_basename}: 与多数输出不一致。标记为 {final_status}。")
+            create_log_file(log_path, input_path, reference_out, test_out_path,
+                            majority_label, status, stderr_content, final_status, comparison)
+            minority_lines.append(f"    {os.path.basename(test_jar_path)}: {final_status}{describe_divergence(comparison)}")
+            results[test_jar_path] = final_status
+            RESULTS.record(test_jar_path, input_path, "vote", status, final_status, limit_s=TIMEOUT_SECONDS, comparison=comparison)
+
+    vote_summaries[input_basename] = "\n".join(
+        [f"{input_basename}: 多数 {len(majority)}/{len(runs)} - 分组: {group_text}"] + minority_lines)
+    return results
+
+
+def write_vote_report(report_path, overall_results):
+    """Vote mode: per-input groups and minority jars, then how often each jar was outvoted."""
+    minority_count = {name: sum(s in ('WA', 'RE', 'TLE') for s in results.values())
+                      for name, results in overall_results.items()}
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(f"--- 多数投票报告 (quorum {VOTE_QUORUM:.0%}) ---\n\n")
+        for input_basename in sorted(vote_summaries):
+            f.write(vote_summaries[input_basename] + "\n")
+        f.write("\n各 JAR 处于少数的次数:\n")
+        for name in sorted(minority_count, key=lambda n: -minority_count[n]):
+            f.write(f"  - {name}: {minority_count[name]}/{len(overall_results[name])}\n")
+
+
 # --- 主脚本逻辑 (Main Script Logic) ---
 
 if __name__ == "__main__":
@@ -437,14 +626,21 @@ if __name__ == "__main__":
     print("\n--- Phase 2: Locating Files ---")
     # Standard JAR
     std_jars = glob.glob(os.path.join(STD_DIR, "*.jar"))
-    if not std_jars:
-        print(f"错误: 在 '{STD_DIR}' 中未找到标准 JAR 文件。")
+    if STD_BACKEND == "oracle":
+        std_jar_path = None
+        print("使用参考实现 oracle.py 代替标准 JAR。")
+    elif STD_BACKEND == "vote":
+        std_jar_path = None
+        print(f"多数投票模式: 不使用标准 JAR，以测试 JAR 的多数输出为准 (quorum {VOTE_QUORUM:.0%})。")
+    elif not std_jars:
+        print(f"错误: 在 '{STD_DIR}' 中未找到标准 JAR 文件。(没有可信的标准 JAR 时可设置 JUDGE_STD=vote 使用多数投票)")
         sys.exit(1)
-    if len(std_jars) > 1:
+    elif len(std_jars) > 1:
         print(f"错误: 在 '{STD_DIR}' 中找到多个 JAR 文件。请确保只有一个标准 JAR。")
         sys.exit(1)
-    std_jar_path = std_jars[0]
-    print(f"使用标准 JAR: {os.path.basename(std_jar_path)}")
+    else:
+        std_jar_path = std_jars[0]
+        print(f"使用标准 JAR: {os.path.basename(std_jar_path)}")
 
     # Test JAR(s)
     test_jar_paths = glob.glob(os.path.join(TESTJAR_DIR, "*.jar"))
@@ -453,6 +649,8 @@ if __name__ == "__main__":
         # Allow script to continue to potentially just run the standard JAR
     else:
         print(f"找到 {len(test_jar_paths)} 个测试 JAR: {[os.path.basename(p) for p in test_jar_paths]}")
+    if STD_BACKEND == "vote" and len(test_jar_paths) < 3:
+        print("警告: 多数投票模式下测试 JAR 少于 3 个，多数结果可能没有意义。")
 
     # Input Files
     input_files = sorted(glob.glob(os.path.join(DATA_DIR, "*.txt")))
@@ -466,124 +664,73 @@ if __name__ == "__main__":
              sys.exit(1) # Exit if data generation was requested but failed silently
     print(f"找到 {len(input_files)} 个输入数据文件。")
 
-    # 4. Generate Standard Outputs
-    print("\n--- Phase 3: Generating Standard Outputs ---")
+    # 4. Pipelined Standard & Test Runs
+    print(f"\n--- Phase 3: Standard Outputs & Comparison Testing (up to {MAX_WORKERS} parallel runs) ---")
     std_run_statuses.clear() # Ensure fresh status dictionary
-    for input_path in input_files:
-        input_basename = os.path.basename(input_path)
-        # Construct standard output filename (e.g., testcase_1.ans)
-        std_ans_basename = os.path.splitext(input_basename)[0] + ".ans"
-        std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
+    test_jar_paths.sort() # Deterministic jar order for reports
+    case_futures = {} # {(test_jar_path, input_path): Future[final_status]}
+    vote_futures = {} # Vote mode: {input_path: Future[{test_jar_path: final_status}]}
+    resumed_results = {} # JUDGE_RESUME=1: {(test_jar_path, input_path): verdict streamed by an earlier run}
+    vote_summaries.clear()
+    RESULTS.start(std_jar_path, STD_BACKEND, TIMEOUT_SECONDS)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Submit per input, std first: the pool dequeues tasks in FIFO order, so an input's std run
+        # always starts before its test runs, and a test run waiting on std can never starve the pool.
+        # With calibrated limits a test run needs std's time, so its case is submitted by a callback once
+        # the std run is done: later inputs' std runs keep the pool busy meanwhile.
+        calibrated = LIMITS.enabled and STD_BACKEND == "jar"
+        for input_path in input_files:
+            if STD_BACKEND == "vote":
+                # Same ordering argument: all runs of an input are dequeued before its vote waits on them
+                run_futures = {test_jar_path: executor.submit(run_test_case, test_jar_path, input_path)
+                               for test_jar_path in test_jar_paths}
+                vote_futures[input_path] = executor.submit(vote_case, input_path, run_futures)
+                continue
+            for test_jar_path in test_jar_paths:
+                record = RESULTS.reusable(test_jar_path, input_path)
+                if record:
+                    resumed_results[(test_jar_path, input_path)] = record["verdict"]
+            pending = [p for p in test_jar_paths if (p, input_path) not in resumed_results]
+            if test_jar_paths and not pending:
+                continue # Every jar was judged on this input by the run being resumed: std is not needed either
+            std_future = executor.submit(run_std_case, std_jar_path, input_path)
+            for test_jar_path in pending:
+                if calibrated:
+                    case_futures[(test_jar_path, input_path)] = submit_when_done(
+                        executor, std_future, judge_case, test_jar_path, input_path, std_future)
+                else:
+                    case_futures[(test_jar_path, input_path)] = executor.submit(judge_case, test_jar_path, input_path, std_future)
+        # Callback submissions must happen before the pool shuts down at the end of this block
+        concurrent.futures.wait(case_futures.values())
+    RESULTS.close()
 
-        print(f"  处理 {input_basename} 使用标准 JAR...")
-        # Give standard JAR more time
-        std_status, _, std_stderr = run_jar(std_jar_path, input_path, std_ans_path, timeout=(TIMEOUT_SECONDS * STD_TIMEOUT_FACTOR))
-        std_run_statuses[input_basename] = std_status # Store the status
-
-        # Create empty output file if run failed, for consistency
-        if std_status != 'AC' and not os.path.exists(std_ans_path):
-             try:
-                 with open(std_ans_path, 'w') as f_empty: pass # Create empty file
-                 print(f"    为 {input_basename} 创建了空的标准输出文件，因为状态为 {std_status}。")
-             except Exception as e_create:
-                 print(f"    警告: 创建空输出文件 {std_ans_path} 失败: {e_create}")
-
-        if std_status == 'RE':
-            print(f"    警告: 标准 JAR 在 {input_basename} 上报告了 RE。")
-            # Optionally log std_stderr here if needed
-        elif std_status == 'TLE':
-            print(f"    警告: 标准 JAR 在 {input_basename} 上报告了 TLE。")
-
-    print("标准输出生成完成。")
-
-    # 5. Run Comparison Testing
-    print("\n--- Phase 4: Comparison Testing ---")
+    print("标准输出生成与对比测试完成。")
+    if resumed_results:
+        print(f"复用了 {RESULTS.path} 中上次运行的 {len(resumed_results)} 个用例结果 (JUDGE_RESUME=1)。")
+
+    # 5. Collect Results (in sorted jar / input order, independent of completion order)
+    print("\n--- Phase 4: Collecting Results ---")
     overall_results = {} # {jar_name: {input_name: status}}
 
     if not test_jar_paths:
         print("未找到测试 JAR。跳过对比测试。")
     else:
         for test_jar_path in test_jar_paths:
-            test_jar_name = os.path.basename(test_jar_path)
-            print(f"\n--- 测试 JAR: {test_jar_name} ---")
             jar_results = {}
-            overall_results[test_jar_name] = jar_results
-
+            overall_results[os.path.basename(test_jar_path)] = jar_results
             for input_path in input_files:
                 input_basename = os.path.basename(input_path)
-                input_name_no_ext = os.path.splitext(input_basename)[0]
-                print(f"  测试输入: {input_basename}")
-
-                # Define output and log paths for this test run
-                test_out_filename = f"{os.path.splitext(test_jar_name)[0]}_{input_name_no_ext}.txt"
-                test_out_path = os.path.join(OUT_DIR, test_out_filename)
-                log_filename = f"{os.path.splitext(test_jar_name)[0]}_{input_name_no_ext}.log"
-                log_path = os.path.join(LOG_DIR, log_filename)
-
-                # Standard output path
-                std_ans_basename = input_name_no_ext + ".ans"
-                std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
-
-                # Get the status of the standard run for this input
-                std_status = std_run_statuses.get(input_basename, 'Skipped (Internal Error - No Std Status Found)')
-
-                final_status = 'Unknown' # Default status
-
-                # Skip test run if standard JAR timed out
-                if std_status == 'TLE':
-                    print(f"    跳过 {input_basename} 的测试运行，因为标准 JAR 超时。")
-                    final_status = 'AC (Skipped - Std TLE)'
-                    jar_results[input_basename] = final_status
-                    # Create a minimal log indicating skip reason
-                    create_log_file(log_path, input_path, std_ans_path, "", std_status, None, b"", final_status)
-                    continue # Move to the next input file
-                elif std_status == 'Skipped (Internal Error - No Std Status Found)':
-                     print(f"    跳过对比: 未找到 '{input_basename}' 的标准运行状态。")
-                     jar_results[input_basename] = std_status
-                     continue
-
-                # Run the test JAR
-                test_status, _, test_stderr_content = run_jar(test_jar_path, input_path, test_out_path, TIMEOUT_SECONDS)
-
-                # Determine final status based on comparison
-                comparison_needed = False
-                if std_status == test_status:
-                    if std_status == 'AC':
-                        comparison_needed = True # Both AC, need to compare output
-                    else:
-                        # Both failed in the same way (RE) - Treat as AC for comparison purposes
-                        # TLE case is handled above by skipping
-                        final_status = 'AC'
-                        print(f"    状态匹配 ({std_status})。接受。")
-                else:
-                    # Statuses differ
-                    if test_status == 'AC':
-                        # Test JAR passed but standard failed (RE) - this is effectively WA
-                        final_status = 'WA'
-                        print(f"    状态不匹配: 测试 JAR 为 AC, 标准 JAR 为 {std_status}。标记为 WA。")
-                        comparison_needed = True # Compare output to see the difference
+                try:
+                    if (test_jar_path, input_path) in resumed_results:
+                        jar_results[input_basename] = resumed_results[(test_jar_path, input_path)]
+                    elif STD_BACKEND == "vote":
+                        jar_results[input_basename] = vote_futures[input_path].result()[test_jar_path]
                     else:
-                        # Test JAR failed differently than standard JAR, or standard passed and test failed
-                        final_status = test_status # Report the test JAR's failure status (TLE or RE)
-                        print(f"    状态不匹配: 测试 JAR 为 {test_status}, 标准 JAR 为 {std_status}。标记为 {final_status}。")
-
-                # Compare outputs if needed
-                if comparison_needed:
-                     if compare_outputs(std_ans_path, test_out_path):
-                         # If outputs match, and we reached here, it means std_status was AC
-                         final_status = 'AC'
-                         print(f"    输出匹配。接受。")
-                     else:
-                         # Outputs differ
-                         final_status = 'WA'
-                         print(f"    输出与标准答案不同。标记为 WA。")
-
-                # Store result and create log if not AC
-                jar_results[input_basename] = final_status
-                # Create log for any non-AC status, including RE, TLE, WA
-                if final_status != 'AC' and final_status != 'AC (Skipped - Std TLE)':
-                     create_log_file(log_path, input_path, std_ans_path, test_out_path,
-                                     std_status, test_status, test_stderr_content, final_status)
+                        jar_results[input_basename] = case_futures[(test_jar_path, input_path)].result()
+                except Exception as e:
+                    print(f"  错误: {os.path.basename(test_jar_path)}/{input_basename} 评测过程中发生意外错误: {e}")
+                    jar_results[input_basename] = f"Skipped (Internal Error: {e})"
 
     # 6. Generate Reports
     print("\n--- Phase 5: Generating Reports ---")
@@ -598,7 +745,7 @@ if __name__ == "__main__":
 
             total_cases = len(results)
             # Use a dictionary for counts for flexibility
-            counts = {'AC': 0, 'WA': 0, 'TLE': 0, 'RE': 0, 'AC (Skipped - Std TLE)': 0, 'Other Skipped': 0}
+            counts = {'AC': 0, SLOW_STATUS: 0, 'WA': 0, 'TLE': 0, 'RE': 0, 'AC (Skipped - Std TLE)': 0, 'Other Skipped': 0}
             failed_or_skipped_cases = [] # List of tuples (input_name, status)
 
             for input_name, status in results.items():
@@ -609,21 +756,24 @@ if __name__ == "__main__":
 
                 counts[count_status] = counts.get(count_status, 0) + 1
 
-                # Log non-AC cases for the report details, showing original status
-                if status != 'AC':
+                # Log non-AC cases for the report details, showing original status (slow ones get their own section)
+                if status == 'TLE':
+                    failed_or_skipped_cases.append((input_name, f"TLE, {LIMITS.describe_limit(input_name, TIMEOUT_SECONDS)}"))
+                elif status not in ('AC', SLOW_STATUS):
                     failed_or_skipped_cases.append((input_name, status))
 
             # Sort failed/skipped cases for consistent reporting
             failed_or_skipped_cases.sort()
 
             try:
-                with open(report_path, 'w', encoding='utf-8') as f:
+                with PROFILER.phase("report_write"), open(report_path, 'w', encoding='utf-8') as f:
                     f.write(f"--- 测试报告: {test_jar_name} ---\n\n")
                     f.write(f"总处理测试用例数: {total_cases}\n")
                     f.write("结果汇总:\n")
 
                     # Write counts for each status category if > 0
                     if counts['AC'] > 0: f.write(f"  - AC (通过):              {counts['AC']}\n")
+                    if counts[SLOW_STATUS] > 0: f.write(f"  - AC (通过但偏慢):        {counts[SLOW_STATUS]}\n")
                     if counts['WA'] > 0: f.write(f"  - WA (答案错误):          {counts['WA']}\n")
                     if counts['TLE'] > 0: f.write(f"  - TLE (超时):             {counts['TLE']}\n")
                     if counts['RE'] > 0: f.write(f"  - RE (运行时错误):        {counts['RE']}\n")
@@ -637,14 +787,38 @@ if __name__ == "__main__":
                         for name, status in failed_or_skipped_cases:
                             f.write(f"  - {name}: {status}\n")
                     # Write overall success message if applicable
-                    elif counts['AC'] == total_cases:
+                    elif counts['AC'] + counts[SLOW_STATUS] == total_cases:
                          f.write("\n*** 所有测试用例通过! ***\n")
                     else: # Some skipped but no failures
                          f.write("\n*** 所有运行的测试用例通过 (部分用例可能被跳过)。 ***\n")
 
+                    slow_lines = LIMITS.slow_lines(test_jar_name)
+                    if slow_lines:
+                        f.write("\n" + "\n".join(slow_lines) + "\n")
+
+                    # CPU / memory of this jar's runs, so heavy but passing submissions stand out
+                    usage_lines = USAGE.jar_lines(test_jar_name)
+                    if usage_lines:
+                        f.write("\n" + "\n".join(usage_lines) + "\n")
+
             except Exception as e:
                 print(f"  写入报告 {report_path} 时出错: {e}")
 
+        if STD_BACKEND == "vote":
+            vote_report_path = os.path.join(os.path.dirname(sys.argv[0]) or '.', VOTE_REPORT)
+            print(f"  生成多数投票报告: {vote_report_path}")
+            try:
+                write_vote_report(vote_report_path, overall_results)
+            except Exception as e:
+                print(f"  写入报告 {vote_report_path} 时出错: {e}")
+
+    print(STD_CACHE.summary())
+    print(LIMITS.summary(TIMEOUT_SECONDS))
+    summary_path = RESULTS.write_summary()
+    if summary_path:
+        print(f"结果流: {RESULTS.path}, 汇总: {summary_path} (python result_stream.py 可合并多个结果流重新生成)")
+    USAGE.report()
+    PROFILER.report()
     end_overall_time = time.time()
     print(f"\n--- 测试完成 ---")
     print(f"总执行时间: {end_overall_time - start_overall_time:.2f} 秒。")
@@ -4,6 +4,14 @@ import string
 import sys
 import time
 import math  # For potential calculations
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import topology
+import outcome_coverage
+import message_state
+from output_compare import build_line_index
+from outcome_coverage import COVERAGE
 
 # --- 配置常量 (Configuration Constants) ---
 MODE_PUBLIC = 's'
@@ -48,26 +56,80 @@ EXCEPTION_TARGET_COMMANDS = [  # Commands potentially causing exceptions (needs
     "am", "aem", "arem", "afm", "sm", "sei", "dce", "qsv", "qrm", "qp", "qm"
 ]
 
+# --- 批量生成 (Batch Generation) ---
+DEFAULT_WORKERS = os.cpu_count() or 1  # Generator processes; each process has its own copy of the state below
+MANIFEST_PATH = os.path.join("data", "manifest.json")  # Per-file seeds, for bit-for-bit regeneration
+
+# --- 索引集合 (Indexed Set) ---
+class IndexedSet:
+    """
+    A set kept as an array plus an item -> position map, so add / discard / membership
+    and uniform random sampling are all O(1) (no tuple(...) / list(...) copy per pick).
+    """
+    __slots__ = ("items", "positions")
+
+    def __init__(self, iterable=()):
+        self.items = []
+        self.positions = {}
+        for item in iterable: self.add(item)
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def discard(self, item):
+        pos = self.positions.pop(item, None)
+        if pos is None: return
+        last = self.items.pop()
+        if pos < len(self.items):  # Move the last item into the hole
+            self.items[pos] = last
+            self.positions[last] = pos
+
+    def clear(self):
+        self.items.clear()
+        self.positions.clear()
+
+    def choice(self):
+        return random.choice(self.items) if self.items else None
+
+    def sample(self, k):
+        return random.sample(self.items, k)  # O(k) for large sets
+
+    def __contains__(self, item): return item in self.positions
+
+    def __len__(self): return len(self.items)
+
+    def __iter__(self): return iter(self.items)
+
+
 # --- 状态变量 (State Variables) ---
-# (State variables remain the same as the previous hw11 version)
-persons = set()
-person_details = {}  # {pid: {'name': str, 'age': int, 'social_value': int, 'money': int}}
-relations = set()  # {(p1, p2) with p1 < p2}
+persons = IndexedSet()
+person_details = {}  # {pid: {'name': str, 'age': int}}
+relations = IndexedSet()  # {(p1, p2) with p1 < p2}
 relation_values = {}  # {(p1, p2): value}
-person_tags = {}  # {pid: set_of_tag_ids}
-tag_members = {}  # {(owner_pid, tag_id): set_of_member_pids}
-official_accounts = set()
+acquaintances = {}  # {pid: IndexedSet_of_linked_pids}, mirrors relations
+person_tags = {}  # {pid: IndexedSet_of_tag_ids}
+tag_members = {}  # {(owner_pid, tag_id): IndexedSet_of_member_pids}
+official_accounts = IndexedSet()
 account_details = {}  # {acc_id: {'owner': pid, 'name': str}}
-followers = {}  # {acc_id: set_of_follower_pids}
-articles = set()  # art_id
+followers = {}  # {acc_id: IndexedSet_of_follower_pids}
+followed_accounts = {}  # {pid: set_of_acc_ids}, reverse index of followers
+articles = IndexedSet()  # art_id
 article_details = {}  # {art_id: {'account': acc_id, 'contributor': pid, 'name': str}}
 account_articles = {}  # {acc_id: set_of_art_ids}
 contributions = {}  # {acc_id: {contrib_pid: count}}
-network_messages_store = {}  # {msg_id: details_dict}
-person_received_message_ids = {}  # {pid: list_of_msg_ids}
-network_emoji_ids = set()  # Stored emoji IDs by 'sei'
-network_emoji_heat = {}  # {emoji_id: heat_count}
+person_received_articles = {}  # {pid: {art_id: live count}}, what afm may forward
+unsent_message_ids = IndexedSet()  # msg_ids with is_sent == False
+sent_message_ids = IndexedSet()  # msg_ids with is_sent == True
+network_emoji_ids = IndexedSet()  # Stored emoji IDs by 'sei'
+# Messages, emoji heat, social value, money and received messages (message_state.py)
+MESSAGES = message_state.MessageSystem(lambda a, b: (min(a, b), max(a, b)) in relations,
+                                       lambda pid: person_tags.get(pid, ()))
+MESSAGE_QUERIES = {"qsv", "qm", "qrm", "qp"}  # answered from MESSAGES, checked against oracle.py
+message_answers = []  # (output line, expected, command line) of the current file
 next_message_id = 0
+worst_case_topology = None  # topology.Topology driving the current worst-case file, None until its ln block
 
 # --- 运行时变量 (Runtime variables) ---
 instructions_generated_total = 0
@@ -103,8 +165,11 @@ def generate_random_message_delivery_type(): return random.randint(0, 1)
 def generate_random_limit(): return random.randint(0, 100)
 
 
+_fallback_hints = {}  # {(id(container), max_val): last fallback id}, only a starting point, every id is re-checked
+
+
 def generate_unique_id(existing_ids, min_val=-10000, max_val=10000):
-    if not isinstance(existing_ids, set):
+    if not isinstance(existing_ids, (set, frozenset, dict, IndexedSet, type({}.keys()))):  # Only copy if 'in' would be slow
         try:
             existing_ids = set(existing_ids)
         except TypeError:
@@ -118,16 +183,16 @@ def generate_unique_id(existing_ids, min_val=-10000, max_val=10000):
             existing_ids = temp_set
 
     attempts = 0
-    max_attempts = len(existing_ids) + 2000
+    max_attempts = len(existing_ids) + 2000 if len(existing_ids) < max_val - min_val + 1 else 0  # Full range: no point
     while attempts < max_attempts:
         new_id = random.randint(min_val, max_val)
         if new_id not in existing_ids: return new_id
         attempts += 1
-    fallback_id = max_val + 1
-    if existing_ids:
-        numeric_ids = {id_ for id_ in existing_ids if isinstance(id_, (int, float))}
-        if numeric_ids: fallback_id = max(numeric_ids) + 1
+    # Probe upwards from the last fallback handed out for this container instead of scanning it for its max
+    hint_key = (id(existing_ids), max_val)
+    fallback_id = max(max_val + 1, _fallback_hints.get(hint_key, max_val + 1))
     while fallback_id in existing_ids: fallback_id += 1
+    _fallback_hints[hint_key] = fallback_id
     if fallback_id > max_val + 100000:
         print(f"Warning: Unique ID generation struggling significantly. Current fallback: {fallback_id}",
               file=sys.stderr)
@@ -135,92 +200,74 @@ def generate_unique_id(existing_ids, min_val=-10000, max_val=10000):
 
 
 def get_random_existing_person():
-    if not persons: return None
-    try:
-        return random.choice(tuple(persons))
-    except IndexError:
-        return None
+    return persons.choice()
 
 
 def get_two_random_existing_persons():
     if len(persons) < 2: return None, None
-    try:
-        return random.sample(list(persons), 2)
-    except ValueError:
-        return None, None
+    return persons.sample(2)
+
+
+def get_random_relation():
+    return relations.choice()
+
+
+def get_random_acquaintance(person_id):
+    linked = acquaintances.get(person_id)
+    return linked.choice() if linked else None
 
 
 def get_random_tag_for_person(person_id):
     tags_set = person_tags.get(person_id)
-    if not tags_set: return None
-    try:
-        return random.choice(tuple(tags_set))
-    except IndexError:
-        return None
+    return tags_set.choice() if tags_set else None
 
 
 def get_random_member_for_tag(owner_id, tag_id):
     members_set = tag_members.get((owner_id, tag_id))
-    if not members_set: return None
-    try:
-        return random.choice(tuple(members_set))
-    except IndexError:
-        return None
+    return members_set.choice() if members_set else None
 
 
 def get_random_existing_account():
-    if not official_accounts: return None
-    try:
-        return random.choice(tuple(official_accounts))
-    except IndexError:
-        return None
+    return official_accounts.choice()
 
 
 def get_random_existing_article():
-    if not articles: return None
-    try:
-        return random.choice(tuple(articles))
-    except IndexError:
-        return None
+    return articles.choice()
 
 
 def get_random_follower(account_id):
     follower_set = followers.get(account_id)
-    if not follower_set: return None
-    try:
-        return random.choice(tuple(follower_set))
-    except IndexError:
-        return None
+    return follower_set.choice() if follower_set else None
+
+
+def get_random_received_article(person_id):
+    received = [art_id for art_id in person_received_articles.get(person_id, ()) if art_id in articles]
+    return random.choice(received) if received else None
 
 
 def get_random_existing_message_id(sent_status=None):
-    possible_messages = [
-        msg_id for msg_id, details in network_messages_store.items()
-        if sent_status is None or details['is_sent'] == sent_status
-    ]
-    if not possible_messages: return None
-    try:
-        return random.choice(possible_messages)
-    except IndexError:
-        return None
+    if sent_status is False: return unsent_message_ids.choice()
+    if sent_status is True: return sent_message_ids.choice()
+    total = len(unsent_message_ids) + len(sent_message_ids)
+    if total == 0: return None
+    index = random.randrange(total)
+    if index < len(unsent_message_ids): return unsent_message_ids.items[index]
+    return sent_message_ids.items[index - len(unsent_message_ids)]
 
 
 def get_random_stored_emoji_id():
-    if not network_emoji_ids: return None
-    try:
-        return random.choice(tuple(network_emoji_ids))
-    except IndexError:
-        return None
+    return network_emoji_ids.choice()
 
 
 # --- 状态更新函数 (State Update Functions) ---
-# (State update functions remain the same as the previous hw11 version)
+# All indexes (acquaintances, followed_accounts, unsent/sent ids, MESSAGES' heaps and received views)
+# are maintained here, so the generator never scans the whole state.
 def add_person_state(pid, name, age):
     if pid in persons: return
     persons.add(pid)
-    person_details[pid] = {'name': name, 'age': age, 'social_value': 0, 'money': 0}
-    person_tags[pid] = set()
-    person_received_message_ids[pid] = []
+    person_details[pid] = {'name': name, 'age': age}
+    person_tags[pid] = IndexedSet()
+    acquaintances[pid] = IndexedSet()
 
 
 def add_relation_state(id1, id2, value):
@@ -228,6 +275,8 @@ def add_relation_state(id1, id2, value):
     if (p1, p2) in relations: return
     relations.add((p1, p2));
     relation_values[(p1, p2)] = value
+    acquaintances.setdefault(p1, IndexedSet()).add(p2)
+    acquaintances.setdefault(p2, IndexedSet()).add(p1)
 
 
 def modify_relation_state(id1, id2, m_value):
@@ -239,11 +288,15 @@ def modify_relation_state(id1, id2, m_value):
             relation_values[key] = new_value
         else:
             relations.discard(key); relation_values.pop(key, None)
+            acquaintances[p1].discard(p2); acquaintances[p2].discard(p1)
+            for owner, member in ((p1, p2), (p2, p1)):  # each side leaves the other's own tags (JML)
+                for tag_id in person_tags.get(owner, ()):
+                    tag_members[(owner, tag_id)].discard(member)
 
 
 def add_tag_state(person_id, tag_id):
-    person_tags.setdefault(person_id, set()).add(tag_id)
-    tag_members.setdefault((person_id, tag_id), set())
+    person_tags.setdefault(person_id, IndexedSet()).add(tag_id)
+    tag_members.setdefault((person_id, tag_id), IndexedSet())
 
 
 def del_tag_state(person_id, tag_id):
@@ -254,7 +307,7 @@ def del_tag_state(person_id, tag_id):
 def add_to_tag_state(person_id1, person_id2, tag_id):
     key = (person_id2, tag_id)
     if person_id2 in person_tags and tag_id in person_tags[person_id2]:
-        tag_members.setdefault(key, set()).add(person_id1)
+        tag_members.setdefault(key, IndexedSet()).add(person_id1)
 
 
 def del_from_tag_state(person_id1, person_id2, tag_id):
@@ -266,7 +319,7 @@ def add_account_state(acc_id, owner_id, name):
     if acc_id in official_accounts: return
     official_accounts.add(acc_id)
     account_details[acc_id] = {'owner': owner_id, 'name': name}
-    followers[acc_id] = set()
+    followers[acc_id] = IndexedSet()
     account_articles[acc_id] = set()
     contributions[acc_id] = {}
 
@@ -277,7 +330,8 @@ def del_account_state(acc_id):
     for art_id in articles_to_delete: del_article_state(art_id)
     official_accounts.discard(acc_id)
     account_details.pop(acc_id, None)
-    followers.pop(acc_id, None)
+    for follower_id in followers.pop(acc_id, ()):
+        followed_accounts[follower_id].discard(acc_id)
     account_articles.pop(acc_id, None)
     contributions.pop(acc_id, None)
 
@@ -290,6 +344,8 @@ def add_article_state(art_id, acc_id, person_id, name):
     account_articles.setdefault(acc_id, set()).add(art_id)
     contrib_for_acc = contributions.setdefault(acc_id, {})
     contrib_for_acc[person_id] = contrib_for_acc.get(person_id, 0) + 1
+    for follower_id in followers.get(acc_id, ()):
+        receive_article_state(follower_id, art_id)
 
 
 def del_article_state(art_id):
@@ -302,6 +358,8 @@ def del_article_state(art_id):
     person_id = details['contributor']
     articles.discard(art_id)
     if acc_id in account_articles: account_articles[acc_id].discard(art_id)
+    for follower_id in followers.get(acc_id, ()):
+        person_received_articles.get(follower_id, {}).pop(art_id, None)
     if acc_id in contributions and person_id in contributions[acc_id]:
         contributions[acc_id][person_id] -= 1
         if contributions[acc_id][person_id] <= 0:
@@ -309,143 +367,78 @@ def del_article_state(art_id):
             if not contributions[acc_id]: contributions.pop(acc_id, None)
 
 
+def receive_article_state(person_id, art_id):
+    received = person_received_articles.setdefault(person_id, {})
+    received[art_id] = received.get(art_id, 0) + 1
+
+
 def add_follower_state(person_id, acc_id):
     if acc_id in official_accounts and person_id in persons:
-        followers.setdefault(acc_id, set()).add(person_id)
+        followers.setdefault(acc_id, IndexedSet()).add(person_id)
+        followed_accounts.setdefault(person_id, set()).add(acc_id)
 
 
 def add_message_to_store_state(msg_id, msg_class, social_value_base, derived_social_value, sender_id, delivery_type,
                                receiver_id_or_tag_id, emoji_id_val=None, money_val=None, forward_article_id_val=None):
-    if msg_id in network_messages_store: return
-    details = {
-        'id': msg_id, 'msg_class': msg_class, 'social_value_base': social_value_base,
-        'derived_social_value': derived_social_value, 'sender_id': sender_id,
-        'delivery_type': delivery_type, 'is_sent': False,
-        'emoji_id_val': emoji_id_val, 'money_val': money_val,
-        'forward_article_id_val': forward_article_id_val
-    }
-    if delivery_type == 0:
-        details['receiver_id'] = receiver_id_or_tag_id
-    else:
-        details['tag_id'] = receiver_id_or_tag_id
-    network_messages_store[msg_id] = details
+    if msg_id in MESSAGES.messages: return
+    extra = next((v for v in (emoji_id_val, money_val, forward_article_id_val) if v is not None), 0)
+    members = None
+    if delivery_type == 1:  # the message keeps the tag's member set, even after the tag is deleted
+        members = tag_members.setdefault((sender_id, receiver_id_or_tag_id), IndexedSet())
+    MESSAGES.add_message(msg_id, msg_class, derived_social_value, sender_id, delivery_type, receiver_id_or_tag_id,
+                         members, extra)
+    unsent_message_ids.add(msg_id)
 
 
 def send_message_state(msg_id_to_send):
-    if msg_id_to_send not in network_messages_store: return False  # Indicate failure
-    msg = network_messages_store[msg_id_to_send]
-    if msg['is_sent']: return False  # Indicate failure (already sent)
-
-    sender_id = msg['sender_id']
-    if sender_id not in person_details: return False  # Sender doesn't exist
-
-    sender_details = person_details[sender_id]
-    actual_recipients = []
-    message_sent_successfully = False  # Track if the message could be delivered to anyone
-
-    if msg['delivery_type'] == 0:  # To person
-        receiver_id = msg['receiver_id']
-        if receiver_id in person_details and receiver_id != sender_id:
-            p1_link, p2_link = min(sender_id, receiver_id), max(sender_id, receiver_id)
-            if (p1_link, p2_link) in relations:  # Check link
-                receiver_details = person_details[receiver_id]
-                receiver_details['social_value'] += msg['derived_social_value']
-                actual_recipients.append(receiver_id)
-                if msg['msg_class'] == 'red_envelope':
-                    # Check money *before* deducting
-                    if sender_details['money'] >= msg['money_val']:
-                        sender_details['money'] -= msg['money_val']
-                        receiver_details['money'] += msg['money_val']
-                        message_sent_successfully = True
-                    else:
-                        return False  # Not enough money, send fails
-                else:
-                    message_sent_successfully = True  # Other messages send if linked
-            # else: RelationNotFound - send technically fails per JML, but we mark as sent in generator state
-            # Let's return False if relation not found, as sm command would fail.
-            else:
-                return False  # Send fails if not linked
-
-    elif msg['delivery_type'] == 1:  # To tag
-        tag_owner_id = msg['sender_id']  # Sender must own the tag
-        tag_id_val = msg['tag_id']
-        if tag_owner_id in person_tags and tag_id_val in person_tags[tag_owner_id]:
-            paid_for_red_envelope_group = False
-            members = tag_members.get((tag_owner_id, tag_id_val), set())
-            # Check money for red envelope *before* iterating members
-            if msg['msg_class'] == 'red_envelope' and sender_details['money'] < msg['money_val']:
-                return False  # Not enough money for even one recipient
-
-            for member_id in members:
-                if member_id == tag_owner_id: continue  # Skip self
-                if member_id not in person_details: continue  # Skip non-existent member
-
-                p1_link, p2_link = min(tag_owner_id, member_id), max(tag_owner_id, member_id)
-                if (p1_link, p2_link) in relations:  # Check link
-                    member_details = person_details[member_id]
-                    member_details['social_value'] += msg['derived_social_value']
-                    actual_recipients.append(member_id)
-                    if msg['msg_class'] == 'red_envelope':
-                        if not paid_for_red_envelope_group:
-                            sender_details['money'] -= msg['money_val']  # Deduct once
-                            paid_for_red_envelope_group = True
-                        member_details['money'] += msg['money_val']  # Each gets full amount
-                    message_sent_successfully = True  # At least one recipient possible
-            # If tag exists but has no valid linked members, send still "succeeds" from network perspective (message removed)
-            if not members or not message_sent_successfully:
-                # If red envelope and no one received, refund? JML implies money deducted if tag exists.
-                # Let's assume money deducted if tag exists, even if no valid recipients.
-                if msg['msg_class'] == 'red_envelope' and not paid_for_red_envelope_group:
-                    sender_details['money'] -= msg['money_val']  # Deduct even if no one receives
-                message_sent_successfully = True  # Mark as "sent" even if no one got it
-
-        else:
-            return False  # TagIdNotFound - send fails
-
-    if not message_sent_successfully:
-        # If type 0 failed due to relation or money, or type 1 failed due to tag not found or money
-        return False
-
-    # Common updates only if message was successfully processed at least partially
-    sender_details['social_value'] += msg['derived_social_value']  # Sender always gets social value if send initiated
-
-    for rec_id in actual_recipients:
-        person_received_message_ids.setdefault(rec_id, []).insert(0, msg_id_to_send)
-
-    if msg['msg_class'] == 'emoji':
-        emoji_id_val = msg['emoji_id_val']
-        if emoji_id_val in network_emoji_ids:
-            network_emoji_heat[emoji_id_val] = network_emoji_heat.get(emoji_id_val, 0) + 1
-
-    msg['is_sent'] = True
+    """Sends like the Runner: a missing relation or tag makes sm fail; there is no money check (JML)."""
+    message = MESSAGES.messages.get(msg_id_to_send)
+    receivers = MESSAGES.send(msg_id_to_send)
+    if receivers is None: return False  # Indicate failure (unknown message, RelationNotFound, TagIdNotFound)
+    if message.kind == message_state.FORWARD:
+        for receiver_id in receivers: receive_article_state(receiver_id, message.extra)
+    unsent_message_ids.discard(msg_id_to_send)
+    sent_message_ids.add(msg_id_to_send)
     return True  # Indicate success
 
 
 def store_emoji_id_state(emoji_id_to_store):
     network_emoji_ids.add(emoji_id_to_store)
-    if emoji_id_to_store not in network_emoji_heat:
-        network_emoji_heat[emoji_id_to_store] = 0
+    MESSAGES.store_emoji(emoji_id_to_store)
 
 
 def delete_cold_emoji_state(limit_val):
-    emojis_to_remove_from_store = {eid for eid, heat in network_emoji_heat.items() if heat < limit_val}
-    if not emojis_to_remove_from_store: return  # Nothing to delete
-
-    for eid in emojis_to_remove_from_store:
-        network_emoji_ids.discard(eid)
-        network_emoji_heat.pop(eid, None)
-
-    message_ids_to_delete = {
-        msg_id for msg_id, details in network_messages_store.items()
-        if details['msg_class'] == 'emoji' and details['emoji_id_val'] in emojis_to_remove_from_store
-    }
-
-    for msg_id in message_ids_to_delete:
-        network_messages_store.pop(msg_id, None)
-        for pid in list(person_received_message_ids.keys()):  # Iterate over keys copy
-            if msg_id in person_received_message_ids.get(pid, []):
-                # Create new list excluding the deleted message ID
-                person_received_message_ids[pid] = [m for m in person_received_message_ids[pid] if m != msg_id]
+    """Received messages are untouched: only the unsent messages of the deleted emojis go (JML)."""
+    emojis, message_ids = MESSAGES.delete_cold_emojis(limit_val)
+    for eid in emojis: network_emoji_ids.discard(eid)
+    for msg_id in message_ids: unsent_message_ids.discard(msg_id)
+
+
+def record_message_answers(outputs, output_line):
+    """outputs: (command line, printed line or None) of a written block, output_line: output lines before it.
+    Records the expected answer of every valid message query; returns (output lines after the block, number of
+    answers that differ from oracle.py)."""
+    differ = 0
+    for command, printed in outputs:
+        if printed is None: continue
+        output_line += 1
+        args = command.split()
+        if args[0] not in MESSAGE_QUERIES or len(args) < 2: continue
+        target = int(args[1])
+        if args[0] == "qp":
+            if target not in MESSAGES.heat: continue  # EmojiIdNotFound, not a message answer
+            expected = MESSAGES.query_popularity(target)
+        elif target not in persons:
+            continue
+        elif args[0] == "qsv":
+            expected = MESSAGES.query_social_value(target)
+        elif args[0] == "qm":
+            expected = MESSAGES.query_money(target)
+        else:
+            expected = MESSAGES.query_received_messages(target)
+        message_answers.append((output_line, expected, command))
+        differ += expected != printed
+    return output_line, differ
 
 
 # --- 辅助函数: 尝试生成参数 (Helper: Try generating params) ---
@@ -475,7 +468,7 @@ def _try_generate_command_params(command):
     # --- Modify Relation ---
     elif command == "mr":
         if relations:  # Check precondition
-            p1_mr, p2_mr = random.choice(list(relations))
+            p1_mr, p2_mr = get_random_relation()
             m_val = generate_random_m_value()
             generated.append(f"mr {p1_mr} {p2_mr} {m_val}")
             modify_relation_state(p1_mr, p2_mr, m_val)
@@ -523,7 +516,7 @@ def _try_generate_command_params(command):
     # --- Query Value ---
     elif command == "qv":
         if relations:  # Prefer existing relations for meaningful query
-            p1_qv, p2_qv = random.choice(list(relations))
+            p1_qv, p2_qv = get_random_relation()
             generated.append(f"qv {p1_qv} {p2_qv}")
         elif len(persons) >= 2:  # Query non-existent if no relations exist but people do
             p1_try_qv, p2_try_qv = get_two_random_existing_persons()
@@ -553,9 +546,7 @@ def _try_generate_command_params(command):
         p_id_qba = get_random_existing_person()
         if p_id_qba is not None:
             # Check if person has acquaintances
-            has_acquaintance = any(
-                min(p_id_qba, p2) == p_id_qba or max(p_id_qba, p1) == p_id_qba for p1, p2 in relations)
-            if has_acquaintance:
+            if acquaintances.get(p_id_qba):
                 generated.append(f"qba {p_id_qba}")
     # --- Create Official Account ---
     elif command == "coa":
@@ -618,8 +609,7 @@ def _try_generate_command_params(command):
         p_id_qra = get_random_existing_person()  # Need person
         if p_id_qra is not None:
             # Check if person follows any accounts
-            follows_any = any(p_id_qra in followers.get(acc_id, set()) for acc_id in official_accounts)
-            if follows_any:  # More likely to have received articles
+            if followed_accounts.get(p_id_qra):  # More likely to have received articles
                 generated.append(f"qra {p_id_qra}")
     # --- Store Emoji ID ---
     elif command == "sei":
@@ -640,19 +630,11 @@ def _try_generate_command_params(command):
 
         # Find valid target (person or tag)
         if msg_delivery_type == 0 and len(persons) >= 2:  # To person
-            attempts = 0
-            # Try to find a valid linked receiver. Max attempts to avoid infinite loop.
-            max_target_attempts = len(persons) * 2 + 5
-            while attempts < max_target_attempts:
-                p2_receiver = get_random_existing_person()
-                if p2_receiver is not None and p1_sender != p2_receiver:
-                    key_rel = (min(p1_sender, p2_receiver), max(p1_sender, p2_receiver))
-                    if key_rel in relations:  # Check link
-                        p2_or_tag_id = p2_receiver
-                        # target_person = p2_receiver # Not strictly needed here
-                        valid_target = True
-                        break
-                attempts += 1
+            # Pick a linked receiver directly from the sender's acquaintances
+            p2_receiver = get_random_acquaintance(p1_sender)
+            if p2_receiver is not None:
+                p2_or_tag_id = p2_receiver
+                valid_target = True
         elif msg_delivery_type == 1:  # To tag
             tag_id_target = get_random_tag_for_person(p1_sender)
             if tag_id_target is not None:
@@ -687,11 +669,8 @@ def _try_generate_command_params(command):
                                            msg_delivery_type, p2_or_tag_id, money_val=money_val)
                 next_message_id += 1
             elif command == "afm":
-                article_to_fwd = get_random_existing_article()
-                if article_to_fwd is not None:  # Check prerequisite: article exists
-                    # JML for addMessage(ForwardMessage) requires sender to have received the article.
-                    # This is hard to track perfectly in generator without simulating Person.receivedArticles.
-                    # For simplicity, we assume it's possible if article exists.
+                article_to_fwd = get_random_received_article(p1_sender)
+                if article_to_fwd is not None:  # Check prerequisite: the sender received the (existing) article
                     # The actual social value for ForwardMessage is abs(articleId) % 200 per spec.
                     derived_sv_afm = abs(article_to_fwd) % 200
                     generated.append(f"afm {msg_id} {article_to_fwd} {msg_delivery_type} {p1_sender} {p2_or_tag_id}")
@@ -710,7 +689,7 @@ def _try_generate_command_params(command):
             # else: If send_message_state returns False, don't generate 'sm' command, let strategy retry.
     # --- Delete Cold Emoji ---
     elif command == "dce":
-        if network_emoji_heat:  # Need emojis to delete
+        if MESSAGES.heat:  # Need emojis to delete
             limit_dce = generate_random_limit()
             generated.append(f"dce {limit_dce}")
             delete_cold_emoji_state(limit_dce)
@@ -723,7 +702,7 @@ def _try_generate_command_params(command):
         p_id_qrm = get_random_existing_person()  # Need person
         if p_id_qrm is not None:
             # Check if person likely received messages (stateful check)
-            if person_received_message_ids.get(p_id_qrm):
+            if MESSAGES.has_received(p_id_qrm):
                 generated.append(f"qrm {p_id_qrm}")
     # --- Query Popularity ---
     elif command == "qp":
@@ -762,13 +741,21 @@ def _try_generate_command_params(command):
 
 # --- 策略 (Strategies) ---
 
+_probability_cache = {}  # {(phase, ln_boost, no_persons, no_emojis): (commands, weights)}
+
+
 def get_command_probabilities(current_instr_count, max_instr_count):
     """ dynamically adjust command probabilities based on progress """
     progress = current_instr_count / max_instr_count if max_instr_count > 0 else 0
+    phase = 0 if progress < 0.25 else 1 if progress < 0.75 else 2
+    # The weights only depend on these four facts, so each combination is built once
+    cache_key = (phase, current_instr_count == 0 and not persons, not persons, not network_emoji_ids)
+    cached = _probability_cache.get(cache_key)
+    if cached is not None: return cached
     probs = {}
 
     # Early phase (0% - 25%): Focus on building state
-    if progress < 0.25:
+    if phase == 0:
         probs.update({cmd: 5 for cmd in STATE_ADD_COMMANDS if cmd != 'ln'})  # High weight for adding
         if 'ln' in COMMANDS and current_instr_count == 0 and not persons: probs[
             'ln'] = 50  # Very high weight for ln at start if no persons
@@ -776,7 +763,7 @@ def get_command_probabilities(current_instr_count, max_instr_count):
         probs.update({cmd: 0.5 for cmd in QUERY_COMMANDS})  # Low weight for queries
         probs.update({cmd: 0.2 for cmd in EXCEPTION_TARGET_COMMANDS})  # Low weight for exceptions
     # Mid phase (25% - 75%): Mix of building, modifying, querying, exceptions
-    elif progress < 0.75:
+    elif phase == 1:
         probs.update({cmd: 2 for cmd in STATE_ADD_COMMANDS if cmd != 'ln'})  # Moderate weight for adding
         probs.update({cmd: 3 for cmd in STATE_MODIFY_COMMANDS})  # Higher weight for modifying
         probs.update({cmd: 3 for cmd in QUERY_COMMANDS})  # Higher weight for querying
@@ -797,8 +784,9 @@ def get_command_probabilities(current_instr_count, max_instr_count):
     valid_weights = [probs[cmd] for cmd in valid_commands]
 
     if not valid_commands:  # Fallback if all weights ended up zero (should be rare)
-        return list(COMMANDS), [1] * len(COMMANDS)
+        valid_commands, valid_weights = list(COMMANDS), [1] * len(COMMANDS)
 
+    _probability_cache[cache_key] = (valid_commands, valid_weights)
     return valid_commands, valid_weights
 
 
@@ -816,12 +804,8 @@ def strategy_dynamic_random(commands_list):
     filtered_commands = [cmd for cmd in possible_commands if cmd in allowed_set]
 
     # Adjust weights based on the filtered list
-    current_weights = []
-    for cmd in filtered_commands:
-        try:
-            current_weights.append(weights[possible_commands.index(cmd)])
-        except ValueError:  # Should not happen if logic is correct
-            current_weights.append(1)  # Default weight if cmd somehow not in original weighted list
+    weight_of = dict(zip(possible_commands, weights))
+    current_weights = [weight_of.get(cmd, 1) for cmd in filtered_commands]
 
     if not filtered_commands:
         return strategy_simple_random_with_checks(commands_list)
@@ -926,16 +910,17 @@ def strategy_exception_focus(commands_list):
     # Attempt to generate a valid version first, then try to make it invalid
     # This is a placeholder for more sophisticated exception generation.
     # For now, it's similar to dynamic_random but with a slight bias.
-    generated = _try_generate_command_params(target_command)
-    if generated and random.random() < 0.7:  # Higher chance to return a valid command
-        return generated
+    # Decided before generating: generated lines update the state, so they must not be thrown away
+    if random.random() < 0.7:  # Higher chance to return a valid command
+        generated = _try_generate_command_params(target_command)
+        if generated: return generated
 
     # Crude attempt to force an exception (example: non-existent ID)
     if random.random() < 0.5:  # Try to make it invalid
         if target_command in ["sm", "qp", "qsv", "qm", "qrm", "qba", "doa", "da", "foa", "qbc", "qra", "dt", "dft",
                               "att", "qtav", "qtvs"]:
             non_existent_pid = generate_unique_id(persons, -20000, -10001)
-            non_existent_msg_id = generate_unique_id(network_messages_store.keys(), -20000, -10001)
+            non_existent_msg_id = generate_unique_id(MESSAGES.messages, -20000, -10001)
             non_existent_emoji_id = generate_unique_id(network_emoji_ids, -20000, -10001)
             non_existent_tag_id = generate_unique_id(set(), -600, -501)  # Tags can be small negatives
 
@@ -956,6 +941,12 @@ def strategy_exception_focus(commands_list):
 
 
 # --- ADDED STRATEGY DEFINITIONS ---
+def strategy_coverage_guided(commands_list):
+    """Feedback loop on the oracle's outputs (outcome_coverage.py): favours valid commands and JML violations whose
+    past outcomes (exception classes and counters, zero / negative / large results) were seen least so far."""
+    return COVERAGE.next_lines(commands_list, _try_generate_command_params, random) or strategy_dynamic_random(commands_list)
+
+
 def strategy_message_focus(commands_list):
     """Prioritizes commands related to messages."""
     preferred_cmds = [cmd for cmd in MESSAGE_COMMANDS if cmd in commands_list]
@@ -1004,11 +995,57 @@ def strategy_tag_focus(commands_list):
     return strategy_dynamic_random(commands_list)
 
 
+# --- 最坏情况拓扑 (Worst-Case Topologies) ---
+def apply_topology_line(line):
+    """Mirrors a line emitted by the topology (ar / mr / at / att / dft) into the generator state."""
+    parts = line.split()
+    command, args = parts[0], list(map(int, parts[1:]))
+    if command == "ar": add_relation_state(*args)
+    elif command == "mr": modify_relation_state(*args)
+    elif command == "at": add_tag_state(*args)
+    elif command == "att": add_to_tag_state(*args)
+    elif command == "dft": del_from_tag_state(*args)
+
+
+def worst_case_lines(family, commands_list):
+    """First call: the family's ln block at the person limit plus its setup. Later calls: one churn / expensive query round."""
+    global worst_case_topology
+    if worst_case_topology is None:
+        if current_file_instruction_count > 0 or 'ln' not in commands_list:
+            return []  # ln must be the first instruction
+        worst_case_topology = topology.build(family, max_p, random, COMMANDS)
+        for pid, name, age in zip(worst_case_topology.ids, worst_case_topology.names, worst_case_topology.ages):
+            add_person_state(pid, name, age)
+        for (p1, p2), value in worst_case_topology.edges.items():
+            add_relation_state(p1, p2, value)
+        lines = worst_case_topology.ln_lines() + worst_case_topology.setup
+        for line in worst_case_topology.setup: apply_topology_line(line)
+        return lines
+    lines = worst_case_topology.next_lines()
+    for line in lines: apply_topology_line(line)
+    return lines
+
+
+def make_worst_case_strategy(family):
+    def strategy(commands_list):
+        return worst_case_lines(family, commands_list)
+    strategy.__name__ = f"strategy_worst_{family}"
+    strategy.__doc__ = f"Worst-case {family} topology, the rest of the budget filled with its most expensive queries."
+    return strategy
+
+
+# {strategy name: strategy}, one per topology family this homework's commands can express
+WORST_CASE_STRATEGIES = {f"worst_{family}": make_worst_case_strategy(family)
+                         for family in topology.available_families(COMMANDS)}
+
+
 # --- 主生成逻辑 (Main Generation Logic) ---
-def generate_test_case(filename_prefix, mode_choice, strategy_func):
+def generate_test_case(filename_prefix, mode_choice, strategy_func, seed=None):
+    """Writes data/{prefix}_{strategy}.txt; with a seed the file depends only on (seed, mode, strategy)."""
     global persons, person_details, relations, relation_values, person_tags, tag_members
     global official_accounts, account_details, followers, articles, article_details, account_articles, contributions
-    global network_messages_store, person_received_message_ids, network_emoji_ids, network_emoji_heat, next_message_id
+    global network_emoji_ids
+    global next_message_id, worst_case_topology
     global max_instr, max_p, mode
     global current_file_instruction_count
 
@@ -1017,21 +1054,29 @@ def generate_test_case(filename_prefix, mode_choice, strategy_func):
     person_details.clear();
     relations.clear();
     relation_values.clear()
+    acquaintances.clear()
     person_tags.clear();
     tag_members.clear()
     official_accounts.clear();
     account_details.clear();
     followers.clear();
+    followed_accounts.clear()
     articles.clear()
     article_details.clear();
     account_articles.clear();
     contributions.clear()
-    network_messages_store.clear();
-    person_received_message_ids.clear()
-    network_emoji_ids.clear();
-    network_emoji_heat.clear()
+    person_received_articles.clear()
+    unsent_message_ids.clear();
+    sent_message_ids.clear()
+    network_emoji_ids.clear()
+    MESSAGES.reset()
+    message_answers.clear()
     next_message_id = 0
+    worst_case_topology = None
     current_file_instruction_count = 0  # Reset for each file
+    _fallback_hints.clear()  # Keyed by container id(), must not leak between files
+    random.seed(seed)
+    COVERAGE.reset()
 
     mode = mode_choice
     max_instr = MAX_INSTRUCTIONS[mode]
@@ -1047,6 +1092,7 @@ def generate_test_case(filename_prefix, mode_choice, strategy_func):
     print(f"Generating {filename} using primary strategy {strategy_name}...")
 
     instructions_written_this_file = 0  # Use this for instruction counting within a file
+    output_lines_this_file = answers_differ = 0
     try:
         with open(filepath, 'w', encoding='utf-8') as f:
             while instructions_written_this_file < max_instr:
@@ -1075,6 +1121,9 @@ def generate_test_case(filename_prefix, mode_choice, strategy_func):
                     for line in generated_lines:
                         f.write(line + '\n')
                     instructions_written_this_file += num_lines_in_block  # Count all lines written from a successful generation
+                    COVERAGE.observe(generated_lines)  # Keeps the oracle in step with the file, for every strategy
+                    output_lines_this_file, differ = record_message_answers(COVERAGE.outputs, output_lines_this_file)
+                    answers_differ += differ
                 else:
                     # print(f"Warning: All strategies failed. Stopping for {filename} at {instructions_written_this_file} instructions.", file=sys.stderr)
                     break
@@ -1083,12 +1132,96 @@ def generate_test_case(filename_prefix, mode_choice, strategy_func):
         print(f"Error opening or writing to file {filepath}: {e}", file=sys.stderr)
         return None
 
-    print(f"Generated {filepath} with {instructions_written_this_file} instructions.")
+    build_line_index(filepath)  # data/<file>.idx: output line -> input line, for the checker's logs and diffs
+    # data/<file>.expect: the message answers of the generator's own state (python message_state.py to check a jar)
+    message_state.write_answers(message_state.expect_path_for(filepath), message_answers,
+                                f"{filename}: qsv / qm / qrm / qp answers of the generator's message state")
+    print(f"Generated {filepath} with {instructions_written_this_file} instructions"
+          f" ({len(message_answers)} message answers, {answers_differ} differ from oracle.py).")
     return filename
 
 
+def generate_seeded_case(task):
+    """Process pool task: task = (filename_prefix, mode, strategy_name, seed) -> (filename or None, seconds, outcome hits)."""
+    filename_prefix, mode_choice, strategy_name, seed = task
+    start_time_file = time.time()
+    strategy_func = WORST_CASE_STRATEGIES.get(strategy_name) or globals()[f"strategy_{strategy_name}"]
+    generated_filename = generate_test_case(filename_prefix, mode_choice, strategy_func, seed)
+    return generated_filename, time.time() - start_time_file, COVERAGE.hits
+
+
+def generate_batch(tasks, workers):
+    """Generates all tasks (in a process pool when workers > 1); returns [(task, filename or None, outcome hits)] in task order."""
+    outcomes = []
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            futures = [executor.submit(generate_seeded_case, task) for task in tasks]
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append(e)
+    else:
+        for task in tasks:
+            try:
+                outcomes.append(generate_seeded_case(task))
+            except Exception as e:
+                outcomes.append(e)
+
+    results = []
+    for task, outcome in zip(tasks, outcomes):
+        filename_prefix, _, strategy_name, seed = task
+        if isinstance(outcome, Exception):
+            print(f"Critical Error generating test case starting with {filename_prefix} using strategy "
+                  f"{strategy_name} (seed {seed}): {outcome!r}", file=sys.stderr)
+            results.append((task, None, None))
+            continue
+        generated_filename, elapsed, hits = outcome
+        if generated_filename:
+            print(f"    Time taken for {generated_filename}: {elapsed:.2f}s")
+            print(f"    Coverage: {outcome_coverage.summary(hits)}")
+        else:
+            print(f"Error: Failed to generate file starting with {filename_prefix} using primary strategy {strategy_name}.")
+        results.append((task, generated_filename, hits))
+    return results
+
+
+def write_manifest(mode_choice, master_seed, results):
+    cases = [{"file": filename, "prefix": task[0], "strategy": task[2], "seed": task[3]}
+             for task, filename, _ in results if filename]
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump({"mode": mode_choice, "master_seed": master_seed, "cases": cases}, f, indent=2)
+
+
+def replay_manifest(filenames, workers):
+    """Regenerates the given files (all if empty) from the seeds in the manifest, byte-identical to the originals."""
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    wanted = {os.path.basename(name) for name in filenames}
+    tasks = [(case["prefix"], manifest["mode"], case["strategy"], case["seed"])
+             for case in manifest["cases"] if not wanted or case["file"] in wanted]
+    missing = wanted - {case["file"] for case in manifest["cases"]}
+    if missing:
+        print(f"Warning: not in {MANIFEST_PATH}: {', '.join(sorted(missing))}", file=sys.stderr)
+    results = generate_batch(tasks, workers)
+    print(f"\nReplayed {sum(1 for _, filename, _ in results if filename)} of {len(tasks)} files.")
+
+
 # --- 主执行块 (Main Execution Block) ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HW11 data generator")
+    parser.add_argument("--seed", type=int, default=None, help="master seed of the batch (default: random)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="number of generator processes")
+    parser.add_argument("--replay", nargs='*', metavar="FILE", default=None,
+                        help=f"regenerate FILEs (default: all) from the seeds in {MANIFEST_PATH}")
+    parser.add_argument("--stress", action="store_true",
+                        help="only worst-case topologies (topology.py), each filled up with its most expensive queries")
+    args = parser.parse_args()
+
+    if args.replay is not None:
+        replay_manifest(args.replay, args.workers)
+        sys.exit(0)
+
     while True:
         mode_input = input(f"Choose mode: Public Test ({MODE_PUBLIC}) or Mutual Test ({MODE_MUTUAL}): ").lower()
         if mode_input in [MODE_PUBLIC, MODE_MUTUAL]:
@@ -1120,53 +1253,30 @@ if __name__ == "__main__":
         strategy_tag_focus,  # Focus on tags
         strategy_stress_test,  # Stress test with modifications/queries
         strategy_exception_focus,  # Try to cause exceptions
+        strategy_coverage_guided,  # Steer toward exceptions / results the oracle has not produced yet
         strategy_dynamic_random,  # More general random
         strategy_build_state,  # Build more state if needed
         strategy_stress_test,  # Another stress phase
     ]
+    if args.stress:
+        strategies_to_use = list(WORST_CASE_STRATEGIES.values())
     num_strategies = len(strategies_to_use)
 
-    generated_files_count = 0
-    file_base_index = 1
-    start_time_total = time.time()
+    # Every file gets its own seed drawn from the master seed, so the master seed reproduces the whole batch
+    master_seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    seeder = random.Random(master_seed)
+    tasks = [(f"testcase_{i + 1}", mode_input,
+              strategies_to_use[i % num_strategies].__name__.replace("strategy_", ""), seeder.randrange(2 ** 32))
+             for i in range(num_files_total)]
+    print(f"Master seed: {master_seed}, workers: {args.workers}")
 
-    while generated_files_count < num_files_total:
-        start_time_file = time.time()
-        # Cycle through the defined primary strategies
-        current_primary_strategy = strategies_to_use[generated_files_count % num_strategies]
-        filename_prefix = f"testcase_{file_base_index}"
-
-        try:
-            # Pass the chosen *primary* strategy to generate_test_case
-            generated_filename = generate_test_case(filename_prefix, mode_input, current_primary_strategy)
-
-            if generated_filename:
-                generated_files_count += 1
-                file_base_index += 1
-                end_time_file = time.time()
-                print(f"    Time taken for {generated_filename}: {end_time_file - start_time_file:.2f}s")
-            else:
-                # Handle generation failure
-                print(
-                    f"Error: Failed to generate file starting with {filename_prefix} using primary strategy {current_primary_strategy.__name__}.")
-                # Optionally ask to continue or break
-                # cont = input("File generation failed. Continue? (y/n): ").lower()
-                # if cont != 'y': break
-                file_base_index += 1  # Increment index to avoid retrying same prefix immediately
-
-        except Exception as e:
-            # Handle critical errors during generation
-            import traceback
-
-            print(f"\n!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!", file=sys.stderr)
-            print(
-                f"Critical Error generating test case starting with {filename_prefix} using strategy {current_primary_strategy.__name__}:",
-                file=sys.stderr)
-            traceback.print_exc(file=sys.stderr)
-            print(f"!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n", file=sys.stderr)
-            cont = input("A critical error occurred. Continue generating other files? (y/n): ").lower()
-            if cont != 'y': break
-            file_base_index += 1  # Move to next file prefix
+    start_time_total = time.time()
+    results = generate_batch(tasks, args.workers)
+    write_manifest(mode_input, master_seed, results)
+    generated_files_count = sum(1 for _, filename, _ in results if filename)
+    coverage_path = outcome_coverage.COVERAGE_REPORT_FILE
+    headline = outcome_coverage.write_report(coverage_path, COMMANDS, [(filename, task[2], hits) for task, filename, hits in results if filename])
+    print("\n" + "\n".join(headline) + f"\n(details in {coverage_path})")
 
     end_time_total = time.time()
     print(f"\nData generation finished. Generated {generated_files_count} files.")
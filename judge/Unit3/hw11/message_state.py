@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# Message subsystem of the hw11 generator: unsent messages, emoji heat, social value, money and the received-message
+# views, with the sendMessage / deleteColdEmoji semantics of the spec3 JML (the same ones oracle.py implements).
+#   received: per person a deque(maxlen=5), newest first. qrm only ever shows the 5 newest messages and nothing
+#             removes a received message, so older ones are simply dropped instead of being kept and shifted.
+#   dce:      min-heap of (heat, emoji id) with lazy deletion. A send pushes the emoji's new heat and leaves the old
+#             entry behind; popping skips entries whose heat is no longer current, so one dce costs
+#             O(deleted emojis + stale entries) instead of a scan over every emoji and every person.
+# The answers of qsv / qrm / qp / qm come straight from this state; the generator compares them with oracle.py as
+# it writes each file and stores them in data/<file>.expect.
+# Usage: python message_state.py input.txt output.txt
+#   Checks a jar's output against the answers the generator recorded in input.txt.expect; exit code 1 on a mismatch.
+import sys
+import heapq
+from collections import defaultdict, deque
+
+# --- 配置 ---
+EXPECT_SUFFIX = ".expect"  # 期望答案旁路文件与数据放在一起 (data/xxx.txt.expect), 不匹配 *.txt
+RECEIVED_LIST_LIMIT = 5    # qrm 只输出最新的 5 条
+# --- End 配置 ---
+
+ORDINARY, RED_ENVELOPE, FORWARD, EMOJI = "plain", "red_envelope", "forward", "emoji"  # the generator's msg_class
+
+
+def to_int(x):
+    """Wraps an exact integer to Java int (two's complement, 32 bit)."""
+    return (x + 0x80000000) % 0x100000000 - 0x80000000
+
+
+def java_div(a, b):
+    """Java int division: truncates toward zero."""
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b > 0) else -q
+
+
+def expect_path_for(input_path):
+    return input_path + EXPECT_SUFFIX
+
+
+class Message:
+    __slots__ = ("id", "kind", "social_value", "sender", "receiver", "tag_id", "members", "extra")
+
+    def __init__(self, message_id, kind, social_value, sender, receiver, tag_id, members, extra):
+        self.id = message_id
+        self.kind = kind
+        self.social_value = social_value
+        self.sender = sender
+        self.receiver = receiver   # None for tag messages
+        self.tag_id = tag_id       # None for person messages
+        self.members = members     # the tag's member set at creation time; a deleted tag keeps it (JML)
+        self.extra = extra         # money / article id / emoji id
+
+    def describe(self):
+        if self.kind == FORWARD:
+            return f"Forward: {self.extra}"
+        if self.kind == EMOJI:
+            return f"Emoji: {self.extra}"
+        if self.kind == RED_ENVELOPE:
+            return f"RedEnvelope: {self.extra}"
+        return f"Ordinary message: {self.id}"
+
+
+class MessageSystem:
+    """Messages, emojis and the per-person values they change.
+
+    linked(a, b) and owned_tags(pid) look into the generator's relation and tag state; sending is only possible
+    when they say the Runner would not raise (RelationNotFound / TagIdNotFound).
+    """
+
+    def __init__(self, linked, owned_tags):
+        self.linked = linked
+        self.owned_tags = owned_tags
+        self.reset()
+
+    def reset(self):
+        self.messages = {}                      # unsent message id -> Message
+        self.emoji_messages = defaultdict(set)  # emoji id -> its unsent message ids
+        self.heat = {}                          # stored emoji id -> heat
+        self.cold_heap = []                     # lazy (heat, emoji id), current iff heat[emoji id] == heat
+        self.social_value = defaultdict(int)
+        self.money = defaultdict(int)
+        self.received = {}                      # person id -> deque of describe() strings, newest first
+
+    # --- state changes ---
+
+    def add_message(self, message_id, kind, social_value, sender, delivery_type, target, members=None, extra=0):
+        """target is the receiver (delivery_type 0) or the sender's tag id (1, members: that tag's member set)."""
+        if delivery_type == 0:
+            message = Message(message_id, kind, social_value, sender, target, None, None, extra)
+        else:
+            message = Message(message_id, kind, social_value, sender, None, target, members, extra)
+        self.messages[message_id] = message
+        if kind == EMOJI:
+            self.emoji_messages[extra].add(message_id)
+
+    def sendable(self, message_id):
+        message = self.messages.get(message_id)
+        if message is None:
+            return False
+        if message.tag_id is None:
+            return self.linked(message.sender, message.receiver)
+        return message.tag_id in self.owned_tags(message.sender)
+
+    def deliver(self, message, receiver, money):
+        self.social_value[receiver] += message.social_value
+        if message.kind == RED_ENVELOPE:
+            self.money[message.sender] -= money
+            self.money[receiver] += money
+        received = self.received.get(receiver)
+        if received is None:
+            received = self.received[receiver] = deque(maxlen=RECEIVED_LIST_LIMIT)
+        received.appendleft(message.describe())
+
+    def send(self, message_id):
+        """Sends a message if the Runner would; returns its receivers, None if it would raise."""
+        if not self.sendable(message_id):
+            return None
+        message = self.messages.pop(message_id)
+        if message.kind == EMOJI:
+            self.heat[message.extra] += 1
+            heapq.heappush(self.cold_heap, (self.heat[message.extra], message.extra))
+            self.emoji_messages[message.extra].discard(message_id)
+        self.social_value[message.sender] += message.social_value
+        if message.tag_id is None:
+            receivers = [message.receiver]
+            share = message.extra
+        else:
+            receivers = [member for member in message.members or () if member != message.sender]
+            share = java_div(message.extra, len(message.members)) if message.kind == RED_ENVELOPE and message.members else 0
+        for receiver in receivers:
+            self.deliver(message, receiver, share)
+        return receivers
+
+    def store_emoji(self, emoji_id):
+        if emoji_id not in self.heat:
+            self.heat[emoji_id] = 0
+            heapq.heappush(self.cold_heap, (0, emoji_id))
+
+    def delete_cold_emojis(self, limit):
+        """Removes the emojis with heat < limit and their unsent messages; returns (removed emoji ids, removed
+        message ids). Received messages stay where they are."""
+        emojis, message_ids = [], []
+        heap, heat = self.cold_heap, self.heat
+        while heap and heap[0][0] < limit:
+            value, emoji_id = heapq.heappop(heap)
+            if heat.get(emoji_id) != value:
+                continue  # stale: the emoji was sent since, or is already gone
+            del heat[emoji_id]
+            emojis.append(emoji_id)
+            for message_id in self.emoji_messages.pop(emoji_id, ()):
+                del self.messages[message_id]
+                message_ids.append(message_id)
+        return emojis, message_ids
+
+    # --- answers, printed like the Runner ---
+
+    def query_social_value(self, pid):
+        return str(to_int(self.social_value[pid]))
+
+    def query_money(self, pid):
+        return str(to_int(self.money[pid]))
+
+    def query_received_messages(self, pid):
+        received = self.received.get(pid)
+        return "; ".join(received) if received else "None"
+
+    def query_popularity(self, emoji_id):
+        return str(self.heat[emoji_id])
+
+    def has_received(self, pid):
+        return bool(self.received.get(pid))
+
+
+def write_answers(path, answers, header):
+    """answers: (output line, expected, command line) in file order."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"# {header}\n# output line\texpected\tcommand\n")
+        for output_line, expected, command in answers:
+            f.write(f"{output_line}\t{expected}\t{command}\n")
+
+
+def read_answers(path):
+    """{output line: (expected, command)} from an answers file."""
+    answers = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#') or not line.strip():
+                continue
+            output_line, expected, command = line.rstrip('\n').split('\t')
+            answers[int(output_line)] = (expected, command)
+    return answers
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python message_state.py input.txt output.txt")
+        sys.exit(1)
+    answers = read_answers(expect_path_for(sys.argv[1]))
+    with open(sys.argv[2], 'r', encoding='utf-8', errors='replace') as f:
+        output = [line.strip() for line in f]
+    wrong = [(n, expected, command, output[n - 1] if n <= len(output) else "<EOF>")
+             for n, (expected, command) in sorted(answers.items())
+             if n > len(output) or output[n - 1] != expected]
+    for n, expected, command, actual in wrong[:20]:
+        print(f"line {n}: {command} -> expected {expected}, got {actual}")
+    print(f"{len(answers) - len(wrong)}/{len(answers)} message query answers correct")
+    sys.exit(1 if wrong else 0)
+
+
+if __name__ == "__main__":
+    main()
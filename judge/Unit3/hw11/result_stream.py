@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+# Case results as a JSON-lines stream: check.py appends one record per (jar, input) the moment the case is judged,
+# so a run that crashes or is interrupted keeps everything finished so far. With JUDGE_RESUME=1 the next run reuses
+# those records instead of running the cases again; a record is only reused while the test jar, the input and the
+# expected-output source (std jar hash / oracle) are unchanged and its time limit still decides the verdict the same
+# way (a TLE or slow verdict under a lower limit, or a pass slower than the current limit, is rerun). Vote mode always reruns (the majority needs every
+# jar's output), but still streams its results.
+# The summary (verdicts per jar, jar x input verdict matrix, slowest cases) is built from streams alone:
+# Usage: python result_stream.py [results.jsonl ...] [--html results_summary.html] [--top N]
+#   Several streams (e.g. batches of jars run separately) are merged; the last record of a (jar, input) wins.
+import os
+import sys
+import json
+import html
+import time
+import threading
+from collections import Counter
+from std_cache import STD_CACHE, file_digest
+from resource_usage import USAGE
+from time_limits import LIMITS
+
+# --- 配置 ---
+RESULTS_FILE = "results.jsonl"          # 与报告一样放在脚本目录下
+SUMMARY_FILE = "results_summary.html"
+RESUME = os.environ.get("JUDGE_RESUME", "0") == "1"  # 1: 复用 RESULTS_FILE 中仍然有效的结果, 只运行其余用例
+SLOWEST_CASES = 20                      # 汇总中列出的最慢用例数
+LINE_TEXT_LIMIT = 200                   # 首个差异的期望 / 实际行最多保留的字符数
+# --- End 配置 ---
+
+VERDICT_ORDER = ("AC", "AC (Slow)", "WA", "TLE", "RE")  # other verdicts (skips) follow in name order
+VERDICT_COLORS = {"AC": "#c8e6c9", "AC (Slow)": "#fff59d", "WA": "#ef9a9a", "TLE": "#ffcc80", "RE": "#ce93d8"}
+SKIP_COLOR = "#e0e0e0"
+
+
+def clip(text):
+    return text if text is None or len(text) <= LINE_TEXT_LIMIT else text[:LINE_TEXT_LIMIT] + "..."
+
+
+def load_records(paths):
+    """{(jar, input): record} from JSON-lines streams; later records replace earlier ones, a torn last line
+    (the run was killed mid-write) is skipped."""
+    records = {}
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        records[(record["jar"], record["input"])] = record
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError as e:
+            print(f"Warning: could not read {path}: {e}")
+    return records
+
+
+class ResultStream:
+    """Appends case records to the stream and answers which cases a resumed run can skip."""
+
+    def __init__(self, path=RESULTS_FILE, resume=RESUME):
+        self.path = path
+        self.resume = resume
+        self.lock = threading.Lock()
+        self.file = None
+        self.reference = None
+        self.ceiling = None      # TIMEOUT_SECONDS of this run, the fixed limit that calibrated limits stay within
+        self.previous = {}       # (jar, input) -> record of an earlier run, resume only
+        self.input_digests = {}  # (path, size, mtime_ns) -> digest, an input is hashed once per session
+        self.keys = set()        # (jar, input) judged or resumed in this run
+        self.resumed = 0
+
+    def start(self, std_jar_path, backend, ceiling):
+        """Opens the stream: appended to when resuming, truncated otherwise."""
+        self.ceiling = ceiling
+        self.reference = STD_CACHE.jar_digest(std_jar_path)[:16] if std_jar_path else backend
+        if self.resume:
+            self.previous = load_records([self.path]) if os.path.exists(self.path) else {}
+        self.file = open(self.path, 'a' if self.resume else 'w', encoding='utf-8')
+
+    def input_digest(self, input_path):
+        st = os.stat(input_path)
+        key = (os.path.abspath(input_path), st.st_size, st.st_mtime_ns)
+        with self.lock:
+            digest = self.input_digests.get(key)
+        if digest is None:
+            digest = file_digest(input_path)
+            with self.lock:
+                self.input_digests[key] = digest
+        return digest
+
+    def limit_still_holds(self, record):
+        """Like the std answer cache: a TLE or slow verdict is only trusted if it was given under at least the current
+        limit, a finished run only if it finished within it. The current limit is derived from the std time the
+        record's limit was calibrated on, so a changed JUDGE_TIMEOUT_FACTOR or TIMEOUT_SECONDS is noticed."""
+        recorded = record.get("limit_s")
+        if recorded is None:
+            return False
+        if record.get("std_status") == 'TLE':
+            return recorded >= self.ceiling  # std itself ran under the fixed limit
+        current = LIMITS.limit_for(record.get("std_s"), self.ceiling)
+        if record.get("test_status") == 'TLE' or record.get("slow"):
+            return recorded >= current
+        return record.get("wall_s") is None or record["wall_s"] <= current
+
+    def reusable(self, jar_path, input_path):
+        """The earlier record of this case if it is still valid (same jar, input and reference, and a limit that
+        gives the same verdict), else None. A reused case counts as judged in this run; its slow verdict is
+        restored for the report."""
+        if not self.resume:
+            return None
+        key = (os.path.basename(jar_path), os.path.basename(input_path))
+        record = self.previous.get(key)
+        if record is None or record.get("reference") != self.reference or \
+                record.get("jar_digest") != STD_CACHE.jar_digest(jar_path) or \
+                record.get("input_digest") != self.input_digest(input_path) or \
+                record.get("verdict", "").startswith("Skipped (Internal") or not self.limit_still_holds(record):
+            return None
+        if record.get("slow"):
+            LIMITS.restore_slow(key[0], key[1], tuple(record["slow"]))
+        with self.lock:
+            self.keys.add(key)
+            self.resumed += 1
+        return record
+
+    def record(self, jar_path, input_path, std_status, test_status, verdict, wall_s=None, limit_s=None, comparison=None):
+        """Appends one judged case; never raises into the judge."""
+        jar_name, input_name = os.path.basename(jar_path), os.path.basename(input_path)
+        usage = USAGE.measured(jar_name).get(input_name) if test_status is not None else None
+        mismatch = comparison.mismatches[0] if comparison is not None and comparison.mismatches else None
+        slow = LIMITS.slow_run(jar_name, input_name)
+        USAGE.set_verdict(jar_name, input_name, verdict)  # every judged case passes through here
+        try:
+            record = {"jar": jar_name, "input": input_name, "std_status": std_status, "test_status": test_status,
+                      "verdict": verdict,
+                      "wall_s": None if wall_s is None else round(wall_s, 3),
+                      "cpu_s": None if usage is None else round(usage.user_s + usage.sys_s, 3),
+                      "peak_rss_mb": None if usage is None else round(usage.peak_rss_kb / 1024, 1),
+                      "limit_s": limit_s, "std_s": LIMITS.std_seconds(input_name),
+                      "first_mismatch": None if mismatch is None else {
+                          "output_line": mismatch.output_line, "input_line": mismatch.input_line,
+                          "command": mismatch.input_command,
+                          "expected": clip(mismatch.std_line), "actual": clip(mismatch.test_line)},
+                      "slow": None if slow is None else [round(x, 3) if isinstance(x, float) else x for x in slow],
+                      "reference": self.reference, "jar_digest": STD_CACHE.jar_digest(jar_path),
+                      "input_digest": self.input_digest(input_path), "time": round(time.time(), 3)}
+            line = json.dumps(record, ensure_ascii=False)
+            with self.lock:
+                self.keys.add((jar_name, input_name))
+                if self.file is not None:
+                    self.file.write(line + "\n")
+                    self.file.flush()  # a crash loses at most the case being written
+        except (OSError, ValueError, TypeError) as e:
+            print(f"    Warning: could not stream the result of {jar_name}/{input_name}: {e}")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def write_summary(self, path=SUMMARY_FILE):
+        """HTML summary of this run's cases (including resumed ones), built from the stream; returns its path."""
+        records = {key: r for key, r in load_records([self.path]).items() if key in self.keys}
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(summary_html(records))
+        except OSError as e:
+            print(f"Warning: could not write {path}: {e}")
+            return None
+        return path
+
+
+def verdict_columns(records):
+    seen = {r["verdict"] for r in records.values()}
+    return [v for v in VERDICT_ORDER if v in seen] + sorted(seen - set(VERDICT_ORDER))
+
+
+def case_seconds(record):
+    """(seconds, clock) used to rank slow cases: CPU when measured, else wall."""
+    if record.get("cpu_s") is not None:
+        return record["cpu_s"], "CPU"
+    return record.get("wall_s") or 0.0, "wall"
+
+
+def summary_lines(records, top=SLOWEST_CASES):
+    """Plain-text version of the summary for the terminal."""
+    jars = sorted({jar for jar, _ in records})
+    columns = verdict_columns(records)
+    lines = [f"--- Result Summary ({len(records)} cases, {len(jars)} jars) ---",
+             f"  {'jar':<28}" + "".join(f"{v:>12}" for v in columns)]
+    for jar in jars:
+        counts = Counter(r["verdict"] for (j, _), r in records.items() if j == jar)
+        lines.append(f"  {jar:<28}" + "".join(f"{counts.get(v, 0):>12}" for v in columns))
+    slowest = sorted(records.values(), key=lambda r: case_seconds(r)[0], reverse=True)[:top]
+    if slowest:
+        lines.append("  Slowest cases:")
+        for r in slowest:
+            seconds, clock = case_seconds(r)
+            lines.append(f"    {r['jar']}/{r['input']}: {r['verdict']}, {clock} {seconds:.2f}s")
+    return lines
+
+
+def summary_html(records, top=SLOWEST_CASES):
+    """Self-contained page: verdict counts per jar, the jar x input matrix (hover a cell for the details)
+    and the slowest cases."""
+    esc = html.escape
+    jars = sorted({jar for jar, _ in records})
+    inputs = sorted({name for _, name in records})
+    columns = verdict_columns(records)
+    out = ["<!DOCTYPE html><html><head><meta charset='utf-8'><title>Unit3 results</title><style>",
+           "body{font-family:sans-serif;font-size:13px} table{border-collapse:collapse;margin-bottom:24px}",
+           "td,th{border:1px solid #bbb;padding:2px 6px;text-align:center} th.v{writing-mode:vertical-rl}",
+           "td.l,th.l{text-align:left}</style></head><body>",
+           f"<h2>Unit3 results: {len(records)} cases, {len(jars)} jars, {len(inputs)} inputs</h2>",
+           "<h3>Verdicts per jar</h3><table><tr><th class='l'>jar</th>"]
+    out.append("".join(f"<th>{esc(v)}</th>" for v in columns) + "<th>cases</th></tr>")
+    for jar in jars:
+        counts = Counter(r["verdict"] for (j, _), r in records.items() if j == jar)
+        cells = "".join(f"<td style='background:{VERDICT_COLORS.get(v, SKIP_COLOR) if counts.get(v) else '#fff'}'>"
+                        f"{counts.get(v, 0)}</td>" for v in columns)
+        out.append(f"<tr><td class='l'>{esc(jar)}</td>{cells}<td>{sum(counts.values())}</td></tr>")
+    out.append("</table><h3>Verdict matrix</h3><table><tr><th class='l'>jar</th>")
+    out.append("".join(f"<th class='v'>{esc(name)}</th>" for name in inputs) + "</tr>")
+    for jar in jars:
+        row = [f"<tr><td class='l'>{esc(jar)}</td>"]
+        for name in inputs:
+            r = records.get((jar, name))
+            if r is None:
+                row.append("<td></td>")
+                continue
+            seconds, clock = case_seconds(r)
+            details = [f"{jar}/{name}: {r['verdict']}", f"std {r.get('std_status')}, test {r.get('test_status')}",
+                       f"{clock} {seconds:.2f}s" + (f", limit {r['limit_s']:.1f}s" if r.get("limit_s") else "")]
+            mismatch = r.get("first_mismatch")
+            if mismatch:
+                details.append(f"output line {mismatch['output_line']} (input line {mismatch['input_line']}: "
+                               f"{mismatch['command']}): expected {mismatch['expected']}, got {mismatch['actual']}")
+            if r.get("slow"):
+                details.append(f"{r['slow'][0]:.1f}x std")
+            short = {"AC (Slow)": "S"}.get(r["verdict"], r["verdict"][:3])
+            row.append(f"<td style='background:{VERDICT_COLORS.get(r['verdict'], SKIP_COLOR)}' "
+                       f"title='{esc(chr(10).join(details))}'>{esc(short)}</td>")
+        out.append("".join(row) + "</tr>")
+    out.append("</table><h3>Slowest cases</h3><table><tr><th class='l'>case</th><th>verdict</th><th>seconds</th>"
+               "<th>clock</th><th>limit</th><th>peak RSS (MB)</th></tr>")
+    for r in sorted(records.values(), key=lambda r: case_seconds(r)[0], reverse=True)[:top]:
+        seconds, clock = case_seconds(r)
+        out.append(f"<tr><td class='l'>{esc(r['jar'])}/{esc(r['input'])}</td>"
+                   f"<td style='background:{VERDICT_COLORS.get(r['verdict'], SKIP_COLOR)}'>{esc(r['verdict'])}</td>"
+                   f"<td>{seconds:.2f}</td><td>{clock}</td><td>{r.get('limit_s') or '-'}</td>"
+                   f"<td>{r.get('peak_rss_mb') if r.get('peak_rss_mb') is not None else '-'}</td></tr>")
+    out.append("</table></body></html>\n")
+    return "\n".join(out)
+
+
+RESULTS = ResultStream()
+
+
+def main():
+    args = sys.argv[1:]
+    html_path, top = SUMMARY_FILE, SLOWEST_CASES
+    if "--html" in args:
+        i = args.index("--html"); html_path = args[i + 1]; del args[i:i + 2]
+    if "--top" in args:
+        i = args.index("--top"); top = max(1, int(args[i + 1])); del args[i:i + 2]
+    paths = args or [RESULTS_FILE]
+    missing = [p for p in paths if not os.path.isfile(p)]
+    if missing:
+        print(f"Usage: python result_stream.py [results.jsonl ...] [--html {SUMMARY_FILE}] [--top N]\n"
+              f"Not found: {', '.join(missing)}")
+        sys.exit(1)
+    records = load_records(paths)
+    print("\n".join(summary_lines(records, top)))
+    with open(html_path, 'w', encoding='utf-8') as f:
+        f.write(summary_html(records, top))
+    print(f"HTML summary written to {html_path}")
+
+
+if __name__ == "__main__":
+    main()
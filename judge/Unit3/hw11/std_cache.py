@@ -0,0 +1,109 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+# --- 配置 ---
+STD_CACHE_ENABLED = os.environ.get("JUDGE_STD_CACHE", "1") != "0"
+# 放在 Unit3 目录下, hw9/hw10/hw11 共用同一个仓库 (同一标程 + 同一数据在任一作业目录下都能命中)
+STD_CACHE_DIR = os.environ.get("JUDGE_STD_CACHE_DIR") or \
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".std_cache")
+HASH_BLOCK_SIZE = 1024 * 1024
+# --- End 配置 ---
+
+
+def file_digest(path):
+    """返回文件内容的 sha256 十六进制摘要"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StdAnswerCache:
+    """Persists std.jar outputs and run statuses keyed by (std jar hash, input hash).
+
+    A changed jar or input simply hashes to a new key, so stale answers are never reused.
+    A cached TLE is only trusted if it was produced with at least the current timeout,
+    and a cached AC/RE only if the run finished within the current timeout.
+    """
+
+    def __init__(self, root=STD_CACHE_DIR, enabled=STD_CACHE_ENABLED):
+        self.root = root
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.jar_digests = {}  # (path, size, mtime_ns) -> digest, a jar is hashed once per session
+        self.hits = 0
+        self.misses = 0
+
+    def jar_digest(self, jar_path):
+        st = os.stat(jar_path)
+        key = (os.path.abspath(jar_path), st.st_size, st.st_mtime_ns)
+        with self.lock:
+            digest = self.jar_digests.get(key)
+        if digest is None:
+            digest = file_digest(jar_path)
+            with self.lock:
+                self.jar_digests[key] = digest
+        return digest
+
+    def entry_paths(self, jar_path, input_path):
+        """返回 (答案文件路径, 元数据路径)"""
+        base = os.path.join(self.root, self.jar_digest(jar_path)[:16], file_digest(input_path))
+        return base + ".ans", base + ".json"
+
+    def lookup(self, jar_path, input_path, output_path, timeout):
+        """命中时把缓存的答案复制到 output_path 并返回 (status, elapsed, cpu), 否则返回 None; 旧条目没有 cpu 时为 None"""
+        if not self.enabled:
+            return None
+        try:
+            ans_path, meta_path = self.entry_paths(jar_path, input_path)
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            status = meta["status"]
+            if status == 'TLE':
+                usable = meta["timeout"] >= timeout
+            else:
+                usable = meta["elapsed"] <= timeout
+            if not usable:
+                raise KeyError(status)
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            shutil.copyfile(ans_path, output_path)
+        except (OSError, ValueError, KeyError, TypeError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return status, meta["elapsed"], meta.get("cpu")
+
+    def store(self, jar_path, input_path, output_path, status, elapsed, timeout, cpu=None):
+        """保存一次标程运行的结果 (cpu: JVM 的 CPU 秒数, 用于校准时限); 写临时文件后原子替换, 并发或中断时不会留下半个条目"""
+        if not self.enabled:
+            return
+        try:
+            ans_path, meta_path = self.entry_paths(jar_path, input_path)
+            os.makedirs(os.path.dirname(ans_path), exist_ok=True)
+            suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+            if os.path.exists(output_path):
+                shutil.copyfile(output_path, ans_path + suffix)
+            else:
+                open(ans_path + suffix, 'wb').close()
+            with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+                json.dump({"status": status, "elapsed": round(elapsed, 3), "timeout": timeout,
+                           "cpu": None if cpu is None else round(cpu, 3),
+                           "jar": os.path.basename(jar_path), "input": os.path.basename(input_path)}, f)
+            os.replace(ans_path + suffix, ans_path)
+            os.replace(meta_path + suffix, meta_path)  # 元数据最后落盘, 有元数据就一定有完整的答案
+        except OSError as e:
+            print(f"    Warning: failed to cache std answer for {os.path.basename(input_path)}: {e}")
+
+    def summary(self):
+        if not self.enabled:
+            return "Std answer cache disabled."
+        return f"Std answer cache ({self.root}): {self.hits} hit(s), {self.misses} miss(es)."
+
+
+STD_CACHE = StdAnswerCache()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+# Worst-case graph topologies for stress inputs. A family builds a graph at the person limit and emits it as one `ln`
+# block plus follow-up setup commands; afterwards every round returns the queries that are most expensive on that shape,
+# mixed with ar / mr churn that invalidates whatever a student implementation cached.
+# Pure module: randomness comes from the rng argument (the generator passes its seeded `random` module), and the
+# generator mirrors every emitted line into its own state.
+import string
+
+# --- 配置 ---
+VALUE_MIN, VALUE_MAX = 1, 200  # 关系值范围
+TAG_ID = 1                     # giant_tag 使用的标签 id
+TAG_MEMBER_LIMIT = 999         # 标签最多 999 人 (JML)
+ID_MIN, ID_MAX = -10000, 10000
+# --- End 配置 ---
+
+
+def edge_key(a, b):
+    return (a, b) if a < b else (b, a)
+
+
+class Topology:
+    """One worst-case input: the graph, the setup after the ln block and the churn / query plan for the rest."""
+
+    def __init__(self, family, rng, count):
+        self.family = family
+        self.rng = rng
+        self.ids = rng.sample(range(ID_MIN, ID_MAX + 1), count)
+        self.names = [''.join(rng.choices(string.ascii_letters, k=5)) for _ in range(count)]
+        self.ages = [rng.randint(1, 200) for _ in range(count)]
+        self.edges = {}        # (min_id, max_id) -> value
+        self.setup = []        # lines right after the ln block
+        self.queries = []      # [(command, fn() -> line)], only commands the homework has are kept
+        self.churn_rate = 0.0  # chance that a round starts with churn
+        self.churn = None      # fn() -> list of lines
+        self.removed = []      # edges taken out by churn, re-added later
+
+    def link(self, i, j, value=None):
+        """Adds the edge between ids[i] and ids[j] (indices) to the ln matrix."""
+        self.edges[edge_key(self.ids[i], self.ids[j])] = value or self.rng.randint(VALUE_MIN, VALUE_MAX)
+
+    def ln_lines(self):
+        """`ln n`, the id / name / age rows and the n-1 rows of the lower triangle (0 = no relation)."""
+        ids = self.ids
+        lines = [f"ln {len(ids)}", " ".join(map(str, ids)), " ".join(self.names), " ".join(map(str, self.ages))]
+        for i in range(1, len(ids)):
+            lines.append(" ".join(str(self.edges.get(edge_key(ids[i], ids[j]), 0)) for j in range(i)))
+        return lines
+
+    def toggle(self, a, b):
+        """Deletes the relation a-b (mr down to 0) if it exists, adds it otherwise."""
+        key = edge_key(a, b)
+        if key in self.edges:
+            return [f"mr {a} {b} {-self.edges.pop(key)}"]
+        self.edges[key] = self.rng.randint(VALUE_MIN, VALUE_MAX)
+        return [f"ar {a} {b} {self.edges[key]}"]
+
+    def bump(self, a, b):
+        """Raises an existing relation value, which changes best acquaintances and value sums without unlinking."""
+        key = edge_key(a, b)
+        delta = self.rng.randint(1, VALUE_MAX)
+        self.edges[key] += delta
+        return [f"mr {a} {b} {delta}"]
+
+    def edge_churn(self, pick):
+        """Churn that deletes the edge pick() returns, re-adding the oldest deleted one once a few are out."""
+        def churn():
+            if self.removed and (len(self.removed) > 4 or self.rng.random() < 0.5):
+                return self.toggle(*self.removed.pop(0))
+            a, b = pick()
+            if edge_key(a, b) not in self.edges:
+                return []
+            self.removed.append((a, b))
+            return self.toggle(a, b)
+        return churn
+
+    def next_lines(self):
+        """One round: maybe churn, then one expensive query."""
+        lines = []
+        if self.churn and self.rng.random() < self.churn_rate:
+            lines.extend(self.churn())
+        lines.append(self.rng.choice(self.queries)[1]())
+        return lines
+
+
+def build_complete(count, rng):
+    """Complete graph at the person limit: C(n, 3) triangles and degree n-1 everywhere; churn deletes and
+    re-adds random edges so qts / qba / qci results cannot simply be kept."""
+    topo = Topology("complete", rng, count)
+    for i in range(count):
+        for j in range(i):
+            topo.link(i, j)
+    ids = topo.ids
+    topo.queries = [("qts", lambda: "qts"), ("qcs", lambda: "qcs"),
+                    ("qba", lambda: f"qba {rng.choice(ids)}"),
+                    ("qci", lambda: "qci {} {}".format(*rng.sample(ids, 2)))]
+    topo.churn_rate, topo.churn = 0.3, topo.edge_churn(lambda: rng.sample(ids, 2))
+    return topo
+
+
+def build_path(count, rng):
+    """One long path; queries run between the two ends, and churn toggles short chords that never shorten the
+    path much, so each qsp / qci walks almost the whole graph again."""
+    topo = Topology("path", rng, count)
+    for i in range(1, count):
+        topo.link(i - 1, i)
+    ids, span = topo.ids, max(1, count // 10)
+
+    def far_pair():
+        return ids[rng.randrange(span)], ids[-1 - rng.randrange(span)]
+
+    def chord():
+        i = rng.randrange(count - 2)
+        return topo.toggle(ids[i], ids[i + 2])
+
+    topo.queries = [("qsp", lambda: "qsp {} {}".format(*far_pair())),
+                    ("qci", lambda: "qci {} {}".format(*far_pair()))]
+    topo.churn_rate, topo.churn = 0.2, chord
+    return topo
+
+
+def build_star(count, rng):
+    """Person 0 linked to everybody else; churn raises one spoke at a time, so the hub's best acquaintance
+    changes on every round and a qba / qcs that scans the hub's neighbours costs O(n)."""
+    topo = Topology("star", rng, count)
+    for i in range(1, count):
+        topo.link(0, i)
+    ids = topo.ids
+    topo.queries = [("qba", lambda: f"qba {ids[0]}"), ("qcs", lambda: "qcs")]
+    topo.churn_rate, topo.churn = 0.5, lambda: topo.bump(ids[0], rng.choice(ids[1:]))
+    return topo
+
+
+def build_hubs(count, rng):
+    """Hub-and-spoke: a few hubs linked to each other and to every spoke (K_hubs + K_hubs,spokes), so every
+    spoke has several candidates for best acquaintance and the hubs have degree n-1."""
+    topo = Topology("hubs", rng, count)
+    hubs = max(2, count // 20)
+    for i in range(hubs):
+        for j in range(count):
+            if j != i and (j >= hubs or j < i):
+                topo.link(i, j)
+    ids = topo.ids
+    topo.queries = [("qba", lambda: f"qba {rng.choice(ids[:hubs])}"), ("qcs", lambda: "qcs"), ("qts", lambda: "qts")]
+    topo.churn_rate = 0.5
+    topo.churn = lambda: topo.bump(ids[rng.randrange(hubs)], ids[rng.randrange(hubs, count)])
+    return topo
+
+
+def build_triangle_mesh(count, rng):
+    """Band graph (i ~ j when |i - j| <= w): a dense mesh where every edge lies in ~w triangles, so toggling
+    one edge changes many triangles at once and an incremental qts has to walk large common neighbourhoods."""
+    topo = Topology("triangle_mesh", rng, count)
+    width = max(2, count // 6)
+    for i in range(count):
+        for j in range(max(0, i - width), i):
+            topo.link(i, j)
+    ids = topo.ids
+
+    def band_pair():
+        i = rng.randrange(1, count)
+        return ids[i], ids[max(0, i - rng.randint(1, width))]
+
+    topo.queries = [("qts", lambda: "qts")]
+    topo.churn_rate, topo.churn = 0.5, topo.edge_churn(band_pair)
+    return topo
+
+
+def build_components(count, rng):
+    """Many small disconnected cliques; churn links two components and unlinks them again, so union-find
+    style caches are invalidated by deletions and qci between components keeps changing its answer."""
+    topo = Topology("components", rng, count)
+    groups, start = [], 0
+    while start < count:
+        size = min(rng.randint(2, 5), count - start)
+        groups.append(range(start, start + size))
+        for i in groups[-1]:
+            for j in range(start, i):
+                topo.link(i, j)
+        start += size
+    ids = topo.ids
+    bridges = []
+
+    def bridge():
+        if bridges and (len(bridges) > 8 or rng.random() < 0.5):
+            return topo.toggle(*bridges.pop(0))
+        if len(groups) < 2:
+            return []
+        first, second = rng.sample(groups, 2)
+        a, b = ids[rng.choice(first)], ids[rng.choice(second)]
+        if edge_key(a, b) in topo.edges:
+            return []
+        bridges.append((a, b))
+        return topo.toggle(a, b)
+
+    topo.queries = [("qci", lambda: "qci {} {}".format(*rng.sample(ids, 2))), ("qts", lambda: "qts")]
+    topo.churn_rate, topo.churn = 0.5, bridge
+    return topo
+
+
+def build_giant_tag(count, rng):
+    """Person 0 owns one tag holding everybody else (up to 999), members linked along a path; churn changes
+    member-member values and moves members out of / back into the tag, so qtvs / qtav cannot be cached."""
+    topo = Topology("giant_tag", rng, count)
+    members = list(range(1, min(count, TAG_MEMBER_LIMIT + 1)))
+    for i in range(1, count):
+        topo.link(0, i)
+    for i in range(2, count):
+        topo.link(i - 1, i)
+    ids = topo.ids
+    owner = ids[0]
+    topo.setup = [f"at {owner} {TAG_ID}"] + [f"att {ids[i]} {owner} {TAG_ID}" for i in members]
+    outside = []
+
+    def churn():
+        if outside and rng.random() < 0.5:
+            return [f"att {outside.pop()} {owner} {TAG_ID}"]
+        if rng.random() < 0.3 and len(members) > 2:
+            outside.append(ids[members.pop(rng.randrange(len(members)))])
+            return [f"dft {outside[-1]} {owner} {TAG_ID}"]
+        i = rng.randrange(2, count)
+        return topo.bump(ids[i - 1], ids[i])
+
+    topo.queries = [("qtvs", lambda: f"qtvs {owner} {TAG_ID}"), ("qtav", lambda: f"qtav {owner} {TAG_ID}")]
+    topo.churn_rate, topo.churn = 0.5, churn
+    return topo
+
+
+# family -> (builder, its queries in order of preference, other commands the input uses besides ln)
+FAMILIES = {
+    "complete": (build_complete, ["qts", "qcs", "qba", "qci"], ["ar", "mr"]),
+    "path": (build_path, ["qsp", "qci"], ["ar", "mr"]),
+    "star": (build_star, ["qba", "qcs"], ["mr"]),
+    "hubs": (build_hubs, ["qba", "qcs", "qts"], ["mr"]),
+    "triangle_mesh": (build_triangle_mesh, ["qts"], ["ar", "mr"]),
+    "components": (build_components, ["qci", "qts"], ["ar", "mr"]),
+    "giant_tag": (build_giant_tag, ["qtvs", "qtav"], ["mr", "at", "att", "dft"]),
+}
+
+
+def available_families(commands):
+    """Families this homework can express: ln and the churn commands exist, and at least one of the queries."""
+    return [family for family, (_, queries, needs) in FAMILIES.items()
+            if "ln" in commands and all(c in commands for c in needs) and any(q in commands for q in queries)]
+
+
+def build(family, count, rng, commands):
+    """Builds `family` over `count` (>= 4) persons, keeping only the queries in `commands`."""
+    topo = FAMILIES[family][0](count, rng)
+    topo.queries = [query for query in topo.queries if query[0] in commands]
+    return topo
@@ -7,6 +7,14 @@ import shutil
 import filecmp
 import signal
 import platform
+import concurrent.futures
+from profiler import PROFILER
+from std_cache import STD_CACHE
+from time_limits import LIMITS, SLOW_STATUS, measured_time # Per-input time limits calibrated on std's CPU time
+from result_stream import RESULTS # Every case result as a JSON-lines record, resumable runs and the HTML summary
+from resource_usage import USAGE, AccountedPopen, reap, describe, gc_log_args, gc_log_path_for
+from output_compare import compare_output_files, copy_text_excerpt, output_digest, CompareResult
+import oracle
 
 # --- Configuration ---
 STD_DIR = "std"
@@ -15,11 +23,18 @@ DATA_DIR = "data"
 OUT_DIR = "out"
 STDOUT_DIR = "stdout"
 LOG_DIR = "log"
-TIMEOUT_SECONDS = 10
+TIMEOUT_SECONDS = 10 # Test JAR timeout; with a std time for the input, time_limits.py calibrates it below this
 DATA_GENERATOR_SCRIPT = "data_generator.py"
+MAX_DIFF_LINES_TO_LOG = 10 # Comparison stops after this many differing lines; they are detailed in the log
+MAX_WORKERS = os.cpu_count() or 1 # Max JVMs running at once; more than the core count risks false TLEs
+STD_BACKEND = os.environ.get("JUDGE_STD", "jar") # 'oracle': expected outputs come from oracle.py instead of std/*.jar
+                                                 # 'vote': no std at all, the majority output of the test jars is expected
+VOTE_QUORUM = float(os.environ.get("JUDGE_VOTE_QUORUM", "0.5")) # Vote mode: share of all test jars the winning group needs
+VOTE_REPORT = "vote_report.txt" # Vote mode: per-input groups and minority jars
 
 # --- Global Variable for Standard Run Statuses ---
 std_run_statuses = {} # Stores {input_basename: status} for std.jar runs
+vote_summaries = {} # Vote mode: {input_basename: summary line(s) for VOTE_REPORT}
 
 # --- Helper Functions ---
 
@@ -55,6 +70,9 @@ def run_jar(jar_path, input_path, output_path, timeout):
     stderr_content = b''
     start_time = time.time()
     process = None
+    case_key = f"{os.path.basename(jar_path)}/{os.path.basename(input_path)}"
+    wait_start = None
+    gc_log_path = gc_log_path_for(output_path) # None unless JUDGE_GC_LOG=1
 
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -66,6 +84,7 @@ def run_jar(jar_path, input_path, output_path, timeout):
                 # Recommended: Add memory limits, adjust as needed
                 '-Xms128m',
                 '-Xmx512m',
+                *gc_log_args(gc_log_path), # Optional GC log, summarized after the run
                 '-jar',
                 jar_path
             ]
@@ -83,7 +102,9 @@ def run_jar(jar_path, input_path, output_path, timeout):
                 pass
 
 
-            process = subprocess.Popen(
+            spawn_start = time.perf_counter()
+            # AccountedPopen reaps the JVM with os.wait4, which keeps its CPU time and peak RSS
+            process = AccountedPopen(
                 java_command,
                 stdin=infile,
                 stdout=outfile,
@@ -93,6 +114,7 @@ def run_jar(jar_path, input_path, output_path, timeout):
             )
 
             try:
+                PROFILER.record("jvm_spawn", spawn_start, time.perf_counter() - spawn_start, case_key); wait_start = time.perf_counter()
                 _, stderr_content = process.communicate(timeout=timeout)
 
                 if stderr_content:
@@ -121,6 +143,7 @@ def run_jar(jar_path, input_path, output_path, timeout):
                         try:
                             process.kill() # Simple fallback
                         except Exception: pass # Ignore errors on fallback kill
+                    reap(process) # Wait for the killed JVM so its resource usage is still recorded
                 status = 'TLE'
                 stderr_content = b"--- PROCESS KILLED DUE TO TIMEOUT ---"
 
@@ -139,38 +162,40 @@ def run_jar(jar_path, input_path, output_path, timeout):
              except Exception as kill_e:
                   print(f"    Error trying to kill process after unexpected error: {kill_e}")
 
+    if wait_start is not None: PROFILER.record("process_wait", wait_start, time.perf_counter() - wait_start, case_key)
+    if os.path.exists(output_path): PROFILER.count("output_bytes", os.path.getsize(output_path))
     end_time = time.time()
+    usage = USAGE.record(jar_path, input_path, status, end_time - start_time, process, gc_log_path)
     # Note: Changed "Initial Status" to "Run Status" for clarity
-    print(f"    Finished {os.path.basename(jar_path)} on {os.path.basename(input_path)} in {end_time - start_time:.2f}s - Run Status: {status}")
+    print(f"    Finished {os.path.basename(jar_path)} on {os.path.basename(input_path)} in {end_time - start_time:.2f}s - Run Status: {status}{describe(usage)}")
     return status, b'', stderr_content
 
-def compare_outputs(std_ans_path, test_out_path):
+def compare_outputs(std_ans_path, test_out_path, input_path=None):
     """
-    Compares two output files, ignoring leading/trailing whitespace on each line.
-    Returns True if identical, False otherwise.
+    Compares two output files in a single streaming pass, ignoring leading/trailing whitespace on each line.
+    Returns a CompareResult: .match is True if identical, .mismatches lists the first
+    MAX_DIFF_LINES_TO_LOG differing lines with the input command that produced each one.
     """
     try:
         if not os.path.exists(std_ans_path):
              print(f"    Error comparing: Standard answer file not found ({std_ans_path})")
-             return False
+             return CompareResult(False, [], False)
         if not os.path.exists(test_out_path):
              print(f"    Error comparing: Test output file not found ({test_out_path})")
-             return False
-
-        with open(std_ans_path, 'r', encoding='utf-8', errors='ignore') as f1, \
-             open(test_out_path, 'r', encoding='utf-8', errors='ignore') as f2:
-            lines1 = [line.strip() for line in f1]
-            lines2 = [line.strip() for line in f2]
-            while lines1 and not lines1[-1]: lines1.pop()
-            while lines2 and not lines2[-1]: lines2.pop()
-            return lines1 == lines2
+             return CompareResult(False, [], False)
+
+        return compare_output_files(std_ans_path, test_out_path, input_path, MAX_DIFF_LINES_TO_LOG)
     except Exception as e:
         print(f"    Error comparing files {std_ans_path} and {test_out_path}: {e}")
-        return False
+        return CompareResult(False, [], False)
 
 def create_log_file(log_path, input_path, std_ans_path, test_out_path,
-                    std_status, test_status, test_stderr_content, final_status):
-    """Creates a log file for a failed test case."""
+                    std_status, test_status, test_stderr_content, final_status, comparison=None):
+    """
+    Creates a log file for a failed test case.
+    File contents are copied in chunks; for WA the mismatches found by the judge are listed at the end.
+    Files above output_compare.EXCERPT_THRESHOLD are excerpted around those mismatches instead of copied whole.
+    """
     # Added check: Don't log if the final status is implicitly AC due to skipping
     if final_status == 'AC (Skipped - Std TLE)':
          print(f"    Skipping log creation for {os.path.basename(input_path)} (Std TLE).")
@@ -178,6 +203,13 @@ def create_log_file(log_path, input_path, std_ans_path, test_out_path,
 
     print(f"    Difference detected ({final_status})! Creating log: {log_path}")
     try:
+        # Reuse the comparison made while judging; its mismatches also pick the lines excerpted from huge files
+        if final_status == 'WA' and comparison is None:
+            comparison = compare_outputs(std_ans_path, test_out_path, input_path)
+        mismatches = comparison.mismatches if comparison else []
+        input_centers = [mismatch.input_line for mismatch in mismatches]
+        output_centers = [mismatch.output_line for mismatch in mismatches]
+
         with open(log_path, 'w', encoding='utf-8') as logfile:
             logfile.write(f"--- Test Case Failed: {final_status} ---\n")
             logfile.write(f"Standard JAR Status: {std_status}\n")
@@ -190,8 +222,7 @@ def create_log_file(log_path, input_path, std_ans_path, test_out_path,
 
             logfile.write("--- Input Data ({}) ---\n".format(os.path.basename(input_path)))
             try:
-                with open(input_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    logfile.write(f.read())
+                copy_text_excerpt(input_path, logfile, input_centers)
             except Exception as e:
                 logfile.write(f"\n!!! Error reading input file: {e} !!!\n")
             logfile.write("\n--- End Input Data ---\n\n")
@@ -200,8 +231,7 @@ def create_log_file(log_path, input_path, std_ans_path, test_out_path,
             logfile.write("--- Standard Output ({}) ---\n".format(os.path.basename(std_ans_path)))
             if os.path.exists(std_ans_path):
                 try:
-                    with open(std_ans_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        logfile.write(f.read())
+                    copy_text_excerpt(std_ans_path, logfile, output_centers)
                 except Exception as e:
                     logfile.write(f"\n!!! Error reading standard output file: {e} !!!\n")
             else:
@@ -218,18 +248,283 @@ def create_log_file(log_path, input_path, std_ans_path, test_out_path,
             logfile.write("--- Test Program Output ({}) ---\n".format(os.path.basename(test_out_path)))
             if os.path.exists(test_out_path):
                  try:
-                      with open(test_out_path, 'r', encoding='utf-8', errors='ignore') as f:
-                           logfile.write(f.read())
+                      copy_text_excerpt(test_out_path, logfile, output_centers)
                  except Exception as e:
                       logfile.write(f"\n!!! Error reading test output file: {e} !!!\n")
             else:
                  logfile.write("!!! Test output file not found or empty (possibly skipped or crashed early) !!!\n")
             logfile.write("\n--- End Test Program Output ---\n")
 
+            # Detailed differences for WA, reusing the comparison made while judging
+            if final_status == 'WA':
+                 logfile.write(f"\n--- Detailed Differences (First {MAX_DIFF_LINES_TO_LOG} Mismatches) ---\n")
+                 for diff_count, mismatch in enumerate(comparison.mismatches, start=1):
+                      logfile.write(f"\n[Mismatch #{diff_count} at Output Line {mismatch.output_line}]\n")
+                      if mismatch.input_line is not None:
+                           logfile.write(f"  Input Command (Line {mismatch.input_line}): {mismatch.input_command}\n")
+                      else:
+                           logfile.write("  Input Command: <output has more lines than the input has commands>\n")
+                      logfile.write(f"  Standard Output: {mismatch.std_line}\n")
+                      logfile.write(f"  Test Output    : {mismatch.test_line}\n")
+                 if comparison.stopped_early:
+                      logfile.write("\n--- (Reached max difference lines to log) ---\n")
+                 elif not comparison.mismatches:
+                      logfile.write("\n--- No line-by-line differences found (missing or unreadable file?) ---\n")
+
     except Exception as e:
         print(f"    Error creating log file {log_path}: {e}")
 
 
+def run_std_case(std_jar_path, input_path):
+    """Runs the standard JAR on one input, records its status in std_run_statuses and returns it."""
+    input_basename = os.path.basename(input_path)
+    std_ans_basename = os.path.splitext(input_basename)[0] + ".ans"
+    std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
+
+    std_timeout = TIMEOUT_SECONDS * 3 # Give std more time
+    cached = STD_CACHE.lookup(std_jar_path, input_path, std_ans_path, std_timeout) if std_jar_path else None
+    if std_jar_path is None: # JUDGE_STD=oracle
+        print(f"  Running reference oracle for {input_basename}...")
+        with PROFILER.phase("oracle_run", input_basename):
+            std_status = oracle.run_file(input_path, std_ans_path)
+    elif cached:
+        std_status = cached[0]
+        print(f"  Reusing cached standard answer for {input_basename} - Run Status: {std_status}")
+        if std_status == 'AC': # Old cache entries have no CPU time, their wall time is the best estimate
+            LIMITS.record_std(input_basename, *((cached[2], 'cpu') if cached[2] is not None else (cached[1], 'wall')))
+    else:
+        print(f"  Running standard JAR for {input_basename}...")
+        run_start = time.perf_counter()
+        std_status, _, std_stderr = run_jar(std_jar_path, input_path, std_ans_path, timeout=std_timeout)
+        std_elapsed = time.perf_counter() - run_start
+        std_time, std_clock = measured_time(os.path.basename(std_jar_path), input_basename, std_elapsed)
+        STD_CACHE.store(std_jar_path, input_path, std_ans_path, std_status, std_elapsed, std_timeout,
+                        std_time if std_clock == 'cpu' else None)
+        if std_status == 'AC':
+            LIMITS.record_std(input_basename, std_time, std_clock)
+    std_run_statuses[input_basename] = std_status
+
+    if std_status != 'AC' and not os.path.exists(std_ans_path):
+         try:
+              open(std_ans_path, 'w').close()
+              print(f"    Created empty standard output file due to status: {std_status}")
+         except Exception as e_create:
+              print(f"    Warning: Failed to create empty output file {std_ans_path}: {e_create}")
+
+    if std_status == 'RE': print(f"    Warning: Standard JAR reported RE for {input_basename}.")
+    elif std_status == 'TLE': print(f"    Warning: Standard JAR reported TLE for {input_basename}.")
+    return std_status
+
+def case_paths(test_jar_path, input_path):
+    """Returns (output path, log path) of one test JAR on one input file."""
+    jar_name_no_ext = os.path.splitext(os.path.basename(test_jar_path))[0]
+    input_name_no_ext = os.path.splitext(os.path.basename(input_path))[0]
+    return (os.path.join(OUT_DIR, f"{jar_name_no_ext}_{input_name_no_ext}.txt"),
+            os.path.join(LOG_DIR, f"{jar_name_no_ext}_{input_name_no_ext}.log"))
+
+def submit_when_done(executor, future, fn, *args):
+    """
+    Submits fn(*args) to the pool once `future` has finished and returns a Future of its result,
+    so no pool thread sits blocked waiting for `future`. If it has already finished, fn is submitted at once.
+    """
+    result = concurrent.futures.Future()
+    def relay(inner):
+        if inner.cancelled():
+            result.cancel()
+        elif inner.exception() is not None:
+            result.set_exception(inner.exception())
+        else:
+            result.set_result(inner.result())
+    def launch(_):
+        try:
+            executor.submit(fn, *args).add_done_callback(relay)
+        except RuntimeError as e: # The pool is shutting down
+            result.set_exception(e)
+    future.add_done_callback(launch)
+    return result
+
+def judge_case(test_jar_path, input_path, std_future):
+    """
+    Runs one test JAR on one input concurrently with the standard run for that input,
+    compares as soon as std_future has finished, and returns the final status.
+    With calibrated time limits the case is only submitted once std_future has finished (submit_when_done).
+    """
+    test_jar_name = os.path.basename(test_jar_path)
+    input_basename = os.path.basename(input_path)
+    input_name_no_ext = os.path.splitext(input_basename)[0]
+    case_name = f"{test_jar_name}/{input_basename}" # Cases run interleaved, so tag every message
+
+    # Define paths
+    test_out_path, log_path = case_paths(test_jar_path, input_path)
+    std_ans_basename = input_name_no_ext + ".ans"
+    std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
+
+    # A calibrated time limit needs std's time on this input: then the case was submitted after the standard run
+    # finished (std_future.result() below returns at once) instead of running alongside it
+    calibrated = LIMITS.enabled and STD_BACKEND == "jar"
+    test_status = test_wall = None
+    test_timeout = TIMEOUT_SECONDS
+    if not calibrated:
+        print(f"  Testing {case_name}")
+        test_run_start = time.perf_counter()
+        test_status, _, test_stderr_content = run_jar(test_jar_path, input_path, test_out_path, TIMEOUT_SECONDS)
+        test_wall = time.perf_counter() - test_run_start
+
+    # Wait for the standard run of this input, then retrieve its status
+    try:
+        std_future.result()
+    except Exception as e:
+        print(f"    Warning: Standard JAR run for {input_basename} failed unexpectedly: {e}")
+    std_status = std_run_statuses.get(input_basename, 'Skipped (No Std Status)')
+
+    if std_status == 'TLE':
+        print(f"    {case_name}: Skipped because std.jar timed out.")
+        RESULTS.record(test_jar_path, input_path, std_status, test_status, 'AC (Skipped - Std TLE)', test_wall, test_timeout)
+        return 'AC (Skipped - Std TLE)' # Note: We don't create a log file here for skipped cases
+    elif std_status == 'Skipped (No Std Status)':
+         print(f"    {case_name}: Skipping comparison, standard status not found.")
+         RESULTS.record(test_jar_path, input_path, None, test_status, std_status, test_wall, test_timeout)
+         return std_status
+
+    if calibrated:
+        print(f"  Testing {case_name} ({LIMITS.describe_limit(input_basename, TIMEOUT_SECONDS)})")
+        test_timeout = LIMITS.timeout_for(input_basename, TIMEOUT_SECONDS)
+        test_run_start = time.perf_counter()
+        test_status, _, test_stderr_content = run_jar(test_jar_path, input_path, test_out_path, test_timeout)
+        test_wall = time.perf_counter() - test_run_start
+
+    # Compare Statuses and Determine Final Status
+    final_status = 'Unknown'
+    comparison_needed = False
+    comparison = None
+
+    if std_status == test_status:
+        if std_status == 'AC':
+            comparison_needed = True # Will set final_status after compare
+        else: # Both RE
+            final_status = 'AC'
+            print(f"    {case_name}: Consistent non-AC behavior ({std_status}). Accepted.")
+    else: # Statuses differ
+        if test_status == 'AC': # Test AC, Std RE
+            final_status = 'WA'
+            print(f"    {case_name}: Status mismatch: Test JAR AC, but Standard JAR was {std_status}.")
+        else: # Test RE/TLE, Std AC or different RE
+            final_status = test_status # Report Test JAR's failure
+            print(f"    {case_name}: Status mismatch: Test JAR {test_status}, Standard JAR was {std_status}.")
+
+    # Perform comparison only if needed (both initially AC)
+    if comparison_needed:
+         with PROFILER.phase("compare", case_name):
+             comparison = compare_outputs(std_ans_path, test_out_path, input_path)
+         if comparison.match:
+              final_status = 'AC'
+              # Correct, but is it far slower than std on the same input?
+              ratio = LIMITS.check_slow(test_jar_name, input_basename, *measured_time(test_jar_name, input_basename, test_wall))
+              if ratio is not None:
+                  final_status = SLOW_STATUS
+                  print(f"    {case_name}: Correct but {ratio:.1f}x std's time. Marked {SLOW_STATUS}.")
+         else:
+              final_status = 'WA'
+              print(f"    {case_name}: Stdout differs from standard answer.")
+
+    # Create log file ONLY if final status is not Accepted AND not the special skipped status
+    if final_status not in ('AC', SLOW_STATUS, 'AC (Skipped - Std TLE)'):
+         with PROFILER.phase("log_write", case_name):
+             create_log_file(log_path, input_path, std_ans_path, test_out_path,
+                             std_status, test_status, test_stderr_content, final_status, comparison)
+    RESULTS.record(test_jar_path, input_path, std_status, test_status, final_status, test_wall, test_timeout, comparison)
+    return final_status
+
+
+def run_test_case(test_jar_path, input_path):
+    """Vote mode: runs one test JAR on one input file and returns (status, stderr_content)."""
+    print(f"  Testing {os.path.basename(test_jar_path)}/{os.path.basename(input_path)}")
+    status, _, stderr_content = run_jar(test_jar_path, input_path, case_paths(test_jar_path, input_path)[0], TIMEOUT_SECONDS)
+    return status, stderr_content
+
+def describe_divergence(comparison):
+    """The first differing output line and the input command that produced it, for the vote report."""
+    if comparison is None or not comparison.mismatches:
+        return ""
+    mismatch = comparison.mismatches[0]
+    if mismatch.input_line is None:
+        return f", first difference at output line {mismatch.output_line} (past the last command)"
+    return f", first difference at output line {mismatch.output_line} (input line {mismatch.input_line}: {mismatch.input_command})"
+
+def vote_case(input_path, run_futures):
+    """
+    Vote mode (N-version differential testing): waits until every test JAR has run on one input and
+    groups the runs by output content (RE runs form one group, TLE runs never vote).
+    The largest group is taken as the expected output if it holds at least VOTE_QUORUM of all jars
+    and no other group is as large: its jars are AC, the others WA / RE / TLE with a log written
+    against the majority output. Without such a group every jar is skipped for this input.
+    Returns {test_jar_path: final_status}.
+    """
+    input_basename = os.path.basename(input_path)
+    runs = {}
+    for test_jar_path, future in run_futures.items():
+        try:
+            runs[test_jar_path] = future.result()
+        except Exception as e:
+            print(f"    Warning: unexpected error while running {os.path.basename(test_jar_path)}/{input_basename}: {e}")
+            runs[test_jar_path] = ('RE', str(e).encode(errors='ignore'))
+
+    with PROFILER.phase("vote", input_basename):
+        groups = {} # {output digest or 'RE': [test_jar_path]}
+        for test_jar_path, (status, _) in runs.items():
+            if status == 'AC':
+                groups.setdefault(output_digest(case_paths(test_jar_path, input_path)[0]), []).append(test_jar_path)
+            elif status == 'RE':
+                groups.setdefault('RE', []).append(test_jar_path)
+        ranked = sorted(groups.items(), key=lambda item: len(item[1]), reverse=True)
+        group_text = " | ".join(", ".join(os.path.basename(p) for p in jars) + (" (RE)" if key == 'RE' else "")
+                                for key, jars in ranked)
+
+        if not ranked or len(ranked[0][1]) < VOTE_QUORUM * len(runs) or \
+                (len(ranked) > 1 and len(ranked[1][1]) == len(ranked[0][1])):
+            print(f"    {input_basename}: no output reached the quorum. Skipping.")
+            vote_summaries[input_basename] = f"{input_basename}: no quorum ({len(runs)} jars) - groups: {group_text or 'none'}"
+            for test_jar_path, (status, _) in runs.items():
+                RESULTS.record(test_jar_path, input_path, "vote", status, 'Skipped (No Quorum)', limit_s=TIMEOUT_SECONDS)
+            return {test_jar_path: 'Skipped (No Quorum)' for test_jar_path in runs}
+
+        winner, majority = ranked[0]
+        reference_out = case_paths(majority[0], input_path)[0]
+        majority_label = f"Majority of test jars ({len(majority)}/{len(runs)}, e.g. {os.path.basename(majority[0])})" + \
+                         (" - RE" if winner == 'RE' else "")
+        results, minority_lines = {}, []
+        for test_jar_path, (status, stderr_content) in sorted(runs.items()):
+            if test_jar_path in majority:
+                results[test_jar_path] = 'AC'
+                RESULTS.record(test_jar_path, input_path, "vote", status, 'AC', limit_s=TIMEOUT_SECONDS)
+                continue
+            test_out_path, log_path = case_paths(test_jar_path, input_path)
+            final_status = 'WA' if status == 'AC' else status
+            comparison = compare_outputs(reference_out, test_out_path, input_path)
+            print(f"    {os.path.basename(test_jar_path)}/{input_basename}: differs from the majority. Marked as {final_status}.")
+            create_log_file(log_path, input_path, reference_out, test_out_path,
+                            majority_label, status, stderr_content, final_status, comparison)
+            minority_lines.append(f"    {os.path.basename(test_jar_path)}: {final_status}{describe_divergence(comparison)}")
+            results[test_jar_path] = final_status
+            RESULTS.record(test_jar_path, input_path, "vote", status, final_status, limit_s=TIMEOUT_SECONDS, comparison=comparison)
+
+    vote_summaries[input_basename] = "\n".join(
+        [f"{input_basename}: majority {len(majority)}/{len(runs)} - groups: {group_text}"] + minority_lines)
+    return results
+
+def write_vote_report(report_path, overall_results):
+    """Vote mode: per-input groups and minority jars, then how often each jar was outvoted."""
+    minority_count = {name: sum(s in ('WA', 'RE', 'TLE') for s in results.values())
+                      for name, results in overall_results.items()}
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(f"--- Majority Vote Report (quorum {VOTE_QUORUM:.0%}) ---\n\n")
+        for input_basename in sorted(vote_summaries):
+            f.write(vote_summaries[input_basename] + "\n")
+        f.write("\nTimes each jar was in the minority:\n")
+        for name in sorted(minority_count, key=lambda n: -minority_count[n]):
+            f.write(f"  - {name}: {minority_count[name]}/{len(overall_results[name])}\n")
+
+
 # --- Main Script Logic ---
 
 if __name__ == "__main__":
@@ -265,15 +560,19 @@ if __name__ == "__main__":
     # Find standard JAR
     # ... (std jar finding) ...
     std_jars = glob.glob(os.path.join(STD_DIR, "*.jar"))
-    if not std_jars: print(f"Error: No standard JAR file found in '{STD_DIR}'."); sys.exit(1)
-    if len(std_jars) > 1: print(f"Error: Multiple JAR files found in '{STD_DIR}'."); sys.exit(1)
-    std_jar_path = std_jars[0]; print(f"Found standard JAR: {std_jar_path}")
+    if STD_BACKEND == "oracle": std_jar_path = None; print("Using reference oracle (oracle.py) instead of a standard JAR.")
+    elif STD_BACKEND == "vote": std_jar_path = None; print(f"Vote mode: no standard JAR, the majority output of the test JARs is expected (quorum {VOTE_QUORUM:.0%}).")
+    else:
+        if not std_jars: print(f"Error: No standard JAR file found in '{STD_DIR}'. (Set JUDGE_STD=vote to judge by majority vote instead.)"); sys.exit(1)
+        if len(std_jars) > 1: print(f"Error: Multiple JAR files found in '{STD_DIR}'."); sys.exit(1)
+        std_jar_path = std_jars[0]; print(f"Found standard JAR: {std_jar_path}")
 
 
     # Find test JARs
     # ... (test jar finding) ...
     test_jar_paths = glob.glob(os.path.join(TESTJAR_DIR, "*.jar"))
     if not test_jar_paths: print(f"Warning: No test JAR files found in '{TESTJAR_DIR}'.")
+    if STD_BACKEND == "vote" and len(test_jar_paths) < 3: print("Warning: vote mode with fewer than 3 test JARs, a majority means little.")
 
 
     # Find input data files
@@ -284,111 +583,71 @@ if __name__ == "__main__":
     print("--- End Setup Phase ---")
 
 
-    # 2. Generate Standard Outputs and Record Statuses
-    print("\n--- Generating Standard Outputs & Recording Statuses ---")
+    # 2. Generate Standard Outputs and Run Comparison Testing (pipelined)
+    print(f"\n--- Standard Outputs & Comparison Testing Phase (up to {MAX_WORKERS} parallel runs) ---")
     std_run_statuses.clear()
-    for input_path in input_files:
-        input_basename = os.path.basename(input_path)
-        std_ans_basename = os.path.splitext(input_basename)[0] + ".ans"
-        std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
-
-        print(f"  Running standard JAR for {input_basename}...")
-        std_status, _, std_stderr = run_jar(std_jar_path, input_path, std_ans_path, timeout=TIMEOUT_SECONDS * 3) # Give std more time
-        std_run_statuses[input_basename] = std_status
-
-        if std_status != 'AC' and not os.path.exists(std_ans_path):
-             try:
-                  open(std_ans_path, 'w').close()
-                  print(f"    Created empty standard output file due to status: {std_status}")
-             except Exception as e_create:
-                  print(f"    Warning: Failed to create empty output file {std_ans_path}: {e_create}")
-
-        if std_status == 'RE': print(f"    Warning: Standard JAR reported RE for {input_basename}.")
-        elif std_status == 'TLE': print(f"    Warning: Standard JAR reported TLE for {input_basename}.")
-
-    print("--- Standard Output Generation & Status Recording Complete ---")
-
-
-    # 3. Run Comparison Testing
-    print("\n--- Comparison Testing Phase ---")
-    overall_results = {}
+    test_jar_paths.sort()
+    case_futures = {}
+    vote_futures = {} # Vote mode: {input_path: Future[{test_jar_path: final_status}]}
+    resumed_results = {} # JUDGE_RESUME=1: {(test_jar_path, input_path): verdict streamed by an earlier run}
+    vote_summaries.clear()
+    RESULTS.start(std_jar_path, STD_BACKEND, TIMEOUT_SECONDS)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Submit per input, std first: the pool dequeues in FIFO order, so an input's std run always
+        # starts before its test runs, and test runs waiting on std can never starve the pool.
+        # With calibrated limits a test run needs std's time, so its case is submitted by a callback once
+        # the std run is done: later inputs' std runs keep the pool busy meanwhile.
+        calibrated = LIMITS.enabled and STD_BACKEND == "jar"
+        for input_path in input_files:
+            if STD_BACKEND == "vote":
+                # Same ordering argument: all runs of an input are dequeued before its vote waits on them
+                run_futures = {test_jar_path: executor.submit(run_test_case, test_jar_path, input_path)
+                               for test_jar_path in test_jar_paths}
+                vote_futures[input_path] = executor.submit(vote_case, input_path, run_futures)
+                continue
+            for test_jar_path in test_jar_paths:
+                record = RESULTS.reusable(test_jar_path, input_path)
+                if record:
+                    resumed_results[(test_jar_path, input_path)] = record["verdict"]
+            pending = [p for p in test_jar_paths if (p, input_path) not in resumed_results]
+            if test_jar_paths and not pending:
+                continue # Every jar was judged on this input by the run being resumed, so std is not needed either
+            std_future = executor.submit(run_std_case, std_jar_path, input_path)
+            for test_jar_path in pending:
+                if calibrated:
+                    case_futures[(test_jar_path, input_path)] = submit_when_done(
+                        executor, std_future, judge_case, test_jar_path, input_path, std_future)
+                else:
+                    case_futures[(test_jar_path, input_path)] = executor.submit(judge_case, test_jar_path, input_path, std_future)
+        # Callback submissions must happen before the pool shuts down at the end of this block
+        concurrent.futures.wait(case_futures.values())
+    RESULTS.close()
+    print("--- Standard Outputs & Comparison Testing Complete ---")
+    if resumed_results:
+        print(f"Reused {len(resumed_results)} case results of the previous run from {RESULTS.path} (JUDGE_RESUME=1).")
 
     if not test_jar_paths:
          print("No test JARs found to compare. Exiting.")
          sys.exit(0)
 
+
+    # 3. Collect Results (sorted jar / input order, regardless of completion order)
+    overall_results = {}
     for test_jar_path in test_jar_paths:
-        test_jar_name = os.path.basename(test_jar_path)
-        print(f"\n--- Testing JAR: {test_jar_name} ---")
         jar_results = {}
-        overall_results[test_jar_name] = jar_results
-
+        overall_results[os.path.basename(test_jar_path)] = jar_results
         for input_path in input_files:
             input_basename = os.path.basename(input_path)
-            input_name_no_ext = os.path.splitext(input_basename)[0]
-            print(f"  Testing with input: {input_basename}")
-
-            # Define paths
-            test_out_filename = f"{os.path.splitext(test_jar_name)[0]}_{input_name_no_ext}.txt"
-            test_out_path = os.path.join(OUT_DIR, test_out_filename)
-            log_filename = f"{os.path.splitext(test_jar_name)[0]}_{input_name_no_ext}.log"
-            log_path = os.path.join(LOG_DIR, log_filename)
-            std_ans_basename = input_name_no_ext + ".ans"
-            std_ans_path = os.path.join(STDOUT_DIR, std_ans_basename)
-
-            # Retrieve standard status
-            std_status = std_run_statuses.get(input_basename, 'Skipped (No Std Status)')
-
-            # --- MODIFICATION: Skip if Std TLE ---
-            if std_status == 'TLE':
-                print(f"    Skipping input {input_basename} because std.jar timed out.")
-                final_status = 'AC (Skipped - Std TLE)' # Assign special status
-                jar_results[input_basename] = final_status
-                # Note: We don't create a log file here for skipped cases
-                continue # Move to the next input file for this test jar
-            elif std_status == 'Skipped (No Std Status)':
-                 print(f"    Skipping comparison: Standard status for '{input_basename}' not found.")
-                 jar_results[input_basename] = std_status
-                 continue
-            # --- End MODIFICATION ---
-
-            # If std_status was not TLE or Skipped, proceed with running test jar
-            test_status, _, test_stderr_content = run_jar(test_jar_path, input_path, test_out_path, TIMEOUT_SECONDS)
-
-            # Compare Statuses and Determine Final Status
-            final_status = 'Unknown'
-            comparison_needed = False
-
-            if std_status == test_status:
-                if std_status == 'AC':
-                    comparison_needed = True # Will set final_status after compare
-                else: # Both RE
-                    final_status = 'AC'
-                    print(f"    Consistent non-AC behavior ({std_status}). Accepted.")
-            else: # Statuses differ
-                if test_status == 'AC': # Test AC, Std RE
-                    final_status = 'WA'
-                    print(f"    Status mismatch: Test JAR AC, but Standard JAR was {std_status}.")
-                else: # Test RE/TLE, Std AC or different RE
-                    final_status = test_status # Report Test JAR's failure
-                    print(f"    Status mismatch: Test JAR {test_status}, Standard JAR was {std_status}.")
-
-            # Perform comparison only if needed (both initially AC)
-            if comparison_needed:
-                 if compare_outputs(std_ans_path, test_out_path):
-                      final_status = 'AC'
-                 else:
-                      final_status = 'WA'
-                      print(f"    Stdout differs from standard answer.")
-
-            # Store final result
-            jar_results[input_basename] = final_status
-
-            # Create log file ONLY if final status is not Accepted AND not the special skipped status
-            if final_status != 'AC' and final_status != 'AC (Skipped - Std TLE)':
-                 # Pass test_status which is relevant here
-                 create_log_file(log_path, input_path, std_ans_path, test_out_path,
-                                 std_status, test_status, test_stderr_content, final_status)
+            try:
+                if (test_jar_path, input_path) in resumed_results:
+                    jar_results[input_basename] = resumed_results[(test_jar_path, input_path)]
+                elif STD_BACKEND == "vote":
+                    jar_results[input_basename] = vote_futures[input_path].result()[test_jar_path]
+                else:
+                    jar_results[input_basename] = case_futures[(test_jar_path, input_path)].result()
+            except Exception as e:
+                print(f"  Error: unexpected failure while judging {os.path.basename(test_jar_path)}/{input_basename}: {e}")
+                jar_results[input_basename] = f"Skipped (Internal Error: {e})"
 
 
     # 4. Generate Reports
@@ -400,7 +659,7 @@ if __name__ == "__main__":
 
         total_cases = len(results)
         # Initialize counts, including the new skipped status
-        counts = {'AC': 0, 'WA': 0, 'TLE': 0, 'RE': 0, 'AC (Skipped - Std TLE)': 0}
+        counts = {'AC': 0, SLOW_STATUS: 0, 'WA': 0, 'TLE': 0, 'RE': 0, 'AC (Skipped - Std TLE)': 0}
         other_skipped_count = 0
         failed_or_skipped_cases = [] # Stores tuples (input_name, status)
 
@@ -411,14 +670,16 @@ if __name__ == "__main__":
                 other_skipped_count += 1
                 status = status # Keep the original status string
 
-            # List all non-plain 'AC' results for details
-            if status != 'AC':
+            # List all failed or skipped results for details (slow ones have their own section)
+            if status == 'TLE':
+                failed_or_skipped_cases.append((input_name, f"TLE, {LIMITS.describe_limit(input_name, TIMEOUT_SECONDS)}"))
+            elif status not in ('AC', SLOW_STATUS):
                 failed_or_skipped_cases.append((input_name, status))
 
         failed_or_skipped_cases.sort() # Sort by input name
 
         try:
-            with open(report_path, 'w', encoding='utf-8') as f:
+            with PROFILER.phase("report_write"), open(report_path, 'w', encoding='utf-8') as f:
                 f.write(f"--- Test Report for {test_jar_name} ---\n\n")
                 f.write(f"Total Test Cases Processed: {total_cases}\n")
                 f.write("Summary:\n")
@@ -429,6 +690,7 @@ if __name__ == "__main__":
                 re_count = counts.get('RE', 0)
 
                 if plain_ac_count > 0: f.write(f"  - AC (Passed): {plain_ac_count}\n")
+                if counts[SLOW_STATUS] > 0: f.write(f"  - AC (Passed, but slow): {counts[SLOW_STATUS]}\n")
                 if wa_count > 0: f.write(f"  - WA (Wrong Answer): {wa_count}\n")
                 if tle_count > 0: f.write(f"  - TLE (Time Limit Exceeded): {tle_count}\n")
                 if re_count > 0: f.write(f"  - RE (Runtime Error): {re_count}\n")
@@ -446,8 +708,31 @@ if __name__ == "__main__":
                 else:
                      f.write("\nAll run test cases passed (or were skipped due to Std TLE).\n")
 
+                slow_lines = LIMITS.slow_lines(test_jar_name)
+                if slow_lines:
+                    f.write("\n" + "\n".join(slow_lines) + "\n")
+
+                # CPU / memory of this jar's runs: heavy submissions stand out even when they pass
+                usage_lines = USAGE.jar_lines(test_jar_name)
+                if usage_lines:
+                    f.write("\n" + "\n".join(usage_lines) + "\n")
+
         except Exception as e:
             print(f"  Error writing report {report_path}: {e}")
 
-
+    if STD_BACKEND == "vote":
+        vote_report_path = os.path.join(os.path.dirname(sys.argv[0]) or '.', VOTE_REPORT)
+        print(f"  Generating majority vote report: {vote_report_path}")
+        try:
+            write_vote_report(vote_report_path, overall_results)
+        except Exception as e:
+            print(f"  Error writing report {vote_report_path}: {e}")
+
+    print(STD_CACHE.summary())
+    print(LIMITS.summary(TIMEOUT_SECONDS))
+    summary_path = RESULTS.write_summary()
+    if summary_path:
+        print(f"Result stream: {RESULTS.path}, summary: {summary_path} (python result_stream.py merges streams into a new one)")
+    USAGE.report()
+    PROFILER.report()
     print("\n--- Comparison Testing Complete ---")
\ No newline at end of file
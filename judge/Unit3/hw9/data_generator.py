@@ -1,6 +1,16 @@
 import random
 import os
+import sys
 import string
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import topology
+import outcome_coverage
+import graph_state
+from output_compare import build_line_index
+from outcome_coverage import COVERAGE
+from graph_state import GRAPH
 
 # --- 配置常量 ---
 MODE_PUBLIC = 's'
@@ -31,6 +41,10 @@ EXCEPTION_TARGET_COMMANDS = [
     "qv", "qci", "qtav", "qba"
 ]
 
+# 批量生成: 每个进程有自己的一份状态变量, 文件之间互不影响
+DEFAULT_WORKERS = os.cpu_count() or 1
+MANIFEST_PATH = os.path.join("data", "manifest.json") # 记录每个文件的种子, 用于逐字节复现
+
 
 # --- 状态维护变量 ---
 persons = set()
@@ -39,6 +53,7 @@ relations = set() # Store as tuple (min_id, max_id)
 relation_values = {} # Store as tuple (min_id, max_id) -> value
 person_tags = {} # person_id -> set of tag_ids
 tag_members = {} # (person_id, tag_id) -> set of member_person_ids
+worst_case_topology = None # 当前最坏情况文件的 topology.Topology, 输出 ln 之前为 None
 
 current_instruction_count = 0
 max_instr = 0
@@ -517,6 +532,25 @@ def strategy_exception_focus(commands_list):
     return generated
 
 
+def strategy_coverage_guided(commands_list):
+    """策略：根据 oracle 的输出反馈 (outcome_coverage.py), 优先生成以往结果 (异常类型与计数、零 / 负 / 大的查询结果) 出现最少的合法指令或违反 JML 的指令"""
+    commands = [c for c in commands_list if c != "ln" or current_instruction_count == 0]
+    return COVERAGE.next_lines(commands, lambda command: strategy_random([command]), random) or strategy_random(commands_list)
+
+
+def strategy_query_aware(commands_list):
+    """策略：按 graph_state 维护的三元环数、连通性 (可回滚的并查集) 与度数统计, 每轮先做一次改变图的操作 (闭合最多三角形的 ar、
+    连接两个连通分量的 ar、删除生成森林中的边、制造 qba 并列), 紧接着生成答案因此改变 (或不该改变) 的 qts / qci / qba / qv"""
+    lines = GRAPH.plan_round(random, max_p, lambda: generate_unique_id(persons | set(GRAPH.adj)))
+    for line in lines:
+        parts = line.split()
+        if parts[0] == "ap":
+            add_person_state(int(parts[1]), parts[2], int(parts[3]))
+        elif parts[0] in ("ar", "mr"):
+            apply_topology_line(line)
+    return lines
+
+
 def strategy_tag_focus(commands_list):
     """策略：重点生成与Tag相关的操作"""
     # Increase probability of tag-related commands
@@ -537,9 +571,61 @@ def strategy_load_network(commands_list):
          return strategy_random([c for c in commands_list if c != "ln"]) # Fallback if not first
 
 
+# --- 最坏情况拓扑 ---
+def apply_topology_line(line):
+    """把拓扑产生的 ar / mr / at / att / dft 同步到生成器状态"""
+    parts = line.split()
+    command, args = parts[0], list(map(int, parts[1:]))
+    if command == "ar":
+        add_relation_state(*args)
+    elif command == "mr":
+        modify_relation_state(*args)
+    elif command == "at":
+        add_tag_state(*args)
+    elif command == "att":
+        add_to_tag_state(*args)
+    elif command == "dft":
+        del_from_tag_state(*args)
+
+
+def worst_case_lines(family, commands_list):
+    """首次调用: 人数上限下该拓扑的 ln 块及后续设置指令; 之后每次: 一轮扰动 + 最昂贵的查询"""
+    global worst_case_topology
+    if worst_case_topology is None:
+        if current_instruction_count > 0 or "ln" not in commands_list:
+            return [] # ln 只能是第一条指令
+        worst_case_topology = topology.build(family, max_p, random, COMMANDS)
+        for pid, name, age in zip(worst_case_topology.ids, worst_case_topology.names, worst_case_topology.ages):
+            add_person_state(pid, name, age)
+        for (p1, p2), value in worst_case_topology.edges.items():
+            add_relation_state(p1, p2, value)
+        for line in worst_case_topology.setup:
+            apply_topology_line(line)
+        return worst_case_topology.ln_lines() + worst_case_topology.setup
+    lines = worst_case_topology.next_lines()
+    for line in lines:
+        apply_topology_line(line)
+    return lines
+
+
+def make_worst_case_strategy(family):
+    def strategy(commands_list):
+        return worst_case_lines(family, commands_list)
+    strategy.__name__ = f"strategy_worst_{family}"
+    strategy.__doc__ = f"策略：最坏情况拓扑 {family}，剩余指令全部用于该拓扑下最昂贵的查询"
+    return strategy
+
+
+# {策略名: 策略}, 每个本次作业指令能表达的拓扑族一个
+WORST_CASE_STRATEGIES = {f"worst_{family}": make_worst_case_strategy(family)
+                         for family in topology.available_families(COMMANDS)}
+
+
 # --- 主生成逻辑 ---
-def generate_test_case(filename, mode_choice):
-    global persons, person_details, relations, relation_values, person_tags, tag_members
+def generate_test_case(filename, mode_choice, seed=None, strategy_func=None):
+    """生成单个测试文件; 给定 seed 时文件内容只由 (seed, 模式, 策略) 决定.
+    strategy_func 为 None 时每一步从下面的策略中随机选择, 否则整个文件只用该策略"""
+    global persons, person_details, relations, relation_values, person_tags, tag_members, worst_case_topology
     global current_instruction_count, max_instr, max_p, mode
 
     # Reset state for new file
@@ -549,7 +635,11 @@ def generate_test_case(filename, mode_choice):
     relation_values = {}
     person_tags = {}
     tag_members = {}
+    worst_case_topology = None
     current_instruction_count = 0
+    random.seed(seed)
+    COVERAGE.reset()
+    GRAPH.reset()
 
     mode = mode_choice
     max_instr = MAX_INSTRUCTIONS[mode]
@@ -570,7 +660,7 @@ def generate_test_case(filename, mode_choice):
     with open(filename, 'w') as f:
         while current_instruction_count < max_instr:
             # Choose a strategy
-            chosen_strategy = random.choice(strategies)
+            chosen_strategy = strategy_func or random.choice(strategies)
 
             # Generate instruction(s) using the strategy
             generated_lines = chosen_strategy(allowed_commands)
@@ -591,15 +681,18 @@ def generate_test_case(filename, mode_choice):
                      lines_written += 1
                  else:
                      break # Stop if limit reached mid-generation
+            COVERAGE.observe(generated_lines[:lines_written]) # oracle 跟上文件内容, 统计每个文件的结果覆盖
+            GRAPH.observe(generated_lines[:lines_written]) # 三元环数 / 连通性 / 度数, 并记录查询的期望答案
 
             # If a strategy generated nothing useful (e.g., couldn't find valid targets)
             # or we hit the limit, break or continue
             if lines_written == 0 and current_instruction_count < max_instr:
                  # Try a fallback strategy if one failed to produce output
                  fallback_lines = strategy_random(allowed_commands)
+                 fallback_written = []
                  for line in fallback_lines:
                      if current_instruction_count < max_instr:
-                         f.write(line + '\n')
+                         f.write(line + '\n'); fallback_written.append(line)
                          if line.startswith("ln "):
                              n = int(line.split()[1])
                              current_instruction_count += (1 + 3 + (n-1 if n>0 else 0))
@@ -607,15 +700,95 @@ def generate_test_case(filename, mode_choice):
                             current_instruction_count += 1
                      else:
                          break
+                 COVERAGE.observe(fallback_written)
+                 GRAPH.observe(fallback_written)
 
             if current_instruction_count >= max_instr:
                 break
 
-    print(f"Generated {filename} with {current_instruction_count} instructions.")
+    build_line_index(filename) # data/<文件名>.idx: 输出行 -> 输入行, 供评测机写日志和对比时直接定位
+    GRAPH.write_answers(graph_state.expect_path_for(filename)) # data/<文件名>.expect: qts / qci / qv / qba 的期望答案
+    print(f"Generated {filename} with {current_instruction_count} instructions ({GRAPH.summary()}).")
+
+
+def generate_seeded_case(task):
+    """进程池任务: task = (filepath, mode, seed, strategy_name), strategy_name 为 None 表示混合策略; 返回各结果出现次数"""
+    filepath, mode_choice, seed, strategy_name = task
+    strategy_func = None
+    if strategy_name:
+        strategy_func = WORST_CASE_STRATEGIES.get(strategy_name) or globals()[f"strategy_{strategy_name}"]
+    generate_test_case(filepath, mode_choice, seed, strategy_func)
+    return COVERAGE.hits
+
+
+def generate_batch(tasks, workers):
+    """生成全部 tasks (workers > 1 时使用进程池), 返回成功生成的 [(task, 各结果出现次数)] (保持原顺序)"""
+    outcomes = []
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            futures = [executor.submit(generate_seeded_case, task) for task in tasks]
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append(e)
+    else:
+        for task in tasks:
+            try:
+                outcomes.append(generate_seeded_case(task))
+            except Exception as e:
+                outcomes.append(e)
+
+    generated = []
+    for task, outcome in zip(tasks, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Error generating {task[0]} (seed {task[2]}): {outcome!r}", file=sys.stderr)
+        else:
+            print(f"    {os.path.basename(task[0])} coverage: {outcome_coverage.summary(outcome)}")
+            generated.append((task, outcome))
+    return generated
+
+
+def write_manifest(mode_choice, master_seed, generated):
+    cases = [{"file": os.path.basename(filepath), "seed": seed, "strategy": strategy_name}
+             for (filepath, _, seed, strategy_name), _ in generated]
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump({"mode": mode_choice, "master_seed": master_seed, "cases": cases}, f, indent=2)
+
+
+def replay_manifest(filenames, workers):
+    """按 manifest 中记录的种子重新生成指定文件 (为空则全部), 与原文件逐字节相同"""
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    wanted = {os.path.basename(name) for name in filenames}
+    tasks = [(os.path.join("data", case["file"]), manifest["mode"], case["seed"], case.get("strategy"))
+             for case in manifest["cases"] if not wanted or case["file"] in wanted]
+    missing = wanted - {case["file"] for case in manifest["cases"]}
+    if missing:
+        print(f"Warning: not in {MANIFEST_PATH}: {', '.join(sorted(missing))}", file=sys.stderr)
+    generated = generate_batch(tasks, workers)
+    print(f"Replayed {len(generated)} of {len(tasks)} files.")
 
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HW9 data generator")
+    parser.add_argument("--seed", type=int, default=None, help="master seed of the batch (default: random)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="number of generator processes")
+    parser.add_argument("--replay", nargs='*', metavar="FILE", default=None,
+                        help=f"regenerate FILEs (default: all) from the seeds in {MANIFEST_PATH}")
+    parser.add_argument("--stress", action="store_true",
+                        help="only worst-case topologies (topology.py), each filled up with its most expensive queries")
+    parser.add_argument("--coverage", action="store_true",
+                        help="every file uses strategy_coverage_guided (steered by the outcomes oracle.py reports)")
+    parser.add_argument("--query-aware", action="store_true",
+                        help="every file uses strategy_query_aware (queries aimed at triangles / components that just changed)")
+    args = parser.parse_args()
+
+    if args.replay is not None:
+        replay_manifest(args.replay, args.workers)
+        sys.exit(0)
+
     while True:
         mode_input = input(f"choose mode: strong({MODE_PUBLIC}) or mutual ({MODE_MUTUAL}): ").lower()
         if mode_input in [MODE_PUBLIC, MODE_MUTUAL]:
@@ -638,9 +811,25 @@ if __name__ == "__main__":
         os.makedirs("data")
         print("Creating folder: data")
 
-    # 生成文件
-    for i in range(1, num_files + 1):
-        filepath = os.path.join("data", f"testcase_{i}.txt")
-        generate_test_case(filepath, mode_input)
+    # 每个文件的种子由主种子派生, 主种子相同则整批数据相同
+    master_seed = args.seed if args.seed is not None else random.randrange(2**32)
+    seeder = random.Random(master_seed)
+    if args.stress:
+        # 每个文件固定使用一种最坏情况拓扑, 文件名带上拓扑名
+        stress_names = list(WORST_CASE_STRATEGIES)
+        tasks = [(os.path.join("data", f"testcase_{i}_{stress_names[(i - 1) % len(stress_names)]}.txt"), mode_input,
+                  seeder.randrange(2**32), stress_names[(i - 1) % len(stress_names)])
+                 for i in range(1, num_files + 1)]
+    else:
+        tasks = [(os.path.join("data", f"testcase_{i}.txt"), mode_input, seeder.randrange(2**32),
+                  "coverage_guided" if args.coverage else "query_aware" if args.query_aware else None)
+                 for i in range(1, num_files + 1)]
+    print(f"Master seed: {master_seed}, workers: {args.workers}")
 
-    print("Data generator finished")
\ No newline at end of file
+    # 生成文件
+    generated = generate_batch(tasks, args.workers)
+    write_manifest(mode_input, master_seed, generated)
+    coverage_path = outcome_coverage.COVERAGE_REPORT_FILE
+    headline = outcome_coverage.write_report(coverage_path, COMMANDS, [(os.path.basename(task[0]), task[3] or "mixed", hits)
+                                                                       for task, hits in generated])
+    print("\n" + "\n".join(headline) + f"\n(详见 {coverage_path})")
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+# Graph bookkeeping for the hw9 generator: follows the relations of an input as it is written and keeps the
+# answers of its graph queries current, so the generator can aim queries where an answer has just changed and
+# record every expected answer in a side file (data/testcase_1.txt.expect).
+#   qts: triangle count, updated from common neighbours on every ar / deleting mr.
+#   qci: union-find with rollback. Every union is logged with the history mark before it; deleting an edge whose
+#        union merged two sets rolls back to that mark and replays the later edges without it, deleting any other
+#        edge changes nothing (its endpoints were already joined by earlier edges).
+#   qba / qv: acquaintance values, plus a degree histogram to find hubs.
+# Usage: python graph_state.py input.txt [output.txt]
+#   Without output: prints the expected answers of the input's qts / qci / qv / qba lines (a fast hw9 oracle for
+#   these queries). With output: checks a jar's output against them; exit code 1 on a mismatch.
+import os
+import sys
+import string
+from collections import Counter, deque
+
+# --- 配置 ---
+EXPECT_SUFFIX = ".expect"  # 期望答案旁路文件与数据放在一起 (data/testcase_1.txt.expect), 不匹配 *.txt
+RECENT_EVENTS = 32         # 记住的最近连通分量合并 / 拆分事件数
+SAMPLE_TRIES = 12          # 挑选 "最有区分度" 的人或关系时的采样次数
+VALUE_MIN, VALUE_MAX = 1, 200
+# --- End 配置 ---
+
+
+def edge_key(a, b):
+    return (a, b) if a < b else (b, a)
+
+
+def expect_path_for(input_path):
+    return input_path + EXPECT_SUFFIX
+
+
+class RollbackUnionFind:
+    """Union by size without path compression, so every union is a single parent link that can be undone."""
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+        self.history = []  # (child root, parent root) of every union that merged, oldest first
+
+    def add(self, x):
+        self.parent[x] = x
+        self.size[x] = 1
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        """Joins the sets of a and b; returns False if they already were one set."""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        self.history.append((b, a))
+        return True
+
+    def rollback(self, mark):
+        """Undoes the unions made after len(history) was mark."""
+        while len(self.history) > mark:
+            child, root = self.history.pop()
+            self.parent[child] = child
+            self.size[root] -= self.size[child]
+
+
+class GraphBookkeeper:
+    """Relations of one hw9 input, fed line by line through observe() in file order.
+
+    Commands that the Runner would answer with an exception leave the state alone, exactly like the JML; only
+    qts / qci / qv / qba answers are recorded, the other commands just advance the output line.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.adj = {}                 # person id -> {acquaintance id: value}
+        self.triangles = 0
+        self.degrees = Counter()      # degree -> number of persons with it
+        self.dsu = RollbackUnionFind()
+        self.log_edges = []           # every current edge in insertion order (the union-find replay order)
+        self.log_marks = []           # history mark before the edge's union, None if the union did not merge
+        self.events = deque(maxlen=RECENT_EVENTS)  # ('merge' | 'split', id1, id2), newest last
+        self.output_line = 0
+        self.answers = []             # (output line, command line, expected output)
+
+    # --- state changes ---
+
+    def add_person(self, pid):
+        if pid in self.adj:
+            return False
+        self.adj[pid] = {}
+        self.degrees[0] += 1
+        self.dsu.add(pid)
+        return True
+
+    def move_degree(self, pid, delta):
+        degree = len(self.adj[pid])
+        self.degrees[degree - delta] -= 1
+        self.degrees[degree] += 1
+
+    def add_edge(self, a, b, value):
+        self.triangles += len(self.adj[a].keys() & self.adj[b].keys())
+        self.adj[a][b] = self.adj[b][a] = value
+        self.move_degree(a, 1)
+        self.move_degree(b, 1)
+        mark = len(self.dsu.history)
+        merged = self.dsu.union(a, b)
+        self.log_edges.append(edge_key(a, b))
+        self.log_marks.append(mark if merged else None)
+        if merged:
+            self.events.append(('merge', a, b))
+
+    def remove_edge(self, a, b):
+        del self.adj[a][b], self.adj[b][a]
+        self.triangles -= len(self.adj[a].keys() & self.adj[b].keys())
+        self.move_degree(a, -1)
+        self.move_degree(b, -1)
+        position = self.log_edges.index(edge_key(a, b))
+        mark = self.log_marks[position]
+        del self.log_edges[position], self.log_marks[position]
+        if mark is None:
+            return  # a and b are still joined by the earlier edges that made this union redundant
+        self.dsu.rollback(mark)
+        for i in range(position, len(self.log_edges)):
+            mark = len(self.dsu.history)
+            self.log_marks[i] = mark if self.dsu.union(*self.log_edges[i]) else None
+        if not self.connected(a, b):
+            self.events.append(('split', a, b))
+
+    # --- queries ---
+
+    def connected(self, a, b):
+        return self.dsu.find(a) == self.dsu.find(b)
+
+    def best_acquaintance(self, pid):
+        """Acquaintance with the largest value, the smallest id among equals; None if pid knows nobody."""
+        acquaintance = self.adj[pid]
+        return min(acquaintance, key=lambda other: (-acquaintance[other], other)) if acquaintance else None
+
+    def component(self, pid):
+        """Persons reachable from pid, in BFS order (so the last ones are the farthest)."""
+        seen, queue, order = {pid}, deque([pid]), []
+        while queue:
+            person = queue.popleft()
+            order.append(person)
+            for other in self.adj[person]:
+                if other not in seen:
+                    seen.add(other)
+                    queue.append(other)
+        return order
+
+    def component_count(self):
+        return sum(1 for pid in self.adj if self.dsu.parent[pid] == pid)
+
+    def hubs(self, count):
+        return sorted(self.adj, key=lambda pid: (-len(self.adj[pid]), pid))[:count]
+
+    def summary(self):
+        degrees = [degree for degree, n in self.degrees.items() for _ in range(n)]
+        mean = sum(degrees) / len(degrees) if degrees else 0
+        return (f"{len(self.adj)} persons, {len(self.log_edges)} relations, {self.triangles} triangles, "
+                f"{self.component_count()} components, degree mean {mean:.1f} max {max(degrees, default=0)}")
+
+    # --- following the input ---
+
+    def observe(self, lines):
+        """Applies written lines (an ln block must come whole in one call) and records the query answers."""
+        lines = iter(lines)
+        for line in lines:
+            args = line.split()
+            if not args:
+                continue
+            self.output_line += 1
+            if args[0] in ("ln", "load_network"):
+                self.load_network(int(args[1]), lines)
+                continue
+            answer = self.apply(args[0], [int(arg) if arg.lstrip('-').isdigit() else arg for arg in args[1:]])
+            if answer is not None:
+                self.answers.append((self.output_line, line.strip(), answer))
+
+    def load_network(self, n, lines):
+        needed = 3 * n + n * (n - 1) // 2
+        tokens = []
+        for line in lines:
+            tokens.extend(line.split())
+            if len(tokens) >= needed:
+                break
+        else:
+            return  # truncated block (the generator hit its instruction limit): the Runner rejects it anyway
+        ids = [int(t) for t in tokens[:n]]
+        for pid in ids:
+            self.add_person(pid)
+        values = iter(int(t) for t in tokens[3 * n:needed])
+        for i in range(n - 1):
+            for j in range(i + 1):
+                value = next(values)
+                if value:
+                    self.add_edge(ids[i + 1], ids[j], value)
+
+    def apply(self, command, args):
+        """Runs one command; returns its answer for the recorded queries, None otherwise."""
+        adj = self.adj
+        if command in ("ap", "add_person"):
+            self.add_person(args[0])
+        elif command in ("ar", "add_relation"):
+            a, b, value = args[:3]
+            if a in adj and b in adj and a != b and b not in adj[a]:
+                self.add_edge(a, b, value)
+        elif command in ("mr", "modify_relation"):
+            a, b, delta = args[:3]
+            if a in adj and b in adj and a != b and b in adj[a]:
+                if adj[a][b] + delta > 0:
+                    adj[a][b] = adj[b][a] = adj[a][b] + delta
+                else:
+                    self.remove_edge(a, b)
+        elif command in ("qts", "query_triple_sum"):
+            return str(self.triangles)
+        elif command in ("qci", "query_circle"):
+            a, b = args[:2]
+            if a in adj and b in adj:
+                return "true" if self.connected(a, b) else "false"
+        elif command in ("qv", "query_value"):
+            a, b = args[:2]
+            if a in adj and b in adj and (a == b or b in adj[a]):
+                return str(adj[a].get(b, 0))
+        elif command in ("qba", "query_best_acquaintance"):
+            if args[0] in adj and adj[args[0]]:
+                return str(self.best_acquaintance(args[0]))
+        return None
+
+    def write_answers(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"# {self.summary()}\n# output line\texpected\tcommand\n")
+            for output_line, command, answer in self.answers:
+                f.write(f"{output_line}\t{answer}\t{command}\n")
+
+    # --- query-aware generation ---
+
+    def plan_round(self, rng, max_persons, new_id):
+        """One change to the graph followed by the queries whose answers it just changed (or left unchanged where
+        a careless cache would change them). new_id() gives an unused person id. Returns the lines."""
+        persons = list(self.adj)
+        if len(persons) < 3 or (len(persons) < max_persons and rng.random() < 0.1):
+            pid = new_id()
+            lines = [f"ap {pid} {''.join(rng.choices(string.ascii_letters, k=5))} {rng.randint(1, 200)}"]
+            if persons:
+                lines += [f"ar {pid} {rng.choice(persons)} {rng.randint(VALUE_MIN, VALUE_MAX)}", "qts"]
+            return lines
+        roll = rng.random()
+        if roll < 0.25:
+            return self.plan_closing_edge(rng, persons)
+        if roll < 0.45:
+            return self.plan_bridge(rng, persons)
+        if roll < 0.65:
+            return self.plan_cut(rng, persons)
+        if roll < 0.8:
+            return self.plan_tie(rng, persons)
+        if roll < 0.9 and self.events:
+            return self.plan_revisit(rng)
+        a, b = rng.sample(persons, 2)
+        if b in self.adj[a]:
+            return [f"mr {a} {b} {rng.randint(1, VALUE_MAX)}", f"qba {a}", f"qv {a} {b}"]
+        return [f"ar {a} {b} {rng.randint(VALUE_MIN, VALUE_MAX)}", "qts", f"qba {b}"]
+
+    def plan_closing_edge(self, rng, persons):
+        """Links the unlinked pair with the most common neighbours found around a few hubs: qts jumps by that many."""
+        best = None
+        hubs = self.hubs(SAMPLE_TRIES)
+        for _ in range(SAMPLE_TRIES):
+            neighbours = list(self.adj[rng.choice(hubs)])
+            if len(neighbours) < 2:
+                continue
+            a, b = rng.sample(neighbours, 2)
+            if b not in self.adj[a]:
+                common = len(self.adj[a].keys() & self.adj[b].keys())
+                if best is None or common > best[0]:
+                    best = (common, a, b)
+        if best is None:
+            a, b = rng.sample(persons, 2)
+            if b in self.adj[a]:
+                return ["qts", f"qba {a}"]
+        else:
+            _, a, b = best
+        return [f"ar {a} {b} {rng.randint(VALUE_MIN, VALUE_MAX)}", "qts", f"qci {a} {b}"]
+
+    def plan_bridge(self, rng, persons):
+        """Links two components, then asks qci between their farthest members (true now) and, if there is one,
+        towards a third component (still false). A bridge never closes a triangle, so qts must stay put."""
+        for _ in range(SAMPLE_TRIES):
+            a, b = rng.sample(persons, 2)
+            if not self.connected(a, b):
+                break
+        else:
+            return self.plan_cut(rng, persons)
+        far_a, far_b = self.component(a)[-1], self.component(b)[-1]
+        lines = [f"qci {far_a} {far_b}", f"ar {a} {b} {rng.randint(VALUE_MIN, VALUE_MAX)}", f"qci {far_a} {far_b}", "qts"]
+        other = rng.choice(persons)
+        if not self.connected(other, a) and not self.connected(other, b):
+            lines.append(f"qci {other} {far_b}")
+        return lines
+
+    def plan_cut(self, rng, persons):
+        """Deletes a relation whose union joined two sets (a spanning-forest edge, the ones that can split a
+        component), then asks qci across it from the far ends, qts and qba of both endpoints."""
+        merged = [edge for edge, mark in zip(self.log_edges, self.log_marks) if mark is not None]
+        if not merged:
+            return self.plan_bridge(rng, persons)  # no relation at all yet, so any two persons can be linked
+        a, b = rng.choice(merged)
+        order = self.component(a)
+        far = order[-1] if order[-1] not in (a, b) else b
+        return [f"mr {a} {b} {-self.adj[a][b] - rng.randint(0, VALUE_MAX)}", f"qci {a} {b}", f"qci {far} {a}",
+                "qts", f"qba {a}", f"qba {b}"]
+
+    def plan_tie(self, rng, persons):
+        """Sets the best acquaintance of a hub to the value of another acquaintance, so qba has to break the tie by
+        the smaller id."""
+        candidates = [pid for pid in self.hubs(SAMPLE_TRIES) if len(self.adj[pid]) >= 2]
+        if not candidates:
+            return self.plan_closing_edge(rng, persons)
+        pid = rng.choice(candidates)
+        best = self.best_acquaintance(pid)
+        other = rng.choice([o for o in self.adj[pid] if o != best])
+        delta = self.adj[pid][other] - self.adj[pid][best]
+        if delta == 0:
+            delta = 1  # already tied: move the best one up and break the tie the other way
+        return [f"qba {pid}", f"mr {pid} {best} {delta}", f"qba {pid}", f"qv {pid} {best}", f"qba {best}"]
+
+    def plan_revisit(self, rng):
+        """qci on the endpoints of an older merge / split: answers that flipped since then catch stale caches."""
+        _, a, b = rng.choice(self.events)
+        return [f"qci {a} {b}", f"qci {b} {a}"]
+
+
+GRAPH = GraphBookkeeper()  # 每个生成进程一份, generate_test_case 开始时 reset
+
+
+def read_answers(path):
+    """{output line: (expected, command)} from an answers file."""
+    answers = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#') or not line.strip():
+                continue
+            output_line, expected, command = line.rstrip('\n').split('\t')
+            answers[int(output_line)] = (expected, command)
+    return answers
+
+
+def main():
+    if len(sys.argv) not in (2, 3) or not os.path.isfile(sys.argv[1]):
+        print("Usage: python graph_state.py input.txt [output.txt]")
+        sys.exit(1)
+    input_path = sys.argv[1]
+    expect_path = expect_path_for(input_path)
+    if not os.path.isfile(expect_path) or os.path.getmtime(expect_path) < os.path.getmtime(input_path):
+        graph = GraphBookkeeper()
+        with open(input_path, 'r', encoding='utf-8') as f:
+            graph.observe(f.read().splitlines())
+        graph.write_answers(expect_path)
+    answers = read_answers(expect_path)
+    if len(sys.argv) == 2:
+        with open(expect_path, 'r', encoding='utf-8') as f:
+            sys.stdout.write(f.read())
+        return
+    with open(sys.argv[2], 'r', encoding='utf-8', errors='replace') as f:
+        output = [line.strip() for line in f]
+    wrong = [(n, expected, command, output[n - 1] if n <= len(output) else "<EOF>")
+             for n, (expected, command) in sorted(answers.items())
+             if n > len(output) or output[n - 1] != expected]
+    for n, expected, command, actual in wrong[:20]:
+        print(f"line {n}: {command} -> expected {expected}, got {actual}")
+    print(f"{len(answers) - len(wrong)}/{len(answers)} graph query answers correct")
+    sys.exit(1 if wrong else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# Command-mix profiler: where in an input does a jar spend its time? The input is cut at command boundaries into
+# growing prefixes (checkpoints); the jar runs on every prefix in parallel, and the marginal time between two
+# checkpoints is charged to the commands in that window. Prints the windows ranked by marginal time, labelled with
+# their command mix and the state built before them ("qts x280 after 5000 ar"), and the time per command type.
+# Usage: python mix_profile.py input.txt [jar_files...] [--checkpoints K] [--repeat R] [--workers W] [--top N]
+#   Without jar files: every jar in testjar/. Times are the JVM's CPU time (user + sys, see resource_usage.py),
+#   which parallel runs disturb far less than wall time; wall time is used where CPU time is unavailable.
+import os
+import sys
+import glob
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from check import run_jar, TIMEOUT_SECONDS, TESTJAR_DIR
+from resource_usage import USAGE
+from output_compare import line_index, COPY_CHUNK_SIZE
+from complexity_probe import pop_option
+
+# --- 配置 ---
+PROFILE_DIR = "mix_profile"    # 前缀数据与输出
+DEFAULT_CHECKPOINTS = 10       # 前缀个数 (不含空输入), 按指令条数等分
+DEFAULT_REPEAT = 2             # 每个前缀运行次数, 取最快的一次
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_TOP = 8                # 列出的最耗时窗口数
+NOISE_FLOOR = 0.05             # 边际用时低于该秒数的窗口视为噪声, 不列出
+MIX_SHOWN = 3                  # 窗口标签中列出的指令种类数
+FIT_ROUNDS = 60                # 按指令种类拟合单条耗时时的坐标下降轮数
+# 建立状态的指令: 窗口标签中的 "after 5000 ar" 取窗口之前这些指令中最多的两种
+STATE_COMMANDS = {"ap", "ar", "mr", "at", "att", "dft", "coa", "foa", "ca", "am", "arem", "afm", "aem", "sm", "sei", "ln"}
+# --- End 配置 ---
+
+
+def checkpoints(total, count):
+    """Command counts to cut at: 0 (the empty input, i.e. JVM start-up) up to total, evenly spaced."""
+    return sorted({round(total * i / count) for i in range(count + 1)})
+
+
+def write_prefixes(input_path, cuts):
+    """Writes the first `cut` commands of the input for every cut; returns {cut: prefix path}."""
+    index = line_index(input_path)
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    paths = {}
+    with open(input_path, 'rb') as source:
+        for cut in cuts:
+            remaining = os.path.getsize(input_path) if cut >= index.count else index.lookup(cut + 1)[1]
+            paths[cut] = os.path.join(PROFILE_DIR, f"{stem}_prefix_{cut}.txt")
+            source.seek(0)
+            with open(paths[cut], 'wb') as f:  # copied in blocks, the input is never held in memory
+                while remaining > 0:
+                    block = source.read(min(COPY_CHUNK_SIZE, remaining))
+                    if not block: break
+                    f.write(block); remaining -= len(block)
+    return paths
+
+
+def time_prefix(jar_path, prefix_path, repeat):
+    """Returns (status, best seconds, 'cpu' or 'wall'); stops repeating once a run is not AC."""
+    jar_name = os.path.basename(jar_path)
+    out_path = os.path.join(PROFILE_DIR, "out", f"{os.path.splitext(jar_name)[0]}_{os.path.basename(prefix_path)}")
+    best, clock = None, 'wall'
+    for _ in range(repeat):
+        start = time.perf_counter()
+        status, _, _ = run_jar(jar_path, prefix_path, out_path, timeout=TIMEOUT_SECONDS)
+        elapsed = time.perf_counter() - start
+        usage = USAGE.measured(jar_name).get(os.path.basename(prefix_path))  # this (jar, prefix) runs in this task only
+        if usage is not None and status != 'TLE':
+            elapsed, clock = usage.user_s + usage.sys_s, 'cpu'
+        if status != 'AC': return status, elapsed, clock
+        best = elapsed if best is None else min(best, elapsed)
+    return 'AC', best, clock
+
+
+def mix_label(counts, limit=MIX_SHOWN):
+    return ", ".join(f"{command} {n}" for command, n in counts.most_common(limit)) or "-"
+
+
+def fit_type_costs(windows, types):
+    """Per-command cost of every type such that window time ~ sum(count in window * cost), least squares with
+    costs >= 0 (coordinate descent). A type that also appears in cheap windows is not blamed for an expensive one."""
+    mixes = [(Counter(types[start:end]), seconds) for start, end, seconds in windows]
+    cost = dict.fromkeys(sorted({command for mix, _ in mixes for command in mix}), 0.0)
+    for _ in range(FIT_ROUNDS):
+        for command in cost:
+            numerator = denominator = 0.0
+            for mix, seconds in mixes:
+                n = mix.get(command, 0)
+                if n:
+                    rest = sum(cost[other] * k for other, k in mix.items() if other != command)
+                    numerator += n * (seconds - rest); denominator += n * n
+            cost[command] = max(0.0, numerator / denominator)
+    return cost
+
+
+def profile_jar(jar_path, input_path, cuts, paths, types, repeat, workers, top):
+    jar_name = os.path.basename(jar_path)
+    print(f"\n== {jar_name} on {os.path.basename(input_path)}: {cuts[-1]} commands, checkpoints {cuts[1:]}")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {cut: executor.submit(time_prefix, jar_path, paths[cut], repeat) for cut in cuts}
+        timings = {cut: future.result() for cut, future in futures.items()}
+    clock = 'CPU' if all(t[2] == 'cpu' for t in timings.values()) else 'wall'
+    baseline_status, baseline, _ = timings[0]
+    if baseline_status != 'AC':
+        print(f"  empty input failed ({baseline_status}), skipping jar"); return False
+    print(f"  {'commands':>9} {'status':>6} {clock + ' (s)':>10} {'marginal':>9}")
+    windows, previous, stopped = [], 0, None
+    for cut in cuts[1:]:
+        status, seconds, _ = timings[cut]
+        marginal = seconds - timings[previous][1]
+        print(f"  {cut:>9} {status:>6} {seconds:>10.3f} {marginal:>+9.3f}")
+        if status != 'AC':
+            stopped = (cut, status); break  # a failing prefix has no meaningful time, longer ones fail as well
+        windows.append((previous, cut, max(marginal, 0.0)))
+        previous = cut
+    if stopped:
+        print(f"  stopped at checkpoint {stopped[0]}: {stopped[1]}, commands {previous + 1}-{stopped[0]} contain the problem")
+    total = sum(w[2] for w in windows)
+    if total < NOISE_FLOOR:
+        print(f"  all windows within {NOISE_FLOOR}s of each other: no hot spot above the JVM start-up ({baseline:.3f}s)")
+        return stopped is not None
+
+    print(f"\n  Hot windows (marginal {clock} time; {baseline:.3f}s JVM start-up excluded):")
+    ranked = sorted(windows, key=lambda w: w[2], reverse=True)
+    for rank, (start, end, seconds) in enumerate(ranked[:top], start=1):
+        if seconds < NOISE_FLOOR: break
+        mix = Counter(types[start:end])
+        built = Counter(t for t in types[:start] if t in STATE_COMMANDS)
+        dominant, n = mix.most_common(1)[0]
+        context = " after " + " + ".join(f"{k} {command}" for command, k in built.most_common(2)) if built else ""
+        print(f"  {rank:>2}. {dominant} x{n}{context}: {seconds:.2f}s ({seconds / total:.0%})"
+              f"  [commands {start + 1}-{end}: {mix_label(mix)}]")
+
+    type_counts = Counter(types[:windows[-1][1]])
+    per_type = Counter({command: cost * type_counts[command] for command, cost in fit_type_costs(windows, types).items()})
+    fitted = sum(per_type.values()) or 1.0
+    per_type = Counter({command: seconds * total / fitted for command, seconds in per_type.items()})  # shares of the measured total
+    print("\n  Time by command type (per-command cost fitted across windows; sharper with more --checkpoints):")
+    for command, seconds in per_type.most_common():
+        if seconds < NOISE_FLOOR / 10: break
+        print(f"    {command:<6} {seconds:>8.2f}s ({seconds / total:>4.0%})  {type_counts[command]:>6} commands, "
+              f"{seconds / type_counts[command] * 1000:.3f} ms each")
+    return stopped is not None
+
+
+def main():
+    args = sys.argv[1:]
+    count = max(1, int(pop_option(args, "--checkpoints", DEFAULT_CHECKPOINTS)))
+    repeat = max(1, int(pop_option(args, "--repeat", DEFAULT_REPEAT)))
+    workers = max(1, int(pop_option(args, "--workers", DEFAULT_WORKERS)))
+    top = max(1, int(pop_option(args, "--top", DEFAULT_TOP)))
+    if not args or not os.path.isfile(args[0]):
+        print("Usage: python mix_profile.py input.txt [jar_files...] [--checkpoints K] [--repeat R] [--workers W] [--top N]")
+        sys.exit(1)
+    input_path, jar_paths = args[0], args[1:] or sorted(glob.glob(os.path.join(TESTJAR_DIR, "*.jar")))
+    if not jar_paths: print(f"No jar files given and none found in '{TESTJAR_DIR}'."); sys.exit(1)
+    os.makedirs(os.path.join(PROFILE_DIR, "out"), exist_ok=True)
+
+    index = line_index(input_path)
+    types = [index.lookup(k)[2] for k in range(1, index.count + 1)]
+    cuts = checkpoints(index.count, min(count, index.count))
+    paths = write_prefixes(input_path, cuts)
+    failed = [os.path.basename(jar) for jar in jar_paths
+              if profile_jar(jar, input_path, cuts, paths, types, repeat, workers, top)]
+    if failed: print(f"\nNot AC on the full input: {', '.join(failed)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
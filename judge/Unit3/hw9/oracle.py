@@ -0,0 +1,875 @@
+import os
+import sys
+import time
+import heapq
+from itertools import islice
+from collections import defaultdict, deque
+
+# --- 配置 ---
+# Python 参考实现: 按 homework/Unit3 中 spec3 的 JML 与 Runner 的输出格式执行 hw9~hw11 的全部指令,
+# 无需 JVM 即可生成标准输出。hw11 的指令集是 hw9/hw10 的超集, 三次作业共用同一份实现。
+RECEIVED_LIST_LIMIT = 5  # qra / qrm 只输出最新的 5 条
+TAG_SIZE_LIMIT = 999     # 标签人数 > 999 时 att 静默不加入 (JML: persons.length <= 999)
+SHORTEST_PATH_CACHE_SIZE = 4096
+# --- End 配置 ---
+
+MESSAGE_ORDINARY, MESSAGE_RED_ENVELOPE, MESSAGE_FORWARD, MESSAGE_EMOJI = range(4)
+
+
+def to_int(x):
+    """Wraps an exact integer to Java int (two's complement, 32 bit)."""
+    return (x + 0x80000000) % 0x100000000 - 0x80000000
+
+
+def java_div(a, b):
+    """Java int division: truncates toward zero."""
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b > 0) else -q
+
+
+class OracleError(Exception):
+    """An exception from the spec; the message is the line its print() writes."""
+
+
+class ErrorCounter:
+    """Mirrors the static counters of one exception class in com.oocourse.spec*.exceptions."""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.count = 0
+        self.id_counts = defaultdict(int)
+
+    def single(self, id1):
+        self.count += 1
+        self.id_counts[id1] += 1
+        return OracleError(f"{self.prefix}-{self.count}, {id1}-{self.id_counts[id1]}")
+
+    def pair(self, id1, id2):
+        """er / pnf / cpd / dapd / doapd: one per exception, an equal id pair is counted once."""
+        self.count += 1
+        self.id_counts[id1] += 1
+        if id1 != id2:
+            self.id_counts[id2] += 1
+        low, high = min(id1, id2), max(id1, id2)
+        return OracleError(f"{self.prefix}-{self.count}, {low}-{self.id_counts[low]}, {high}-{self.id_counts[high]}")
+
+    def relation(self, id1, id2):
+        """rnf counts both ids even when equal and reports the total halved."""
+        self.count += 2
+        self.id_counts[id1] += 1
+        self.id_counts[id2] += 1
+        low, high = min(id1, id2), max(id1, id2)
+        return OracleError(f"{self.prefix}-{self.count // 2}, {low}-{self.id_counts[low]}, {high}-{self.id_counts[high]}")
+
+
+class Person:
+    __slots__ = ("id", "name", "age", "acquaintance", "tags", "best_heap", "money", "social_value",
+                 "messages", "articles", "article_live", "article_cut", "article_stale")
+
+    def __init__(self, pid, name, age):
+        self.id = pid
+        self.name = name
+        self.age = age
+        self.acquaintance = {}     # id -> value
+        self.tags = {}             # tag id -> Tag (only the person's current tags)
+        self.best_heap = []        # lazy (-value, id), validated against acquaintance on read
+        self.money = 0
+        self.social_value = 0
+        self.messages = deque()    # newest first
+        self.articles = []         # (article id, seq), newest last; dead entries are skipped lazily
+        self.article_live = {}     # article id -> live occurrences
+        self.article_cut = {}      # article id -> entries with a smaller seq were deleted
+        self.article_stale = 0
+
+
+class Tag:
+    __slots__ = ("id", "owner", "members", "age_sum", "age_square_sum", "value_sum")
+
+    def __init__(self, tag_id, owner):
+        self.id = tag_id
+        self.owner = owner
+        self.members = {}          # id -> Person
+        self.age_sum = 0
+        self.age_square_sum = 0
+        self.value_sum = 0         # sum over ordered linked member pairs of their value
+
+
+class Account:
+    __slots__ = ("id", "owner", "followers", "contributions", "best_heap", "articles")
+
+    def __init__(self, account_id, owner):
+        self.id = account_id
+        self.owner = owner
+        self.followers = []        # follow order; contributions holds the follower set
+        self.contributions = {}    # follower id -> contributed article count
+        self.best_heap = []        # lazy (-contributions, id)
+        self.articles = {}         # article id -> contributor id
+
+
+class Message:
+    __slots__ = ("id", "kind", "social_value", "person1", "person2", "tag", "extra")
+
+    def __init__(self, message_id, kind, social_value, person1, person2, tag, extra):
+        self.id = message_id
+        self.kind = kind
+        self.social_value = social_value
+        self.person1 = person1
+        self.person2 = person2     # None for tag messages
+        self.tag = tag             # the Tag object at creation time (None for person messages)
+        self.extra = extra         # money / article id / emoji id
+
+    def describe(self):
+        if self.kind == MESSAGE_FORWARD:
+            return f"Forward: {self.extra}"
+        if self.kind == MESSAGE_EMOJI:
+            return f"Emoji: {self.extra}"
+        if self.kind == MESSAGE_RED_ENVELOPE:
+            return f"RedEnvelope: {self.extra}"
+        return f"Ordinary message: {self.id}"
+
+
+class Network:
+    """Executes the hw9-hw11 social network commands with incremental indexes.
+
+    qci: component labels, merged small-into-large on ar and split on edge deletion by a
+    search from both endpoints that stops once the smaller side is exhausted.
+    qts: triangle count updated from common neighbours on every edge change.
+    qba / qcs: lazy max-heaps per person plus an eagerly maintained best-acquaintance map.
+    qtvs / qtav: per-tag value, age and age-square sums, updated through a person -> tags index.
+    qsp: bidirectional BFS, cached until the graph changes.
+    """
+
+    def __init__(self):
+        self.persons = {}
+        self.errors = {name: ErrorCounter(name) for name in
+                       ("epi", "pinf", "er", "rnf", "eti", "tinf", "anf", "pnf", "eoai", "oainf", "doapd",
+                        "eai", "ainf", "cpd", "dapd", "emi", "einf", "eei", "minf")}
+        self.member_of = {}                # person id -> set of current tags containing the person
+        self.component = {}                # person id -> component label
+        self.component_members = {}        # label -> set of person ids
+        self.next_label = 0
+        self.triple_sum = 0
+        self.best = {}                     # person id -> best acquaintance id (None if alone)
+        self.couple_sum = 0
+        self.graph_version = 0
+        self.path_cache = {}
+        self.accounts = {}
+        self.all_articles = set()          # every contributed article; deleteArticle keeps it (JML)
+        self.article_seq = 0
+        self.messages = {}
+        self.emoji_heat = {}
+        self.emoji_messages = defaultdict(set)
+
+    # --- lookups raising the spec exceptions ---
+
+    def person(self, pid):
+        person = self.persons.get(pid)
+        if person is None:
+            raise self.errors["pinf"].single(pid)
+        return person
+
+    def account(self, account_id):
+        account = self.accounts.get(account_id)
+        if account is None:
+            raise self.errors["oainf"].single(account_id)
+        return account
+
+    def owned_tag(self, person, tag_id):
+        tag = person.tags.get(tag_id)
+        if tag is None:
+            raise self.errors["tinf"].single(tag_id)
+        return tag
+
+    # --- persons, relations and their indexes ---
+
+    def add_person(self, pid, name, age):
+        if pid in self.persons:
+            raise self.errors["epi"].single(pid)
+        self.persons[pid] = Person(pid, name, age)
+        self.member_of[pid] = set()
+        self.best[pid] = None
+        self.component[pid] = self.next_label
+        self.component_members[self.next_label] = {pid}
+        self.next_label += 1
+
+    def common_neighbours(self, p1, p2):
+        small, large = (p1.acquaintance, p2.acquaintance) if len(p1.acquaintance) <= len(p2.acquaintance) \
+            else (p2.acquaintance, p1.acquaintance)
+        return sum(1 for other in small if other in large)
+
+    def shared_tags(self, pid1, pid2):
+        tags1, tags2 = self.member_of[pid1], self.member_of[pid2]
+        return [tag for tag in tags1 if tag in tags2] if len(tags1) <= len(tags2) else \
+            [tag for tag in tags2 if tag in tags1]
+
+    def refresh_best(self, person):
+        heap, acquaintance = person.best_heap, person.acquaintance
+        while heap and acquaintance.get(heap[0][1]) != -heap[0][0]:
+            heapq.heappop(heap)
+        if len(heap) > 2 * len(acquaintance) + 16:
+            heap[:] = [(-value, other) for other, value in acquaintance.items()]
+            heapq.heapify(heap)
+        new_best = heap[0][1] if heap else None
+        old_best = self.best[person.id]
+        if new_best == old_best:
+            return
+        if old_best is not None and self.best.get(old_best) == person.id:
+            self.couple_sum -= 1
+        self.best[person.id] = new_best
+        if new_best is not None and self.best.get(new_best) == person.id:
+            self.couple_sum += 1
+
+    def set_value(self, p1, p2, value):
+        p1.acquaintance[p2.id] = value
+        p2.acquaintance[p1.id] = value
+        heapq.heappush(p1.best_heap, (-value, p2.id))
+        heapq.heappush(p2.best_heap, (-value, p1.id))
+        self.refresh_best(p1)
+        self.refresh_best(p2)
+
+    def add_relation(self, id1, id2, value):
+        p1, p2 = self.person(id1), self.person(id2)
+        if id1 == id2 or id2 in p1.acquaintance:
+            raise self.errors["er"].pair(id1, id2)
+        self.triple_sum += self.common_neighbours(p1, p2)
+        for tag in self.shared_tags(id1, id2):
+            tag.value_sum += 2 * value
+        self.set_value(p1, p2, value)
+        self.union(id1, id2)
+        self.graph_changed()
+
+    def modify_relation(self, id1, id2, value):
+        p1, p2 = self.person(id1), self.person(id2)
+        if id1 == id2:
+            raise self.errors["epi"].single(id1)
+        if id2 not in p1.acquaintance:
+            raise self.errors["rnf"].relation(id1, id2)
+        old_value = p1.acquaintance[id2]
+        if old_value + value > 0:
+            for tag in self.shared_tags(id1, id2):
+                tag.value_sum += 2 * value
+            self.set_value(p1, p2, old_value + value)
+            return
+        for tag in self.shared_tags(id1, id2):
+            tag.value_sum -= 2 * old_value
+        del p1.acquaintance[id2]
+        del p2.acquaintance[id1]
+        self.triple_sum -= self.common_neighbours(p1, p2)
+        # Each side leaves the other's own tags (not third-party tags containing both)
+        for owner, member in ((p1, p2), (p2, p1)):
+            for tag in [tag for tag in self.member_of[member.id] if tag.owner is owner]:
+                self.remove_from_tag(tag, member)
+        self.refresh_best(p1)
+        self.refresh_best(p2)
+        self.split_if_disconnected(id1, id2)
+        self.graph_changed()
+
+    def query_value(self, id1, id2):
+        p1 = self.person(id1)
+        self.person(id2)
+        if id1 == id2:
+            return 0  # isLinked(self) holds and queryValue(self) is 0
+        if id2 not in p1.acquaintance:
+            raise self.errors["rnf"].relation(id1, id2)
+        return p1.acquaintance[id2]
+
+    def query_best_acquaintance(self, pid):
+        self.person(pid)
+        best = self.best[pid]
+        if best is None:
+            raise self.errors["anf"].single(pid)
+        return best
+
+    # --- connectivity (qci / qsp) ---
+
+    def graph_changed(self):
+        self.graph_version += 1
+        self.path_cache.clear()
+
+    def union(self, id1, id2):
+        label1, label2 = self.component[id1], self.component[id2]
+        if label1 == label2:
+            return
+        members1, members2 = self.component_members[label1], self.component_members[label2]
+        if len(members1) < len(members2):
+            label1, label2, members1, members2 = label2, label1, members2, members1
+        for pid in members2:
+            self.component[pid] = label1
+        members1 |= members2
+        del self.component_members[label2]
+
+    def split_if_disconnected(self, id1, id2):
+        """After deleting edge id1-id2: grow both sides in turn; if one side runs out before they
+        meet, it is a whole component and gets a fresh label. Cost is bounded by the smaller side."""
+        seen = ({id1}, {id2})
+        queues = (deque([id1]), deque([id2]))
+        persons = self.persons
+        while queues[0] and queues[1]:
+            side = 0 if len(seen[0]) <= len(seen[1]) else 1
+            own, other = seen[side], seen[1 - side]
+            for neighbour in persons[queues[side].popleft()].acquaintance:
+                if neighbour in other:
+                    return
+                if neighbour not in own:
+                    own.add(neighbour)
+                    queues[side].append(neighbour)
+        split = seen[0] if not queues[0] else seen[1]
+        old_label = self.component[id1]
+        self.component_members[old_label] -= split
+        label = self.next_label
+        self.next_label += 1
+        self.component_members[label] = split
+        for pid in split:
+            self.component[pid] = label
+
+    def is_circle(self, id1, id2):
+        self.person(id1)
+        self.person(id2)
+        return self.component[id1] == self.component[id2]
+
+    def query_shortest_path(self, id1, id2):
+        self.person(id1)
+        self.person(id2)
+        if id1 == id2:
+            return 0
+        if self.component[id1] != self.component[id2]:
+            raise self.errors["pnf"].pair(id1, id2)
+        key = (id1, id2) if id1 < id2 else (id2, id1)
+        cached = self.path_cache.get(key)
+        if cached is None:
+            cached = self.bidirectional_bfs(id1, id2)
+            if len(self.path_cache) >= SHORTEST_PATH_CACHE_SIZE:
+                self.path_cache.clear()
+            self.path_cache[key] = cached
+        return cached
+
+    def bidirectional_bfs(self, id1, id2):
+        dist = ({id1: 0}, {id2: 0})
+        frontiers = ([id1], [id2])
+        persons = self.persons
+        while frontiers[0] and frontiers[1]:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            own, other = dist[side], dist[1 - side]
+            next_frontier = []
+            best = None
+            for pid in frontiers[side]:
+                d = own[pid] + 1
+                for neighbour in persons[pid].acquaintance:
+                    if neighbour in other:
+                        total = d + other[neighbour]
+                        best = total if best is None or total < best else best
+                    elif neighbour not in own:
+                        own[neighbour] = d
+                        next_frontier.append(neighbour)
+            if best is not None:
+                return best
+            frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+        raise self.errors["pnf"].pair(id1, id2)  # unreachable while component labels are consistent
+
+    # --- tags ---
+
+    def add_tag(self, pid, tag_id):
+        person = self.person(pid)
+        if tag_id in person.tags:
+            raise self.errors["eti"].single(tag_id)
+        person.tags[tag_id] = Tag(tag_id, person)
+
+    def del_tag(self, pid, tag_id):
+        person = self.person(pid)
+        tag = self.owned_tag(person, tag_id)
+        del person.tags[tag_id]
+        for member_id in tag.members:  # the tag object keeps its members for pending tag messages
+            self.member_of[member_id].discard(tag)
+
+    def add_to_tag(self, tag, person):
+        acquaintance, members = person.acquaintance, tag.members
+        if len(acquaintance) <= len(members):
+            linked = sum(value for other, value in acquaintance.items() if other in members)
+        else:
+            linked = sum(acquaintance[other] for other in members if other in acquaintance)
+        tag.value_sum += 2 * linked
+        members[person.id] = person
+        tag.age_sum += person.age
+        tag.age_square_sum += person.age * person.age
+        self.member_of[person.id].add(tag)
+
+    def remove_from_tag(self, tag, person):
+        del tag.members[person.id]
+        acquaintance, members = person.acquaintance, tag.members
+        if len(acquaintance) <= len(members):
+            linked = sum(value for other, value in acquaintance.items() if other in members)
+        else:
+            linked = sum(acquaintance[other] for other in members if other in acquaintance)
+        tag.value_sum -= 2 * linked
+        tag.age_sum -= person.age
+        tag.age_square_sum -= person.age * person.age
+        self.member_of[person.id].discard(tag)
+
+    def add_person_to_tag(self, id1, id2, tag_id):
+        p1, p2 = self.person(id1), self.person(id2)
+        if id1 == id2:
+            raise self.errors["epi"].single(id1)
+        if id1 not in p2.acquaintance:
+            raise self.errors["rnf"].relation(id1, id2)
+        tag = self.owned_tag(p2, tag_id)
+        if id1 in tag.members:
+            raise self.errors["epi"].single(id1)
+        if len(tag.members) <= TAG_SIZE_LIMIT:
+            self.add_to_tag(tag, p1)
+
+    def del_person_from_tag(self, id1, id2, tag_id):
+        p1, p2 = self.person(id1), self.person(id2)
+        tag = self.owned_tag(p2, tag_id)
+        if id1 not in tag.members:
+            raise self.errors["pinf"].single(id1)
+        self.remove_from_tag(tag, p1)
+
+    def query_tag_value_sum(self, pid, tag_id):
+        return to_int(self.owned_tag(self.person(pid), tag_id).value_sum)
+
+    def query_tag_age_var(self, pid, tag_id):
+        tag = self.owned_tag(self.person(pid), tag_id)
+        size = len(tag.members)
+        if size == 0:
+            return 0
+        mean = java_div(tag.age_sum, size)
+        square_sum = tag.age_square_sum - 2 * mean * tag.age_sum + size * mean * mean
+        return java_div(to_int(square_sum), size)  # Java sums the squares in int, wrapping on overflow
+
+    # --- official accounts and articles ---
+
+    def create_official_account(self, pid, account_id):
+        self.person(pid)
+        if account_id in self.accounts:
+            raise self.errors["eoai"].single(account_id)
+        account = Account(account_id, pid)
+        self.accounts[account_id] = account
+        self.add_follower(account, pid)
+
+    def add_follower(self, account, pid):
+        account.followers.append(pid)
+        account.contributions[pid] = 0
+        heapq.heappush(account.best_heap, (0, pid))
+
+    def delete_official_account(self, pid, account_id):
+        self.person(pid)
+        account = self.account(account_id)
+        if account.owner != pid:
+            raise self.errors["doapd"].pair(pid, account_id)
+        del self.accounts[account_id]
+
+    def follow_official_account(self, pid, account_id):
+        self.person(pid)
+        account = self.account(account_id)
+        if pid in account.contributions:
+            raise self.errors["epi"].single(pid)
+        self.add_follower(account, pid)
+
+    def change_contribution(self, account, pid, delta):
+        account.contributions[pid] += delta
+        heapq.heappush(account.best_heap, (-account.contributions[pid], pid))
+
+    def contribute_article(self, pid, account_id, article_id):
+        self.person(pid)
+        account = self.account(account_id)
+        if article_id in self.all_articles:
+            raise self.errors["eai"].single(article_id)
+        if pid not in account.contributions:
+            raise self.errors["cpd"].pair(pid, article_id)
+        self.all_articles.add(article_id)
+        account.articles[article_id] = pid
+        self.change_contribution(account, pid, 1)
+        for follower in account.followers:
+            self.receive_article(self.persons[follower], article_id)
+
+    def delete_article(self, pid, account_id, article_id):
+        self.person(pid)
+        account = self.account(account_id)
+        if article_id not in account.articles:
+            raise self.errors["ainf"].single(article_id)
+        if account.owner != pid:
+            raise self.errors["dapd"].pair(pid, article_id)
+        for follower in account.followers:
+            self.drop_article(self.persons[follower], article_id)
+        self.change_contribution(account, account.articles.pop(article_id), -1)
+
+    def query_best_contributor(self, account_id):
+        account = self.account(account_id)
+        heap, contributions = account.best_heap, account.contributions
+        while contributions[heap[0][1]] != -heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][1]
+
+    def receive_article(self, person, article_id):
+        person.articles.append((article_id, self.article_seq))
+        self.article_seq += 1
+        person.article_live[article_id] = person.article_live.get(article_id, 0) + 1
+
+    def drop_article(self, person, article_id):
+        live = person.article_live.pop(article_id, 0)
+        if not live:
+            return
+        person.article_cut[article_id] = self.article_seq
+        person.article_stale += live
+        if person.article_stale > 32 and 2 * person.article_stale > len(person.articles):
+            cut = person.article_cut
+            person.articles = [entry for entry in person.articles if entry[1] >= cut.get(entry[0], 0)]
+            person.article_stale = 0
+
+    def query_received_articles(self, pid):
+        person = self.person(pid)
+        cut = person.article_cut
+        live = (article for article, seq in reversed(person.articles) if seq >= cut.get(article, 0))
+        return list(islice(live, RECEIVED_LIST_LIMIT))
+
+    # --- messages and emojis ---
+
+    def add_message(self, message):
+        if message.id in self.messages:
+            raise self.errors["emi"].single(message.id)
+        if message.kind == MESSAGE_EMOJI and message.extra not in self.emoji_heat:
+            raise self.errors["einf"].single(message.extra)
+        if message.kind == MESSAGE_FORWARD and (message.extra not in self.all_articles or
+                                                not message.person1.article_live.get(message.extra)):
+            raise self.errors["ainf"].single(message.extra)
+        if message.tag is None and message.person1 is message.person2:
+            raise self.errors["epi"].single(message.person1.id)
+        self.messages[message.id] = message
+        if message.kind == MESSAGE_EMOJI:
+            self.emoji_messages[message.extra].add(message.id)
+
+    def deliver(self, sender, receiver, message, money):
+        receiver.social_value += message.social_value
+        if message.kind == MESSAGE_RED_ENVELOPE:
+            sender.money -= money
+            receiver.money += money
+        elif message.kind == MESSAGE_FORWARD:
+            self.receive_article(receiver, message.extra)
+        receiver.messages.appendleft(message)
+
+    def send_message(self, message_id):
+        message = self.messages.get(message_id)
+        if message is None:
+            raise self.errors["minf"].single(message_id)
+        sender = message.person1
+        if message.tag is None:
+            if message.person2.id not in sender.acquaintance:
+                raise self.errors["rnf"].relation(sender.id, message.person2.id)
+        elif message.tag.id not in sender.tags:
+            raise self.errors["tinf"].single(message.tag.id)
+        del self.messages[message_id]
+        if message.kind == MESSAGE_EMOJI:
+            self.emoji_heat[message.extra] += 1
+            self.emoji_messages[message.extra].discard(message_id)
+        sender.social_value += message.social_value
+        if message.tag is None:
+            self.deliver(sender, message.person2, message, message.extra)
+            return
+        members = message.tag.members
+        if not members:
+            return
+        share = java_div(message.extra, len(members)) if message.kind == MESSAGE_RED_ENVELOPE else 0
+        for member in members.values():
+            if member is not sender:
+                self.deliver(sender, member, message, share)
+
+    def store_emoji_id(self, emoji_id):
+        if emoji_id in self.emoji_heat:
+            raise self.errors["eei"].single(emoji_id)
+        self.emoji_heat[emoji_id] = 0
+
+    def query_popularity(self, emoji_id):
+        if emoji_id not in self.emoji_heat:
+            raise self.errors["einf"].single(emoji_id)
+        return self.emoji_heat[emoji_id]
+
+    def delete_cold_emoji(self, limit):
+        for emoji_id in [e for e, heat in self.emoji_heat.items() if heat < limit]:
+            del self.emoji_heat[emoji_id]
+            for message_id in self.emoji_messages.pop(emoji_id, ()):
+                del self.messages[message_id]
+        return len(self.emoji_heat)
+
+    def query_received_messages(self, pid):
+        return list(islice(self.person(pid).messages, RECEIVED_LIST_LIMIT))
+
+
+class OracleRunner:
+    """Parses commands like com.oocourse.spec3.main.Runner and collects the printed lines."""
+
+    def __init__(self):
+        self.network = Network()
+        self.output = []
+        self.handlers = {}
+        for names, handler in (
+                (("ap", "add_person"), self.cmd_add_person),
+                (("ar", "add_relation"), self.cmd_add_relation),
+                (("mr", "modify_relation"), self.cmd_modify_relation),
+                (("qv", "query_value"), self.cmd_query_value),
+                (("qci", "query_circle"), self.cmd_query_circle),
+                (("qts", "query_triple_sum"), self.cmd_query_triple_sum),
+                (("at", "add_tag"), self.cmd_add_tag),
+                (("dt", "del_tag"), self.cmd_del_tag),
+                (("att", "add_to_tag"), self.cmd_add_to_tag),
+                (("dft", "del_from_tag"), self.cmd_del_from_tag),
+                (("qtvs", "query_tag_value_sum"), self.cmd_query_tag_value_sum),
+                (("qtav", "query_tag_age_var"), self.cmd_query_tag_age_var),
+                (("qba", "query_best_acquaintance"), self.cmd_query_best_acquaintance),
+                (("qcs", "query_couple_sum"), self.cmd_query_couple_sum),
+                (("qsp", "query_shortest_path"), self.cmd_query_shortest_path),
+                (("coa", "create_official_account"), self.cmd_create_official_account),
+                (("doa", "delete_official_account"), self.cmd_delete_official_account),
+                (("ca", "contribute_article"), self.cmd_contribute_article),
+                (("da", "delete_article"), self.cmd_delete_article),
+                (("foa", "follow_official_account"), self.cmd_follow_official_account),
+                (("qbc", "query_best_contributor"), self.cmd_query_best_contributor),
+                (("qra", "query_received_articles"), self.cmd_query_received_articles),
+                (("am", "add_message"), self.cmd_add_message(MESSAGE_ORDINARY)),
+                (("arem", "add_red_envelope_message"), self.cmd_add_message(MESSAGE_RED_ENVELOPE)),
+                (("afm", "add_forward_message"), self.cmd_add_message(MESSAGE_FORWARD)),
+                (("aem", "add_emoji_message"), self.cmd_add_message(MESSAGE_EMOJI)),
+                (("sm", "send_message"), self.cmd_send_message),
+                (("qsv", "query_social_value"), self.cmd_query_social_value),
+                (("qrm", "query_received_messages"), self.cmd_query_received_messages),
+                (("sei", "store_emoji_id"), self.cmd_store_emoji_id),
+                (("qp", "query_popularity"), self.cmd_query_popularity),
+                (("dce", "delete_cold_emoji"), self.cmd_delete_cold_emoji),
+                (("qm", "query_money"), self.cmd_query_money)):
+            for name in names:
+                self.handlers[name] = handler
+
+    def run(self, lines):
+        """Runs all commands; returns 'AC', or 'RE' where the Java Runner would abort (unknown command, bad ln)."""
+        lines = iter(lines)
+        for line in lines:
+            args = line.split(" ")
+            try:
+                if args[0] in ("ln", "load_network"):
+                    self.load_network(args, lines)
+                elif args[0] in ("lnl", "load_network_local"):
+                    with open(args[2], 'r', encoding='utf-8') as f:
+                        self.load_network(args, iter(f.read().splitlines()))
+                else:
+                    handler = self.handlers.get(args[0])
+                    if handler is None:
+                        return 'RE'
+                    self.output.append(handler(args))
+            except OracleError as e:
+                self.output.append(str(e))
+            except (ValueError, IndexError, OSError):
+                return 'RE'
+        return 'AC'
+
+    def load_network(self, args, lines):
+        n = int(args[1])
+        needed = 3 * n + n * (n - 1) // 2
+        tokens = []
+        while len(tokens) < needed:
+            tokens.extend(next(lines).split())
+        ids = [int(t) for t in tokens[:n]]
+        names = tokens[n:2 * n]
+        ages = [int(t) for t in tokens[2 * n:3 * n]]
+        values = iter(int(t) for t in tokens[3 * n:needed])
+        network = self.network
+        try:
+            for pid, name, age in zip(ids, names, ages):
+                network.add_person(pid, name, age)
+            for i in range(n - 1):
+                for j in range(i + 1):
+                    value = next(values)
+                    if value != 0:
+                        network.add_relation(ids[i + 1], ids[j], value)
+        except OracleError as e:
+            raise ValueError("Unreachable") from e  # the Java Runner aborts here as well
+        self.output.append("Ok")
+
+    # --- command handlers: parse, call the network, return the printed line ---
+
+    def cmd_add_person(self, args):
+        self.network.add_person(int(args[1]), args[2], int(args[3]))
+        return "Ok"
+
+    def cmd_add_relation(self, args):
+        self.network.add_relation(int(args[1]), int(args[2]), int(args[3]))
+        return "Ok"
+
+    def cmd_modify_relation(self, args):
+        self.network.modify_relation(int(args[1]), int(args[2]), int(args[3]))
+        return "Ok"
+
+    def cmd_query_value(self, args):
+        return str(self.network.query_value(int(args[1]), int(args[2])))
+
+    def cmd_query_circle(self, args):
+        return "true" if self.network.is_circle(int(args[1]), int(args[2])) else "false"
+
+    def cmd_query_triple_sum(self, args):
+        return str(self.network.triple_sum)
+
+    def cmd_add_tag(self, args):
+        self.network.add_tag(int(args[1]), int(args[2]))
+        return "Ok"
+
+    def cmd_del_tag(self, args):
+        self.network.del_tag(int(args[1]), int(args[2]))
+        return "Ok"
+
+    def cmd_add_to_tag(self, args):
+        self.network.add_person_to_tag(int(args[1]), int(args[2]), int(args[3]))
+        return "Ok"
+
+    def cmd_del_from_tag(self, args):
+        self.network.del_person_from_tag(int(args[1]), int(args[2]), int(args[3]))
+        return "Ok"
+
+    def cmd_query_tag_value_sum(self, args):
+        return str(self.network.query_tag_value_sum(int(args[1]), int(args[2])))
+
+    def cmd_query_tag_age_var(self, args):
+        return str(self.network.query_tag_age_var(int(args[1]), int(args[2])))
+
+    def cmd_query_best_acquaintance(self, args):
+        return str(self.network.query_best_acquaintance(int(args[1])))
+
+    def cmd_query_couple_sum(self, args):
+        return str(self.network.couple_sum)
+
+    def cmd_query_shortest_path(self, args):
+        return str(self.network.query_shortest_path(int(args[1]), int(args[2])))
+
+    def cmd_create_official_account(self, args):
+        self.network.create_official_account(int(args[1]), int(args[2]))
+        return "Ok"
+
+    def cmd_delete_official_account(self, args):
+        self.network.delete_official_account(int(args[1]), int(args[2]))
+        return "Ok"
+
+    def cmd_contribute_article(self, args):
+        self.network.contribute_article(int(args[1]), int(args[2]), int(args[3]))
+        return "Ok"
+
+    def cmd_delete_article(self, args):
+        self.network.delete_article(int(args[1]), int(args[2]), int(args[3]))
+        return "Ok"
+
+    def cmd_follow_official_account(self, args):
+        self.network.follow_official_account(int(args[1]), int(args[2]))
+        return "Ok"
+
+    def cmd_query_best_contributor(self, args):
+        return str(self.network.query_best_contributor(int(args[1])))
+
+    def cmd_query_received_articles(self, args):
+        articles = self.network.query_received_articles(int(args[1]))
+        return "".join(f"{a} " for a in articles) if articles else "None"
+
+    def cmd_add_message(self, kind):
+        def handler(args):
+            message_id, extra, message_type = int(args[1]), int(args[2]), int(args[3])
+            id1, id2 = int(args[4]), int(args[5])
+            persons = self.network.persons
+            if message_type == 0:
+                if id1 not in persons or id2 not in persons:
+                    return "The person with this number does not exist"
+                person2, tag = persons[id2], None
+            elif message_type == 1:
+                if id1 not in persons:
+                    return "The person with this number does not exist"
+                person2, tag = None, persons[id1].tags.get(id2)
+                if tag is None:
+                    return "Tag does not exist"
+            else:
+                return None  # the Java Runner prints nothing for other types
+            if kind == MESSAGE_RED_ENVELOPE:
+                social_value = extra * 5
+            elif kind == MESSAGE_FORWARD:
+                social_value = abs(extra) % 200
+            elif kind == MESSAGE_EMOJI:
+                social_value = extra
+            else:
+                social_value = extra
+            self.network.add_message(Message(message_id, kind, social_value, persons[id1], person2, tag,
+                                             extra if kind != MESSAGE_ORDINARY else None))
+            return "Ok"
+        return handler
+
+    def cmd_send_message(self, args):
+        self.network.send_message(int(args[1]))
+        return "Ok"
+
+    def cmd_query_social_value(self, args):
+        return str(to_int(self.network.person(int(args[1])).social_value))
+
+    def cmd_query_received_messages(self, args):
+        messages = self.network.query_received_messages(int(args[1]))
+        return "; ".join(m.describe() for m in messages) if messages else "None"
+
+    def cmd_store_emoji_id(self, args):
+        self.network.store_emoji_id(int(args[1]))
+        return "Ok"
+
+    def cmd_query_popularity(self, args):
+        return str(self.network.query_popularity(int(args[1])))
+
+    def cmd_delete_cold_emoji(self, args):
+        return str(self.network.delete_cold_emoji(int(args[1])))
+
+    def cmd_query_money(self, args):
+        return str(to_int(self.network.person(int(args[1])).money))
+
+
+def run_lines(lines):
+    """Returns (status, output lines) for the given input lines."""
+    runner = OracleRunner()
+    status = runner.run(lines)
+    return status, [line for line in runner.output if line is not None]
+
+
+class OutputWriter:
+    """Stands in for OracleRunner.output: every printed line goes straight to the file instead of a list."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def append(self, line):
+        if line is not None:
+            self.f.write(line + "\n")
+
+
+def run_file(input_path, output_path):
+    """Writes the expected output of input_path to output_path; returns 'AC' or 'RE'.
+
+    Input lines are read and output lines written one at a time, so huge inputs run in the memory of the network.
+    """
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(input_path, 'r', encoding='utf-8', errors='ignore', newline='') as f_in, \
+            open(output_path, 'w', encoding='utf-8') as f_out:
+        runner = OracleRunner()
+        runner.output = OutputWriter(f_out)
+        return runner.run(line.rstrip('\r\n') for line in f_in)
+
+
+def main():
+    args = sys.argv[1:]
+    output_path = None
+    if "-o" in args:
+        index = args.index("-o")
+        output_path = args[index + 1]
+        del args[index:index + 2]
+    if len(args) != 1:
+        print("Usage: python oracle.py <input_file> [-o output_file]")
+        sys.exit(1)
+    start = time.perf_counter()
+    if output_path:
+        status = run_file(args[0], output_path)
+    else:
+        with open(args[0], 'r', encoding='utf-8', errors='ignore') as f:
+            status, output = run_lines(f.read().splitlines())
+        sys.stdout.write("".join(line + "\n" for line in output))
+    print(f"oracle: {args[0]} -> {status} in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+    sys.exit(0 if status == 'AC' else 1)
+
+
+if __name__ == "__main__":
+    main()
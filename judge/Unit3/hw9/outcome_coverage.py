@@ -0,0 +1,410 @@
+import re
+from collections import Counter, defaultdict
+
+import oracle
+
+# --- 配置 ---
+COVERAGE_REPORT_FILE = "generation_coverage.txt"  # 写在生成器目录下, 不能放进 data/ (check.py 会把 data/*.txt 当作输入)
+PICK_TRIES = 8            # 一次 next_lines 最多尝试的意图数, 都生成不出来时交给调用方的后备策略
+SAMPLE_TRIES = 8          # 寻找满足条件的人 / 关系 / 标签时的随机抽样次数
+MISSING_IDS = range(-30008, -30000)  # 不存在的 id: 在所有生成器的 id 范围之外, 且个数少, 同一个 id 的异常计数会重复
+LARGE_VALUE = 10 ** 6     # 查询结果达到这个量级即归为 large (求和类查询开始有 int 溢出的可能)
+LIST_BUCKET_CAP = 5       # 列表类查询 (qra / qrm) 按长度分桶, 超过此值归为同一桶
+RARE_FILES = 1            # 报告中列出只在这么多个文件中出现过的结果
+# --- End 配置 ---
+
+EXCEPTION_PREFIXES = tuple(oracle.Network().errors)
+# "pinf-3, 12-1" (single) or "er-2, 5-1, 9-2" (pair / relation, lower id first)
+EXCEPTION_LINE = re.compile(r"^([a-z]+)-\d+, (-?\d+)-(\d+)(?:, (-?\d+)-(\d+))?$")
+OUTPUT_CLASSES = {"Ok": "ok", "true": "true", "false": "false", "None": "empty",
+                  "The person with this number does not exist": "no-person", "Tag does not exist": "no-tag"}
+
+
+def value_bucket(output):
+    """Bucket of a query result: zero / one / negative / positive / large, or list-<length> for qra / qrm."""
+    try:
+        value = int(output)
+    except ValueError:
+        items = output.split("; ") if ":" in output else output.split()
+        return f"list-{min(len(items), LIST_BUCKET_CAP)}"
+    if value == 0:
+        return "zero"
+    if abs(value) >= LARGE_VALUE:
+        return "large"
+    if value < 0:
+        return "negative"
+    return "one" if value == 1 else "positive"
+
+
+def outcome_features(command_line, output):
+    """Outcome keys of one printed line.
+
+    Exceptions give "<command>:<prefix>" plus the counter pattern of the exception class, e.g. "pinf:1"
+    (first time for that id), "rnf:1/n" (second id seen before) and "er:same-id" for an equal id pair.
+    Everything else gives "<command>:<class or value bucket>".
+    """
+    name = command_line.split(" ", 1)[0]
+    match = EXCEPTION_LINE.match(output)
+    if match:
+        prefix, id1, count1, id2, count2 = match.groups()
+        counts = [count1] if id2 is None else [count1, count2]
+        features = [f"{name}:{prefix}", f"{prefix}:" + "/".join("1" if c == "1" else "n" for c in counts)]
+        if id2 is not None and id1 == id2:
+            features.append(f"{prefix}:same-id")
+        return features
+    return [f"{name}:{OUTPUT_CLASSES.get(output) or value_bucket(output)}"]
+
+
+def command_lines(lines):
+    """The command lines among lines, skipping ln payload rows (one printed line per command)."""
+    commands, tokens_left = [], 0
+    for line in lines:
+        if tokens_left > 0:
+            tokens_left -= len(line.split())
+            continue
+        commands.append(line)
+        args = line.split()
+        if args[0] in ("ln", "load_network"):
+            n = int(args[1])
+            tokens_left = 3 * n + n * (n - 1) // 2
+    return commands
+
+
+def is_exception(feature):
+    return feature.split(":", 1)[1].split(":")[0] in EXCEPTION_PREFIXES
+
+
+class Sampler:
+    """Random picks from the oracle's network, i.e. from the state the std will actually be in."""
+
+    def __init__(self, network, rng):
+        self.network = network
+        self.rng = rng
+        self.person_ids = ()  # persons are never removed, so the tuple only needs extending
+
+    def person(self):
+        persons = self.network.persons
+        if len(self.person_ids) != len(persons):
+            self.person_ids = tuple(persons)
+        return self.rng.choice(self.person_ids) if self.person_ids else None
+
+    def persons(self, condition):
+        """First (id1, id2) of SAMPLE_TRIES random distinct pairs with condition(p1, p2), else (None, None)."""
+        for _ in range(SAMPLE_TRIES):
+            id1, id2 = self.person(), self.person()
+            if id1 is not None and id1 != id2 and condition(self.network.persons[id1], self.network.persons[id2]):
+                return id1, id2
+        return None, None
+
+    def missing(self, existing=()):
+        candidates = [i for i in MISSING_IDS if i not in existing]
+        return self.rng.choice(candidates) if candidates else None
+
+    def one_of(self, mapping):
+        return self.rng.choice(tuple(mapping)) if mapping else None
+
+    def lonely(self):
+        for _ in range(SAMPLE_TRIES):
+            pid = self.person()
+            if pid is not None and not self.network.persons[pid].acquaintance:
+                return pid
+        return None
+
+    def linked(self):
+        return self.persons(lambda p1, p2: p2.id in p1.acquaintance)
+
+    def unlinked(self):
+        return self.persons(lambda p1, p2: p2.id not in p1.acquaintance)
+
+    def disconnected(self):
+        component = self.network.component
+        return self.persons(lambda p1, p2: component[p1.id] != component[p2.id])
+
+    def tag(self, condition=lambda tag: True):
+        """(owner id, tag id) of a random tag with condition(tag), else (None, None)."""
+        for _ in range(SAMPLE_TRIES):
+            pid = self.person()
+            if pid is None:
+                break
+            tag_id = self.one_of(self.network.persons[pid].tags)
+            if tag_id is not None and condition(self.network.persons[pid].tags[tag_id]):
+                return pid, tag_id
+        return None, None
+
+    def tag_member(self):
+        """(member, owner, tag id) with the member still linked to the owner, so att fails on the membership."""
+        owner, tag_id = self.tag(lambda tag: any(m in tag.owner.acquaintance for m in tag.members))
+        if owner is None:
+            return None, None, None
+        tag = self.network.persons[owner].tags[tag_id]
+        return self.rng.choice([m for m in tag.members if m in tag.owner.acquaintance]), owner, tag_id
+
+    def tag_outsider(self):
+        owner, tag_id = self.tag()
+        pid = self.person()
+        if owner is None or pid in self.network.persons[owner].tags[tag_id].members:
+            return None, None, None
+        return pid, owner, tag_id
+
+    def account(self, condition=lambda account: True):
+        account_id = self.one_of(self.network.accounts)
+        return account_id if account_id is not None and condition(self.network.accounts[account_id]) else None
+
+    def non_owner(self):
+        """(person, account) where the person does not own the account."""
+        pid, account_id = self.person(), self.account()
+        if account_id is None or self.network.accounts[account_id].owner == pid:
+            return None, None
+        return pid, account_id
+
+    def follower(self):
+        account_id = self.account()
+        if account_id is None:
+            return None, None
+        return self.one_of(self.network.accounts[account_id].contributions), account_id
+
+    def non_follower(self):
+        pid, account_id = self.person(), self.account()
+        if account_id is None or pid in self.network.accounts[account_id].contributions:
+            return None, None
+        return pid, account_id
+
+    def account_article(self):
+        account_id = self.account(lambda account: account.articles)
+        if account_id is None:
+            return None, None
+        return account_id, self.one_of(self.network.accounts[account_id].articles)
+
+    def message(self, condition):
+        """Id of a random pending message with condition(message), else None."""
+        for _ in range(SAMPLE_TRIES):
+            message_id = self.one_of(self.network.messages)
+            if message_id is not None and condition(self.network.messages[message_id]):
+                return message_id
+        return None
+
+    def line(self, *parts):
+        """The command line, or None if a part could not be sampled."""
+        return None if any(part is None for part in parts) else " ".join(map(str, parts))
+
+
+def _non_owner_of_article(s):
+    account_id, article_id = s.account_article()
+    pid = s.person()
+    if account_id is None or s.network.accounts[account_id].owner == pid:
+        return None
+    return s.line("da", pid, account_id, article_id)
+
+
+def _message_violations(command):
+    violations = {
+        "emi": lambda s: s.line(command, s.one_of(s.network.messages), 1, 0, *s.persons(lambda p1, p2: True)),
+        "no-person": lambda s: s.line(command, s.missing(s.network.messages), 1, 0, s.missing(s.network.persons), s.person()),
+        "no-tag": lambda s: s.line(command, s.missing(s.network.messages), 1, 1, s.person(), s.missing()),
+    }
+    if command in ("am", "arem"):
+        violations["epi"] = lambda s: s.line(command, s.missing(s.network.messages), 1, 0, *[s.person()] * 2)
+    if command == "aem":
+        violations["einf"] = lambda s: s.line(command, s.missing(s.network.messages), s.missing(s.network.emoji_heat), 0,
+                                              *s.persons(lambda p1, p2: True))
+    if command == "afm":
+        violations["ainf"] = lambda s: s.line(command, s.missing(s.network.messages), s.missing(s.network.all_articles), 0,
+                                              *s.persons(lambda p1, p2: True))
+    return violations
+
+
+# {command: {kind: builder(Sampler) -> line or None}}. Every line is rejected by the network (an exception, or
+# the Runner's "does not exist" message), so it changes no state and the generator's own bookkeeping stays valid.
+# Kinds that are not exceptions ("self") are queries, which change nothing either.
+VIOLATIONS = {
+    "ap": {"epi": lambda s: s.line("ap", s.person(), "x", 1)},
+    "ar": {"pinf": lambda s: s.line("ar", s.missing(s.network.persons), s.person(), 1),
+           "er": lambda s: s.line("ar", *s.linked(), 1),
+           "er-self": lambda s: s.line("ar", *[s.person()] * 2, 1)},
+    "mr": {"pinf": lambda s: s.line("mr", s.person(), s.missing(s.network.persons), 1),
+           "epi": lambda s: s.line("mr", *[s.person()] * 2, 1),
+           "rnf": lambda s: s.line("mr", *s.unlinked(), 1)},
+    "qv": {"pinf": lambda s: s.line("qv", s.missing(s.network.persons), s.person()),
+           "rnf": lambda s: s.line("qv", *s.unlinked()),
+           "self": lambda s: s.line("qv", *[s.person()] * 2)},
+    "qci": {"pinf": lambda s: s.line("qci", s.person(), s.missing(s.network.persons)),
+            "self": lambda s: s.line("qci", *[s.person()] * 2)},
+    "at": {"pinf": lambda s: s.line("at", s.missing(s.network.persons), 1),
+           "eti": lambda s: s.line("at", *s.tag())},
+    "dt": {"pinf": lambda s: s.line("dt", s.missing(s.network.persons), 1),
+           "tinf": lambda s: s.line("dt", s.person(), s.missing())},
+    "att": {"pinf": lambda s: s.line("att", s.missing(s.network.persons), *s.tag()),
+            "epi": lambda s: s.line("att", *[s.person()] * 2, 1),
+            "rnf": lambda s: s.line("att", *s.unlinked(), 1),
+            "tinf": lambda s: s.line("att", *s.linked(), s.missing()),
+            "epi-member": lambda s: s.line("att", *s.tag_member())},
+    "dft": {"pinf": lambda s: s.line("dft", s.person(), s.missing(s.network.persons), 1),
+            "tinf": lambda s: s.line("dft", s.person(), s.person(), s.missing()),
+            "pinf-member": lambda s: s.line("dft", *s.tag_outsider())},
+    "qtvs": {"pinf": lambda s: s.line("qtvs", s.missing(s.network.persons), 1),
+             "tinf": lambda s: s.line("qtvs", s.person(), s.missing())},
+    "qtav": {"pinf": lambda s: s.line("qtav", s.missing(s.network.persons), 1),
+             "tinf": lambda s: s.line("qtav", s.person(), s.missing())},
+    "qba": {"pinf": lambda s: s.line("qba", s.missing(s.network.persons)),
+            "anf": lambda s: s.line("qba", s.lonely())},
+    "qsp": {"pinf": lambda s: s.line("qsp", s.missing(s.network.persons), s.person()),
+            "pnf": lambda s: s.line("qsp", *s.disconnected()),
+            "self": lambda s: s.line("qsp", *[s.person()] * 2)},
+    "coa": {"pinf": lambda s: s.line("coa", s.missing(s.network.persons), s.missing(s.network.accounts), "x"),
+            "eoai": lambda s: s.line("coa", s.person(), s.account(), "x")},
+    "doa": {"pinf": lambda s: s.line("doa", s.missing(s.network.persons), s.account()),
+            "oainf": lambda s: s.line("doa", s.person(), s.missing(s.network.accounts)),
+            "doapd": lambda s: s.line("doa", *s.non_owner())},
+    "ca": {"pinf": lambda s: s.line("ca", s.missing(s.network.persons), s.account(), s.missing(s.network.all_articles), "x"),
+           "oainf": lambda s: s.line("ca", s.person(), s.missing(s.network.accounts), s.missing(s.network.all_articles), "x"),
+           "eai": lambda s: s.line("ca", *s.follower(), s.one_of(s.network.all_articles), "x"),
+           "cpd": lambda s: s.line("ca", *s.non_follower(), s.missing(s.network.all_articles), "x")},
+    "da": {"pinf": lambda s: s.line("da", s.missing(s.network.persons), *s.account_article()),
+           "oainf": lambda s: s.line("da", s.person(), s.missing(s.network.accounts), 1),
+           "ainf": lambda s: s.line("da", s.person(), s.account(), s.missing(s.network.all_articles)),
+           "dapd": _non_owner_of_article},
+    "foa": {"pinf": lambda s: s.line("foa", s.missing(s.network.persons), s.account()),
+            "oainf": lambda s: s.line("foa", s.person(), s.missing(s.network.accounts)),
+            "epi": lambda s: s.line("foa", *s.follower())},
+    "qbc": {"oainf": lambda s: s.line("qbc", s.missing(s.network.accounts))},
+    "qra": {"pinf": lambda s: s.line("qra", s.missing(s.network.persons))},
+    "am": _message_violations("am"),
+    "arem": _message_violations("arem"),
+    "afm": _message_violations("afm"),
+    "aem": _message_violations("aem"),
+    "sm": {"minf": lambda s: s.line("sm", s.missing(s.network.messages)),
+           "rnf": lambda s: s.line("sm", s.message(lambda m: m.tag is None and m.person2.id not in m.person1.acquaintance)),
+           "tinf": lambda s: s.line("sm", s.message(lambda m: m.tag is not None and m.tag.id not in m.person1.tags))},
+    "sei": {"eei": lambda s: s.line("sei", s.one_of(s.network.emoji_heat))},
+    "qp": {"einf": lambda s: s.line("qp", s.missing(s.network.emoji_heat))},
+    "qsv": {"pinf": lambda s: s.line("qsv", s.missing(s.network.persons))},
+    "qrm": {"pinf": lambda s: s.line("qrm", s.missing(s.network.persons))},
+    "qm": {"pinf": lambda s: s.line("qm", s.missing(s.network.persons))},
+}
+
+
+def reachable_exceptions(commands):
+    """Exception prefixes the VIOLATIONS of these commands aim at."""
+    return sorted({kind.split("-")[0] for command in commands for kind in VIOLATIONS.get(command, ())
+                   if kind.split("-")[0] in EXCEPTION_PREFIXES})
+
+
+class CoverageTracker:
+    """Runs every generated line through oracle.py and steers generation toward rarely reached outcomes.
+
+    An intent is (command, kind): kind None asks the generator for a valid command, any other kind builds
+    the VIOLATIONS line. Each intent remembers the outcomes it produced; its weight is the mean of
+    1 / (1 + times seen) over them, so intents whose outcomes are already common fade out. Intents that
+    never produced output keep weight 1 / (1 + failed attempts).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, rng=None):
+        self.runner = oracle.OracleRunner()
+        self.sampler = Sampler(self.runner.network, rng)
+        self.hits = Counter()                   # feature -> times reached in this file
+        self.intent_hits = {}                   # intent -> Counter of the features it produced
+        self.feature_intents = defaultdict(set)  # feature -> intents that produced it (for weight invalidation)
+        self.weights = {}                       # intent -> cached weight
+        self.failures = Counter()               # intent -> attempts that produced no line
+        self.pending = None                     # intent of the lines about to be observed
+        self.broken = False                     # the oracle stopped (RE): nothing more can be observed
+        self.outputs = []                       # (command line, printed line or None) of the last observe()
+
+    def observe(self, lines):
+        """Feeds written lines to the oracle, counts their outcomes and credits them to the pending intent."""
+        intent, self.pending = self.pending, None
+        self.outputs = []
+        if self.broken or not lines:
+            return []
+        try:
+            self.broken = self.runner.run(lines) != 'AC'
+        except StopIteration:  # an ln block cut off by the instruction limit
+            self.broken = True
+        features = []
+        self.outputs = list(zip(command_lines(lines), self.runner.output))
+        for command, output in self.outputs:
+            if output is not None:
+                features.extend(outcome_features(command, output))
+        self.runner.output = []
+        self.hits.update(features)
+        for feature in features:
+            for stale in self.feature_intents[feature]:
+                self.weights.pop(stale, None)
+        if intent is not None and features:
+            self.intent_hits.setdefault(intent, Counter()).update(features)
+            for feature in features:
+                self.feature_intents[feature].add(intent)
+            self.weights.pop(intent, None)
+        return features
+
+    def weight(self, intent):
+        cached = self.weights.get(intent)
+        if cached is None:
+            produced = self.intent_hits.get(intent)
+            if produced:
+                cached = sum(n / (1 + self.hits[f]) for f, n in produced.items()) / sum(produced.values())
+            else:
+                cached = 1 / (1 + self.failures[intent])
+            self.weights[intent] = cached
+        return cached
+
+    def intents(self, commands):
+        return [(command, None) for command in commands] + \
+               [(command, kind) for command in commands for kind in VIOLATIONS.get(command, ())]
+
+    def next_lines(self, commands, valid_lines, rng):
+        """Lines for the most promising intent: valid_lines(command) for valid intents (the generator keeps its
+        own state), VIOLATIONS for the rest. Returns [] if PICK_TRIES intents all failed."""
+        self.sampler.rng = rng
+        intents = self.intents(commands)
+        for _ in range(PICK_TRIES):
+            intent = rng.choices(intents, [self.weight(i) for i in intents])[0]
+            command, kind = intent
+            if kind is None:
+                lines = valid_lines(command)
+            else:
+                line = VIOLATIONS[command][kind](self.sampler)
+                lines = [line] if line else []
+            if lines:
+                self.pending = intent
+                return lines
+            self.failures[intent] += 1
+            self.weights.pop(intent, None)
+        return []
+
+    def distinct(self):
+        return len(self.hits)
+
+
+def summary(hits):
+    """Short per-file line: distinct outcomes and the exception classes reached."""
+    reached = sorted({f.split(":", 1)[1].split(":")[0] for f in hits if is_exception(f)})
+    return f"{len(hits)} outcomes, exceptions: {' '.join(reached) or 'none'}"
+
+
+def write_report(path, commands, results):
+    """results = [(file name, strategy name, {feature: hits})]; writes the batch coverage report."""
+    files_with = Counter(feature for _, _, hits in results for feature in hits)
+    reached = {f.split(":", 1)[1].split(":")[0] for f in files_with if is_exception(f)}
+    per_strategy = defaultdict(list)
+    for _, strategy, hits in results:
+        per_strategy[strategy].append(len(hits))
+    lines = ["--- Outcome Coverage (oracle.py replay of every generated file) ---",
+             f"{len(files_with)} distinct outcomes over {len(results)} files",
+             f"Exceptions reached: {' '.join(sorted(reached)) or 'none'}",
+             f"Exceptions never reached: {' '.join(p for p in reachable_exceptions(commands) if p not in reached) or 'none'}",
+             "", "Distinct outcomes per file, by strategy:"]
+    for strategy, counts in sorted(per_strategy.items(), key=lambda kv: -sum(kv[1]) / len(kv[1])):
+        lines.append(f"  {strategy:<28}{len(counts):>4} files, mean {sum(counts) / len(counts):.1f}, max {max(counts)}")
+    rare = sorted(f for f, n in files_with.items() if n <= RARE_FILES)
+    lines += ["", f"Outcomes reached in at most {RARE_FILES} file(s) ({len(rare)}):"] + [f"  {f}" for f in rare]
+    lines += ["", "Per file:"] + [f"  {name}: {summary(hits)}" for name, _, hits in results]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return lines[:4]
+
+
+COVERAGE = CoverageTracker()
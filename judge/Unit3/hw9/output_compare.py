@@ -0,0 +1,278 @@
+import os
+import mmap
+import struct
+import hashlib
+import threading
+from itertools import islice, zip_longest
+from collections import namedtuple
+
+# --- 配置 ---
+MMAP_THRESHOLD = 4 * 1024 * 1024  # 不小于该大小的输出文件通过 mmap 逐行读取, 不整体读入内存
+COPY_CHUNK_SIZE = 1024 * 1024     # 日志中拷贝文件内容时的块大小
+EXCERPT_THRESHOLD = 4 * 1024 * 1024  # 日志中不小于该大小的文件只写开头、结尾与差异附近的行 (按偏移定位), 不整份拷贝
+EXCERPT_EDGE_LINES = 20           # 摘录时开头 / 结尾各写的行数
+EXCERPT_CONTEXT = 3               # 摘录时每处差异前后各写的行数
+EOF_MARK = "<EOF>"
+INDEX_SUFFIX = ".idx"             # 输出行 -> 输入行索引与数据文件放在一起 (data/testcase_1.txt.idx), 不匹配 *.txt
+INDEX_PERSIST = os.environ.get("JUDGE_LINE_INDEX", "1") != "0"  # 0: 索引只在内存中建立, 不写文件
+INDEX_CACHE_SIZE = 256            # 进程内缓存的索引个数 (同一输入上多个 jar 出错时共用)
+# --- End 配置 ---
+
+# Index file: header, then one fixed-size record per expected output line, so record k is at a known offset.
+INDEX_MAGIC = b"U3LIDX1\n"
+INDEX_HEADER = struct.Struct("<8sQQI")  # magic, input size, input mtime_ns, record count
+INDEX_RECORD = struct.Struct("<IQB")    # input line (1-based), byte offset of that line, command type code
+COMMAND_TYPES = ("ap", "ar", "mr", "qv", "qci", "qts", "at", "dt", "att", "dft", "qtav", "qba", "ln", "lnl",
+                 "coa", "doa", "ca", "da", "foa", "qsp", "qbc", "qra", "qtvs", "qcs",
+                 "am", "aem", "arem", "afm", "sm", "sei", "dce", "qsv", "qrm", "qp", "qm")
+COMMAND_CODES = {name: code for code, name in enumerate(COMMAND_TYPES)}
+UNKNOWN_TYPE = 255
+
+# output_line / input_line are 1-based; std_line / test_line are EOF_MARK past the end of that file
+Mismatch = namedtuple("Mismatch", ["output_line", "std_line", "test_line", "input_line", "input_command"])
+# stopped_early: the comparison hit max_mismatches, later lines were not looked at
+CompareResult = namedtuple("CompareResult", ["match", "mismatches", "stopped_early"])
+
+
+def iter_lines(path):
+    """逐行产出文件的原始字节行 (含换行符); 大文件走 mmap"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from iter(mm.readline, b'')
+        else:
+            yield from f
+
+
+def iter_command_offsets(f):
+    """Yields (start line, byte offset, raw command) for every expected output line of an input opened in binary mode.
+
+    Blank lines produce no output; an 'ln n' block spans n + 3 lines and produces one.
+    """
+    line_no, offset = 0, 0
+    for raw in f:
+        line_no += 1
+        start, offset = offset, offset + len(raw)
+        command = raw.strip()
+        if not command:
+            continue
+        yield line_no, start, command
+        parts = command.split()
+        if parts[0] in (b"ln", b"load_network") and len(parts) == 2 and parts[1].isdigit():
+            for skipped in islice(f, int(parts[1]) + 2):
+                line_no += 1
+                offset += len(skipped)
+
+
+def index_path_for(input_path):
+    return input_path + INDEX_SUFFIX
+
+
+class LineIndex:
+    """Output line -> (input line, byte offset, command type) of one input file, see build_line_index."""
+
+    def __init__(self, input_path, records):
+        self.input_path = input_path
+        self.records = records  # the record part of the index file
+        self.count = len(records) // INDEX_RECORD.size
+
+    def lookup(self, output_line):
+        """(input line, byte offset, command type) of a 1-based output line, or None past the last command."""
+        if not 1 <= output_line <= self.count:
+            return None
+        input_line, offset, code = INDEX_RECORD.unpack_from(self.records, (output_line - 1) * INDEX_RECORD.size)
+        return input_line, offset, COMMAND_TYPES[code] if code < len(COMMAND_TYPES) else "?"
+
+    def command(self, output_line):
+        """(input line, command text) that produced an output line, read by seeking into the input; None past the end."""
+        entry = self.lookup(output_line)
+        if entry is None:
+            return None
+        with open(self.input_path, 'rb') as f:
+            f.seek(entry[1])
+            return entry[0], f.readline().strip().decode('utf-8', errors='ignore')
+
+
+def input_stamp(input_path):
+    stat = os.stat(input_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def build_line_index(input_path, persist=INDEX_PERSIST):
+    """Parses the input once and returns its LineIndex; with persist, also writes it next to the input.
+
+    The file is written to a temporary name and renamed, so concurrent builders never expose a partial index.
+    """
+    size, mtime_ns = input_stamp(input_path)
+    records = bytearray()
+    with open(input_path, 'rb') as f:
+        for line_no, offset, command in iter_command_offsets(f):
+            code = COMMAND_CODES.get(command.split()[0].decode('ascii', errors='ignore'), UNKNOWN_TYPE)
+            records += INDEX_RECORD.pack(line_no, offset, code)
+    if persist:
+        index_path = index_path_for(input_path)
+        temp_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, size, mtime_ns, len(records) // INDEX_RECORD.size))
+                f.write(records)
+            os.replace(temp_path, index_path)
+            if len(records) >= MMAP_THRESHOLD:
+                return load_line_index(input_path) or LineIndex(input_path, bytes(records))
+        except OSError:  # read-only data directory: the in-memory index still works
+            try: os.remove(temp_path)
+            except OSError: pass
+    return LineIndex(input_path, bytes(records))
+
+
+def load_line_index(input_path):
+    """The persisted LineIndex of an input, or None if there is none or the input changed since it was built.
+
+    Large index files are memory-mapped instead of read, so cached indexes of huge inputs stay in the page cache.
+    """
+    try:
+        with open(index_path_for(input_path), 'rb') as f:
+            magic, size, mtime_ns, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+            length = count * INDEX_RECORD.size
+            if magic != INDEX_MAGIC or (size, mtime_ns) != input_stamp(input_path) \
+                    or os.fstat(f.fileno()).st_size != INDEX_HEADER.size + length:
+                return None
+            if length >= MMAP_THRESHOLD:
+                records = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))[INDEX_HEADER.size:]
+            else:
+                records = f.read()
+    except (OSError, struct.error, ValueError):
+        return None
+    return LineIndex(input_path, records)
+
+
+_index_cache = {}  # input path -> (input stamp, LineIndex)
+_index_lock = threading.Lock()
+
+
+def line_index(input_path):
+    """LineIndex of an input: from the process cache, else the index file, else parsed (and persisted) now."""
+    stamp = input_stamp(input_path)
+    with _index_lock:
+        cached = _index_cache.get(input_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        index = load_line_index(input_path) or build_line_index(input_path)
+        if len(_index_cache) >= INDEX_CACHE_SIZE:
+            _index_cache.clear()
+        _index_cache[input_path] = (stamp, index)
+        return index
+
+
+def decode_line(raw):
+    return EOF_MARK if raw is None else raw.decode('utf-8', errors='replace').rstrip('\r\n')
+
+
+def compare_output_files(std_ans_path, test_out_path, input_path=None, max_mismatches=10):
+    """Compares two output files in one streaming pass, in constant memory.
+
+    Lines are compared with leading/trailing whitespace stripped and trailing blank lines are
+    ignored (a missing line counts as blank). Stops after max_mismatches differing lines; each
+    Mismatch carries the input command that produced that output line when input_path is given,
+    looked up in the input's LineIndex (built on the first mismatch, then shared by every jar).
+    """
+    index = None
+    mismatches = []
+    pairs = zip_longest(iter_lines(std_ans_path), iter_lines(test_out_path))
+    for output_line, (std_raw, test_raw) in enumerate(pairs, start=1):
+        if (std_raw or b'').strip() == (test_raw or b'').strip():
+            continue
+        command = None
+        if input_path:
+            index = index or line_index(input_path)
+            command = index.command(output_line)  # None once the output runs past the last command
+        mismatches.append(Mismatch(output_line, decode_line(std_raw), decode_line(test_raw),
+                                   *(command or (None, None))))
+        if len(mismatches) >= max_mismatches:
+            return CompareResult(False, mismatches, True)
+    return CompareResult(not mismatches, mismatches, False)
+
+
+def output_digest(path):
+    """Content hash under the same equality as compare_output_files: lines stripped, trailing blank lines ignored."""
+    digest = hashlib.sha1()
+    blank_lines = 0
+    for raw in iter_lines(path):
+        line = raw.strip()
+        if not line:
+            blank_lines += 1  # only counts if a non-blank line follows
+            continue
+        digest.update(b'\n' * blank_lines + line + b'\n')
+        blank_lines = 0
+    return digest.hexdigest()
+
+
+def copy_text(path, out):
+    """把文本文件按块写入已打开的日志, 去掉末尾的一个换行 (与 '\\n'.join(lines) 的效果一致)"""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        pending = ''
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), ''):
+            out.write(pending)
+            pending = ''
+            if chunk.endswith('\n'):
+                chunk, pending = chunk[:-1], '\n'
+            out.write(chunk)
+
+
+def count_lines(path):
+    """Number of lines (a last line without newline counts), counted block by block."""
+    lines, last = 0, b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    return lines + (last != b'\n')
+
+
+def read_lines(path, numbers):
+    """{line number: raw line without newline} for the wanted 1-based line numbers that exist.
+
+    The file is memory-mapped and skipped block by block by counting newlines; only the wanted lines are copied out.
+    """
+    result = {}
+    if not os.path.getsize(path):
+        return result
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        position, line_no = 0, 1
+        for target in sorted(set(numbers)):
+            while line_no < target and position < len(mm):
+                newlines = mm[position:position + COPY_CHUNK_SIZE].count(b'\n')
+                if line_no + newlines < target:
+                    position, line_no = min(position + COPY_CHUNK_SIZE, len(mm)), line_no + newlines
+                    continue
+                for _ in range(target - line_no):
+                    position = mm.find(b'\n', position) + 1
+                line_no = target
+            if position >= len(mm) or line_no != target:
+                break
+            end = mm.find(b'\n', position)
+            result[target] = mm[position:end if end >= 0 else len(mm)].rstrip(b'\r')
+    return result
+
+
+def copy_text_excerpt(path, out, centers=()):
+    """copy_text for files under EXCERPT_THRESHOLD. A larger file is not copied: only its first and last
+    EXCERPT_EDGE_LINES lines and EXCERPT_CONTEXT lines around each 1-based line in centers are written, numbered,
+    with the skipped stretches marked. Returns True if the file was excerpted."""
+    if os.path.getsize(path) < EXCERPT_THRESHOLD:
+        copy_text(path, out)
+        return False
+    total = count_lines(path)
+    ranges = [(1, EXCERPT_EDGE_LINES), (total - EXCERPT_EDGE_LINES + 1, total)]
+    ranges += [(center - EXCERPT_CONTEXT, center + EXCERPT_CONTEXT) for center in centers if center]
+    numbers = sorted({n for first, last in ranges for n in range(max(1, first), min(total, last) + 1)})
+    lines = read_lines(path, numbers)
+    parts, previous = [f"<{total} lines, {os.path.getsize(path)} bytes: excerpt, full file at {path}>"], 0
+    for n in numbers:
+        if n > previous + 1:
+            parts.append(f"<... {n - previous - 1} lines ...>")
+        parts.append(f"{n}: {lines.get(n, b'').decode('utf-8', errors='ignore')}")
+        previous = n
+    out.write("\n".join(parts))
+    return True
@@ -0,0 +1,204 @@
+import os
+import re
+import sys
+import subprocess
+import threading
+from collections import namedtuple
+from statistics import median
+
+# --- 配置 ---
+USAGE_ENABLED = os.environ.get("JUDGE_USAGE", "1") != "0"
+GC_LOG_ENABLED = os.environ.get("JUDGE_GC_LOG", "0") == "1"  # 每次运行加 -Xloggc, 结束后汇总 GC 次数与停顿
+USAGE_REPORT_FILE = "resource_usage.txt"
+HEAVY_FACTOR = 2.0      # 平均 CPU 或峰值内存达到所有 jar 中位数的这么多倍即标记为 HEAVY
+HEAVIEST_CASES = 5      # 每个 jar 的报告中列出 CPU 最高的用例数
+# --- End 配置 ---
+
+# user_s / sys_s and peak_rss_kb cover the JVM and every descendant it reaped; None where os.wait4 is unavailable.
+# gc_count / gc_pause_ms are None unless JUDGE_GC_LOG=1 and the log could be parsed.
+RunUsage = namedtuple("RunUsage", ["status", "wall_s", "user_s", "sys_s", "peak_rss_kb", "gc_count", "gc_pause_ms"])
+
+# JDK 8 -Xloggc: "0.178: [GC (Allocation Failure)  33280K->776K(125952K), 0.0015213 secs]" (also Full GC)
+GC_LINE_JDK8 = re.compile(rb"\[(?:Full )?GC\b.*?, ([\d.]+) secs\]")
+# JDK 9+ (-Xloggc maps to -Xlog:gc): "[0.012s][info][gc] GC(0) Pause Young (Normal) (G1 Evacuation Pause) 24M->2M(256M) 1.234ms"
+GC_LINE_UNIFIED = re.compile(rb"GC\(\d+\) Pause.*? ([\d.]+)ms")
+
+
+class AccountedPopen(subprocess.Popen):
+    """Popen that reaps its child with os.wait4, keeping the child's rusage (CPU time, peak RSS).
+
+    communicate() and wait() both end in _try_wait, so this sees exactly one successful reap;
+    poll() does not go through it, so a killed process should be reaped with wait() (see reap()).
+    """
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        if not hasattr(os, "wait4"):
+            return super()._try_wait(wait_flags)
+        try:
+            pid, sts, rusage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return self.pid, 0  # same as Popen: the child was reaped elsewhere, its status is lost
+        if pid == self.pid:
+            self.rusage = rusage
+        return pid, sts
+
+
+def reap(process, timeout=5):
+    """Waits for a killed process so its resource usage is collected; never raises."""
+    try:
+        process.wait(timeout=timeout)
+    except Exception:
+        pass
+
+
+def gc_log_path_for(output_path):
+    """GC log location next to a run's output file, or None when GC logging is off."""
+    return os.path.splitext(output_path)[0] + ".gc.log" if GC_LOG_ENABLED else None
+
+
+def gc_log_args(gc_log_path):
+    """JVM options for writing the GC log (JDK 8 syntax, still accepted by later JDKs)."""
+    return [f"-Xloggc:{gc_log_path}"] if gc_log_path else []
+
+
+def parse_gc_log(gc_log_path):
+    """Returns (collections, total pause ms) from a GC log, or (None, None) if there is none."""
+    if not gc_log_path or not os.path.exists(gc_log_path):
+        return None, None
+    count, pause_ms = 0, 0.0
+    with open(gc_log_path, 'rb') as f:
+        for line in f:
+            match = GC_LINE_JDK8.search(line)
+            if match:
+                count += 1
+                pause_ms += float(match.group(1)) * 1000
+                continue
+            match = GC_LINE_UNIFIED.search(line)
+            if match:
+                count += 1
+                pause_ms += float(match.group(1))
+    return count, pause_ms
+
+
+def peak_rss_kb(rusage):
+    """ru_maxrss is in KiB on Linux but in bytes on macOS.
+
+    Linux keeps the high-water mark across exec, so the figure never drops below the forked judge
+    process (~15 MB); a JVM is well above that, and every jar shares the same floor.
+    """
+    return rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+
+
+def describe(usage):
+    """One-line summary of a run's usage for the per-run progress message."""
+    if usage is None or usage.user_s is None:
+        return ""
+    text = f", CPU {usage.user_s + usage.sys_s:.2f}s (user {usage.user_s:.2f}s, sys {usage.sys_s:.2f}s), peak RSS {usage.peak_rss_kb / 1024:.1f} MB"
+    if usage.gc_count is not None:
+        text += f", GC {usage.gc_count}x / {usage.gc_pause_ms:.1f} ms"
+    return text
+
+
+class UsageRecorder:
+    """Collects the RunUsage of every jar run, keyed by (jar name, input name)."""
+
+    def __init__(self, enabled=USAGE_ENABLED):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.runs = {}  # jar name -> {input name: RunUsage}
+        self.verdicts = {}  # jar name -> {input name: final verdict}, set once the case has been judged
+
+    def record(self, jar_path, input_path, status, wall_s, process, gc_log_path=None):
+        """Stores the usage of one finished run (process may be None if it never started) and returns it."""
+        if not self.enabled:
+            return None
+        rusage = getattr(process, "rusage", None)
+        gc_count, gc_pause_ms = parse_gc_log(gc_log_path)
+        usage = RunUsage(status, wall_s,
+                         rusage.ru_utime if rusage else None, rusage.ru_stime if rusage else None,
+                         peak_rss_kb(rusage) if rusage else None, gc_count, gc_pause_ms)
+        with self.lock:
+            self.runs.setdefault(os.path.basename(jar_path), {})[os.path.basename(input_path)] = usage
+        return usage
+
+    def set_verdict(self, jar_name, input_name, verdict):
+        """Stores a case's final verdict; RunUsage.status is only how the run ended (a WA run is 'AC')."""
+        if self.enabled:
+            with self.lock:
+                self.verdicts.setdefault(jar_name, {})[input_name] = verdict
+
+    def measured(self, jar_name):
+        """The runs of a jar that have CPU / RSS figures."""
+        with self.lock:
+            return {name: u for name, u in self.runs.get(jar_name, {}).items() if u.user_s is not None}
+
+    def jar_lines(self, jar_name):
+        """Resource section for one jar's test report: totals, peaks and the most CPU-hungry cases."""
+        runs = self.measured(jar_name)
+        if not runs:
+            return []
+        with self.lock:
+            verdicts = dict(self.verdicts.get(jar_name, {}))
+        cpu = {name: u.user_s + u.sys_s for name, u in runs.items()}
+        top_rss = max(runs, key=lambda name: runs[name].peak_rss_kb)
+        lines = ["Resource usage:",
+                 f"  - CPU total {sum(cpu.values()):.2f}s, avg {sum(cpu.values()) / len(cpu):.2f}s per case "
+                 f"(user {sum(u.user_s for u in runs.values()):.2f}s, sys {sum(u.sys_s for u in runs.values()):.2f}s)",
+                 f"  - Peak RSS {runs[top_rss].peak_rss_kb / 1024:.1f} MB ({top_rss})"]
+        gc_runs = [u for u in runs.values() if u.gc_count is not None]
+        if gc_runs:
+            lines.append(f"  - GC {sum(u.gc_count for u in gc_runs)} collections, "
+                         f"{sum(u.gc_pause_ms for u in gc_runs):.1f} ms paused in total")
+        lines.append("  Heaviest cases by CPU:")
+        for name in sorted(cpu, key=cpu.get, reverse=True)[:HEAVIEST_CASES]:
+            verdict = verdicts.get(name, f"run {runs[name].status}")
+            lines.append(f"    {name}: {verdict}, wall {runs[name].wall_s:.2f}s{describe(runs[name])}")
+        return lines
+
+    def summary_lines(self):
+        """Cross-jar table; jars far above the median CPU or memory are flagged even when they pass."""
+        with self.lock:
+            names = sorted(self.runs)
+        stats = {}
+        for name in names:
+            runs = self.measured(name)
+            if runs:
+                stats[name] = (len(runs), sum(u.user_s + u.sys_s for u in runs.values()) / len(runs),
+                               max(u.peak_rss_kb for u in runs.values()) / 1024,
+                               sum(u.gc_pause_ms or 0.0 for u in runs.values()))
+        lines = ["--- Resource Usage Summary ---"]
+        if not stats:
+            lines.append("  (no CPU / memory figures recorded)")
+            return lines
+        cpu_median = median(s[1] for s in stats.values())
+        rss_median = median(s[2] for s in stats.values())
+        lines.append(f"  {'jar':<28}{'runs':>6}{'avg CPU(s)':>12}{'peak RSS(MB)':>14}{'GC pause(ms)':>14}")
+        for name, (runs, avg_cpu, rss, gc_pause) in sorted(stats.items(), key=lambda kv: kv[1][1], reverse=True):
+            flags = []
+            if len(stats) > 2 and cpu_median > 0 and avg_cpu >= HEAVY_FACTOR * cpu_median:
+                flags.append(f"HEAVY CPU {avg_cpu / cpu_median:.1f}x median")
+            if len(stats) > 2 and rss_median > 0 and rss >= HEAVY_FACTOR * rss_median:
+                flags.append(f"HEAVY RSS {rss / rss_median:.1f}x median")
+            lines.append(f"  {name:<28}{runs:>6}{avg_cpu:>12.2f}{rss:>14.1f}{gc_pause:>14.1f}"
+                         + (f"  <- {', '.join(flags)}" if flags else ""))
+        return lines
+
+    def report(self, path=USAGE_REPORT_FILE):
+        """Prints the cross-jar table and writes it to `path`; never raises into the judge."""
+        if not self.enabled:
+            return
+        lines = self.summary_lines()
+        print("\n" + "\n".join(lines))
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+                for name in sorted(self.runs):
+                    section = self.jar_lines(name)
+                    if section:
+                        f.write(f"\n{name}\n" + "\n".join(section) + "\n")
+        except OSError as e:
+            print(f"Warning: could not write {path}: {e}")
+
+
+USAGE = UsageRecorder()
@@ -8,7 +8,12 @@ from enum import Enum
 from collections import defaultdict, deque
 import importlib
 import random
+import time
+import codecs
+import queue
+import threading
 import traceback
+from profiler import PROFILER, PROFILE_SUMMARY_FILE, PROFILE_TRACE_FILE
 
 
 # --- Global Print Mode Configuration ---
@@ -94,6 +99,10 @@ ERROR_LOGS_DIR = os.path.join(LOGS_DIR, "error")
 SUMMARY_FILE = os.path.join(RESULTS_DIR, "summary.txt")
 DATA_GENERATOR_SCRIPT_NAME = "data_generator"  # Keep for main function structure
 PROCESS_TIMEOUT = 5
+LINE_TIMEOUT = PROCESS_TIMEOUT  # Seconds the student may take for each output line the harness waits for
+SESSION_TIMEOUT = 120  # Seconds for a whole test case, from starting the JVM to its last output line
+STDERR_TAIL_LINES = 20  # Last stderr lines copied into the log when a case fails
+READ_CHUNK_SIZE = 65536
 
 
 # --- Enums and Data Structures ---
@@ -320,17 +329,30 @@ class LibraryGroundTruth:
 
 
 class StudentProcess:
-    def __init__(self, jar_path):
+    def __init__(self, jar_path, case_key=None):
         self.jar_path = jar_path;
+        self.case_key = case_key
         self.process = None;
         self.log_buffer = []
+        self.stdout_lines = queue.Queue()  # Filled by the stdout reader thread; None marks EOF
+        self.partial_line = ""  # Output after the last newline, logged if the student stops mid-line
+        self.stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+        self.stderr_thread = None
+        self.session_deadline = None
+        self.timed_out = False
 
     def start(self):
         try:
             print_console(f"Starting student process: java -jar {self.jar_path}")
+            spawn_start = time.perf_counter()
             self.process = subprocess.Popen(['java', '-jar', self.jar_path], stdin=subprocess.PIPE,
                                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8',
                                             errors='replace', bufsize=1)
+            PROFILER.record("jvm_spawn", spawn_start, time.perf_counter() - spawn_start, self.case_key)
+            self.session_deadline = time.monotonic() + SESSION_TIMEOUT
+            threading.Thread(target=self._pump_stdout, daemon=True).start()
+            self.stderr_thread = threading.Thread(target=self._pump_stderr, daemon=True)
+            self.stderr_thread.start()
             self.log_buffer.append(f"Harness: Started {self.jar_path}");
             return True
         except Exception as e:
@@ -345,8 +367,10 @@ class StudentProcess:
         try:
             print_send(line)
             self.log_buffer.append(f"Harness SEND: {line}")
-            self.process.stdin.write(line + "\n");
-            self.process.stdin.flush();
+            with PROFILER.phase("input_feed", self.case_key):
+                self.process.stdin.write(line + "\n")
+                self.process.stdin.flush()
+            PROFILER.count("lines_sent")
             return True
         except Exception as e:
             print_error(f"Failed to send input '{line}': {e}");
@@ -354,25 +378,76 @@ class StudentProcess:
             self.kill();
             return False
 
+    def _pump_stdout(self):
+        # Reads the raw pipe as data arrives and splits it into lines, so the harness can wait with a deadline
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending = ""
+        try:
+            while True:
+                chunk = os.read(self.process.stdout.fileno(), READ_CHUNK_SIZE)
+                if not chunk: break
+                pending += decoder.decode(chunk)
+                *lines, pending = pending.split("\n")
+                for line in lines: self.stdout_lines.put(line)
+                self.partial_line = pending
+        except (OSError, ValueError):
+            pass
+        finally:
+            pending += decoder.decode(b"", final=True)
+            if pending: self.stdout_lines.put(pending)  # Last line without a newline, as readline() would return it
+            self.partial_line = ""
+            self.stdout_lines.put(None)
+
+    def _pump_stderr(self):
+        # Drains stderr all along, so a student printing a lot of it never blocks on a full pipe
+        try:
+            for line in self.process.stderr: self.stderr_tail.append(line.rstrip("\n"))
+        except (OSError, ValueError):
+            pass
+
     def read_output_lines(self):
-        if not self.process or self.process.poll() is not None:
+        """Waits for the next output line until LINE_TIMEOUT or the session deadline, whichever comes first.
+
+        Returns the stripped line, or None at EOF or on a timeout; a timeout kills the process and makes
+        failure_verdict() TLE. The log keeps every line read before that.
+        """
+        if not self.process:
             self.log_buffer.append("Harness ERROR: Process not running when reading output.");
             return None
+        wait_start = time.monotonic()
+        if wait_start >= self.session_deadline: return self._on_timeout(wait_start)
         try:
-            line = self.process.stdout.readline()
-            if line:
-                line = line.strip();
-                print_recv(line)
-                self.log_buffer.append(f"Student RECV: {line}")
-            else:
-                self.log_buffer.append(f"Student RECV: [EMPTY LINE or EOF]")
-                if self.process.poll() is not None: return None
-            return line
-        except Exception as e:
-            print_error(f"Failed to read output: {e}");
-            self.log_buffer.append(f"Harness ERROR: Failed to read output: {e}");
-            self.kill();
+            with PROFILER.phase("output_wait", self.case_key):
+                line = self.stdout_lines.get(timeout=min(LINE_TIMEOUT, self.session_deadline - wait_start))
+        except queue.Empty:
+            return self._on_timeout(wait_start)
+        if line is None:
+            self.stdout_lines.put(None)  # EOF stays visible to any later read
+            try:
+                exit_code = self.process.wait(timeout=1)  # Closing stdout usually means the JVM is exiting
+            except subprocess.TimeoutExpired:
+                exit_code = "still running"
+            self.log_buffer.append(f"Student RECV: [EOF] (exit code: {exit_code})")
+            self.consume_stderr()
             return None
+        PROFILER.count("bytes_read", len(line) + 1)
+        line = line.strip()
+        print_recv(line)
+        self.log_buffer.append(f"Student RECV: {line}")
+        return line
+
+    def _on_timeout(self, wait_start):
+        self.timed_out = True
+        limit = f"session limit {SESSION_TIMEOUT}s" if time.monotonic() >= self.session_deadline else f"line limit {LINE_TIMEOUT}s"
+        self.log_buffer.append(f"Harness TIMEOUT: no output line after {time.monotonic() - wait_start:.1f}s ({limit}).")
+        if self.partial_line: self.log_buffer.append(f"Student RECV (partial, no newline): {self.partial_line}")
+        self.kill()
+        self.consume_stderr()
+        return None
+
+    def failure_verdict(self):
+        """Verdict of a case whose output ended early: TLE if a deadline expired, RE if the student exited."""
+        return "TLE" if self.timed_out else "RE"
 
     def read_expected_lines(self, count):
         lines = []
@@ -384,7 +459,12 @@ class StudentProcess:
         return lines
 
     def consume_stderr(self):
-        pass
+        """Copies the stderr tail into the log (once the process has exited, so its last words are included)."""
+        if self.stderr_thread and self.process.poll() is not None: self.stderr_thread.join(timeout=1)
+        if self.stderr_tail:
+            self.log_buffer.append(f"Student STDERR (last {len(self.stderr_tail)} lines):")
+            self.log_buffer.extend(f"  {line}" for line in self.stderr_tail)
+            self.stderr_tail.clear()
 
     def get_current_log(self):
         return "\n".join(self.log_buffer)
@@ -439,7 +519,7 @@ def parse_test_case_file(filepath):
 
 
 def run_single_test_case(jar_path, test_case_file_path):
-    student_proc = StudentProcess(jar_path);
+    student_proc = StudentProcess(jar_path, f"{os.path.basename(jar_path)}/{os.path.basename(test_case_file_path)}");
     sent_inputs_for_replay = [];
     log_content_on_error = ""
     try:
@@ -615,7 +695,7 @@ def run_single_test_case(jar_path, test_case_file_path):
 
             if is_open_command:
                 output_line = student_proc.read_output_lines()
-                if output_line is None: return "RE", student_proc.get_current_log(), "Timeout K for OPEN", sent_inputs_for_replay
+                if output_line is None: return student_proc.failure_verdict(), student_proc.get_current_log(), "Timeout K for OPEN", sent_inputs_for_replay
                 try:
                     num_moves = int(output_line);
                     assert num_moves >= 0
@@ -623,7 +703,7 @@ def run_single_test_case(jar_path, test_case_file_path):
                     return "WA", student_proc.get_current_log(), f"OPEN: Bad K: '{output_line}'", sent_inputs_for_replay
                 if num_moves > 0:
                     move_lines = student_proc.read_expected_lines(num_moves)
-                    if move_lines is None: return "RE", student_proc.get_current_log(), "Timeout OPEN moves", sent_inputs_for_replay
+                    if move_lines is None: return student_proc.failure_verdict(), student_proc.get_current_log(), "Timeout OPEN moves", sent_inputs_for_replay
                     for move_line_str in move_lines:
                         match = ORG_MOVE_REGEX.match(move_line_str)
                         if not match: return "WA", student_proc.get_current_log(), f"OPEN: Bad move: '{move_line_str}'", sent_inputs_for_replay
@@ -661,7 +741,7 @@ def run_single_test_case(jar_path, test_case_file_path):
 
             elif is_close_command:
                 output_line = student_proc.read_output_lines()
-                if output_line is None: return "RE", student_proc.get_current_log(), "Timeout K for CLOSE", sent_inputs_for_replay
+                if output_line is None: return student_proc.failure_verdict(), student_proc.get_current_log(), "Timeout K for CLOSE", sent_inputs_for_replay
                 try:
                     num_moves = int(output_line);
                     assert num_moves >= 0
@@ -669,7 +749,7 @@ def run_single_test_case(jar_path, test_case_file_path):
                     return "WA", student_proc.get_current_log(), f"CLOSE: Bad K: '{output_line}'", sent_inputs_for_replay
                 if num_moves > 0:
                     move_lines = student_proc.read_expected_lines(num_moves)
-                    if move_lines is None: return "RE", student_proc.get_current_log(), "Timeout CLOSE moves", sent_inputs_for_replay
+                    if move_lines is None: return student_proc.failure_verdict(), student_proc.get_current_log(), "Timeout CLOSE moves", sent_inputs_for_replay
                     for move_line_str in move_lines:
                         match = ORG_MOVE_REGEX.match(move_line_str)
                         if not match: return "WA", student_proc.get_current_log(), f"CLOSE: Bad move: '{move_line_str}'", sent_inputs_for_replay
@@ -732,7 +812,7 @@ def run_single_test_case(jar_path, test_case_file_path):
                 parts = command_str_for_send.split();
                 _d_cmd, student_id, action_verb, book_identifier = parts[0], parts[1], parts[2], parts[3]
                 student_output_line = student_proc.read_output_lines()
-                if student_output_line is None: return "RE", student_proc.get_current_log(), f"Timeout resp for {action_verb}: {command_str_for_send}", sent_inputs_for_replay
+                if student_output_line is None: return student_proc.failure_verdict(), student_proc.get_current_log(), f"Timeout resp for {action_verb}: {command_str_for_send}", sent_inputs_for_replay
                 action_match = ACTION_RESPONSE_REGEX.match(student_output_line);
                 query_match_header = QUERY_HEADER_REGEX.match(student_output_line)
                 if action_verb == "queried":
@@ -747,7 +827,7 @@ def run_single_test_case(jar_path, test_case_file_path):
                         return "WA", student_proc.get_current_log(), f"queried: Bad num_traces: '{s_num_traces_str_q}'", sent_inputs_for_replay
                     student_trace_lines_q = student_proc.read_expected_lines(
                         s_num_traces_q) if s_num_traces_q > 0 else []
-                    if s_num_traces_q > 0 and student_trace_lines_q is None: return "RE", student_proc.get_current_log(), "Timeout query traces", sent_inputs_for_replay
+                    if s_num_traces_q > 0 and student_trace_lines_q is None: return student_proc.failure_verdict(), student_proc.get_current_log(), "Timeout query traces", sent_inputs_for_replay
                     gt_success_q, gt_trace_q_list = ground_truth.handle_query(book_identifier)
                     if not gt_success_q: return "RE", student_proc.get_current_log(), f"GT Error query {book_identifier}: {gt_trace_q_list}", sent_inputs_for_replay
 
@@ -994,13 +1074,14 @@ def main():
         # ***修正点: jar_full_path 移到循环内***
         jar_full_path = os.path.join(TESTJAR_DIR, jar_file_name)
         print_status_line(f"\nCONSOLE: --- Testing JAR: {jar_file_name} ---") # Using status_line for this format
-        ac_count, wa_count, re_count = 0, 0, 0
+        ac_count, wa_count, re_count, tle_count = 0, 0, 0, 0
         for tc_file_path in test_case_files:
             tc_name = os.path.basename(tc_file_path)
             print_status_line(f"CONSOLE:   Running Test Case: {tc_name} ... ", end="", flush=True)
             verdict, log_content, reason, recorded_inputs = "RE", "", "Unknown error", []
             try:
-                verdict, log_content, reason, recorded_inputs = run_single_test_case(jar_full_path, tc_file_path)
+                with PROFILER.phase("case_total", f"{jar_file_name}/{tc_name}"):
+                    verdict, log_content, reason, recorded_inputs = run_single_test_case(jar_full_path, tc_file_path)
             except Exception as e_run_tc:
                 verdict = "RE";
                 reason = f"Harness CRITICAL error in run_single_test_case call: {e_run_tc}"
@@ -1021,10 +1102,12 @@ def main():
                 ac_count += 1
             elif verdict == "WA":
                 wa_count += 1
+            elif verdict == "TLE":
+                tle_count += 1
             else:
                 re_count += 1
             try:
-                with open(log_path, 'w', encoding='utf-8') as log_f:
+                with PROFILER.phase("log_write"), open(log_path, 'w', encoding='utf-8') as log_f:
                     log_f.write(f"JAR: {jar_file_name}\nTest Case: {tc_name}\nVerdict: {verdict}\n")
                     if reason: log_f.write(f"Reason: {reason}\n")
                     log_f.write("-" * 20 + " Interaction Log " + "-" * 20 + "\n")
@@ -1037,15 +1120,16 @@ def main():
                         for line in recorded_inputs: replay_f.write(line + "\n")
                 except Exception as e_replay_write:
                     print_error(f"writing replay input file {replay_input_path}: {e_replay_write}")
-        summary_data.append({"jar": jar_file_name, "AC": ac_count, "WA": wa_count, "RE": re_count})
+        summary_data.append({"jar": jar_file_name, "AC": ac_count, "WA": wa_count, "RE": re_count, "TLE": tle_count})
 
-    with open(SUMMARY_FILE, 'w', encoding='utf-8') as sf:
+    with PROFILER.phase("summary_write"), open(SUMMARY_FILE, 'w', encoding='utf-8') as sf:
         sf.write("--- Test Summary ---\n")
         for item in summary_data: sf.write(
-            f"JAR: {item['jar']}\n  AC: {item['AC']}\n  WA: {item['WA']}\n  RE: {item['RE']}\n\n")
+            f"JAR: {item['jar']}\n  AC: {item['AC']}\n  WA: {item['WA']}\n  RE: {item['RE']}\n  TLE: {item['TLE']}\n\n")
 
     print_status_line("") # Newline before final summary
     print_console(f"Summary written to {SUMMARY_FILE}")
+    PROFILER.report(os.path.join(RESULTS_DIR, PROFILE_SUMMARY_FILE), os.path.join(RESULTS_DIR, PROFILE_TRACE_FILE))
     print_console(f"Logs stored in {LOGS_DIR}")
 
 